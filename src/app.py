@@ -8,11 +8,39 @@ from pages.user.user import user_bp
 # Import Sistema de Logging
 from utils.logger import Logger
 
+# Import Sessão de Banco por Requisição
+from models import db_session, cursor_instrumentado
+
+# Import Métricas (Prometheus)
+from utils import metrics
+
+# Import Exportação em massa (comando `flask exportar`)
+from controllers.reports import exportacao
+
+# Import Ingestão direta CSV/JSONL (comando `flask ingerir`)
+from controllers.data_processing import ingestao
+
 app = Flask(__name__)
 app.secret_key = 'minhasecretkeyemuitodificil'
 
 # Inicializar sistema de logging
 logger = Logger.setup_app_logger(app)
+
+# Uma conexão de banco compartilhada por requisição (fechada no teardown)
+db_session.init_app(app)
+
+# Latência, tempo de banco, queries e fases por endpoint (exposto em /metrics)
+metrics.init_app(app)
+
+# Profiler de SQL: N+1, queries lentas e resumo por requisição em modo debug
+cursor_instrumentado.init_app(app)
+
+# Exportação de BPO/viabilidade pela linha de comando
+exportacao.init_app(app)
+
+# Ingestão de BPO/viabilidade em CSV/JSONL pela linha de comando
+ingestao.init_app(app)
+
 # Add Páginas
 app.register_blueprint(app_index)
 app.register_blueprint(admin_bp)
@@ -0,0 +1,435 @@
+"""
+Teste de Carga dos Dashboards e APIs
+====================================
+
+Gera carga contra uma instância local: cada worker faz login como admin e
+como usuário (uma sessão HTTP keep-alive de cada) e sorteia operações de
+um mix ponderado até o fim da duração:
+
+- admin_dados_bpo        GET /admin/api/dados-bpo/<empresa>
+- admin_dados_tabela     GET /admin/api/dados-bpo-tabela/<empresa>
+- user_dados_empresa     GET /user/api/dados-empresa/<empresa>/<ano>
+- user_dados_bpo         GET /user/api/dados-bpo/<empresa>
+- admin_excel_bpo        GET /admin/gerar_relatorio_bpo/<empresa>
+- user_excel_bpo         GET /user/gerar_relatorio_bpo
+- admin_upload_bpo       POST /admin/upload_bpo (planilha sintética)
+- admin_upload_viab      POST /admin/upload (planilha sintética)
+
+Ao final mostra, por operação e no total: requisições, throughput,
+latência p50/p95/p99/máx e taxa de erro. Contam como erro status >= 400,
+falha de conexão e redirecionamentos que levam ao login ou a uma página
+com mensagem flash de erro (alert-danger): uploads e exportações avisam
+falhas assim. O redirecionamento é seguido fora da medição de latência.
+--saida grava o mesmo resultado em JSON para comparar execuções
+(antes/depois de mudanças de pool, cache ou parser).
+
+Com --local o script sobe a própria instância (app Flask com banco SQLite
+embutido em diretório temporário), cria admin, usuário e empresa e envia
+planilhas sintéticas antes da carga; nada de MySQL é necessário.
+
+Uso (a partir de src/):
+    python -m benchmarks.bench_carga --local --concorrencia 8 --duracao 30
+    python -m benchmarks.bench_carga --url http://127.0.0.1:5000 --admin admin@ex.com:senha \\
+        --usuario user@ex.com:senha --empresa 3 --ano 2025 --mix misto --saida antes.json
+"""
+
+import argparse
+import http.client
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from urllib.parse import urlencode, urlsplit
+
+MIXES = {
+    'leitura': {
+        'admin_dados_bpo': 4, 'admin_dados_tabela': 3, 'user_dados_empresa': 3, 'user_dados_bpo': 2,
+    },
+    'misto': {
+        'admin_dados_bpo': 4, 'admin_dados_tabela': 3, 'user_dados_empresa': 3, 'user_dados_bpo': 2,
+        'admin_excel_bpo': 1, 'user_excel_bpo': 1, 'admin_upload_bpo': 0.2, 'admin_upload_viab': 0.2,
+    },
+    'uploads': {
+        'admin_upload_bpo': 1, 'admin_upload_viab': 1, 'admin_dados_bpo': 1, 'user_dados_empresa': 1,
+    },
+    'exportacao': {
+        'admin_excel_bpo': 1, 'user_excel_bpo': 1,
+    },
+}
+
+SENHA_LOCAL = 'Carga@123'
+
+
+# ============================================================================
+# CLIENTE HTTP
+# ============================================================================
+
+class Sessao:
+    """Conexão HTTP keep-alive com o cookie de sessão do Flask."""
+
+    def __init__(self, url, timeout=60):
+        partes = urlsplit(url)
+        self._conexao = http.client.HTTPConnection(partes.hostname, partes.port or 80, timeout=timeout)
+        self._cookie = None
+
+    def requisitar(self, metodo, caminho, corpo=None, headers=None):
+        """Retorna (status, corpo, Location); não segue redirecionamentos."""
+        headers = dict(headers or {})
+        if self._cookie:
+            headers['Cookie'] = self._cookie
+        try:
+            self._conexao.request(metodo, caminho, body=corpo, headers=headers)
+            resposta = self._conexao.getresponse()
+            conteudo = resposta.read()
+        except (http.client.HTTPException, OSError):
+            self._conexao.close()
+            raise
+
+        cookie = resposta.getheader('Set-Cookie')
+        if cookie and cookie.startswith('session='):
+            self._cookie = cookie.split(';', 1)[0]
+        return resposta.status, conteudo, resposta.getheader('Location') or ''
+
+    def login(self, tipo, email, senha):
+        corpo = urlencode({'user_type': tipo, 'email': email, 'password': senha})
+        status, _, destino = self.requisitar(
+            'POST', '/login', corpo, {'Content-Type': 'application/x-www-form-urlencoded'}
+        )
+        if status != 302 or '/login' in destino:
+            raise RuntimeError(f"Login de {email} falhou (status {status})")
+
+    def fechar(self):
+        self._conexao.close()
+
+
+def _multipart(campos, arquivo_campo, nome_arquivo, conteudo):
+    fronteira = uuid.uuid4().hex
+    partes = []
+    for nome, valor in campos.items():
+        partes.append(
+            f'--{fronteira}\r\nContent-Disposition: form-data; name="{nome}"\r\n\r\n{valor}\r\n'.encode()
+        )
+    partes.append(
+        f'--{fronteira}\r\nContent-Disposition: form-data; name="{arquivo_campo}"; filename="{nome_arquivo}"\r\n'
+        f'Content-Type: application/vnd.openxmlformats-officedocument.spreadsheetml.sheet\r\n\r\n'.encode()
+        + conteudo + b'\r\n'
+    )
+    partes.append(f'--{fronteira}--\r\n'.encode())
+    return b''.join(partes), {'Content-Type': f'multipart/form-data; boundary={fronteira}'}
+
+
+# ============================================================================
+# OPERAÇÕES
+# ============================================================================
+
+def _periodo(ctx):
+    return urlencode({'ano_inicio': ctx['ano'], 'mes_inicio': 1, 'ano_fim': ctx['ano'], 'mes_fim': 12})
+
+
+def operacao(nome, admin, user, ctx):
+    """Executa uma operação do mix; retorna (sessão usada, status HTTP, Location)."""
+    empresa, ano = ctx['empresa'], ctx['ano']
+
+    if nome == 'admin_dados_bpo':
+        return (admin,) + _status(admin.requisitar('GET', f"/admin/api/dados-bpo/{empresa}?{_periodo(ctx)}"))
+    if nome == 'admin_dados_tabela':
+        return (admin,) + _status(admin.requisitar('GET', f"/admin/api/dados-bpo-tabela/{empresa}?{_periodo(ctx)}"))
+    if nome == 'user_dados_empresa':
+        return (user,) + _status(user.requisitar('GET', f"/user/api/dados-empresa/{empresa}/{ano}"))
+    if nome == 'user_dados_bpo':
+        return (user,) + _status(user.requisitar('GET', f"/user/api/dados-bpo/{empresa}?{_periodo(ctx)}"))
+    if nome == 'admin_excel_bpo':
+        return (admin,) + _status(admin.requisitar('GET', f"/admin/gerar_relatorio_bpo/{empresa}?{_periodo(ctx)}"))
+    if nome == 'user_excel_bpo':
+        return (user,) + _status(user.requisitar('GET', f"/user/gerar_relatorio_bpo?{_periodo(ctx)}"))
+    if nome == 'admin_upload_bpo':
+        corpo, headers = _multipart({'empresa_id': empresa}, 'arquivo', 'bpo.xlsx', ctx['planilha_bpo'])
+        return (admin,) + _status(admin.requisitar('POST', '/admin/upload_bpo', corpo, headers))
+    if nome == 'admin_upload_viab':
+        corpo, headers = _multipart({'empresa_id': empresa, 'ano': ano}, 'arquivo', 'viabilidade.xlsx',
+                                    ctx['planilha_viabilidade'])
+        return (admin,) + _status(admin.requisitar('POST', '/admin/upload', corpo, headers))
+    raise ValueError(f"Operação desconhecida: {nome}")
+
+
+def _status(resposta):
+    status, _, destino = resposta
+    return status, destino
+
+
+def falhou(sessao, status, destino):
+    """
+    Classifica o resultado de uma operação. Uploads e exportações respondem
+    falhas com flash + redirect, então um redirecionamento é seguido (com a
+    mesma sessão, consumindo o flash) e conta como erro se levar ao login ou
+    se a página mostrar uma mensagem de erro.
+    """
+    if status >= 400:
+        return True
+    if not 300 <= status < 400:
+        return False
+
+    partes = urlsplit(destino)
+    caminho = partes.path + (f"?{partes.query}" if partes.query else '')
+    if caminho.rstrip('/') in ('', '/login'):
+        return True
+    status_destino, corpo, _ = sessao.requisitar('GET', caminho)
+    return status_destino >= 400 or b'alert-danger' in corpo
+
+
+# ============================================================================
+# EXECUÇÃO
+# ============================================================================
+
+class Resultados:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencias = {}
+        self.erros = {}
+
+    def registrar(self, nome, duracao, erro):
+        with self._lock:
+            self.latencias.setdefault(nome, []).append(duracao)
+            if erro:
+                self.erros[nome] = self.erros.get(nome, 0) + 1
+
+
+def _worker(indice, args, ctx, pesos, fim, resultados, falhas):
+    rnd = random.Random(args.semente + indice)
+    nomes, valores = zip(*pesos.items())
+    email_user, senha_user = ctx['usuarios'][indice % len(ctx['usuarios'])]
+    admin, user = Sessao(args.url), Sessao(args.url)
+    try:
+        admin.login('admin', *ctx['admin'])
+        user.login('user', email_user, senha_user)
+        user.requisitar('GET', f"/user/definir-empresa/{ctx['empresa']}")
+    except Exception as e:
+        falhas.append(str(e))
+        return
+
+    while time.perf_counter() < fim:
+        nome = rnd.choices(nomes, valores)[0]
+        inicio = time.perf_counter()
+        try:
+            sessao, status, destino = operacao(nome, admin, user, ctx)
+        except (http.client.HTTPException, OSError):
+            resultados.registrar(nome, time.perf_counter() - inicio, True)
+            continue
+        duracao = time.perf_counter() - inicio
+
+        try:
+            erro = falhou(sessao, status, destino)
+        except (http.client.HTTPException, OSError):
+            erro = True
+        resultados.registrar(nome, duracao, erro)
+
+    admin.fechar()
+    user.fechar()
+
+
+def _percentil(ordenadas, p):
+    return ordenadas[min(len(ordenadas) - 1, int(len(ordenadas) * p))] if ordenadas else 0.0
+
+
+def resumir(resultados, segundos):
+    linhas = {}
+    todas = []
+    for nome, latencias in sorted(resultados.latencias.items()):
+        todas.extend(latencias)
+        linhas[nome] = _resumo(latencias, resultados.erros.get(nome, 0), segundos)
+    linhas['TOTAL'] = _resumo(todas, sum(resultados.erros.values()), segundos)
+    return linhas
+
+
+def _resumo(latencias, erros, segundos):
+    ordenadas = sorted(latencias)
+    return {
+        'requisicoes': len(ordenadas),
+        'por_segundo': round(len(ordenadas) / segundos, 2) if segundos else 0.0,
+        'p50_ms': round(_percentil(ordenadas, 0.50) * 1000, 1),
+        'p95_ms': round(_percentil(ordenadas, 0.95) * 1000, 1),
+        'p99_ms': round(_percentil(ordenadas, 0.99) * 1000, 1),
+        'max_ms': round((ordenadas[-1] if ordenadas else 0.0) * 1000, 1),
+        'erros_percentual': round(erros / len(ordenadas) * 100, 2) if ordenadas else 0.0,
+    }
+
+
+def imprimir(linhas):
+    print(f"{'operação':<22}{'reqs':>8}{'req/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'máx ms':>10}{'erros %':>9}")
+    for nome, r in linhas.items():
+        print(
+            f"{nome:<22}{r['requisicoes']:>8}{r['por_segundo']:>9.1f}{r['p50_ms']:>10.1f}{r['p95_ms']:>10.1f}"
+            f"{r['p99_ms']:>10.1f}{r['max_ms']:>10.1f}{r['erros_percentual']:>9.2f}"
+        )
+
+
+def _pesos(args):
+    pesos = dict(MIXES[args.mix])
+    for item in args.peso or ():
+        nome, valor = item.split('=')
+        if nome not in MIXES['misto']:
+            raise SystemExit(f"Operação desconhecida em --peso: {nome}")
+        pesos[nome] = float(valor)
+    return {nome: valor for nome, valor in pesos.items() if valor > 0}
+
+
+# ============================================================================
+# INSTÂNCIA LOCAL (SQLITE)
+# ============================================================================
+
+def servir_local(porta, diretorio, ano):
+    """Executado no subprocesso: prepara os dados e serve o app na porta."""
+    from app import app
+    from models.user_manager import UserManager
+    from models.company_manager import CompanyManager
+
+    admin = ('admin@carga.local', SENHA_LOCAL)
+    usuario = ('usuario@carga.local', SENHA_LOCAL)
+    UserManager().register_user('Admin Carga', admin[0], '11999999999', SENHA_LOCAL, 'admin')
+    user_id = UserManager().register_user('Usuário Carga', usuario[0], '11999999999', SENHA_LOCAL, 'user')
+
+    company_manager = CompanyManager()
+    company_manager.executar_migracoes()
+    empresa = company_manager.criar_empresa(
+        'Empresa Carga', '00.000.000/0001-00', '11999999999', 'carga@carga.local', '01000-000', '', 'Benchmark'
+    )
+    company_manager.close()
+    UserManager().vincular_user_empresa(user_id, empresa)
+
+    # Dados iniciais enviados pelas próprias rotas de upload
+    cliente = app.test_client()
+    cliente.post('/login', data={'user_type': 'admin', 'email': admin[0], 'password': admin[1]})
+    for rota, nome, campos in (('/admin/upload_bpo', 'bpo.xlsx', {}), ('/admin/upload', 'viabilidade.xlsx', {'ano': ano})):
+        with open(os.path.join(diretorio, nome), 'rb') as arquivo:
+            cliente.post(rota, data=dict(campos, empresa_id=empresa, arquivo=(arquivo, nome)))
+
+    print('PRONTO ' + json.dumps({'admin': admin, 'usuarios': [usuario], 'empresa': empresa}), flush=True)
+    app.run(host='127.0.0.1', port=porta, threaded=True, use_reloader=False)
+
+
+def _porta_livre():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def subir_local(diretorio, ano):
+    porta = _porta_livre()
+    ambiente = dict(
+        os.environ, DB_BACKEND='sqlite', DB_SQLITE_PATH=os.path.join(diretorio, 'carga.db'),
+        LOG_DIR=os.path.join(diretorio, 'logs'), LOG_LEVEL='WARNING'
+    )
+    processo = subprocess.Popen(
+        [sys.executable, '-m', 'benchmarks.bench_carga', '--_servidor', str(porta), diretorio, '--ano', str(ano)],
+        env=ambiente, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True
+    )
+    # Linha PRONTO da saída: credenciais e empresa criadas
+    for linha in processo.stdout:
+        if linha.startswith('PRONTO '):
+            ctx = json.loads(linha[len('PRONTO '):])
+            break
+    else:
+        raise SystemExit("Instância local não iniciou")
+    threading.Thread(target=processo.stdout.read, daemon=True).start()
+
+    url = f"http://127.0.0.1:{porta}"
+    for _ in range(100):
+        try:
+            with socket.create_connection(('127.0.0.1', porta), timeout=1):
+                return processo, url, ctx
+        except OSError:
+            time.sleep(0.1)
+    processo.terminate()
+    raise SystemExit("Instância local não respondeu")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://127.0.0.1:5000')
+    parser.add_argument('--local', action='store_true', help='sobe instância própria com SQLite e dados sintéticos')
+    parser.add_argument('--admin', help='EMAIL:SENHA do admin')
+    parser.add_argument('--usuario', action='append', help='EMAIL:SENHA de usuário com acesso à empresa (repetível)')
+    parser.add_argument('--empresa', type=int)
+    parser.add_argument('--ano', type=int, default=2025)
+    parser.add_argument('--mix', choices=sorted(MIXES), default='leitura')
+    parser.add_argument('--peso', action='append', metavar='OPERACAO=PESO', help='ajusta o peso de uma operação')
+    parser.add_argument('--concorrencia', type=int, default=4)
+    parser.add_argument('--duracao', type=float, default=20, help='segundos de carga')
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--meses', type=int, default=12, help='meses da planilha BPO de upload')
+    parser.add_argument('--contas', type=int, default=200, help='contas da planilha BPO de upload')
+    parser.add_argument('--saida', help='grava o resultado em JSON')
+    parser.add_argument('--_servidor', nargs=2, metavar=('PORTA', 'DIR'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args._servidor:
+        servir_local(int(args._servidor[0]), args._servidor[1], args.ano)
+        return
+
+    from benchmarks.gerar_planilhas import gerar_planilha_viabilidade, gerar_planilha_bpo
+
+    pesos = _pesos(args)
+    processo = None
+    with tempfile.TemporaryDirectory() as diretorio:
+        gerar_planilha_bpo(os.path.join(diretorio, 'bpo.xlsx'), meses=args.meses, contas=args.contas, ano_inicial=args.ano)
+        gerar_planilha_viabilidade(os.path.join(diretorio, 'viabilidade.xlsx'))
+
+        if args.local:
+            processo, args.url, ctx = subir_local(diretorio, args.ano)
+            ctx['admin'] = tuple(ctx['admin'])
+        else:
+            if not (args.admin and args.usuario and args.empresa):
+                parser.error("informe --admin, --usuario e --empresa (ou use --local)")
+            ctx = {
+                'admin': tuple(args.admin.split(':', 1)),
+                'usuarios': [tuple(u.split(':', 1)) for u in args.usuario],
+                'empresa': args.empresa,
+            }
+
+        ctx['ano'] = args.ano
+        for chave, nome in (('planilha_bpo', 'bpo.xlsx'), ('planilha_viabilidade', 'viabilidade.xlsx')):
+            with open(os.path.join(diretorio, nome), 'rb') as arquivo:
+                ctx[chave] = arquivo.read()
+
+        try:
+            resultados = Resultados()
+            falhas = []
+            inicio = time.perf_counter()
+            fim = inicio + args.duracao
+            workers = [
+                threading.Thread(target=_worker, args=(i, args, ctx, pesos, fim, resultados, falhas))
+                for i in range(args.concorrencia)
+            ]
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+            segundos = time.perf_counter() - inicio
+        finally:
+            if processo is not None:
+                processo.terminate()
+                processo.wait()
+
+    if falhas:
+        print(f"{len(falhas)} worker(s) não conseguiram logar: {falhas[0]}")
+
+    linhas = resumir(resultados, segundos)
+    print(f"{args.url} - mix '{args.mix}', {args.concorrencia} workers, {segundos:.1f} s")
+    imprimir(linhas)
+
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as arquivo:
+            json.dump({
+                'url': args.url, 'mix': args.mix, 'pesos': pesos, 'concorrencia': args.concorrencia,
+                'segundos': round(segundos, 2), 'operacoes': linhas
+            }, arquivo, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,154 @@
+"""
+Benchmark dos Relatórios Excel
+==============================
+
+Compara a geração em memória (Workbook + BytesIO) com a geração em streaming
+(workbook write-only enviado em blocos) para uma empresa sintética.
+
+Uso (a partir de src/):
+    python -m benchmarks.bench_excel_reports --anos 5 --contas 500
+
+Mede, para cada modo:
+- Pico de memória alocada (tracemalloc)
+- Tempo até o primeiro byte (TTFB) e tempo total
+- Tamanho do arquivo gerado
+"""
+
+import argparse
+import random
+import time
+import tracemalloc
+
+from controllers.reports.excel_reports import gerar_relatorio_bpo_xlsx
+
+NOMES_MESES = {
+    1: 'Janeiro', 2: 'Fevereiro', 3: 'Março', 4: 'Abril',
+    5: 'Maio', 6: 'Junho', 7: 'Julho', 8: 'Agosto',
+    9: 'Setembro', 10: 'Outubro', 11: 'Novembro', 12: 'Dezembro'
+}
+
+
+def gerar_meses_sinteticos(anos, contas, ano_inicial=2021, semente=42):
+    """Gera meses no formato salvo em TbBpoDados (itens + totais_calculados)."""
+    rnd = random.Random(semente)
+
+    # Plano de contas: 1.0X receitas, 2.0X despesas, demais contas analíticas
+    codigos = []
+    for i in range(contas):
+        grupo = 1 if i % 3 == 0 else 2
+        categoria = (i // 3) % 9 + 1
+        if i < 18:
+            codigos.append((f"{grupo}.0{categoria}", f"Categoria {grupo}.0{categoria}"))
+        else:
+            codigos.append((f"{grupo}.0{categoria}.{i:03d}", f"Conta {i}"))
+
+    meses = []
+    for ano in range(ano_inicial, ano_inicial + anos):
+        for mes in range(1, 13):
+            itens = []
+            for codigo, nome in codigos:
+                orcado = round(rnd.uniform(1000, 50000), 2)
+                realizado = round(orcado * rnd.uniform(0.7, 1.3), 2)
+                itens.append({
+                    'codigo': codigo,
+                    'nome': nome,
+                    'nivel': codigo.count('.') + 1,
+                    'dados_mensais': [{
+                        'mes': mes, 'ano': ano,
+                        'valor_orcado': orcado,
+                        'valor_realizado': realizado,
+                        'perc_atingido': realizado / orcado * 100,
+                        'valor_diferenca': realizado - orcado,
+                    }]
+                })
+            receita = sum(i['dados_mensais'][0]['valor_realizado'] for i in itens if i['codigo'].startswith('1.'))
+            despesa = sum(i['dados_mensais'][0]['valor_realizado'] for i in itens if i['codigo'].startswith('2.'))
+            totais = {
+                cenario: {mes: {
+                    'realizado': {'receita': receita, 'despesa': despesa, 'geral': receita - despesa},
+                    'orcamento': {'receita': receita, 'despesa': despesa, 'geral': receita - despesa},
+                }}
+                for cenario in ('fluxo_caixa', 'real', 'real_mp')
+            }
+            meses.append({'ano': ano, 'mes': mes, 'dados': {
+                'itens_hierarquicos': itens, 'totais_calculados': totais
+            }})
+    return meses
+
+
+def montar_resumo(meses_data, tipo_dre='fluxo_caixa'):
+    """Agrega os meses no formato esperado por gerar_relatorio_bpo_xlsx."""
+    totais = {c: {'receita': 0, 'despesa': 0, 'geral': 0} for c in ('fluxo_caixa', 'real', 'real_mp')}
+    labels, receitas, despesas, gerais = [], [], [], []
+    categorias = {'1': {}, '2': {}}
+
+    for mes_data in meses_data:
+        mes, ano, dados = mes_data['mes'], mes_data['ano'], mes_data['dados']
+        labels.append(f"{NOMES_MESES[mes]}/{str(ano)[-2:]}")
+        for cenario, valores in dados['totais_calculados'].items():
+            realizado = valores[mes]['realizado']
+            for campo in ('receita', 'despesa', 'geral'):
+                totais[cenario][campo] += realizado[campo]
+            if cenario == tipo_dre:
+                receitas.append(realizado['receita'])
+                despesas.append(realizado['despesa'])
+                gerais.append(realizado['geral'])
+        for item in dados['itens_hierarquicos']:
+            partes = item['codigo'].split('.')
+            if len(partes) == 2 and partes[1].startswith('0'):
+                cat = categorias[partes[0]].setdefault(item['codigo'], {'nome': item['nome'], 'orcado': 0, 'realizado': 0})
+                cat['realizado'] += item['dados_mensais'][0]['valor_realizado'] / len(meses_data)
+
+    return {
+        'empresa_nome': 'Empresa Benchmark',
+        'periodo': f"{labels[0]} - {labels[-1]}",
+        'gerado_em': time.strftime('%d/%m/%Y %H:%M'),
+        'tipo_dre': tipo_dre,
+        'totais': totais,
+        'labels_meses': labels,
+        'receitas_mensais': receitas,
+        'despesas_mensais': despesas,
+        'gerais_mensais': gerais,
+        'categorias_receita': categorias['1'],
+        'categorias_despesa': categorias['2'],
+    }
+
+
+def medir(resumo, streaming):
+    tracemalloc.reset_peak()
+    base, _ = tracemalloc.get_traced_memory()
+    inicio = time.perf_counter()
+    ttfb = None
+    tamanho = 0
+    for bloco in gerar_relatorio_bpo_xlsx(resumo, streaming=streaming):
+        if ttfb is None:
+            ttfb = time.perf_counter() - inicio
+        tamanho += len(bloco)
+    total = time.perf_counter() - inicio
+    _, pico = tracemalloc.get_traced_memory()
+    return {'pico_kb': (pico - base) / 1024, 'ttfb_ms': ttfb * 1000, 'total_ms': total * 1000, 'bytes': tamanho}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--anos', type=int, default=5)
+    parser.add_argument('--contas', type=int, default=500)
+    parser.add_argument('--repeticoes', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"Gerando empresa sintética: {args.anos} anos x {args.contas} contas...")
+    meses_data = gerar_meses_sinteticos(args.anos, args.contas)
+    resumo = montar_resumo(meses_data)
+    del meses_data
+
+    tracemalloc.start()
+    print(f"{'modo':<12}{'pico (KB)':>12}{'TTFB (ms)':>12}{'total (ms)':>12}{'bytes':>10}")
+    for nome, streaming in (('memoria', False), ('streaming', True)):
+        resultados = [medir(resumo, streaming) for _ in range(args.repeticoes)]
+        melhor = min(resultados, key=lambda r: r['total_ms'])
+        print(f"{nome:<12}{melhor['pico_kb']:>12.0f}{melhor['ttfb_ms']:>12.1f}{melhor['total_ms']:>12.1f}{melhor['bytes']:>10}")
+    tracemalloc.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,212 @@
+"""
+Benchmark dos Índices das Tabelas de Viabilidade
+================================================
+
+Carrega muitas empresas sintéticas em um banco separado (<DB_NAME>_bench) e
+mede as consultas por (empresa_id, ano) sem os índices compostos, com os
+índices e, opcionalmente, com as tabelas particionadas por ano.
+
+Para cada consulta são exibidos p50/p95 e o plano (EXPLAIN: tipo de acesso,
+índice escolhido e linhas estimadas).
+
+Requer um servidor MySQL com as credenciais do .env (o usuário precisa
+poder criar databases).
+
+Uso (a partir de src/):
+    python -m benchmarks.bench_indices_viabilidade --empresas 500 --anos 6 --itens 80
+    python -m benchmarks.bench_indices_viabilidade --particionar --manter
+"""
+
+import argparse
+import os
+import random
+import statistics
+import time
+from pathlib import Path
+from dotenv import load_dotenv
+
+# Mesmo .env da aplicação (raiz do projeto), lido antes de trocar o DB_NAME
+load_dotenv(dotenv_path=Path(__file__).resolve().parent.parent.parent / '.env')
+
+ANO_INICIAL = 2020
+
+
+def preparar_banco(nome_banco):
+    """Aponta os models para o banco de benchmark e cria o schema."""
+    os.environ['DB_NAME'] = nome_banco
+    from models.auth import DatabaseConnection
+    return DatabaseConnection()
+
+
+def carregar_dados(db, empresas, anos, itens, semente=42):
+    rnd = random.Random(semente)
+    cursor = db.connection.cursor()
+
+    cursor.execute("SELECT id FROM TbSubGrupo ORDER BY id")
+    subgrupos = [row[0] for row in cursor.fetchall()]
+
+    cursor.executemany(
+        "INSERT INTO empresas (nome, cnpj, telefone, email, cep, seguimento) VALUES (%s, %s, %s, %s, %s, %s)",
+        [
+            (f"Empresa Bench {i:05d}", f"{i:08d}/0001-00", "0000-0000", f"bench{i}@example.com", "00000-000", "Benchmark")
+            for i in range(empresas)
+        ]
+    )
+    db.connection.commit()
+    cursor.execute("SELECT id FROM empresas WHERE seguimento = 'Benchmark'")
+    empresa_ids = [row[0] for row in cursor.fetchall()]
+
+    for empresa_id in empresa_ids:
+        linhas_itens = []
+        linhas_dividas = []
+        linhas_gastos = []
+        for ano in range(ANO_INICIAL, ANO_INICIAL + anos):
+            for i in range(itens):
+                linhas_itens.append((
+                    f"Item {i}", round(rnd.uniform(0, 100), 2), round(rnd.uniform(100, 100000), 2),
+                    ano, rnd.choice(subgrupos), empresa_id
+                ))
+            for i in range(max(itens // 10, 1)):
+                valor = round(rnd.uniform(100, 5000), 2)
+                linhas_dividas.append((f"Dívida {i}", valor, valor * 0.02, valor * 1.02, ano, subgrupos[0], empresa_id))
+                linhas_gastos.append((f"Veículo {i}", valor / 1000, valor, ano, subgrupos[0], empresa_id))
+
+        cursor.executemany(
+            "INSERT INTO TbItens (descricao, porcentagem, valor, ano, subgrupo_id, empresa_id) "
+            "VALUES (%s, %s, %s, %s, %s, %s)", linhas_itens
+        )
+        cursor.executemany(
+            "INSERT INTO TbItensDividas (descricao, valor_parc, valor_juros, valor_total_parc, ano, subgrupo_id, empresa_id) "
+            "VALUES (%s, %s, %s, %s, %s, %s, %s)", linhas_dividas
+        )
+        cursor.executemany(
+            "INSERT INTO TbItensGastosOperacionais (descricao, valor_custo_km, valor_mensal, ano, subgrupo_id, empresa_id) "
+            "VALUES (%s, %s, %s, %s, %s, %s)", linhas_gastos
+        )
+        db.connection.commit()
+
+    for tabela in ('TbItens', 'TbItensDividas', 'TbItensGastosOperacionais'):
+        cursor.execute(f"ANALYZE TABLE {tabela}")
+        cursor.fetchall()
+    cursor.close()
+    return empresa_ids
+
+
+# Consultas reais da aplicação (CompanyManager)
+CONSULTAS = {
+    'anos_com_dados': (
+        "SELECT DISTINCT ano FROM TbItens WHERE empresa_id = %s ORDER BY ano DESC",
+        lambda empresa_id, ano: (empresa_id,)
+    ),
+    'verificar_existentes': (
+        "SELECT COUNT(*) FROM TbItens WHERE empresa_id = %s AND ano = %s",
+        lambda empresa_id, ano: (empresa_id, ano)
+    ),
+    'itens_do_ano': (
+        "SELECT g.nome, s.nome, i.descricao, i.porcentagem, i.valor FROM TbItens i "
+        "JOIN TbSubGrupo s ON i.subgrupo_id = s.id JOIN TbGrupo g ON s.grupo_id = g.id "
+        "WHERE i.empresa_id = %s AND i.ano = %s",
+        lambda empresa_id, ano: (empresa_id, ano)
+    ),
+    'dividas_do_ano': (
+        "SELECT descricao, valor_parc, valor_juros, valor_total_parc FROM TbItensDividas "
+        "WHERE empresa_id = %s AND ano = %s",
+        lambda empresa_id, ano: (empresa_id, ano)
+    ),
+    'gastos_op_do_ano': (
+        "SELECT descricao, valor_custo_km, valor_mensal FROM TbItensGastosOperacionais "
+        "WHERE empresa_id = %s AND ano = %s",
+        lambda empresa_id, ano: (empresa_id, ano)
+    ),
+}
+
+
+def medir(db, empresa_ids, anos, amostras, semente=7):
+    rnd = random.Random(semente)
+    cursor = db.connection.cursor()
+    resultados = {}
+
+    for nome, (sql, montar_params) in CONSULTAS.items():
+        tempos = []
+        for _ in range(amostras):
+            params = montar_params(rnd.choice(empresa_ids), ANO_INICIAL + rnd.randrange(anos))
+            inicio = time.perf_counter()
+            cursor.execute(sql, params)
+            cursor.fetchall()
+            tempos.append((time.perf_counter() - inicio) * 1000)
+
+        cursor.execute("EXPLAIN " + sql, montar_params(empresa_ids[0], ANO_INICIAL))
+        colunas = [c[0] for c in cursor.description]
+        plano = [dict(zip(colunas, linha)) for linha in cursor.fetchall()]
+        # Linha do plano referente à tabela de itens (não ao JOIN com grupos)
+        principal = next(
+            (linha for linha in plano
+             if linha.get('table') in ('i', 'TbItens', 'TbItensDividas', 'TbItensGastosOperacionais')),
+            plano[0]
+        )
+
+        tempos.sort()
+        resultados[nome] = {
+            'p50': statistics.median(tempos),
+            'p95': tempos[int(len(tempos) * 0.95) - 1],
+            'tipo': principal.get('type'),
+            'indice': principal.get('key'),
+            'linhas': principal.get('rows'),
+            'particoes': principal.get('partitions'),
+        }
+
+    cursor.close()
+    return resultados
+
+
+def imprimir(titulo, resultados):
+    print(f"\n{titulo}")
+    print(f"{'consulta':<22}{'p50 ms':>9}{'p95 ms':>9}  {'acesso':<8}{'índice':<30}{'linhas':>8}  partições")
+    for nome, r in resultados.items():
+        print(f"{nome:<22}{r['p50']:>9.2f}{r['p95']:>9.2f}  {str(r['tipo']):<8}{str(r['indice']):<30}"
+              f"{str(r['linhas']):>8}  {r['particoes'] or '-'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--empresas', type=int, default=500)
+    parser.add_argument('--anos', type=int, default=6)
+    parser.add_argument('--itens', type=int, default=80, help='itens de TbItens por empresa/ano')
+    parser.add_argument('--amostras', type=int, default=300, help='execuções de cada consulta')
+    parser.add_argument('--banco', default=None, help='database de benchmark (padrão: <DB_NAME>_bench)')
+    parser.add_argument('--particionar', action='store_true', help='mede também com particionamento por ano')
+    parser.add_argument('--manter', action='store_true', help='não apaga o database ao final')
+    args = parser.parse_args()
+
+    nome_banco = args.banco or f"{os.getenv('DB_NAME', 'WaysDb')}_bench"
+    if nome_banco == os.getenv('DB_NAME', 'WaysDb'):
+        raise SystemExit("Use um database próprio para o benchmark (ele é apagado ao final)")
+    db = preparar_banco(nome_banco)
+    if db.connection is None:
+        raise SystemExit("Não foi possível conectar ao MySQL (verifique o .env)")
+
+    try:
+        print(f"Carregando {args.empresas} empresas x {args.anos} anos x {args.itens} itens em {nome_banco}...")
+        inicio = time.perf_counter()
+        empresa_ids = carregar_dados(db, args.empresas, args.anos, args.itens)
+        print(f"Carga concluída em {time.perf_counter() - inicio:.1f}s")
+
+        db.remover_indices_viabilidade()
+        imprimir("SEM índices compostos", medir(db, empresa_ids, args.anos, args.amostras))
+
+        db.create_indices_if_not_exists()
+        imprimir("COM índices compostos", medir(db, empresa_ids, args.anos, args.amostras))
+
+        if args.particionar:
+            db.particionar_tabelas_por_ano(ANO_INICIAL, ANO_INICIAL + args.anos)
+            imprimir("COM índices + particionamento por ano", medir(db, empresa_ids, args.anos, args.amostras))
+    finally:
+        if not args.manter:
+            cursor = db.connection.cursor()
+            cursor.execute(f"DROP DATABASE IF EXISTS {nome_banco}")
+            cursor.close()
+        db.close_connection()
+
+
+if __name__ == '__main__':
+    main()
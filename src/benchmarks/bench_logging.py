@@ -0,0 +1,84 @@
+"""
+Benchmark do Logging
+====================
+
+Mede quanto o logging acrescenta à latência de uma requisição, comparando a
+escrita síncrona no arquivo (LOG_ASYNC=0) com a fila + thread de escrita
+(LOG_ASYNC=1), e o custo de chamadas em nível desabilitado.
+
+Cada "requisição" simulada emite a mesma quantidade de logs que o fluxo de
+login/consulta mais verboso da aplicação (INFO + DEBUG com argumentos).
+
+Uso (a partir de src/):
+    python -m benchmarks.bench_logging --requisicoes 2000 --logs 50
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+
+def simular(requisicoes, logs_por_requisicao):
+    """Executado no subprocesso: usa a configuração de logging do ambiente."""
+    from utils.logger import Logger, get_logger
+
+    logger = get_logger('bench_logging')
+    usuario = {'id': 42, 'nome': 'Usuário Benchmark', 'email': 'bench@example.com'}
+    latencias = []
+
+    for r in range(requisicoes):
+        inicio = time.perf_counter()
+        for i in range(logs_por_requisicao):
+            if i % 2:
+                logger.info("Etapa %d da requisição %d - usuário %s (%s)", i, r, usuario['id'], usuario['email'])
+            else:
+                logger.debug("Detalhe %d: %s", i, usuario)
+        latencias.append((time.perf_counter() - inicio) * 1_000_000)
+
+    inicio = time.perf_counter()
+    Logger.parar()
+    drenagem_ms = (time.perf_counter() - inicio) * 1000
+
+    latencias.sort()
+    print(f"{statistics.median(latencias):.1f} {latencias[int(len(latencias) * 0.95)]:.1f} "
+          f"{latencias[int(len(latencias) * 0.99)]:.1f} {drenagem_ms:.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requisicoes', type=int, default=2000)
+    parser.add_argument('--logs', type=int, default=50, help='chamadas de log por requisição')
+    parser.add_argument('--_filho', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args._filho:
+        simular(args.requisicoes, args.logs)
+        return
+
+    cenarios = [
+        ('síncrono, INFO', {'LOG_ASYNC': '0', 'LOG_LEVEL_BENCH_LOGGING': 'INFO'}),
+        ('fila, INFO', {'LOG_ASYNC': '1', 'LOG_LEVEL_BENCH_LOGGING': 'INFO'}),
+        ('síncrono, WARNING', {'LOG_ASYNC': '0', 'LOG_LEVEL_BENCH_LOGGING': 'WARNING'}),
+        ('fila, WARNING', {'LOG_ASYNC': '1', 'LOG_LEVEL_BENCH_LOGGING': 'WARNING'}),
+    ]
+
+    print(f"{args.requisicoes} requisições x {args.logs} logs (latência por requisição, µs)")
+    print(f"{'cenário':<20}{'p50':>10}{'p95':>10}{'p99':>10}{'drenagem (ms)':>16}")
+    with tempfile.TemporaryDirectory() as log_dir:
+        for nome, variaveis in cenarios:
+            env = dict(os.environ, LOG_DIR=log_dir, **variaveis)
+            saida = subprocess.run(
+                [sys.executable, '-m', 'benchmarks.bench_logging', '--_filho',
+                 '--requisicoes', str(args.requisicoes), '--logs', str(args.logs)],
+                env=env, capture_output=True, text=True, check=True
+            ).stdout.split()
+            p50, p95, p99, drenagem = (float(v) for v in saida)
+            print(f"{nome:<20}{p50:>10.1f}{p95:>10.1f}{p99:>10.1f}{drenagem:>16.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+"""
+Benchmark dos Parsers de Planilhas
+==================================
+
+Gera planilhas sintéticas (benchmarks/gerar_planilhas.py) em vários
+tamanhos e mede os parsers de upload:
+
+- process_uploaded_file (viabilidade)
+- process_bpo_file (BPO, todos os meses de uma vez)
+- process_bpo_file_por_mes (BPO mês a mês, cada mês descartado antes do próximo)
+
+Cada medição roda em um subprocesso próprio, para que o pico de memória
+(RSS máximo do processo) seja o do parse e não o das medições anteriores.
+São exibidos tempo de parse, RSS antes/pico e linhas por segundo.
+
+Não precisa de banco nem de rede. Os prints do parser de viabilidade são
+descartados e os logs vão para um diretório temporário.
+
+Uso (a partir de src/):
+    python -m benchmarks.bench_parsers
+    python -m benchmarks.bench_parsers --tamanhos-bpo 12x200,24x1000 --tamanhos-viabilidade 10,200 --repeticoes 3
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+TAMANHOS_VIABILIDADE = (10, 50, 200)
+TAMANHOS_BPO = ((12, 200), (12, 1000), (36, 1000))
+
+
+def _rss_maximo_mb():
+    import resource
+
+    maximo = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa em KB, macOS em bytes
+    return maximo / (1024 * 1024) if sys.platform == 'darwin' else maximo / 1024
+
+
+def medir_parse(tipo, caminho):
+    """Executado no subprocesso: importa o parser, mede um parse e imprime JSON."""
+    if tipo == 'viabilidade':
+        from controllers.data_processing.file_processing import process_uploaded_file as parser
+    elif tipo == 'bpo-mes':
+        from controllers.data_processing.bpo_file_processing import process_bpo_file_por_mes
+
+        def parser(caminho):
+            for _ in process_bpo_file_por_mes(caminho):
+                pass
+    else:
+        from controllers.data_processing.bpo_file_processing import process_bpo_file as parser
+
+    rss_antes = _rss_maximo_mb()
+    with open(os.devnull, 'w') as nulo, contextlib.redirect_stdout(nulo):
+        inicio = time.perf_counter()
+        parser(caminho)
+        duracao = time.perf_counter() - inicio
+
+    print(json.dumps({'segundos': duracao, 'rss_antes_mb': rss_antes, 'rss_pico_mb': _rss_maximo_mb()}))
+
+
+def executar(tipo, caminho, diretorio_logs):
+    ambiente = dict(os.environ, LOG_DIR=diretorio_logs, LOG_LEVEL='WARNING')
+    saida = subprocess.run(
+        [sys.executable, '-m', 'benchmarks.bench_parsers', '--filho', tipo, caminho],
+        capture_output=True, text=True, env=ambiente, check=True
+    )
+    return json.loads(saida.stdout.strip().splitlines()[-1])
+
+
+def _tamanhos_bpo(texto):
+    tamanhos = []
+    for parte in texto.split(','):
+        meses, contas = parte.lower().split('x')
+        tamanhos.append((int(meses), int(contas)))
+    return tamanhos
+
+
+def imprimir(descricao, linhas, tamanho_kb, resultados):
+    melhor = min(resultados, key=lambda r: r['segundos'])
+    print(
+        f"{descricao:<28}{linhas:>8}{tamanho_kb:>10.0f}{melhor['segundos'] * 1000:>12.1f}"
+        f"{melhor['rss_antes_mb']:>11.1f}{melhor['rss_pico_mb']:>11.1f}{linhas / melhor['segundos']:>12.0f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tamanhos-viabilidade', default=','.join(map(str, TAMANHOS_VIABILIDADE)),
+                        help='itens por subgrupo, separados por vírgula')
+    parser.add_argument('--tamanhos-bpo', default=','.join(f"{m}x{c}" for m, c in TAMANHOS_BPO),
+                        help='MESESxCONTAS, separados por vírgula')
+    parser.add_argument('--repeticoes', type=int, default=3)
+    parser.add_argument('--filho', nargs=2, metavar=('TIPO', 'ARQUIVO'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.filho:
+        medir_parse(*args.filho)
+        return
+
+    from benchmarks.gerar_planilhas import gerar_planilha_viabilidade, gerar_planilha_bpo
+
+    with tempfile.TemporaryDirectory() as diretorio:
+        print(f"{'planilha':<28}{'linhas':>8}{'KB':>10}{'parse (ms)':>12}{'RSS antes':>11}{'RSS pico':>11}{'linhas/s':>12}")
+
+        for itens in (int(t) for t in args.tamanhos_viabilidade.split(',') if t):
+            caminho = os.path.join(diretorio, f"viabilidade_{itens}.xlsx")
+            linhas = gerar_planilha_viabilidade(caminho, itens_por_subgrupo=itens, itens_especiais=max(itens // 2, 1))
+            resultados = [executar('viabilidade', caminho, diretorio) for _ in range(args.repeticoes)]
+            imprimir(f"viabilidade {itens} itens", linhas, os.path.getsize(caminho) / 1024, resultados)
+
+        for meses, contas in _tamanhos_bpo(args.tamanhos_bpo):
+            caminho = os.path.join(diretorio, f"bpo_{meses}x{contas}.xlsx")
+            linhas = gerar_planilha_bpo(caminho, meses=meses, contas=contas)
+            resultados = [executar('bpo', caminho, diretorio) for _ in range(args.repeticoes)]
+            imprimir(f"bpo {meses} meses x {contas} contas", linhas, os.path.getsize(caminho) / 1024, resultados)
+            resultados = [executar('bpo-mes', caminho, diretorio) for _ in range(args.repeticoes)]
+            imprimir("  por mês", linhas, os.path.getsize(caminho) / 1024, resultados)
+
+
+if __name__ == '__main__':
+    main()
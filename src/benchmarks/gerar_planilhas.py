@@ -0,0 +1,260 @@
+"""
+Gerador de Planilhas Sintéticas
+===============================
+
+Gera planilhas no mesmo layout que os clientes enviam, para medir os
+parsers sem arquivos reais:
+
+- Viabilidade (process_uploaded_file): três cenários lado a lado
+  (colunas A-C, E-G, I-K), bloco GERAL, subgrupos com título mesclado e
+  as seções especiais DIVIDAS, INVESTIMENTOS, INVESTIMENTOS GERAL NO
+  NEGOCIO e GASTOS OPERACIONAIS.
+- BPO (process_bpo_file): sheet "Sheet", N meses x 4 colunas (Orçado,
+  Realizado, % Atingido, Diferença) + 3 colunas de totais, plano de contas
+  hierárquico (1 - RECEITA, 2 - DESPESAS, 2.08 - CUSTO MATERIA PRIMA...) e
+  linhas de centro de custo intercaladas.
+
+Uso (a partir de src/):
+    python -m benchmarks.gerar_planilhas --destino /tmp/planilhas --itens 40 --meses 12 --contas 400
+"""
+
+import argparse
+import os
+import random
+from openpyxl import Workbook
+
+NOMES_MESES = (
+    'Janeiro', 'Fevereiro', 'Março', 'Abril', 'Maio', 'Junho',
+    'Julho', 'Agosto', 'Setembro', 'Outubro', 'Novembro', 'Dezembro'
+)
+
+# Nomes exatos esperados por process_uploaded_file / salvar_itens_empresa
+CENARIOS_VIABILIDADE = (
+    ('VIABILIADE FINANCEIRA REAL', 'A'),
+    ('VIABILIADE FINANCEIRA PONTO DE EQUILIBRIO', 'E'),
+    ('VIABILIADE FINANCEIRA IDEAL', 'I'),
+)
+SUBGRUPOS_VIABILIDADE = (
+    'RECEITA',
+    'CONTROLE DESPESAS POR NATURESAS SINTETICAS',
+    'OBRIGAÇÕES',
+    'GASTOS ADM',
+    'MATERIA PRIMA',
+    'GASTOS OPERACIONAIS',
+    'PESSOAL',
+)
+
+# Categorias do plano de contas BPO; os nomes especiais são os usados
+# pelos cálculos de Resultado Real / Resultado Real com MP
+CATEGORIAS_RECEITA = (
+    ('1.01', 'RECEITA VENDA SERVIÇO'),
+    ('1.02', 'RECEITA EMPRESTIMO'),
+    ('1.03', 'OUTRAS RECEITAS'),
+    ('1.04', 'RECEITA VENDA PRODUTO'),
+)
+CATEGORIAS_DESPESA = (
+    ('2.01', 'DESPESAS ADMINISTRATIVAS'),
+    ('2.02', 'DESPESAS COM PESSOAL'),
+    ('2.03', 'IMPOSTOS'),
+    ('2.04', 'DESPESAS OPERACIONAIS'),
+    ('2.05', 'OUTRAS DESPESAS NÃO DEDUTIVEIS'),
+    ('2.06', 'Distribuição de lucro Associados'),
+    ('2.07', 'SAIDA- EMPRESTIMOS'),
+    ('2.08', 'CUSTO MATERIA PRIMA'),
+    ('2.09', 'INVESTIMENTOS'),
+)
+CENTROS_CUSTO = ('ADMINISTRATIVO', 'COMERCIAL', 'OPERACIONAL', 'FINANCEIRO')
+
+
+# ============================================================================
+# VIABILIDADE
+# ============================================================================
+
+def _titulo_mesclado(ws, linha, texto, ultima_coluna='K'):
+    ws[f"A{linha}"] = texto
+    ws.merge_cells(f"A{linha}:{ultima_coluna}{linha}")
+
+
+def gerar_planilha_viabilidade(caminho, itens_por_subgrupo=10, itens_especiais=5, semente=42):
+    """
+    Grava uma planilha de viabilidade sintética.
+
+    Returns:
+        int: quantidade de linhas da planilha
+    """
+    rnd = random.Random(semente)
+    wb = Workbook()
+    ws = wb.active
+
+    colunas = {'A': ('A', 'B', 'C'), 'E': ('E', 'F', 'G'), 'I': ('I', 'J', 'K')}
+
+    # Linha 1: nome dos cenários; linha 2: cabeçalho
+    for nome, coluna in CENARIOS_VIABILIDADE:
+        desc, perc, valor = colunas[coluna]
+        ws[f"{desc}1"] = nome
+        ws[f"{desc}2"], ws[f"{perc}2"], ws[f"{valor}2"] = 'DESCRIÇÃO', '%', 'VALOR'
+
+    def escrever_itens(linha, quantidade, prefixo):
+        for i in range(quantidade):
+            for _, coluna in CENARIOS_VIABILIDADE:
+                desc, perc, valor = colunas[coluna]
+                ws[f"{desc}{linha}"] = f"{prefixo} {i + 1}"
+                ws[f"{perc}{linha}"] = round(rnd.uniform(0.001, 0.25), 6)  # Excel guarda % como fração
+                ws[f"{valor}{linha}"] = round(rnd.uniform(100, 250000), 2)
+            linha += 1
+        return linha
+
+    # Bloco GERAL (linha 3 até a linha em branco antes do primeiro subgrupo)
+    linha = escrever_itens(3, itens_por_subgrupo, 'Indicador')
+    for nome, coluna in CENARIOS_VIABILIDADE:
+        ws[f"{coluna}{linha}"] = 'RESULTADO REAL'  # ignorado pelo parser
+    linha += 2
+
+    # Subgrupos: título mesclado, itens, linha em branco
+    for subgrupo in SUBGRUPOS_VIABILIDADE:
+        _titulo_mesclado(ws, linha, subgrupo)
+        linha = escrever_itens(linha + 1, itens_por_subgrupo, subgrupo.title()) + 1
+
+    # Seções especiais: título, cabeçalho, itens a partir da linha seguinte
+    for secao in ('DIVIDAS', 'INVESTIMENTOS'):
+        _titulo_mesclado(ws, linha, secao, 'F')
+        ws[f"A{linha + 1}"], ws[f"B{linha + 1}"], ws[f"E{linha + 1}"], ws[f"F{linha + 1}"] = (
+            'DESCRIÇÃO', 'PARCELA', 'JUROS', 'TOTAL PARCELA'
+        )
+        linha += 2
+        for i in range(itens_especiais):
+            parcela = round(rnd.uniform(500, 20000), 2)
+            juros = round(parcela * rnd.uniform(0.005, 0.04), 2)
+            ws[f"A{linha}"] = f"{secao.title()} {i + 1}"
+            ws[f"B{linha}"], ws[f"E{linha}"], ws[f"F{linha}"] = parcela, juros, parcela + juros
+            linha += 1
+        linha += 1
+
+    _titulo_mesclado(ws, linha, 'INVESTIMENTOS GERAL NO NEGOCIO', 'F')
+    ws[f"A{linha + 1}"], ws[f"B{linha + 1}"] = 'DESCRIÇÃO', 'VALOR'
+    linha += 2
+    for i in range(itens_especiais):
+        ws[f"A{linha}"], ws[f"B{linha}"] = f"Investimento geral {i + 1}", round(rnd.uniform(1000, 500000), 2)
+        linha += 1
+    linha += 1
+
+    # GASTOS OPERACIONAIS especial: título sem mesclar (o mesclado é o subgrupo)
+    ws[f"A{linha}"] = 'GASTOS OPERACIONAIS'
+    ws[f"A{linha + 1}"], ws[f"B{linha + 1}"], ws[f"C{linha + 1}"] = 'VEÍCULO', 'CUSTO KM', 'CUSTO MENSAL'
+    linha += 2
+    for i in range(itens_especiais):
+        ws[f"A{linha}"] = f"Veículo {i + 1}"
+        ws[f"B{linha}"], ws[f"C{linha}"] = round(rnd.uniform(0.5, 4), 2), round(rnd.uniform(800, 15000), 2)
+        linha += 1
+
+    wb.save(caminho)
+    return ws.max_row
+
+
+# ============================================================================
+# BPO
+# ============================================================================
+
+def _plano_de_contas(contas):
+    """
+    Plano hierárquico: 1 - RECEITA e 2 - DESPESAS, categorias 1.0X/2.0X e
+    `contas` contas analíticas distribuídas entre as categorias.
+    """
+    categorias = [(c, n, '1') for c, n in CATEGORIAS_RECEITA] + [(c, n, '2') for c, n in CATEGORIAS_DESPESA]
+    filhos = {codigo: [] for codigo, _, _ in categorias}
+    for i in range(contas):
+        codigo, nome, _ = categorias[i % len(categorias)]
+        filhos[codigo].append((f"{codigo}.{len(filhos[codigo]) + 1:03d}", f"{nome.split()[0]} ANALITICA {i + 1}"))
+
+    plano = []
+    for raiz, nome_raiz in (('1', 'RECEITA'), ('2', 'DESPESAS')):
+        plano.append((raiz, nome_raiz, [c for c, _, r in categorias if r == raiz]))
+        for codigo, nome, r in categorias:
+            if r == raiz:
+                plano.append((codigo, nome, [c for c, _ in filhos[codigo]]))
+                plano.extend((c, n, []) for c, n in filhos[codigo])
+    return plano
+
+
+def gerar_planilha_bpo(caminho, meses=12, contas=200, ano_inicial=2025, centro_custo_a_cada=25, semente=42):
+    """
+    Grava uma planilha BPO sintética (write-only, para gerar arquivos grandes).
+
+    Returns:
+        int: quantidade de linhas da planilha
+    """
+    rnd = random.Random(semente)
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet('Sheet')
+
+    periodos = [(ano_inicial + m // 12, m % 12) for m in range(meses)]
+
+    cabecalho = ['Descrição']
+    for ano, mes in periodos:
+        rotulo = f"{NOMES_MESES[mes]} {ano}"
+        cabecalho += [f"{rotulo}\nOrçado", f"{rotulo}\nRealizado", f"{rotulo}\n% Atingido", f"{rotulo}\nDiferença"]
+    cabecalho += ['Orçado total', 'Realizado total', 'Pendente total']
+    ws.append(cabecalho)
+
+    plano = _plano_de_contas(contas)
+
+    # Valores das contas analíticas; sintéticas somam os filhos (de baixo para cima)
+    # (receitas com escala maior para o resultado ficar próximo do equilíbrio)
+    valores = {}
+    for codigo, _, filhos in plano:
+        if not filhos:
+            escala = 2.5 if codigo.startswith('1') else 1
+            valores[codigo] = [
+                (orcado, round(orcado * rnd.uniform(0.6, 1.3), 2))
+                for orcado in (round(rnd.uniform(100, 40000) * escala, 2) for _ in periodos)
+            ]
+    for codigo, _, filhos in reversed(plano):
+        if filhos:
+            valores[codigo] = [
+                (round(sum(valores[f][i][0] for f in filhos), 2), round(sum(valores[f][i][1] for f in filhos), 2))
+                for i in range(len(periodos))
+            ]
+
+    linhas = 1
+    for posicao, (codigo, nome, _) in enumerate(plano):
+        if centro_custo_a_cada and posicao and posicao % centro_custo_a_cada == 0:
+            centro = CENTROS_CUSTO[(posicao // centro_custo_a_cada) % len(CENTROS_CUSTO)]
+            ws.append([f"Plano C.Custo: {posicao:05d} - {centro}"])
+            linhas += 1
+
+        linha = [f"{codigo} - {nome}"]
+        total_orcado = total_realizado = 0
+        for orcado, realizado in valores[codigo]:
+            linha += [orcado, realizado, round(realizado / orcado * 100, 2) if orcado else None, round(realizado - orcado, 2)]
+            total_orcado += orcado
+            total_realizado += realizado
+        linha += [round(total_orcado, 2), round(total_realizado, 2), round(total_orcado - total_realizado, 2)]
+        ws.append(linha)
+        linhas += 1
+
+    wb.save(caminho)
+    return linhas
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--destino', default='.', help='diretório das planilhas geradas')
+    parser.add_argument('--itens', type=int, default=10, help='itens por subgrupo (viabilidade)')
+    parser.add_argument('--especiais', type=int, default=5, help='itens por seção especial (viabilidade)')
+    parser.add_argument('--meses', type=int, default=12, help='meses da planilha BPO')
+    parser.add_argument('--contas', type=int, default=200, help='contas analíticas da planilha BPO')
+    parser.add_argument('--semente', type=int, default=42)
+    args = parser.parse_args()
+
+    os.makedirs(args.destino, exist_ok=True)
+    caminho = os.path.join(args.destino, f"viabilidade_{args.itens}itens.xlsx")
+    linhas = gerar_planilha_viabilidade(caminho, args.itens, args.especiais, args.semente)
+    print(f"{caminho}: {linhas} linhas")
+
+    caminho = os.path.join(args.destino, f"bpo_{args.meses}meses_{args.contas}contas.xlsx")
+    linhas = gerar_planilha_bpo(caminho, args.meses, args.contas, semente=args.semente)
+    print(f"{caminho}: {linhas} linhas")
+
+
+if __name__ == '__main__':
+    main()
@@ -3,6 +3,7 @@ import json
 from pathlib import Path
 from dotenv import load_dotenv
 from google import genai
+from utils.metrics import medir_fase
 
 # Buscar o arquivo .env na raiz do projeto
 # Estrutura: raiz/.env e raiz/src/controllers/AI/gemini_utils.py
@@ -274,6 +275,7 @@ ESTRUTURA OBRIGATÓRIA DO RELATÓRIO (Siga RIGOROSAMENTE):
 """
 
 
+@medir_fase('ai')
 def gerar_relatorio_viabilidade(dados: dict) -> str:
     """
     Gera um relatório de viabilidade financeira usando o Gemini.
@@ -449,6 +451,7 @@ ESTRUTURA OBRIGATÓRIA DO RELATÓRIO (Siga RIGOROSAMENTE):
 """
 
 
+@medir_fase('ai')
 def gerar_relatorio_bpo(dados: dict) -> str:
     """
     Gera um relatório executivo de DRE e Performance Estratégica usando o Gemini.
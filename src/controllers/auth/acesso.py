@@ -0,0 +1,138 @@
+"""
+Controle de Acesso Usuário x Empresa
+====================================
+
+Mantém em memória, por usuário, o conjunto (frozenset) de empresas às quais
+ele está vinculado, junto com a lista usada na tela de seleção. Assim a
+troca de empresa e as chamadas às APIs /user/... são autorizadas com uma
+consulta O(1), sem refazer o JOIN em user_empresa a cada requisição.
+
+O cache é invalidado ao vincular/desvincular usuários e ao alterar ou
+excluir empresas (models/user_manager.py e models/company_manager.py).
+
+Configuração (.env):
+    ACESSO_CACHE_TTL   - segundos de validade de cada entrada (padrão: 300)
+    ACESSO_CACHE_MAX   - máximo de usuários em cache (padrão: 1024)
+"""
+
+import os
+import time
+import threading
+from collections import OrderedDict, namedtuple
+from functools import wraps
+from flask import session, jsonify, flash, redirect, url_for
+from utils.logger import get_logger
+
+# Inicializar logger
+logger = get_logger('acesso')
+
+ACESSO_CACHE_TTL = float(os.getenv('ACESSO_CACHE_TTL', '300'))
+ACESSO_CACHE_MAX = int(os.getenv('ACESSO_CACHE_MAX', '1024'))
+
+AcessoUsuario = namedtuple('AcessoUsuario', ['empresa_ids', 'empresas'])
+
+_lock = threading.Lock()
+_cache = OrderedDict()  # user_id -> (expira_em, AcessoUsuario)
+
+
+def obter_acesso(user_id):
+    """
+    Retorna as empresas vinculadas ao usuário (do cache ou do banco).
+
+    Returns:
+        AcessoUsuario: empresa_ids (frozenset) e empresas (tupla de dicts, por nome)
+    """
+    with _lock:
+        entrada = _cache.get(user_id)
+        if entrada is not None and entrada[0] >= time.monotonic():
+            _cache.move_to_end(user_id)
+            return entrada[1]
+
+    from models.user_manager import UserManager
+
+    user_manager = UserManager()
+    empresas = user_manager.get_empresas_do_usuario(user_id)
+    user_manager.close()
+
+    acesso = AcessoUsuario(
+        empresa_ids=frozenset(empresa['id'] for empresa in empresas),
+        empresas=tuple(empresas)
+    )
+
+    with _lock:
+        _cache[user_id] = (time.monotonic() + ACESSO_CACHE_TTL, acesso)
+        _cache.move_to_end(user_id)
+        while len(_cache) > ACESSO_CACHE_MAX:
+            _cache.popitem(last=False)
+
+    return acesso
+
+
+def empresas_permitidas(user_id):
+    """Retorna o frozenset de ids de empresas acessíveis pelo usuário."""
+    return obter_acesso(user_id).empresa_ids
+
+
+def invalidar_acesso(user_id=None):
+    """
+    Descarta o acesso em cache de um usuário (ou de todos, se user_id for None).
+    """
+    with _lock:
+        if user_id is None:
+            _cache.clear()
+        else:
+            _cache.pop(user_id, None)
+    logger.debug("Cache de acesso invalidado (user_id=%s)", user_id)
+
+
+def acesso_empresa_requerido(api=False):
+    """
+    Decorator para rotas de usuário que operam sobre uma empresa.
+
+    Exige sessão de usuário (role 'user') e que a empresa da rota
+    (parâmetro empresa_id) ou, na falta dele, a empresa selecionada na
+    sessão esteja entre as empresas vinculadas ao usuário.
+
+    Args:
+        api (bool): Se True responde JSON 4xx; senão usa flash + redirect
+    """
+    def decorador(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if not ('user_email' in session and session.get('user_role') == 'user'):
+                if api:
+                    return jsonify({"error": "Não autorizado"}), 403
+                flash("Acesso negado. Faça login como usuário.", "danger")
+                return redirect(url_for('index.login'))
+
+            empresa_id = kwargs.get('empresa_id', session.get('empresa_id'))
+            if empresa_id is None:
+                if api:
+                    return jsonify({"error": "Empresa não selecionada"}), 400
+                return redirect(url_for('user.selecionar_empresa'))
+
+            user_id = session.get('user_id')
+            if user_id is None:
+                # Sessão criada antes do user_id ser gravado no login
+                from controllers.auth.principal import obter_usuario_logado
+                usuario = obter_usuario_logado()
+                if not usuario:
+                    if api:
+                        return jsonify({"error": "Usuário não encontrado"}), 404
+                    return redirect(url_for('index.login'))
+                user_id = usuario['id']
+
+            if empresa_id not in empresas_permitidas(user_id):
+                logger.warning("Acesso negado: user_id=%s empresa_id=%s", user_id, empresa_id)
+                if api:
+                    return jsonify({"error": "Acesso negado a esta empresa"}), 403
+                if empresa_id == session.get('empresa_id'):
+                    # Vínculo removido depois que a empresa foi selecionada
+                    session.pop('empresa_id', None)
+                    session.pop('empresa_nome', None)
+                flash("Acesso negado a esta empresa.", "danger")
+                return redirect(url_for('user.selecionar_empresa'))
+
+            return view(*args, **kwargs)
+        return wrapper
+    return decorador
@@ -0,0 +1,140 @@
+"""
+Usuário Autenticado em Cache
+============================
+
+Evita buscar o usuário logado no banco a cada página/API: o registro é
+mantido em um cache em memória (TTL + LRU) indexado pelo id do usuário.
+
+A versão do usuário é a coluna users.versao, incrementada por update_user
+e update_user_password; todos os workers leem o mesmo número do banco. A
+sessão guarda a versão carregada (session['principal_versao']) e o cache só
+é usado quando a versão da entrada bate com a da sessão. Em uma falta de
+cache o usuário é relido do banco (com a versão) e a sessão é atualizada,
+ou encerrada se ele foi excluído.
+
+A alteração descarta na hora a entrada do worker que a fez; os outros
+workers podem servir a entrada antiga (inclusive de um usuário excluído)
+até ela expirar, no máximo PRINCIPAL_CACHE_TTL segundos.
+
+Configuração (.env):
+    PRINCIPAL_CACHE_TTL   - segundos de validade de cada entrada (padrão: 300)
+    PRINCIPAL_CACHE_MAX   - máximo de usuários em cache (padrão: 1024)
+"""
+
+import os
+import time
+import threading
+from collections import OrderedDict
+from flask import session
+from utils.logger import get_logger
+
+# Inicializar logger
+logger = get_logger('principal')
+
+PRINCIPAL_CACHE_TTL = float(os.getenv('PRINCIPAL_CACHE_TTL', '300'))
+PRINCIPAL_CACHE_MAX = int(os.getenv('PRINCIPAL_CACHE_MAX', '1024'))
+
+_lock = threading.Lock()
+_cache = OrderedDict()  # user_id -> (expira_em, usuario)
+
+
+def _sem_senha(usuario):
+    """Cópia do registro sem o hash da senha (não fica em cache nem vai para templates)."""
+    return {campo: valor for campo, valor in usuario.items() if campo != 'password'}
+
+
+def _versao(usuario):
+    return usuario.get('versao') or 0
+
+
+def _guardar(usuario):
+    with _lock:
+        _cache[usuario['id']] = (time.monotonic() + PRINCIPAL_CACHE_TTL, usuario)
+        _cache.move_to_end(usuario['id'])
+        while len(_cache) > PRINCIPAL_CACHE_MAX:
+            _cache.popitem(last=False)
+
+
+def _buscar_em_cache(user_id, versao):
+    with _lock:
+        entrada = _cache.get(user_id)
+        if entrada is None:
+            return None
+        expira_em, usuario = entrada
+        if _versao(usuario) != versao or expira_em < time.monotonic():
+            del _cache[user_id]
+            return None
+        _cache.move_to_end(user_id)
+        return usuario
+
+
+def iniciar_sessao(usuario):
+    """
+    Grava na sessão os dados do usuário que acabou de fazer login.
+
+    Args:
+        usuario (dict): Registro completo retornado por find_user_by_email
+    """
+    usuario = _sem_senha(usuario)
+    _gravar_na_sessao(usuario)
+    _guardar(usuario)
+
+
+def encerrar_sessao():
+    """Remove da sessão o usuário logado e tudo que foi gravado para ele."""
+    session.clear()
+
+
+def _gravar_na_sessao(usuario):
+    session['user_email'] = usuario['email']
+    session['user_role'] = usuario['role']
+    session['user_id'] = usuario['id']
+    session['principal_versao'] = _versao(usuario)
+
+
+def obter_usuario_logado():
+    """
+    Retorna o usuário da sessão atual (sem o campo password).
+
+    Returns:
+        dict|None: Dados do usuário ou None se não houver sessão válida
+    """
+    if 'user_email' not in session:
+        return None
+
+    user_id = session.get('user_id')
+    if user_id is not None and 'principal_versao' in session:
+        usuario = _buscar_em_cache(user_id, session['principal_versao'])
+        if usuario is not None:
+            return dict(usuario)
+
+    # Cache vazio/expirado, versão alterada ou sessão anterior ao user_id
+    from models.user_manager import UserManager
+
+    user_manager = UserManager()
+    if user_id is not None:
+        registro = user_manager.get_user_by_id(user_id)
+    else:
+        registro = user_manager.find_user_by_email(session.get('user_email'))
+    user_manager.close()
+
+    if not registro:
+        logger.warning("Usuário da sessão não existe mais: %s", session.get('user_email'))
+        encerrar_sessao()
+        return None
+
+    usuario = _sem_senha(registro)
+    _gravar_na_sessao(usuario)
+    _guardar(usuario)
+    return dict(usuario)
+
+
+def invalidar_usuario(user_id):
+    """
+    Descarta o usuário do cache deste processo. Chamado após alterar ou
+    excluir o usuário; nos demais processos a versão relida do banco (ou o
+    TTL) invalida a entrada.
+    """
+    with _lock:
+        _cache.pop(user_id, None)
+    logger.debug("Usuário %s invalidado no cache de sessão", user_id)
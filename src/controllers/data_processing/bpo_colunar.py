@@ -0,0 +1,609 @@
+"""
+Histórico Colunar do BPO (cache mapeado em memória)
+===================================================
+
+As visões de vários meses do BPO (dashboard, tabela e comparativo) leem
+poucos números por conta, mas decodificavam o JSON inteiro de cada mês a
+cada requisição. Com o cache ativo, cada empresa ganha um arquivo de layout
+fixo, regravado quando um upload (ou percentual MP / exclusão) é salvo:
+
+    cabeçalho   magic, versão, nº de meses, nº de contas, primeiro mês
+                (indice_periodo) e offsets dos blocos
+    dicionário  JSON com [codigo, nome, nivel_hierarquia] das contas,
+                ordenadas por código
+    contas      float64[mês][conta][5]: tem_dados, orçado, realizado,
+                % atingido, diferença
+    dre         float64[mês][cenário][13]: presente, orçamento, realizado,
+                % atingido e diferença (receita, despesa, geral)
+    meses       float64[mês][2]: presente, percentual_mp_manual
+
+Meses sem dados e valores ausentes (None) são NaN; tem_dados é 0 quando a
+conta aparece no mês sem dados mensais. O arquivo é aberto com mmap e os
+blocos são views NumPy sobre ele (sem cópia): um período é uma fatia de
+meses contíguos e as agregações são somas vetorizadas sobre a fatia.
+
+O Resultado Real com MP é gravado sem o percentual manual e recalculado na
+leitura (como em totais_mes_bpo), então alterar o percentual só muda o
+bloco de meses.
+
+Configuração (.env):
+    BPO_COLUNAR        - 1 para ativar (padrão: 0; exige numpy)
+    BPO_COLUNAR_DIR    - diretório dos arquivos (padrão: <raiz>/cache/bpo_colunar)
+
+Sem numpy, com o cache desligado ou sem arquivo legível, as APIs seguem
+pelo caminho JSON.
+
+Autor: WaysSolutionHub
+"""
+
+import os
+import json
+import mmap
+import struct
+import threading
+import tempfile
+from pathlib import Path
+from dotenv import load_dotenv
+from controllers.data_processing.bpo_totais import CENARIOS_DRE, CODIGO_MATERIA_PRIMA
+from controllers.data_processing.bpo_series import (
+    CAMPOS_DRE, indice_periodo, periodo_do_indice
+)
+from utils.logger import get_logger
+
+try:
+    import numpy as np
+except ImportError:  # numpy é opcional
+    np = None
+
+# Buscar o arquivo .env na raiz do projeto
+BASE_DIR = Path(__file__).resolve().parent.parent.parent.parent
+load_dotenv(dotenv_path=BASE_DIR / '.env')
+
+BPO_COLUNAR = os.getenv('BPO_COLUNAR', '0') == '1'
+BPO_COLUNAR_DIR = os.getenv('BPO_COLUNAR_DIR', str(BASE_DIR / 'cache' / 'bpo_colunar'))
+
+# Inicializar logger
+logger = get_logger('bpo_colunar')
+
+MAGIC = b'WBPOCOL1'
+VERSAO = 1
+
+# magic, versão, meses, contas, primeiro mês, tamanho do dicionário,
+# offsets dos blocos contas/dre/meses (little-endian, sem alinhamento)
+_CABECALHO = struct.Struct('<8sIIIqQQQQ')
+_TAMANHO_CABECALHO = 64
+
+# Campos por (mês, conta)
+CONTA_TEM_DADOS, CONTA_ORCADO, CONTA_REALIZADO, CONTA_PERC, CONTA_DIFERENCA = range(5)
+CAMPOS_CONTA = ('valor_orcado', 'valor_realizado', 'perc_atingido', 'valor_diferenca')
+
+# Campos por (mês, cenário): presente + 4 blocos × (receita, despesa, geral)
+BLOCOS_DRE = ('orcamento', 'realizado', 'perc_atingido', 'diferenca')
+DRE_PRESENTE = 0
+DRE_ORCAMENTO = 1
+DRE_REALIZADO = 4
+N_CAMPOS_DRE = 1 + len(BLOCOS_DRE) * len(CAMPOS_DRE)
+
+MES_PRESENTE, MES_PERCENTUAL = range(2)
+
+NOMES_MESES = ['', 'Janeiro', 'Fevereiro', 'Março', 'Abril', 'Maio', 'Junho',
+               'Julho', 'Agosto', 'Setembro', 'Outubro', 'Novembro', 'Dezembro']
+
+_lock = threading.Lock()
+_abertos = {}        # empresa_id -> (assinatura do arquivo, HistoricoBPO)
+_geracoes = {}       # empresa_id -> nº de invalidações (descarta gravações obsoletas)
+
+
+def ativo():
+    """Cache colunar habilitado (BPO_COLUNAR=1 e numpy instalado)."""
+    return BPO_COLUNAR and np is not None
+
+
+def _caminho(empresa_id):
+    return os.path.join(BPO_COLUNAR_DIR, f"empresa_{int(empresa_id)}.bpo")
+
+
+def _alinhar(offset):
+    return (offset + 7) & ~7
+
+
+def _numero(valor):
+    """float do JSON (None e não numéricos viram NaN)."""
+    if valor is None or isinstance(valor, bool):
+        return np.nan
+    try:
+        return float(valor)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def _opcional(valor):
+    """NaN -> None para a saída JSON."""
+    return None if valor != valor else valor
+
+
+# ============================================================================
+# GRAVAÇÃO
+# ============================================================================
+
+def _itens(dados):
+    """[(codigo, item)] de itens_hierarquicos em lista ou dict."""
+    itens = dados.get('itens_hierarquicos') or []
+    if isinstance(itens, dict):
+        return list(itens.items())
+    return [(item.get('codigo', ''), item) for item in itens]
+
+
+def montar_arquivo(meses):
+    """
+    Serializa os meses no layout colunar.
+
+    Args:
+        meses (list): [(ano, mes, dados)] como em buscar_dados_bpo_periodo
+
+    Returns:
+        bytes: conteúdo do arquivo
+    """
+    contas = {}
+    for _, _, dados in meses:
+        for codigo, item in _itens(dados):
+            if codigo and codigo not in contas:
+                contas[codigo] = [codigo, item.get('nome', codigo), item.get('nivel_hierarquia')]
+    codigos = sorted(contas)
+    posicoes = {codigo: j for j, codigo in enumerate(codigos)}
+
+    if meses:
+        primeiro = indice_periodo(meses[0][0], meses[0][1])
+        n_meses = indice_periodo(meses[-1][0], meses[-1][1]) - primeiro + 1
+    else:
+        primeiro, n_meses = 0, 0
+
+    bloco_contas = np.full((n_meses, len(codigos), 5), np.nan)
+    bloco_dre = np.full((n_meses, len(CENARIOS_DRE), N_CAMPOS_DRE), np.nan)
+    bloco_meses = np.full((n_meses, 2), np.nan)
+
+    for ano, mes, dados in meses:
+        i = indice_periodo(ano, mes) - primeiro
+        bloco_meses[i, MES_PRESENTE] = 1.0
+        bloco_meses[i, MES_PERCENTUAL] = _numero(dados.get('percentual_mp_manual'))
+
+        for codigo, item in _itens(dados):
+            if codigo not in posicoes:
+                continue
+            linha = bloco_contas[i, posicoes[codigo]]
+            dados_mensais = item.get('dados_mensais') or []
+            if not dados_mensais:
+                linha[CONTA_TEM_DADOS] = 0.0
+                continue
+            linha[CONTA_TEM_DADOS] = 1.0
+            for k, campo in enumerate(CAMPOS_CONTA, start=1):
+                linha[k] = _numero(dados_mensais[0].get(campo))
+
+        totais_calculados = dados.get('totais_calculados') or {}
+        for c, cenario in enumerate(CENARIOS_DRE):
+            cenario_data = totais_calculados.get(cenario)
+            if not isinstance(cenario_data, dict):
+                continue
+            mes_dados = cenario_data.get(mes, cenario_data.get(str(mes)))
+            if not mes_dados or not isinstance(mes_dados, dict):
+                continue
+            linha = bloco_dre[i, c]
+            linha[DRE_PRESENTE] = 1.0
+            for b, bloco in enumerate(BLOCOS_DRE):
+                valores = mes_dados.get(bloco)
+                if isinstance(valores, dict):
+                    for k, campo in enumerate(CAMPOS_DRE):
+                        linha[1 + b * 3 + k] = _numero(valores.get(campo))
+
+    dicionario = json.dumps([contas[codigo] for codigo in codigos], ensure_ascii=False).encode('utf-8')
+
+    off_contas = _alinhar(_TAMANHO_CABECALHO + len(dicionario))
+    off_dre = off_contas + bloco_contas.nbytes
+    off_meses = off_dre + bloco_dre.nbytes
+
+    cabecalho = _CABECALHO.pack(
+        MAGIC, VERSAO, n_meses, len(codigos), primeiro, len(dicionario),
+        off_contas, off_dre, off_meses
+    ).ljust(_TAMANHO_CABECALHO, b'\0')
+
+    return b''.join([
+        cabecalho,
+        dicionario.ljust(off_contas - _TAMANHO_CABECALHO, b'\0'),
+        bloco_contas.astype('<f8').tobytes(),
+        bloco_dre.astype('<f8').tobytes(),
+        bloco_meses.astype('<f8').tobytes(),
+    ])
+
+
+def gravar_historico(empresa_id, meses, geracao=None):
+    """
+    Grava (substituição atômica) o arquivo colunar da empresa.
+
+    Args:
+        geracao (int): geração lida antes de buscar os meses; se a empresa foi
+            invalidada depois disso, os meses estão obsoletos e nada é gravado
+
+    Returns:
+        bool: True se o arquivo foi gravado
+    """
+    conteudo = montar_arquivo(meses)
+    os.makedirs(BPO_COLUNAR_DIR, exist_ok=True)
+    descritor, temporario = tempfile.mkstemp(dir=BPO_COLUNAR_DIR, suffix='.tmp')
+    try:
+        with os.fdopen(descritor, 'wb') as arquivo:
+            arquivo.write(conteudo)
+        with _lock:
+            if geracao is not None and _geracoes.get(empresa_id, 0) != geracao:
+                logger.debug("Histórico colunar da empresa %s invalidado durante a montagem", empresa_id)
+                return False
+            os.replace(temporario, _caminho(empresa_id))
+            temporario = None
+    finally:
+        if temporario is not None:
+            os.unlink(temporario)
+
+    logger.debug("Histórico colunar gravado: empresa %s, %s meses, %s bytes", empresa_id, len(meses), len(conteudo))
+    return True
+
+
+def construir_historico(empresa_id, company_manager=None):
+    """
+    Monta o arquivo da empresa a partir de todos os meses de TbBpoDados
+    (uma consulta).
+
+    Returns:
+        bool: True se o arquivo foi gravado
+    """
+    if not ativo():
+        return False
+
+    from models.company_manager import CompanyManager
+
+    with _lock:
+        geracao = _geracoes.get(empresa_id, 0)
+
+    proprio = company_manager is None
+    if proprio:
+        company_manager = CompanyManager()
+    try:
+        meses = company_manager.buscar_dados_bpo_periodo(empresa_id, 1, 1, 9999, 12)
+    finally:
+        if proprio:
+            company_manager.close()
+
+    # Sem meses (ou erro na consulta) não há arquivo: as APIs seguem pelo JSON
+    if not meses:
+        return False
+
+    try:
+        return gravar_historico(empresa_id, meses, geracao)
+    except (OSError, ValueError) as e:
+        logger.error(f"Erro ao gravar histórico colunar da empresa {empresa_id}: {e}")
+        return False
+
+
+def invalidar_historico(empresa_id):
+    """
+    Remove o arquivo da empresa (dados do BPO alterados).
+
+    Returns:
+        bool: True se o cache está ativo (o chamador deve reconstruir)
+    """
+    if not ativo():
+        return False
+    with _lock:
+        _geracoes[empresa_id] = _geracoes.get(empresa_id, 0) + 1
+        _abertos.pop(empresa_id, None)
+        try:
+            os.unlink(_caminho(empresa_id))
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.error(f"Erro ao remover histórico colunar da empresa {empresa_id}: {e}")
+    return True
+
+
+# ============================================================================
+# LEITURA
+# ============================================================================
+
+class HistoricoBPO:
+    """Arquivo colunar de uma empresa mapeado em memória (blocos como views NumPy)."""
+
+    def __init__(self, caminho):
+        with open(caminho, 'rb') as arquivo:
+            # O mapeamento continua válido depois de fechar o arquivo; as
+            # views mantêm o mmap vivo enquanto houver referência a elas
+            self._mmap = mmap.mmap(arquivo.fileno(), 0, access=mmap.ACCESS_READ)
+
+        (magic, versao, n_meses, n_contas, self.primeiro, tamanho_dicionario,
+         off_contas, off_dre, off_meses) = _CABECALHO.unpack_from(self._mmap, 0)
+        if magic != MAGIC or versao != VERSAO:
+            raise ValueError(f"Arquivo colunar inválido: {caminho}")
+
+        self.n_meses = n_meses
+        dicionario = json.loads(self._mmap[_TAMANHO_CABECALHO:_TAMANHO_CABECALHO + tamanho_dicionario])
+        self.codigos = [conta[0] for conta in dicionario]
+        self.nomes = [conta[1] for conta in dicionario]
+        self.niveis = [conta[2] for conta in dicionario]
+        self.posicoes = {codigo: j for j, codigo in enumerate(self.codigos)}
+
+        self.contas = np.frombuffer(self._mmap, dtype='<f8', count=n_meses * n_contas * 5,
+                                    offset=off_contas).reshape(n_meses, n_contas, 5)
+        self.dre = np.frombuffer(self._mmap, dtype='<f8', count=n_meses * len(CENARIOS_DRE) * N_CAMPOS_DRE,
+                                 offset=off_dre).reshape(n_meses, len(CENARIOS_DRE), N_CAMPOS_DRE)
+        self.meses = np.frombuffer(self._mmap, dtype='<f8', count=n_meses * 2,
+                                   offset=off_meses).reshape(n_meses, 2)
+
+        # Categorias do dashboard: itens 1.0X (receita) e 2.0X (despesa)
+        self.categorias = {
+            grupo: [j for j, codigo in enumerate(self.codigos)
+                    if codigo.startswith(grupo + '.') and len(codigo.split('.')) == 2
+                    and codigo.split('.')[1].startswith('0')]
+            for grupo in ('1', '2')
+        }
+
+    def fatia(self, ano_inicio, mes_inicio, ano_fim, mes_fim):
+        """slice das posições do arquivo dentro do período (pode ser vazio)."""
+        inicio = max(indice_periodo(ano_inicio, mes_inicio) - self.primeiro, 0)
+        fim = min(indice_periodo(ano_fim, mes_fim) - self.primeiro + 1, self.n_meses)
+        return slice(inicio, max(fim, inicio))
+
+    def periodo(self, posicao):
+        """(ano, mes) da posição do arquivo."""
+        return periodo_do_indice(self.primeiro + posicao)
+
+    def realizado_dre(self, fatia):
+        """
+        Realizado [mês][cenário][receita, despesa, geral] da fatia, com o
+        Resultado Real com MP recalculado nos meses com percentual manual.
+        """
+        realizado = self.dre[fatia, :, DRE_REALIZADO:DRE_REALIZADO + 3]
+        percentual = self.meses[fatia, MES_PERCENTUAL]
+        c_mp = CENARIOS_DRE.index('real_mp')
+        recalcular = (self.dre[fatia, c_mp, DRE_PRESENTE] == 1) & ~np.isnan(percentual)
+        if not recalcular.any():
+            return realizado
+
+        realizado = realizado.copy()
+        receita = np.nan_to_num(realizado[recalcular, c_mp, 0])
+        despesa_real = np.nan_to_num(self.dre[fatia][recalcular, CENARIOS_DRE.index('real'), DRE_REALIZADO + 1])
+        j = self.posicoes.get(CODIGO_MATERIA_PRIMA)
+        if j is None:
+            materia_prima = 0.0
+        else:
+            materia_prima = np.nan_to_num(self.contas[fatia][recalcular, j, CONTA_REALIZADO])
+        despesa = despesa_real - materia_prima + (percentual[recalcular] / 100) * receita
+        realizado[recalcular, c_mp] = np.stack([receita, despesa, receita - despesa], axis=-1)
+        return realizado
+
+
+def abrir_historico(empresa_id):
+    """
+    HistoricoBPO da empresa, ou None para seguir pelo caminho JSON.
+
+    O mapeamento fica aberto entre requisições e é refeito quando o arquivo
+    muda (inode/mtime/tamanho). Sem arquivo, ele é montado na hora.
+    """
+    if not ativo():
+        return None
+
+    caminho = _caminho(empresa_id)
+    for tentativa in range(2):
+        try:
+            info = os.stat(caminho)
+        except FileNotFoundError:
+            if tentativa or not construir_historico(empresa_id):
+                return None
+            continue
+        except OSError as e:
+            logger.error(f"Erro ao acessar histórico colunar da empresa {empresa_id}: {e}")
+            return None
+
+        assinatura = (info.st_ino, info.st_mtime_ns, info.st_size)
+        with _lock:
+            aberto = _abertos.get(empresa_id)
+        if aberto is not None and aberto[0] == assinatura:
+            return aberto[1]
+
+        try:
+            historico = HistoricoBPO(caminho)
+        except FileNotFoundError:
+            continue
+        except (OSError, ValueError, struct.error) as e:
+            logger.error(f"Erro ao abrir histórico colunar da empresa {empresa_id}: {e}")
+            return None
+
+        with _lock:
+            _abertos[empresa_id] = (assinatura, historico)
+        return historico
+    return None
+
+
+# ============================================================================
+# VISÕES (MESMO FORMATO DAS APIS EM JSON)
+# ============================================================================
+
+def _zeros():
+    return {'receita': 0, 'despesa': 0, 'geral': 0}
+
+
+def _categorias(historico, fatia, indices, num_meses, usuario):
+    """Categorias do dashboard: orçado do primeiro mês com valor, média do realizado."""
+    categorias = {}
+    contas = historico.contas[fatia][:, indices]
+    if contas.size == 0:
+        return categorias
+
+    aparece = ~np.isnan(contas[:, :, CONTA_TEM_DADOS]).all(axis=0)
+    orcado = np.nan_to_num(contas[:, :, CONTA_ORCADO])
+    tem_orcado = orcado != 0
+    primeiro_orcado = orcado[tem_orcado.argmax(axis=0), np.arange(len(indices))]
+    primeiro_orcado = np.where(tem_orcado.any(axis=0), primeiro_orcado, 0.0)
+    realizado = np.nansum(contas[:, :, CONTA_REALIZADO], axis=0)
+
+    for k, j in enumerate(indices):
+        if not aparece[k]:
+            continue
+        media = float(realizado[k]) / num_meses if num_meses > 0 else 0
+        orcado_conta = float(primeiro_orcado[k])
+        categorias[historico.codigos[j]] = {
+            'nome': historico.nomes[j],
+            'orcado': orcado_conta,
+            'realizado': media,
+            'diferenca': orcado_conta - media if usuario else media - orcado_conta
+        }
+    return categorias
+
+
+def dashboard_bpo(historico, ano_inicio, mes_inicio, ano_fim, mes_fim, tipo_dre='fluxo_caixa', usuario=False):
+    """
+    Resposta de /api/dados-bpo (totais, gráficos e categorias) a partir do arquivo.
+
+    Args:
+        usuario (bool): formato da API do usuário (sem meses_data e com a
+            diferença das categorias como orçado - realizado)
+    """
+    fatia = historico.fatia(ano_inicio, mes_inicio, ano_fim, mes_fim)
+    presentes = np.flatnonzero(historico.meses[fatia, MES_PRESENTE] == 1)
+    realizado = historico.realizado_dre(fatia)
+    orcamento = historico.dre[fatia, :, DRE_ORCAMENTO:DRE_ORCAMENTO + 3]
+
+    soma_realizado = np.nansum(realizado, axis=0).tolist()
+    soma_orcamento = np.nansum(orcamento, axis=0).tolist()
+    totais = {cenario: dict(zip(CAMPOS_DRE, soma_realizado[c])) for c, cenario in enumerate(CENARIOS_DRE)}
+    totais_orcamento = {cenario: dict(zip(CAMPOS_DRE, soma_orcamento[c])) for c, cenario in enumerate(CENARIOS_DRE)}
+
+    labels_meses = []
+    meses_data = []
+    for posicao, percentual in zip(presentes.tolist(), historico.meses[fatia][presentes, MES_PERCENTUAL].tolist()):
+        ano, mes = historico.periodo(fatia.start + posicao)
+        labels_meses.append(f"{NOMES_MESES[mes]}/{str(ano)[-2:]}")
+        # O modal de percentual MP só usa percentual_mp_manual de cada mês
+        dados = {} if percentual != percentual else {'percentual_mp_manual': percentual}
+        meses_data.append({'ano': ano, 'mes': mes, 'dados': dados})
+
+    total_receita_orcado = 0
+    if tipo_dre in CENARIOS_DRE:
+        c = CENARIOS_DRE.index(tipo_dre)
+        graficos = np.nan_to_num(realizado[presentes, c]).T.tolist()
+        receitas_orcadas = np.nan_to_num(orcamento[presentes, c, 0])
+        receitas_orcadas = receitas_orcadas[historico.dre[fatia][presentes, c, DRE_PRESENTE] == 1]
+        if receitas_orcadas.any():
+            total_receita_orcado = float(receitas_orcadas[receitas_orcadas.nonzero()[0][0]])
+    else:
+        graficos = [[0] * len(presentes)] * 3
+
+    num_meses = len(presentes)
+    resposta = {
+        'totais_acumulados': totais,
+        'totais_orcamento': totais_orcamento,
+        'num_meses': num_meses,
+        'meses': labels_meses,
+        'receitas': graficos[0],
+        'despesas': graficos[1],
+        'gerais': graficos[2],
+        'categorias_despesa': _categorias(historico, fatia, historico.categorias['2'], num_meses, usuario),
+        'categorias_receita': _categorias(historico, fatia, historico.categorias['1'], num_meses, usuario),
+        'total_receita_orcado': total_receita_orcado
+    }
+    if not usuario:
+        resposta['meses_data'] = meses_data
+    return resposta
+
+
+def tabela_bpo(historico, ano_inicio, mes_inicio, ano_fim, mes_fim):
+    """
+    Resposta de /api/dados-bpo-tabela a partir do arquivo.
+
+    Returns:
+        dict: {'itens', 'meses', 'totais_calculados'} ou None sem meses no período
+    """
+    fatia = historico.fatia(ano_inicio, mes_inicio, ano_fim, mes_fim)
+    presentes = np.flatnonzero(historico.meses[fatia, MES_PRESENTE] == 1).tolist()
+    if not presentes:
+        return None
+
+    periodos = [historico.periodo(fatia.start + posicao) for posicao in presentes]
+    meses_info = [{'mes_numero': mes, 'mes_nome': NOMES_MESES[mes], 'ano': ano} for ano, mes in periodos]
+
+    contas = historico.contas[fatia][presentes]
+    aparece = (~np.isnan(contas[:, :, CONTA_TEM_DADOS])).any(axis=0).tolist()
+    valores = contas.transpose(1, 0, 2).tolist()
+
+    itens = []
+    for j, codigo in enumerate(historico.codigos):
+        if not aparece[j]:
+            continue
+        dados_mensais = {}
+        for (ano, mes), linha in zip(periodos, valores[j]):
+            if linha[CONTA_TEM_DADOS] == 1:
+                dados_mensais[f"{ano}_{mes}"] = {
+                    'mes_numero': mes,
+                    'ano': ano,
+                    **{campo: _opcional(linha[k]) for k, campo in enumerate(CAMPOS_CONTA, start=1)}
+                }
+        itens.append({
+            'codigo': codigo,
+            'nome': historico.nomes[j],
+            'nivel_hierarquia': historico.niveis[j],
+            'dados_mensais': dados_mensais
+        })
+
+    dre = historico.dre[fatia][presentes].tolist()
+    totais_calculados = {cenario: {} for cenario in CENARIOS_DRE}
+    for (ano, mes), linha_mes in zip(periodos, dre):
+        for c, cenario in enumerate(CENARIOS_DRE):
+            linha = linha_mes[c]
+            if linha[DRE_PRESENTE] != 1:
+                continue
+            total = {'mes_numero': mes, 'ano': ano, 'mes_nome': NOMES_MESES[mes]}
+            for b, bloco in enumerate(BLOCOS_DRE):
+                total[bloco] = {campo: _opcional(linha[1 + b * 3 + k]) for k, campo in enumerate(CAMPOS_DRE)}
+            totais_calculados[cenario][f"{ano}_{mes}"] = total
+
+    return {'itens': itens, 'meses': meses_info, 'totais_calculados': totais_calculados}
+
+
+def series_bpo(historico, inicio, tamanho, codigos=None):
+    """
+    Séries mensais do comparativo (mesmo retorno de bpo_series.montar_series).
+
+    Args:
+        inicio (int): indice_periodo da primeira posição das séries
+        tamanho (int): quantidade de meses das séries
+    """
+    series_dre = {(cenario, campo): [float('nan')] * tamanho for cenario in CENARIOS_DRE for campo in CAMPOS_DRE}
+    series_contas = {}
+    nomes_contas = {}
+
+    # Parte do período coberta pelo arquivo
+    de = max(inicio, historico.primeiro)
+    ate = min(inicio + tamanho, historico.primeiro + historico.n_meses)
+    if de >= ate:
+        return series_dre, series_contas, nomes_contas
+
+    fatia = slice(de - historico.primeiro, ate - historico.primeiro)
+    destino = slice(de - inicio, ate - inicio)
+
+    realizado = historico.realizado_dre(fatia)
+    for c, cenario in enumerate(CENARIOS_DRE):
+        for k, campo in enumerate(CAMPOS_DRE):
+            series_dre[(cenario, campo)][destino] = realizado[:, c, k].tolist()
+
+    if codigos is None:
+        indices = range(len(historico.codigos))
+    else:
+        indices = sorted(historico.posicoes[codigo] for codigo in codigos if codigo in historico.posicoes)
+    realizado_contas = historico.contas[fatia, :, CONTA_REALIZADO]
+    com_valor = (~np.isnan(realizado_contas)).any(axis=0)
+    for j in indices:
+        if not com_valor[j]:
+            continue
+        codigo = historico.codigos[j]
+        serie = [float('nan')] * tamanho
+        serie[destino] = realizado_contas[:, j].tolist()
+        series_contas[codigo] = serie
+        nomes_contas[codigo] = historico.nomes[j]
+
+    return series_dre, series_contas, nomes_contas
@@ -10,9 +10,12 @@ Autor: WaysSolutionHub
 Data: 2025-11-25 (Refatorado)
 """
 
+import json
+import hashlib
 import openpyxl
 from openpyxl import load_workbook
 from utils.logger import get_logger
+from utils.metrics import medir_fase
 
 # Inicializar logger
 logger = get_logger('bpo_processing')
@@ -135,7 +138,7 @@ def extrair_meses_do_cabecalho(sheet):
         # Verificar se é coluna de total (contém "TOTAL")
         if 'TOTAL' in cell_text:
             col_inicio_totais = col_atual
-            logger.debug(f"Coluna de TOTAIS identificada na coluna {col_atual}: '{cell_value}'")
+            logger.debug("Coluna de TOTAIS identificada na coluna %s: '%s'", col_atual, cell_value)
             break
 
         # Verificar se é coluna de mês (contém "ORÇADO" ou "ORCADO")
@@ -168,12 +171,12 @@ def extrair_meses_do_cabecalho(sheet):
                 }
                 meses_info.append(mes_info)
 
-                logger.debug(f"Mês identificado: {mes_nome.capitalize()} {ano} (coluna {col_atual})")
+                logger.debug("Mês identificado: %s %s (coluna %s)", mes_nome.capitalize(), ano, col_atual)
 
                 # Pular as próximas 3 colunas deste mês (Realizado, % Atingido, Diferença)
                 col_atual += 4
             else:
-                logger.warning(f"Não foi possível extrair mês/ano de: '{cell_value}'")
+                logger.warning("Não foi possível extrair mês/ano de: '%s'", cell_value)
                 col_atual += 1
         else:
             col_atual += 1
@@ -181,9 +184,9 @@ def extrair_meses_do_cabecalho(sheet):
     # Se não encontrou col_inicio_totais, assume últimas 3 colunas
     if col_inicio_totais is None:
         col_inicio_totais = total_colunas - 2
-        logger.warning(f"Coluna de totais não identificada, assumindo coluna {col_inicio_totais}")
+        logger.warning("Coluna de totais não identificada, assumindo coluna %s", col_inicio_totais)
 
-    logger.debug(f"Resumo: {len(meses_info)} meses identificados, coluna de totais: {col_inicio_totais}")
+    logger.debug("Resumo: %s meses identificados, coluna de totais: %s", len(meses_info), col_inicio_totais)
 
     return {
         'meses': meses_info,
@@ -316,18 +319,18 @@ def calcular_totais_fluxo_caixa(itens_hierarquicos, meses_info):
         if codigo == "1" or ("RECEITA" in nome_upper and codigo.startswith("1")):
             if not item_receita:  # Pegar o primeiro
                 item_receita = item
-                logger.debug(f"Item RECEITA encontrado: [{item['codigo']}] {item['nome']}")
+                logger.debug("Item RECEITA encontrado: [%s] %s", item['codigo'], item['nome'])
 
         # Procurar por "2 - DESPESAS" ou similar
         if codigo == "2" or ("DESPESA" in nome_upper and codigo.startswith("2")):
             if not item_despesa:  # Pegar o primeiro
                 item_despesa = item
-                logger.debug(f"Item DESPESA encontrado: [{item['codigo']}] {item['nome']}")
+                logger.debug("Item DESPESA encontrado: [%s] %s", item['codigo'], item['nome'])
 
     if not item_receita or not item_despesa:
         logger.warning("ATENÇÃO: Não foi possível encontrar itens RECEITA e/ou DESPESAS!")
-        logger.warning(f"Item RECEITA: {'Encontrado' if item_receita else 'NÃO ENCONTRADO'}")
-        logger.warning(f"Item DESPESA: {'Encontrado' if item_despesa else 'NÃO ENCONTRADO'}")
+        logger.warning("Item RECEITA: %s", 'Encontrado' if item_receita else 'NÃO ENCONTRADO')
+        logger.warning("Item DESPESA: %s", 'Encontrado' if item_despesa else 'NÃO ENCONTRADO')
         return totais
 
     # Calcular para cada mês encontrado na planilha
@@ -341,7 +344,7 @@ def calcular_totais_fluxo_caixa(itens_hierarquicos, meses_info):
         dados_mes_despesa = next((m for m in item_despesa['dados_mensais'] if m['mes_numero'] == mes_numero and m['ano'] == ano), None)
 
         if not dados_mes_receita or not dados_mes_despesa:
-            logger.warning(f"{mes_info['mes_nome']} {ano}: Dados não encontrados")
+            logger.warning("%s %s: Dados não encontrados", mes_info['mes_nome'], ano)
             continue
 
         # ====================================================================
@@ -416,10 +419,10 @@ def calcular_totais_fluxo_caixa(itens_hierarquicos, meses_info):
 
         # Log apenas do primeiro mês para não poluir
         if len(totais['fluxo_caixa']) == 1:
-            logger.debug(f"{mes_info['mes_nome']} {ano} - Exemplo de cálculo do Fluxo de Caixa")
-            logger.debug(f"ORÇAMENTO → Receita: R$ {formatar_numero(orcamento_receita)} | Despesa: R$ {formatar_numero(orcamento_despesa)} | Geral: R$ {formatar_numero(orcamento_geral)}")
+            logger.debug("%s %s - Exemplo de cálculo do Fluxo de Caixa", mes_info['mes_nome'], ano)
+            logger.debug("ORÇAMENTO → Receita: R$ %s | Despesa: R$ %s | Geral: R$ %s", formatar_numero(orcamento_receita), formatar_numero(orcamento_despesa), formatar_numero(orcamento_geral))
 
-    logger.debug(f"Totais do Fluxo de Caixa calculados para {len(totais['fluxo_caixa'])} meses")
+    logger.debug("Totais do Fluxo de Caixa calculados para %s meses", len(totais['fluxo_caixa']))
 
     # ========================================================================
     # CALCULAR 2º CENÁRIO: RESULTADO REAL
@@ -446,7 +449,7 @@ def calcular_totais_fluxo_caixa(itens_hierarquicos, meses_info):
         return []
 
     # Função auxiliar para calcular total de subtração
-    def calcular_total_subtracao(nomes_itens, mes_num, campo):
+    def calcular_total_subtracao(nomes_itens, mes_num, ano, campo):
         """
         Soma os valores de múltiplos itens para um mês específico
         campo: 'valor_orcado', 'valor_realizado'
@@ -455,7 +458,7 @@ def calcular_totais_fluxo_caixa(itens_hierarquicos, meses_info):
         for nome in nomes_itens:
             dados_mensais = buscar_valores_item(nome)
             for mes_data in dados_mensais:
-                if mes_data['mes_numero'] == mes_num:
+                if mes_data['mes_numero'] == mes_num and mes_data['ano'] == ano:
                     valor = mes_data.get(campo, 0)
                     total += valor if valor else 0
                     break
@@ -471,7 +474,7 @@ def calcular_totais_fluxo_caixa(itens_hierarquicos, meses_info):
         dados_fc = totais['fluxo_caixa'].get(chave_mes)
 
         if not dados_fc:
-            logger.warning(f"{mes_info['mes_nome']} {ano}: Dados do Fluxo de Caixa não encontrados")
+            logger.warning("%s %s: Dados do Fluxo de Caixa não encontrados", mes_info['mes_nome'], ano)
             continue
 
         # ====================================================================
@@ -481,8 +484,8 @@ def calcular_totais_fluxo_caixa(itens_hierarquicos, meses_info):
         orcamento_despesa_fc = dados_fc['orcamento']['despesa']
 
         # Subtrair os itens específicos
-        subtracao_receita_orcado = calcular_total_subtracao(itens_subtrair_receita, mes_numero, 'valor_orcado')
-        subtracao_despesa_orcado = calcular_total_subtracao(itens_subtrair_despesa, mes_numero, 'valor_orcado')
+        subtracao_receita_orcado = calcular_total_subtracao(itens_subtrair_receita, mes_numero, ano, 'valor_orcado')
+        subtracao_despesa_orcado = calcular_total_subtracao(itens_subtrair_despesa, mes_numero, ano, 'valor_orcado')
 
         orcamento_receita_real = orcamento_receita_fc - subtracao_receita_orcado
         orcamento_despesa_real = orcamento_despesa_fc - subtracao_despesa_orcado
@@ -495,8 +498,8 @@ def calcular_totais_fluxo_caixa(itens_hierarquicos, meses_info):
         realizado_despesa_fc = dados_fc['realizado']['despesa']
 
         # Subtrair os itens específicos
-        subtracao_receita_realizado = calcular_total_subtracao(itens_subtrair_receita, mes_numero, 'valor_realizado')
-        subtracao_despesa_realizado = calcular_total_subtracao(itens_subtrair_despesa, mes_numero, 'valor_realizado')
+        subtracao_receita_realizado = calcular_total_subtracao(itens_subtrair_receita, mes_numero, ano, 'valor_realizado')
+        subtracao_despesa_realizado = calcular_total_subtracao(itens_subtrair_despesa, mes_numero, ano, 'valor_realizado')
 
         realizado_receita_real = realizado_receita_fc - subtracao_receita_realizado
         realizado_despesa_real = realizado_despesa_fc - subtracao_despesa_realizado
@@ -560,9 +563,9 @@ def calcular_totais_fluxo_caixa(itens_hierarquicos, meses_info):
 
         # Log apenas do primeiro mês
         if len(totais['real']) == 1:
-            logger.debug(f"{mes_info['mes_nome']} {ano} - Exemplo de cálculo (Resultado Real)")
+            logger.debug("%s %s - Exemplo de cálculo (Resultado Real)", mes_info['mes_nome'], ano)
 
-    logger.debug(f"Totais do Resultado Real calculados para {len(totais['real'])} meses")
+    logger.debug("Totais do Resultado Real calculados para %s meses", len(totais['real']))
 
     # ========================================================================
     # CALCULAR 3º CENÁRIO: RESULTADO REAL + CUSTO MATÉRIA PRIMA
@@ -582,7 +585,7 @@ def calcular_totais_fluxo_caixa(itens_hierarquicos, meses_info):
         dados_real = totais['real'].get(chave_mes)
 
         if not dados_real:
-            logger.warning(f"{mes_info['mes_nome']} {ano}: Dados do Resultado Real não encontrados")
+            logger.warning("%s %s: Dados do Resultado Real não encontrados", mes_info['mes_nome'], ano)
             continue
 
         # ====================================================================
@@ -683,9 +686,9 @@ def calcular_totais_fluxo_caixa(itens_hierarquicos, meses_info):
 
         # Log apenas do primeiro mês
         if len(totais['real_mp']) == 1:
-            logger.debug(f"{mes_info['mes_nome']} {ano} - Exemplo de cálculo (Resultado Real + Custo MP)")
+            logger.debug("%s %s - Exemplo de cálculo (Resultado Real + Custo MP)", mes_info['mes_nome'], ano)
 
-    logger.debug(f"Totais do Resultado Real + Custo MP calculados para {len(totais['real_mp'])} meses")
+    logger.debug("Totais do Resultado Real + Custo MP calculados para %s meses", len(totais['real_mp']))
 
     return totais
 
@@ -694,29 +697,19 @@ def calcular_totais_fluxo_caixa(itens_hierarquicos, meses_info):
 # FUNÇÃO PRINCIPAL DE PROCESSAMENTO
 # ============================================================================
 
-def process_bpo_file(file):
+def _ler_planilha_bpo(file):
     """
-    Processa arquivo Excel de BPO Financeiro (NOVA ESTRUTURA) e retorna dados estruturados.
-
-    Estrutura da planilha:
-    - Sheet: "Sheet"
-    - Linha 1: Cabeçalho
-    - Linha 2+: Dados começam
-    - Coluna A: Código hierárquico e nome (ex: "1.01 - RECEITA VENDA SERVIÇO")
-    - Coluna B+: Dados mensais (4 colunas por mês: Orçado, Realizado, % Ating, Diferença)
-    - Últimas 3 colunas: Totais (Orçado Total, Realizado Total, Pendente Total)
-
-    Args:
-        file: Arquivo Excel (.xlsx ou .xls)
+    Lê a planilha BPO uma única vez: cabeçalho (meses e totais) e as linhas
+    de conta com os valores brutos, sem montar os itens.
 
     Returns:
         dict: {
-            'itens_hierarquicos': [...],  # Itens com hierarquia
-            'totais_calculados': {},      # Para adicionar depois (quando souber a fórmula)
-            'metadados': {...}            # Info sobre meses, totais, etc
+            'meses_info': [...],           # meses detectados no cabeçalho
+            'col_inicio_totais': int,
+            'total_colunas': int,
+            'linhas': [(col_a, row_values, linha), ...]
         }
     """
-
     try:
         logger.info("PROCESSANDO PLANILHA BPO (NOVA ESTRUTURA)")
 
@@ -729,23 +722,21 @@ def process_bpo_file(file):
             raise Exception(f"Sheet '{sheet_name}' não encontrada. Sheets disponíveis: {wb.sheetnames}")
 
         sheet = wb[sheet_name]
-        logger.debug(f"Sheet '{sheet_name}' encontrada")
+        logger.debug("Sheet '%s' encontrada", sheet_name)
 
         # Identificar estrutura da planilha
         total_colunas = sheet.max_column
-        logger.debug(f"Total de colunas na planilha: {total_colunas}")
+        logger.debug("Total de colunas na planilha: %s", total_colunas)
 
         # Ler o cabeçalho para extrair informações dos meses dinamicamente
         info_cabecalho = extrair_meses_do_cabecalho(sheet)
         meses_info = info_cabecalho['meses']
-        col_inicio_totais = info_cabecalho['col_inicio_totais']
-        num_meses = info_cabecalho['num_meses']
 
         meses_str = ', '.join([f"{m['mes_nome']} {m['ano']}" for m in meses_info])
-        logger.info(f"Número de meses detectados: {num_meses} ({meses_str})")
+        logger.info("Número de meses detectados: %s (%s)", info_cabecalho['num_meses'], meses_str)
 
-        # Processar itens hierárquicos (LINHA 2 em diante)
-        itens_hierarquicos = []
+        # Ler linhas de conta (LINHA 2 em diante)
+        linhas = []
         linha_atual = 2  # Começa na linha 2 (linha 1 = cabeçalho)
 
         logger.debug("PROCESSANDO ITENS HIERÁRQUICOS")
@@ -758,7 +749,7 @@ def process_bpo_file(file):
 
             # Verifica se linha está completamente vazia (fim da planilha)
             if all(v is None or str(v).strip() == '' for v in row_values):
-                logger.debug(f"Linha {linha_atual}: Vazia - fim dos dados")
+                logger.debug("Linha %s: Vazia - fim dos dados", linha_atual)
                 break
 
             # Processar item se coluna A tem conteúdo
@@ -766,46 +757,23 @@ def process_bpo_file(file):
             if col_a and str(col_a).strip():
                 # IGNORAR linhas de centro de custo (formato: "Plano C.Custo: XXXXX - NOME")
                 if eh_linha_centro_custo(str(col_a)):
-                    logger.debug(f"Linha {linha_atual}: IGNORADA (Centro de Custo) - '{col_a}'")
+                    logger.debug("Linha %s: IGNORADA (Centro de Custo) - '%s'", linha_atual, col_a)
                     linha_atual += 1
                     continue
 
-                item = processar_item_hierarquico(
-                    col_a,
-                    row_values,
-                    meses_info,
-                    col_inicio_totais,
-                    linha_atual
-                )
-                itens_hierarquicos.append(item)
+                linhas.append((col_a, row_values, linha_atual))
 
             linha_atual += 1
 
-        logger.debug(f"Total de itens processados: {len(itens_hierarquicos)}")
-
-        # ========================================================================
-        # CALCULAR TOTAIS (1º CENÁRIO: RESULTADO POR FLUXO DE CAIXA)
-        # ========================================================================
-        logger.debug("CALCULANDO TOTAIS - RESULTADO POR FLUXO DE CAIXA")
+        logger.debug("Total de itens processados: %s", len(linhas))
 
-        totais_calculados = calcular_totais_fluxo_caixa(itens_hierarquicos, meses_info)
-
-        # Montar estrutura final
-        dados_processados = {
-            'itens_hierarquicos': itens_hierarquicos,
-            'totais_calculados': totais_calculados,
-            'metadados': {
-                'total_colunas': total_colunas,
-                'num_meses': num_meses,
-                'meses_info': meses_info,
-                'total_itens': len(itens_hierarquicos)
-            }
+        return {
+            'meses_info': meses_info,
+            'col_inicio_totais': info_cabecalho['col_inicio_totais'],
+            'total_colunas': total_colunas,
+            'linhas': linhas
         }
 
-        logger.info(f"PROCESSAMENTO CONCLUÍDO COM SUCESSO! Itens: {len(itens_hierarquicos)}, Meses: {num_meses}, Colunas: {total_colunas}")
-
-        return dados_processados
-
     except Exception as e:
         logger.error(f"ERRO AO PROCESSAR ARQUIVO BPO: {str(e)}")
         import traceback
@@ -813,6 +781,177 @@ def process_bpo_file(file):
         raise Exception(f"Erro no processamento do BPO: {str(e)}")
 
 
+def _metadados_planilha(planilha):
+    return {
+        'total_colunas': planilha['total_colunas'],
+        'num_meses': len(planilha['meses_info']),
+        'meses_info': planilha['meses_info'],
+        'total_itens': len(planilha['linhas'])
+    }
+
+
+@medir_fase('parse')
+def process_bpo_file(file):
+    """
+    Processa arquivo Excel de BPO Financeiro (NOVA ESTRUTURA) e retorna dados estruturados.
+
+    Estrutura da planilha:
+    - Sheet: "Sheet"
+    - Linha 1: Cabeçalho
+    - Linha 2+: Dados começam
+    - Coluna A: Código hierárquico e nome (ex: "1.01 - RECEITA VENDA SERVIÇO")
+    - Coluna B+: Dados mensais (4 colunas por mês: Orçado, Realizado, % Ating, Diferença)
+    - Últimas 3 colunas: Totais (Orçado Total, Realizado Total, Pendente Total)
+
+    Para gravar mês a mês, prefira process_bpo_file_por_mes.
+
+    Args:
+        file: Arquivo Excel (.xlsx ou .xls)
+
+    Returns:
+        dict: {
+            'itens_hierarquicos': [...],  # Itens com hierarquia
+            'totais_calculados': {},      # Para adicionar depois (quando souber a fórmula)
+            'metadados': {...}            # Info sobre meses, totais, etc
+        }
+    """
+    planilha = _ler_planilha_bpo(file)
+    meses_info = planilha['meses_info']
+
+    itens_hierarquicos = [
+        processar_item_hierarquico(col_a, row_values, meses_info, planilha['col_inicio_totais'], linha)
+        for col_a, row_values, linha in planilha['linhas']
+    ]
+
+    # ========================================================================
+    # CALCULAR TOTAIS (1º CENÁRIO: RESULTADO POR FLUXO DE CAIXA)
+    # ========================================================================
+    logger.debug("CALCULANDO TOTAIS - RESULTADO POR FLUXO DE CAIXA")
+
+    totais_calculados = calcular_totais_fluxo_caixa(itens_hierarquicos, meses_info)
+
+    # Montar estrutura final
+    dados_processados = {
+        'itens_hierarquicos': itens_hierarquicos,
+        'totais_calculados': totais_calculados,
+        'metadados': _metadados_planilha(planilha)
+    }
+
+    logger.info("PROCESSAMENTO CONCLUÍDO COM SUCESSO! Itens: %s, Meses: %s, Colunas: %s",
+                len(itens_hierarquicos), len(meses_info), planilha['total_colunas'])
+
+    return dados_processados
+
+
+def _totais_do_mes(totais_calculados, mes_info):
+    """{cenario: {mes_numero: totais}} do mês, a partir das chaves 'ano_mes'."""
+    chave_mes = f"{mes_info['ano']}_{mes_info['mes_numero']}"  # Ex: "2025_3" para Março 2025
+    totais_mes = {}
+    for cenario_key in ['fluxo_caixa', 'real', 'real_mp']:
+        cenario_data = totais_calculados.get(cenario_key, {})
+        # Pegar apenas dados deste mês usando chave ano_mes
+        totais_mes[cenario_key] = {mes_info['mes_numero']: cenario_data[chave_mes]} if chave_mes in cenario_data else {}
+    return totais_mes
+
+
+def process_bpo_file_por_mes(file):
+    """
+    Lê a planilha BPO na hora da chamada e devolve um iterador que monta os
+    meses um a um, já no formato gravado em TbBpoDados (o mesmo de
+    dividir_por_mes(process_bpo_file(file))).
+
+    A leitura do arquivo (a parte cara) acontece antes de qualquer mês ser
+    pedido, então erros de planilha aparecem aqui e quem grava pode chamar
+    esta função antes de abrir a transação. Cada mês é montado só quando
+    pedido, a partir dos valores brutos das linhas: quem salva e descarta o
+    mês antes de pedir o próximo mantém na memória apenas a planilha lida e
+    um mês por vez.
+
+    Args:
+        file: Arquivo Excel (.xlsx ou .xls)
+
+    Returns:
+        iterator: (ano, mes_numero, dados_mes)
+    """
+    with medir_fase('parse'):
+        planilha = _ler_planilha_bpo(file)
+    return _gerar_meses_bpo(planilha)
+
+
+def _gerar_meses_bpo(planilha):
+    metadados = _metadados_planilha(planilha)
+
+    for mes_info in planilha['meses_info']:
+        itens = [
+            processar_item_hierarquico(col_a, row_values, [mes_info], planilha['col_inicio_totais'], linha)
+            for col_a, row_values, linha in planilha['linhas']
+        ]
+        dados_mes = {
+            'itens_hierarquicos': itens,
+            'totais_calculados': _totais_do_mes(calcular_totais_fluxo_caixa(itens, [mes_info]), mes_info),
+            'metadados': metadados
+        }
+        yield mes_info['ano'], mes_info['mes_numero'], dados_mes
+
+
+def dividir_por_mes(dados_bpo):
+    """
+    Separa os dados processados (vários meses) em um documento por mês, no
+    formato gravado em TbBpoDados: itens só com o dado do mês e
+    totais_calculados como {cenario: {mes_numero: totais}}.
+
+    Os dados mensais de cada item são indexados uma vez; cada mês é montado
+    só quando pedido.
+
+    Args:
+        dados_bpo (dict): resultado de process_bpo_file (ou da ingestão direta)
+
+    Yields:
+        tuple: (mes_info, dados_mes)
+    """
+    totais_calculados = dados_bpo.get('totais_calculados', {})
+    itens = dados_bpo['itens_hierarquicos']
+    por_mes = [{(m['ano'], m['mes_numero']): m for m in item['dados_mensais']} for item in itens]
+
+    for mes_info in dados_bpo['metadados']['meses_info']:
+        chave = (mes_info['ano'], mes_info['mes_numero'])
+
+        # Para cada item hierárquico, pegar só dados do mês atual
+        itens_mes = []
+        for item, mensais in zip(itens, por_mes):
+            item_mes = item.copy()
+            item_mes['dados_mensais'] = [mensais[chave]] if chave in mensais else []
+            itens_mes.append(item_mes)
+
+        yield mes_info, {
+            'itens_hierarquicos': itens_mes,
+            'totais_calculados': _totais_do_mes(totais_calculados, mes_info),
+            'metadados': dados_bpo['metadados']
+        }
+
+
+def hash_mes_bpo(dados_mes):
+    """
+    SHA-256 do conteúdo de um mês (contas e valores), usado pelo upload
+    incremental para detectar meses sem alteração.
+
+    Ficam de fora os metadados, a linha da planilha e os totais do arquivo,
+    que mudam quando outros meses entram na planilha, e o percentual MP
+    manual, que é preservado entre uploads.
+    """
+    conteudo = [
+        [
+            item['codigo'], item['nome'], item['nivel_hierarquia'],
+            [
+                [m['valor_orcado'], m['valor_realizado'], m['perc_atingido'], m['valor_diferenca']]
+                for m in item['dados_mensais']
+            ]
+        ]
+        for item in dados_mes['itens_hierarquicos']
+    ]
+    return hashlib.sha256(json.dumps(conteudo, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
 def validate_bpo_data(dados):
     """
     Valida os dados de BPO processados antes de salvar no banco.
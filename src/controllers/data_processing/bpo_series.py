@@ -0,0 +1,255 @@
+"""
+Comparativos do BPO: Ano contra Ano e Janelas Móveis
+====================================================
+
+Monta, a partir dos meses de TbBpoDados, séries mensais contínuas (uma
+posição por mês, array de floats com NaN nos meses sem dados) para:
+
+- cada cenário de DRE: receita, despesa e geral realizados
+- cada código do plano de contas: valor realizado
+
+e calcula, em uma única passada por série, as somas/médias móveis de 3, 6
+e 12 meses e as variações contra o mesmo mês do ano anterior (inclusive das
+somas móveis, ex.: trimestre contra o mesmo trimestre do ano anterior).
+
+Meses sem dados não entram nas somas nem nas médias; quando a janela
+inteira está vazia o resultado é None.
+
+Autor: WaysSolutionHub
+"""
+
+import math
+from array import array
+from controllers.data_processing.bpo_totais import CENARIOS_DRE, totais_mes_bpo
+
+JANELAS = (3, 6, 12)
+CAMPOS_DRE = ('receita', 'despesa', 'geral')
+
+# Limite do período pedido (meses)
+MAX_MESES_PERIODO = 120
+
+# Meses carregados antes do início do período: 12 para o ano anterior
+# mais 11 para a janela de 12 meses do mês do ano anterior
+MESES_HISTORICO = 12 + max(JANELAS) - 1
+
+_NAN = float('nan')
+
+
+def indice_periodo(ano, mes):
+    """Posição absoluta do mês (meses desde o ano 0)."""
+    return ano * 12 + mes - 1
+
+
+def periodo_do_indice(indice):
+    """(ano, mes) da posição absoluta."""
+    return indice // 12, indice % 12 + 1
+
+
+def _serie_vazia(tamanho):
+    return array('d', [_NAN]) * tamanho
+
+
+def montar_series(meses, inicio, tamanho, codigos=None):
+    """
+    Distribui os meses nas séries em uma passada.
+
+    Args:
+        meses (list): [(ano, mes, dados)] como em buscar_dados_bpo_periodo
+        inicio (int): indice_periodo da primeira posição das séries
+        tamanho (int): quantidade de meses das séries
+        codigos (set): códigos do plano de contas a incluir (None = todos)
+
+    Returns:
+        tuple: (series_dre {(cenario, campo): array},
+                series_contas {codigo: array}, nomes_contas {codigo: nome})
+    """
+    series_dre = {(cenario, campo): _serie_vazia(tamanho) for cenario in CENARIOS_DRE for campo in CAMPOS_DRE}
+    series_contas = {}
+    nomes_contas = {}
+
+    for ano, mes, dados in meses:
+        posicao = indice_periodo(ano, mes) - inicio
+        if not 0 <= posicao < tamanho:
+            continue
+
+        for cenario, valores in totais_mes_bpo(dados, mes).items():
+            if valores['realizado'] is not None:
+                for campo, valor in zip(CAMPOS_DRE, valores['realizado']):
+                    series_dre[(cenario, campo)][posicao] = valor
+
+        for item in dados.get('itens_hierarquicos') or ():
+            codigo = item.get('codigo')
+            if not codigo or (codigos is not None and codigo not in codigos):
+                continue
+            dados_mensais = item.get('dados_mensais') or ()
+            valor = dados_mensais[0].get('valor_realizado') if dados_mensais else None
+            if valor is None:
+                continue
+            serie = series_contas.get(codigo)
+            if serie is None:
+                serie = series_contas[codigo] = _serie_vazia(tamanho)
+                nomes_contas[codigo] = item.get('nome', codigo)
+            serie[posicao] = valor
+
+    return series_dre, series_contas, nomes_contas
+
+
+def _saida(valor):
+    return None if math.isnan(valor) else round(valor, 2)
+
+
+def _variacao(atual, anterior):
+    """(delta, delta %) entre dois valores; None quando algum falta."""
+    if math.isnan(atual) or math.isnan(anterior):
+        return None, None
+    delta = atual - anterior
+    return round(delta, 2), (round(delta / abs(anterior) * 100, 2) if anterior else None)
+
+
+def comparar_serie(valores, primeira):
+    """
+    Calcula as métricas de uma série a partir da posição `primeira`.
+
+    Uma única passada mantém, para cada janela, a soma e a quantidade de
+    meses com dados (entra o mês atual, sai o mês que deixou a janela).
+    As somas móveis ficam em arrays para a comparação com 12 meses antes.
+
+    Returns:
+        dict: listas alinhadas com as posições [primeira, len(valores))
+    """
+    tamanho = len(valores)
+    somas = {janela: _serie_vazia(tamanho) for janela in JANELAS}
+    acumulado = {janela: [0.0, 0] for janela in JANELAS}
+
+    resultado = {'valor': [], 'ano_anterior': [], 'yoy': [], 'yoy_percentual': []}
+    for janela in JANELAS:
+        resultado.update({f'soma_{janela}': [], f'media_{janela}': [],
+                          f'yoy_soma_{janela}': [], f'yoy_soma_{janela}_percentual': []})
+
+    for i in range(tamanho):
+        valor = valores[i]
+        for janela in JANELAS:
+            estado = acumulado[janela]
+            if not math.isnan(valor):
+                estado[0] += valor
+                estado[1] += 1
+            if i >= janela:
+                saindo = valores[i - janela]
+                if not math.isnan(saindo):
+                    estado[0] -= saindo
+                    estado[1] -= 1
+            if estado[1]:
+                somas[janela][i] = estado[0]
+
+        if i < primeira:
+            continue
+
+        anterior = valores[i - 12] if i >= 12 else _NAN
+        delta, percentual = _variacao(valor, anterior)
+        resultado['valor'].append(_saida(valor))
+        resultado['ano_anterior'].append(_saida(anterior))
+        resultado['yoy'].append(delta)
+        resultado['yoy_percentual'].append(percentual)
+
+        for janela in JANELAS:
+            soma = somas[janela][i]
+            quantidade = acumulado[janela][1]
+            delta, percentual = _variacao(soma, somas[janela][i - 12] if i >= 12 else _NAN)
+            resultado[f'soma_{janela}'].append(_saida(soma))
+            resultado[f'media_{janela}'].append(round(soma / quantidade, 2) if quantidade else None)
+            resultado[f'yoy_soma_{janela}'].append(delta)
+            resultado[f'yoy_soma_{janela}_percentual'].append(percentual)
+
+    return resultado
+
+
+def comparativo_bpo(meses, ano_inicio, mes_inicio, ano_fim, mes_fim, codigos=None, historico=None):
+    """
+    Comparativo ano contra ano e janelas móveis do período pedido.
+
+    Args:
+        meses (list): [(ano, mes, dados)] cobrindo o período e os
+            MESES_HISTORICO meses anteriores
+        codigos (set): códigos do plano de contas a incluir (None = todos)
+        historico (HistoricoBPO): arquivo colunar da empresa; quando
+            informado, as séries saem dele e `meses` não é usado
+
+    Returns:
+        dict: {'periodos': ['AAAA-MM', ...],
+               'dre': {cenario: {campo: métricas}},
+               'contas': {codigo: {'nome': ..., 'realizado': métricas}}}
+    """
+    primeiro = indice_periodo(ano_inicio, mes_inicio)
+    ultimo = indice_periodo(ano_fim, mes_fim)
+    inicio = primeiro - MESES_HISTORICO
+    tamanho = max(ultimo - inicio + 1, 0)
+
+    if historico is not None:
+        from controllers.data_processing.bpo_colunar import series_bpo
+        series_dre, series_contas, nomes_contas = series_bpo(historico, inicio, tamanho, codigos)
+    else:
+        series_dre, series_contas, nomes_contas = montar_series(meses, inicio, tamanho, codigos)
+
+    dre = {cenario: {} for cenario in CENARIOS_DRE}
+    for (cenario, campo), serie in series_dre.items():
+        dre[cenario][campo] = comparar_serie(serie, MESES_HISTORICO)
+
+    contas = {
+        codigo: {'nome': nomes_contas[codigo], 'realizado': comparar_serie(serie, MESES_HISTORICO)}
+        for codigo, serie in sorted(series_contas.items())
+    }
+
+    periodos = []
+    for indice in range(primeiro, ultimo + 1):
+        ano, mes = periodo_do_indice(indice)
+        periodos.append(f"{ano:04d}-{mes:02d}")
+
+    return {'periodos': periodos, 'janelas': list(JANELAS), 'dre': dre, 'contas': contas}
+
+
+def ler_parametros_comparativo(args):
+    """
+    Lê período e códigos da query string (ano_inicio, mes_inicio, ano_fim,
+    mes_fim, codigos=2.01,2.08).
+
+    Returns:
+        tuple: (parametros, erro) - erro é uma mensagem quando inválidos
+    """
+    parametros = {
+        'ano_inicio': args.get('ano_inicio', 2025, type=int),
+        'mes_inicio': args.get('mes_inicio', 1, type=int),
+        'ano_fim': args.get('ano_fim', 2025, type=int),
+        'mes_fim': args.get('mes_fim', 12, type=int),
+    }
+    codigos = args.get('codigos')
+    parametros['codigos'] = {c.strip() for c in codigos.split(',') if c.strip()} if codigos else None
+
+    if not (1 <= parametros['mes_inicio'] <= 12 and 1 <= parametros['mes_fim'] <= 12):
+        return parametros, "Mês inválido"
+    meses = (indice_periodo(parametros['ano_fim'], parametros['mes_fim'])
+             - indice_periodo(parametros['ano_inicio'], parametros['mes_inicio']) + 1)
+    if meses < 1:
+        return parametros, "Período inválido: início depois do fim"
+    if meses > MAX_MESES_PERIODO:
+        return parametros, f"Período muito longo (máximo de {MAX_MESES_PERIODO} meses)"
+    return parametros, None
+
+
+def carregar_comparativo_bpo(empresa_id, ano_inicio, mes_inicio, ano_fim, mes_fim, codigos=None):
+    """Busca o período (com o histórico necessário) em uma consulta e monta o comparativo."""
+    from models.company_manager import CompanyManager
+    from controllers.data_processing.bpo_colunar import abrir_historico
+
+    historico = abrir_historico(empresa_id)
+    if historico is not None:
+        return comparativo_bpo(None, ano_inicio, mes_inicio, ano_fim, mes_fim, codigos, historico)
+
+    ano_historico, mes_historico = periodo_do_indice(indice_periodo(ano_inicio, mes_inicio) - MESES_HISTORICO)
+
+    company_manager = CompanyManager()
+    meses = company_manager.buscar_dados_bpo_periodo(
+        empresa_id, ano_historico, mes_historico, ano_fim, mes_fim
+    )
+    company_manager.close()
+
+    return comparativo_bpo(meses, ano_inicio, mes_inicio, ano_fim, mes_fim, codigos)
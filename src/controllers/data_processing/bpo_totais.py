@@ -0,0 +1,226 @@
+"""
+Totais Mensais do BPO por Cenário de DRE
+========================================
+
+Cada mês de TbBpoDados traz em 'totais_calculados' o realizado e o orçado
+(receita, despesa, geral) dos três cenários de DRE. Este módulo concentra a
+leitura desses totais, incluindo o recálculo do Resultado Real com MP
+quando o mês tem percentual de matéria-prima manual.
+
+Os mesmos valores são gravados em TbBpoTotais (uma linha por
+empresa/mês/cenário) para a visão consolidada da carteira, que soma os
+totais de todas as empresas em uma única consulta agrupada.
+
+Autor: WaysSolutionHub
+"""
+
+from utils.logger import get_logger
+
+# Inicializar logger
+logger = get_logger('bpo_totais')
+
+CENARIOS_DRE = ('fluxo_caixa', 'real', 'real_mp')
+
+# Item do plano de contas com o realizado de Matéria Prima
+CODIGO_MATERIA_PRIMA = '2.08'
+
+# Critérios de ordenação da carteira
+ORDENACOES_CARTEIRA = ('margem', 'desvio', 'receita', 'geral', 'nome')
+
+
+def _dados_do_mes(cenario_data, mes):
+    """Dados do mês no cenário (a chave pode ser int ou string no JSON)."""
+    return cenario_data.get(mes, cenario_data.get(str(mes), {}))
+
+
+def _valores(bloco):
+    """(receita, despesa, geral) de um bloco 'realizado'/'orcamento', ou None se inválido."""
+    if not isinstance(bloco, dict):
+        return None
+    return (
+        bloco.get('receita', 0) or 0,
+        bloco.get('despesa', 0) or 0,
+        bloco.get('geral', 0) or 0
+    )
+
+
+def valor_materia_prima(dados):
+    """Realizado do item 2.08 (Matéria Prima) no mês (itens em lista ou dict)."""
+    itens = dados.get('itens_hierarquicos', [])
+    items_to_process = itens if isinstance(itens, list) else itens.items()
+
+    for item in items_to_process:
+        if isinstance(itens, list):
+            codigo = item.get('codigo', '')
+            item_data = item
+        else:
+            codigo, item_data = item
+
+        if codigo == CODIGO_MATERIA_PRIMA:
+            dados_mensais = item_data.get('dados_mensais', [])
+            if dados_mensais:
+                return dados_mensais[0].get('valor_realizado', 0) or 0
+            return 0
+    return 0
+
+
+def despesa_mp(receita, despesa_real, materia_prima, percentual):
+    """Despesa do Resultado Real com MP: Despesa_Real - Matéria_Prima + (Receita × Percentual)."""
+    return despesa_real - materia_prima + ((percentual / 100) * receita)
+
+
+def _base_real_mp(dados, totais_calculados, mes):
+    """(despesa realizada do Resultado Real, Matéria Prima realizada) do mês."""
+    real = _dados_do_mes(totais_calculados.get('real', {}) or {}, mes)
+    despesa_real = ((real or {}).get('realizado', {}) or {}).get('despesa', 0) or 0
+    return despesa_real, valor_materia_prima(dados)
+
+
+def componentes_real_mp(dados, mes):
+    """
+    Parcelas do recálculo do Resultado Real com MP no mês.
+
+    Returns:
+        dict: {'receita', 'despesa_real', 'materia_prima', 'despesa', 'percentual'}
+              (despesa já com o percentual manual, se houver), ou None se o
+              mês não tem o cenário real_mp
+    """
+    totais = totais_mes_bpo(dados, mes).get('real_mp')
+    if not totais or totais['realizado'] is None:
+        return None
+    receita, despesa, _ = totais['realizado']
+    despesa_real, materia_prima = _base_real_mp(dados, dados.get('totais_calculados') or {}, mes)
+    return {
+        'receita': receita,
+        'despesa_real': despesa_real,
+        'materia_prima': materia_prima,
+        'despesa': despesa,
+        'percentual': dados.get('percentual_mp_manual')
+    }
+
+
+def totais_mes_bpo(dados, mes):
+    """
+    Totais de um mês do BPO por cenário de DRE.
+
+    No cenário real_mp com percentual_mp_manual, a despesa é recalculada:
+    Despesa_Real - Matéria_Prima + (Receita × Percentual), e o geral passa a
+    ser Receita - Despesa.
+
+    Args:
+        dados (dict): JSON do mês em TbBpoDados
+        mes (int): número do mês
+
+    Returns:
+        dict: {cenario: {'realizado': (receita, despesa, geral) ou None,
+                         'orcamento': (receita, despesa, geral) ou None}},
+              apenas para os cenários presentes no mês
+    """
+    totais_calculados = dados.get('totais_calculados') or {}
+    resultado = {}
+
+    for cenario_key in CENARIOS_DRE:
+        cenario_data = totais_calculados.get(cenario_key, {})
+        if not cenario_data or not isinstance(cenario_data, dict):
+            continue
+
+        mes_dados = _dados_do_mes(cenario_data, mes)
+        if not mes_dados or not isinstance(mes_dados, dict):
+            continue
+
+        realizado = _valores(mes_dados.get('realizado', {}))
+
+        # RECALCULAR DESPESA DO REAL_MP SE EXISTIR PERCENTUAL MANUAL
+        percentual_mp_manual = dados.get('percentual_mp_manual')
+        if cenario_key == 'real_mp' and realizado is not None and percentual_mp_manual is not None:
+            receita = realizado[0]
+            despesa_real, materia_prima = _base_real_mp(dados, totais_calculados, mes)
+            despesa = despesa_mp(receita, despesa_real, materia_prima, percentual_mp_manual)
+
+            logger.debug(
+                "REAL_MP mês %s: Despesa Real: R$ %.2f, Matéria Prima (2.08): R$ %.2f, "
+                "Percentual %s%% × Receita R$ %.2f → Despesa final: R$ %.2f",
+                mes, despesa_real, materia_prima, percentual_mp_manual, receita, despesa
+            )
+            realizado = (receita, despesa, receita - despesa)
+
+        resultado[cenario_key] = {
+            'realizado': realizado,
+            'orcamento': _valores(mes_dados.get('orcamento', {}))
+        }
+
+    return resultado
+
+
+# ============================================================================
+# CARTEIRA (VISÃO CONSOLIDADA)
+# ============================================================================
+
+def _percentual(parte, total):
+    return round(parte / total * 100, 2) if total else None
+
+
+def montar_carteira(linhas, tipo_dre='fluxo_caixa', ordenar='margem', decrescente=True):
+    """
+    Organiza o resultado de CompanyManager.consolidar_totais_bpo por empresa.
+
+    A margem (geral/receita realizados) e o desvio (geral realizado - orçado)
+    são calculados para o cenário tipo_dre, que também define a ordenação.
+
+    Returns:
+        dict: {'empresas': [...], 'totais': {cenario: {...}}}
+    """
+    por_empresa = {}
+    totais = {cenario: {'realizado': [0.0, 0.0, 0.0], 'orcado': [0.0, 0.0, 0.0]} for cenario in CENARIOS_DRE}
+
+    for empresa_id, nome, cnpj, cenario, meses, r_rec, r_desp, r_ger, o_rec, o_desp, o_ger in linhas:
+        if cenario not in totais:
+            continue
+        empresa = por_empresa.get(empresa_id)
+        if empresa is None:
+            empresa = por_empresa[empresa_id] = {
+                'id': empresa_id, 'nome': nome, 'cnpj': cnpj, 'meses': 0, 'cenarios': {}
+            }
+        realizado = (float(r_rec or 0), float(r_desp or 0), float(r_ger or 0))
+        orcado = (float(o_rec or 0), float(o_desp or 0), float(o_ger or 0))
+        empresa['meses'] = max(empresa['meses'], int(meses or 0))
+        empresa['cenarios'][cenario] = {
+            'realizado': dict(zip(('receita', 'despesa', 'geral'), realizado)),
+            'orcado': dict(zip(('receita', 'despesa', 'geral'), orcado))
+        }
+        for i in range(3):
+            totais[cenario]['realizado'][i] += realizado[i]
+            totais[cenario]['orcado'][i] += orcado[i]
+
+    vazio = {'receita': 0.0, 'despesa': 0.0, 'geral': 0.0}
+    empresas = list(por_empresa.values())
+    for empresa in empresas:
+        selecionado = empresa['cenarios'].get(tipo_dre, {'realizado': vazio, 'orcado': vazio})
+        realizado, orcado = selecionado['realizado'], selecionado['orcado']
+        empresa['receita'] = realizado['receita']
+        empresa['geral'] = realizado['geral']
+        empresa['margem'] = _percentual(realizado['geral'], realizado['receita'])
+        empresa['desvio'] = realizado['geral'] - orcado['geral']
+        empresa['desvio_percentual'] = _percentual(empresa['desvio'], abs(orcado['geral']))
+
+    if ordenar == 'nome':
+        empresas.sort(key=lambda e: (e['nome'] or '').lower(), reverse=decrescente)
+    else:
+        # Empresas sem valor (ex.: margem sem receita) ficam sempre no fim
+        com_valor = [e for e in empresas if e[ordenar] is not None]
+        sem_valor = [e for e in empresas if e[ordenar] is None]
+        com_valor.sort(key=lambda e: e[ordenar], reverse=decrescente)
+        empresas = com_valor + sem_valor
+
+    totais_formatados = {}
+    for cenario, valores in totais.items():
+        realizado = dict(zip(('receita', 'despesa', 'geral'), valores['realizado']))
+        orcado = dict(zip(('receita', 'despesa', 'geral'), valores['orcado']))
+        totais_formatados[cenario] = {
+            'realizado': realizado,
+            'orcado': orcado,
+            'margem': _percentual(realizado['geral'], realizado['receita']),
+            'desvio': realizado['geral'] - orcado['geral']
+        }
+
+    return {'empresas': empresas, 'totais': totais_formatados}
@@ -1,5 +1,7 @@
 from openpyxl import load_workbook
+from utils.metrics import medir_fase
 
+@medir_fase('parse')
 def process_uploaded_file(file):
     print("\n\nINICIANDO ANÁLISE DO ARQUIVO UPLOAD... \n\n")
 
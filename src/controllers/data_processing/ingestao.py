@@ -0,0 +1,430 @@
+"""
+Ingestão Direta (CSV / JSON Lines)
+==================================
+
+Carrega BPO e viabilidade sem passar por planilha Excel: o arquivo é lido
+linha a linha, montado na mesma estrutura de process_bpo_file /
+salvar_itens_empresa, validado com validate_bpo_data e gravado em lote
+(executemany, uma transação por empresa).
+
+Formatos: CSV (UTF-8, cabeçalho na primeira linha, ponto decimal) ou JSON
+Lines (um objeto por linha). Colunas desconhecidas são ignoradas, então os
+arquivos de `flask exportar` podem ser reenviados como estão.
+
+Esquema 'bpo' (uma linha por conta por mês):
+    empresa_id        int    obrigatório se a empresa não for informada à parte
+    ano, mes          int    obrigatórios (mes de 1 a 12)
+    codigo            str    código hierárquico ("1.01.06"), pode ser vazio
+    nome              str    obrigatório
+    nivel_hierarquia  int    padrão: pontos do código + 1
+    valor_orcado, valor_realizado, perc_atingido, valor_diferenca   float
+    percentual_mp_manual  float  (se ausente, o percentual já gravado é mantido)
+
+Esquema 'viabilidade' (uma linha por item; substitui o ano inteiro da empresa):
+    empresa_id        int    como no BPO
+    ano               int    obrigatório
+    tabela            str    TbItens, TbItensInvestimentos, TbItensDividas,
+                             TbItensInvestimentoGeral ou TbItensGastosOperacionais
+    grupo, subgrupo   str    nomes de TbGrupo / TbSubGrupo
+    descricao         str    obrigatório
+    porcentagem, valor, valor_parc, valor_juros, valor_total_parc,
+    valor_custo_km, valor_mensal    float (apenas as colunas da tabela)
+
+Qualquer erro de validação cancela a ingestão inteira antes de gravar.
+
+Uso:
+    POST /admin/api/ingestao/<conjunto>   (arquivo, empresa_id, formato)
+    flask --app app ingerir bpo dados.csv --empresa 1
+
+Autor: WaysSolutionHub
+"""
+
+import io
+import csv
+import json
+import time
+import click
+from models.auth import TABELAS_VIABILIDADE
+from controllers.data_processing.bpo_file_processing import (
+    calcular_totais_fluxo_caixa, dividir_por_mes, validate_bpo_data
+)
+from utils.logger import get_logger
+from utils.metrics import medir_fase
+
+# Inicializar logger
+logger = get_logger('ingestao')
+
+FORMATOS = ('csv', 'jsonl')
+EXTENSOES = {'.csv': 'csv', '.jsonl': 'jsonl', '.ndjson': 'jsonl', '.json': 'jsonl'}
+CONJUNTOS = ('bpo', 'viabilidade')
+
+# Erros listados na mensagem (o restante só é contado)
+MAX_ERROS = 20
+
+MESES_NOMES = [
+    'Janeiro', 'Fevereiro', 'Março', 'Abril', 'Maio', 'Junho',
+    'Julho', 'Agosto', 'Setembro', 'Outubro', 'Novembro', 'Dezembro'
+]
+
+COLUNAS_VALOR_BPO = ('valor_orcado', 'valor_realizado', 'perc_atingido', 'valor_diferenca')
+
+
+class IngestaoInvalida(ValueError):
+    """Arquivo com linhas inválidas; `erros` traz as mensagens por linha."""
+
+    def __init__(self, erros):
+        self.erros = erros
+        mensagem = '; '.join(erros[:MAX_ERROS])
+        if len(erros) > MAX_ERROS:
+            mensagem += f" (+{len(erros) - MAX_ERROS} erros)"
+        super().__init__(mensagem)
+
+
+# ============================================================================
+# LEITURA
+# ============================================================================
+
+def formato_do_arquivo(nome):
+    """Formato pela extensão do arquivo (None se não reconhecida)."""
+    if not nome or '.' not in nome:
+        return None
+    return EXTENSOES.get('.' + nome.rsplit('.', 1)[1].lower())
+
+
+def ler_registros(arquivo, formato):
+    """
+    Gera (número da linha, dict) do arquivo binário.
+
+    Raises:
+        IngestaoInvalida: linha JSON malformada
+    """
+    texto = io.TextIOWrapper(arquivo, encoding='utf-8-sig', newline='')
+    try:
+        if formato == 'csv':
+            leitor = csv.DictReader(texto)
+            for registro in leitor:
+                yield leitor.line_num, registro
+        else:
+            for numero, linha in enumerate(texto, start=1):
+                if not linha.strip():
+                    continue
+                try:
+                    registro = json.loads(linha)
+                except ValueError as e:
+                    raise IngestaoInvalida([f"Linha {numero}: JSON inválido ({e})"])
+                if not isinstance(registro, dict):
+                    raise IngestaoInvalida([f"Linha {numero}: esperado um objeto JSON"])
+                yield numero, registro
+    finally:
+        texto.detach()
+
+
+def _vazio(valor):
+    return valor is None or (isinstance(valor, str) and not valor.strip())
+
+
+def _texto(registro, campo, obrigatorio=True):
+    valor = registro.get(campo)
+    if _vazio(valor):
+        if obrigatorio:
+            raise ValueError(f"campo '{campo}' obrigatório")
+        return ''
+    return str(valor).strip()
+
+
+def _inteiro(registro, campo, padrao=None):
+    valor = registro.get(campo)
+    if _vazio(valor):
+        if padrao is None:
+            raise ValueError(f"campo '{campo}' obrigatório")
+        return padrao
+    try:
+        numero = float(valor)
+    except (TypeError, ValueError):
+        raise ValueError(f"campo '{campo}' inválido: '{valor}'")
+    if not numero.is_integer():
+        raise ValueError(f"campo '{campo}' inválido: '{valor}'")
+    return int(numero)
+
+
+def _decimal(registro, campo):
+    valor = registro.get(campo)
+    if _vazio(valor):
+        return None
+    try:
+        return float(valor)
+    except (TypeError, ValueError):
+        raise ValueError(f"campo '{campo}' inválido: '{valor}'")
+
+
+def _empresa(registro, empresa_id):
+    if empresa_id is not None:
+        return empresa_id
+    return _inteiro(registro, 'empresa_id')
+
+
+# ============================================================================
+# BPO
+# ============================================================================
+
+def _montar_bpo(registros, empresa_id=None):
+    """
+    Agrupa as linhas por empresa no formato de process_bpo_file.
+
+    Returns:
+        tuple: (linhas lidas, {empresa_id: (dados_bpo, {(ano, mes): percentual})})
+    """
+    empresas = {}
+    erros = []
+    total = 0
+
+    for numero, registro in registros:
+        total += 1
+        try:
+            empresa = _empresa(registro, empresa_id)
+            ano = _inteiro(registro, 'ano')
+            mes = _inteiro(registro, 'mes')
+            if not 1 <= mes <= 12:
+                raise ValueError(f"mês inválido: {mes}")
+            codigo = _texto(registro, 'codigo', obrigatorio=False)
+            nome = _texto(registro, 'nome')
+            nivel = _inteiro(registro, 'nivel_hierarquia', codigo.count('.') + 1 if codigo else 0)
+            valores = {campo: _decimal(registro, campo) for campo in COLUNAS_VALOR_BPO}
+            percentual = _decimal(registro, 'percentual_mp_manual')
+        except ValueError as e:
+            erros.append(f"Linha {numero}: {e}")
+            continue
+
+        itens, meses, percentuais = empresas.setdefault(empresa, ({}, {}, {}))
+        meses[(ano, mes)] = True
+        if percentual is not None:
+            percentuais[(ano, mes)] = percentual
+
+        item = itens.get((codigo, nome))
+        if item is None:
+            item = itens[(codigo, nome)] = {
+                'codigo': codigo,
+                'nome': nome,
+                'nivel_hierarquia': nivel,
+                'linha': len(itens) + 1,
+                'dados_mensais': {}
+            }
+        if (ano, mes) in item['dados_mensais']:
+            erros.append(f"Linha {numero}: conta '{codigo} - {nome}' repetida em {mes}/{ano}")
+            continue
+        item['dados_mensais'][(ano, mes)] = valores
+
+    if erros:
+        raise IngestaoInvalida(erros)
+
+    resultado = {}
+    for empresa, (itens, meses, percentuais) in empresas.items():
+        meses_info = [
+            {'mes_nome': MESES_NOMES[mes - 1], 'mes_numero': mes, 'ano': ano}
+            for ano, mes in sorted(meses)
+        ]
+
+        itens_hierarquicos = []
+        for item in itens.values():
+            dados_mensais = []
+            for mes_info in meses_info:
+                valores = item['dados_mensais'].get((mes_info['ano'], mes_info['mes_numero']))
+                dados_mensais.append(dict(mes_info, **(valores or dict.fromkeys(COLUNAS_VALOR_BPO))))
+            orcado_total = sum(m['valor_orcado'] or 0 for m in dados_mensais)
+            realizado_total = sum(m['valor_realizado'] or 0 for m in dados_mensais)
+            itens_hierarquicos.append(dict(
+                item,
+                dados_mensais=dados_mensais,
+                resultados_totais={
+                    'valor_orcado_total': orcado_total,
+                    'valor_realizado_total': realizado_total,
+                    'valor_pendente_total': orcado_total - realizado_total
+                }
+            ))
+
+        dados_bpo = {
+            'itens_hierarquicos': itens_hierarquicos,
+            'totais_calculados': calcular_totais_fluxo_caixa(itens_hierarquicos, meses_info),
+            'metadados': {
+                'origem': 'ingestao',
+                'num_meses': len(meses_info),
+                'meses_info': meses_info,
+                'total_itens': len(itens_hierarquicos)
+            }
+        }
+        valido, mensagem = validate_bpo_data(dados_bpo)
+        if not valido:
+            raise IngestaoInvalida([f"Empresa {empresa}: {mensagem}"])
+        resultado[empresa] = (dados_bpo, percentuais)
+
+    return total, resultado
+
+
+def _gravar_bpo(company_manager, empresas):
+    meses_gravados = 0
+    for empresa_id, (dados_bpo, percentuais) in sorted(empresas.items()):
+        meses = []
+        for mes_info, dados_mes in dividir_por_mes(dados_bpo):
+            chave = (mes_info['ano'], mes_info['mes_numero'])
+            if chave in percentuais:
+                dados_mes['percentual_mp_manual'] = percentuais[chave]
+            meses.append(chave + (dados_mes,))
+
+        if not company_manager.salvar_dados_bpo_lote(empresa_id, meses):
+            raise RuntimeError(f"Falha ao gravar o BPO da empresa {empresa_id} (veja o log)")
+        meses_gravados += len(meses)
+    return meses_gravados
+
+
+# ============================================================================
+# VIABILIDADE
+# ============================================================================
+
+def _montar_viabilidade(registros, referencia, empresa_id=None):
+    """
+    Agrupa as linhas por (empresa, ano).
+
+    Returns:
+        tuple: (linhas lidas, {(empresa_id, ano): [itens]})
+    """
+    from models.company_manager import COLUNAS_VIABILIDADE
+
+    subgrupos = set(referencia['por_id'].values())
+    grupos = {}
+    erros = []
+    total = 0
+
+    for numero, registro in registros:
+        total += 1
+        try:
+            empresa = _empresa(registro, empresa_id)
+            ano = _inteiro(registro, 'ano')
+            tabela = _texto(registro, 'tabela')
+            if tabela not in TABELAS_VIABILIDADE:
+                raise ValueError(f"tabela inválida: '{tabela}' (opções: {', '.join(TABELAS_VIABILIDADE)})")
+            grupo = _texto(registro, 'grupo')
+            subgrupo = _texto(registro, 'subgrupo')
+            if (grupo, subgrupo) not in subgrupos:
+                raise ValueError(f"subgrupo '{subgrupo}' não encontrado no grupo '{grupo}'")
+            item = {
+                'tabela': tabela,
+                'grupo': grupo,
+                'subgrupo': subgrupo,
+                'descricao': _texto(registro, 'descricao')
+            }
+            for coluna in COLUNAS_VIABILIDADE[tabela]:
+                item[coluna] = _decimal(registro, coluna)
+        except ValueError as e:
+            erros.append(f"Linha {numero}: {e}")
+            continue
+
+        # Mesmo padrão do upload por planilha (valor obrigatório em TbItens)
+        if tabela == 'TbItens' and item['valor'] is None:
+            item['valor'] = 0.0
+        grupos.setdefault((empresa, ano), []).append(item)
+
+    if erros:
+        raise IngestaoInvalida(erros)
+    return total, grupos
+
+
+def _gravar_viabilidade(company_manager, grupos):
+    for (empresa_id, ano), itens in sorted(grupos.items()):
+        if not company_manager.salvar_itens_lote(empresa_id, ano, itens):
+            raise RuntimeError(f"Falha ao gravar a viabilidade da empresa {empresa_id} em {ano} (veja o log)")
+    return len(grupos)
+
+
+# ============================================================================
+# INGESTÃO
+# ============================================================================
+
+@medir_fase('ingest')
+def ingerir(conjunto, arquivo, formato, empresa_id=None):
+    """
+    Valida e grava o arquivo CSV/JSONL do conjunto.
+
+    Args:
+        conjunto (str): 'bpo' ou 'viabilidade'
+        arquivo: arquivo binário (aberto) com os dados
+        formato (str): 'csv' ou 'jsonl'
+        empresa_id (int): empresa de todas as linhas (None = coluna empresa_id)
+
+    Returns:
+        dict: linhas, empresas, periodos gravados, segundos e linhas_por_segundo
+
+    Raises:
+        IngestaoInvalida: linhas inválidas (nada é gravado)
+        ValueError: conjunto ou formato desconhecido
+        RuntimeError: falha do banco ao gravar
+    """
+    from models.company_manager import CompanyManager
+
+    if conjunto not in CONJUNTOS:
+        raise ValueError(f"Conjunto inválido: '{conjunto}' (opções: {', '.join(CONJUNTOS)})")
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato inválido: '{formato}' (opções: {', '.join(FORMATOS)})")
+
+    inicio = time.perf_counter()
+    registros = ler_registros(arquivo, formato)
+    company_manager = CompanyManager()
+    try:
+        if conjunto == 'bpo':
+            linhas, empresas = _montar_bpo(registros, empresa_id)
+            periodos = _gravar_bpo(company_manager, empresas)
+            ids = set(empresas)
+        else:
+            linhas, grupos = _montar_viabilidade(registros, company_manager.referencia_subgrupos(), empresa_id)
+            periodos = _gravar_viabilidade(company_manager, grupos)
+            ids = {empresa for empresa, _ in grupos}
+    finally:
+        company_manager.close()
+
+    segundos = time.perf_counter() - inicio
+    resultado = {
+        'conjunto': conjunto,
+        'linhas': linhas,
+        'empresas': len(ids),
+        'periodos': periodos,
+        'segundos': round(segundos, 3),
+        'linhas_por_segundo': round(linhas / segundos, 1) if segundos > 0 else None
+    }
+    logger.info(
+        "Ingestão %s concluída: %d linhas, %d empresas, %d períodos em %.3fs (%s linhas/s)",
+        conjunto, linhas, len(ids), periodos, segundos, resultado['linhas_por_segundo']
+    )
+    return resultado
+
+
+# ============================================================================
+# CLI
+# ============================================================================
+
+@click.command('ingerir')
+@click.argument('conjunto', type=click.Choice(CONJUNTOS))
+@click.argument('arquivo', type=click.File('rb'))
+@click.option('--empresa', type=int, default=None,
+              help='ID da empresa de todas as linhas (padrão: coluna empresa_id)')
+@click.option('--formato', type=click.Choice(FORMATOS), default=None,
+              help='Formato do arquivo (padrão: pela extensão)')
+def comando_ingerir(conjunto, arquivo, empresa, formato):
+    """Carrega BPO ou viabilidade de um CSV/JSONL, sem planilha Excel."""
+    formato = formato or formato_do_arquivo(arquivo.name)
+    if formato is None:
+        raise click.ClickException("Formato não reconhecido pela extensão; use --formato csv|jsonl")
+
+    try:
+        resultado = ingerir(conjunto, arquivo, formato, empresa)
+    except (ValueError, RuntimeError) as e:
+        raise click.ClickException(str(e))
+
+    click.echo(
+        f"{resultado['linhas']} linhas ingeridas ({conjunto}): {resultado['empresas']} empresas, "
+        f"{resultado['periodos']} períodos em {resultado['segundos']}s "
+        f"({resultado['linhas_por_segundo']} linhas/s)"
+    )
+
+
+def init_app(app):
+    """Registra o comando `flask ingerir` no app Flask."""
+    app.cli.add_command(comando_ingerir)
@@ -0,0 +1,165 @@
+"""
+Simulação do Percentual de Matéria-Prima (Resultado Real com MP)
+================================================================
+
+Avalia, sem gravar nada, o efeito de outros percentuais de MP sobre a
+despesa e o geral do cenário real_mp. Por mês:
+
+    despesa(p) = (Despesa_Real - Matéria_Prima) + Receita × p / 100
+    geral(p)   = Receita - despesa(p)
+
+As parcelas de cada mês são extraídas uma vez; a varredura de todos os
+percentuais é uma única operação sobre a matriz percentuais × meses (com
+numpy quando instalado, senão em Python puro).
+
+Autor: WaysSolutionHub
+"""
+
+from controllers.data_processing.bpo_totais import componentes_real_mp
+
+try:
+    import numpy as np
+except ImportError:  # numpy é opcional
+    np = None
+
+# Limite de percentuais avaliados por requisição
+MAX_PERCENTUAIS = 201
+
+
+def _arredondar(valores):
+    return [round(v, 2) for v in valores]
+
+
+def extrair_parcelas(meses):
+    """
+    Parcelas de cada mês com o cenário real_mp.
+
+    Args:
+        meses (list): [(ano, mes, dados)] em ordem cronológica
+
+    Returns:
+        dict: listas alinhadas 'periodos', 'receita', 'base' (Despesa_Real -
+              Matéria_Prima), 'despesa_atual' e 'percentual_atual'
+    """
+    parcelas = {'periodos': [], 'receita': [], 'base': [], 'despesa_atual': [], 'percentual_atual': []}
+    for ano, mes, dados in meses:
+        componentes = componentes_real_mp(dados, mes)
+        if componentes is None:
+            continue
+        parcelas['periodos'].append(f"{ano:04d}-{mes:02d}")
+        parcelas['receita'].append(float(componentes['receita']))
+        parcelas['base'].append(float(componentes['despesa_real'] - componentes['materia_prima']))
+        parcelas['despesa_atual'].append(float(componentes['despesa']))
+        parcelas['percentual_atual'].append(componentes['percentual'])
+    return parcelas
+
+
+def _varrer(receita, base, percentuais):
+    """Matrizes despesa/geral (percentuais × meses) em uma avaliação."""
+    if np is not None:
+        receita_np = np.asarray(receita, dtype=float)
+        despesa = np.asarray(base, dtype=float) + np.outer(np.asarray(percentuais, dtype=float) / 100, receita_np)
+        geral = receita_np - despesa
+        return np.round(despesa, 2).tolist(), np.round(geral, 2).tolist()
+
+    despesa = [[b + r * p / 100 for b, r in zip(base, receita)] for p in percentuais]
+    geral = [[r - d for r, d in zip(receita, linha)] for linha in despesa]
+    return [_arredondar(linha) for linha in despesa], [_arredondar(linha) for linha in geral]
+
+
+def simular_percentuais_mp(meses, percentuais, ajustes=None):
+    """
+    Curvas de despesa/geral do real_mp para cada percentual.
+
+    Args:
+        meses (list): [(ano, mes, dados)] do período
+        percentuais (list): percentuais aplicados a todos os meses
+        ajustes (dict): {'AAAA-MM': percentual} - curva 'personalizada' com
+            percentuais por mês (meses sem ajuste mantêm o valor atual)
+
+    Returns:
+        dict: {'periodos', 'receita', 'atual', 'curvas', 'personalizada'}
+    """
+    parcelas = extrair_parcelas(meses)
+    receita, base = parcelas['receita'], parcelas['base']
+
+    despesas, gerais = _varrer(receita, base, percentuais) if percentuais else ([], [])
+    curvas = [
+        {
+            'percentual': percentual,
+            'despesa': despesa,
+            'geral': geral,
+            'total_despesa': round(sum(despesa), 2),
+            'total_geral': round(sum(geral), 2)
+        }
+        for percentual, despesa, geral in zip(percentuais, despesas, gerais)
+    ]
+
+    atual_geral = [r - d for r, d in zip(receita, parcelas['despesa_atual'])]
+    resultado = {
+        'periodos': parcelas['periodos'],
+        'receita': _arredondar(receita),
+        'atual': {
+            'percentual': parcelas['percentual_atual'],
+            'despesa': _arredondar(parcelas['despesa_atual']),
+            'geral': _arredondar(atual_geral),
+            'total_despesa': round(sum(parcelas['despesa_atual']), 2),
+            'total_geral': round(sum(atual_geral), 2)
+        },
+        'curvas': curvas,
+        'personalizada': None
+    }
+
+    if ajustes:
+        despesa = [
+            b + r * ajustes[periodo] / 100 if periodo in ajustes else atual
+            for periodo, r, b, atual in zip(parcelas['periodos'], receita, base, parcelas['despesa_atual'])
+        ]
+        geral = [r - d for r, d in zip(receita, despesa)]
+        resultado['personalizada'] = {
+            'percentual': [ajustes.get(periodo, atual) for periodo, atual in zip(parcelas['periodos'], parcelas['percentual_atual'])],
+            'despesa': _arredondar(despesa),
+            'geral': _arredondar(geral),
+            'total_despesa': round(sum(despesa), 2),
+            'total_geral': round(sum(geral), 2)
+        }
+
+    return resultado
+
+
+def ler_percentuais(valor):
+    """
+    Percentuais da requisição: lista de números ou faixa
+    {'inicio': 0, 'fim': 40, 'passo': 0.5}.
+
+    Raises:
+        ValueError: valores inválidos ou mais que MAX_PERCENTUAIS
+    """
+    if not valor:
+        return []
+    if isinstance(valor, dict):
+        inicio = float(valor.get('inicio', 0))
+        fim = float(valor.get('fim', inicio))
+        passo = float(valor.get('passo', 1))
+        if passo <= 0 or fim < inicio:
+            raise ValueError("Faixa de percentuais inválida")
+        quantidade = int(round((fim - inicio) / passo)) + 1
+        if quantidade > MAX_PERCENTUAIS:
+            raise ValueError(f"Máximo de {MAX_PERCENTUAIS} percentuais por simulação")
+        return [round(inicio + i * passo, 4) for i in range(quantidade)]
+
+    percentuais = [float(p) for p in valor]
+    if len(percentuais) > MAX_PERCENTUAIS:
+        raise ValueError(f"Máximo de {MAX_PERCENTUAIS} percentuais por simulação")
+    return percentuais
+
+
+def ler_ajustes(meses_percentuais):
+    """Ajustes por mês no mesmo formato de salvar_percentual_mp: [{ano, mes, percentual}]."""
+    ajustes = {}
+    for item in meses_percentuais or ():
+        ano, mes, percentual = item.get('ano'), item.get('mes'), item.get('percentual')
+        if ano is None or mes is None or percentual is None:
+            raise ValueError(f"Dados incompletos para mês {mes}/{ano}")
+        ajustes[f"{int(ano):04d}-{int(mes):02d}"] = float(percentual)
+    return ajustes
@@ -0,0 +1,132 @@
+"""
+Dados de Viabilidade Organizados (snapshot)
+===========================================
+
+Os dados de viabilidade de uma empresa/ano só mudam quando uma planilha é
+enviada (salvar_itens_empresa) ou os dados do ano são excluídos
+(excluir_dados_empresa). Nesses dois momentos a estrutura
+{grupo: {subgrupo: [itens]}} usada pelos dashboards é montada uma vez e
+gravada serializada em TbViabilidadeSnapshot, junto com uma versão.
+
+As APIs de dados (admin e usuário) apenas devolvem o JSON gravado, com
+ETag derivado da versão: o navegador revalida e recebe 304 enquanto os
+dados não mudarem.
+
+Autor: WaysSolutionHub
+"""
+
+import json
+from flask import request, current_app
+from utils.logger import get_logger
+
+# Inicializar logger
+logger = get_logger('viabilidade_snapshot')
+
+# Os itens de gastos operacionais ganham um subgrupo próprio para não se
+# misturarem com o subgrupo "GastosOperacionais" de TbItens
+SUBGRUPO_GASTOS_VEICULOS = 'Gastos Operacionais Veículos'
+
+
+def _numero(item, indice):
+    """Valor numérico da coluna (0 quando ausente ou vazio)."""
+    return float(item[indice]) if len(item) > indice and item[indice] else 0
+
+
+def organizar_dados_viabilidade(data_results):
+    """
+    Organiza o resultado de CompanyManager.buscar_dados_empresa por SUBGRUPO
+    dentro de cada grupo de viabilidade.
+
+    Returns:
+        dict: {grupo: {subgrupo: [itens]}}, com os valores já convertidos para float
+    """
+    dados_organizados = {}
+    if not data_results:
+        return dados_organizados
+
+    def adicionar(grupo, subgrupo, item):
+        dados_organizados.setdefault(grupo, {}).setdefault(subgrupo, []).append(item)
+
+    # Processar TbItens
+    for item in data_results.get('TbItens') or ():
+        adicionar(item[0], item[1], {
+            "descricao": item[2],
+            "percentual": _numero(item, 3),
+            "valor": _numero(item, 4)
+        })
+
+    # Processar Investimentos e Dívidas (TODOS OS CAMPOS)
+    for tabela in ('TbItensInvestimentos', 'TbItensDividas'):
+        for item in data_results.get(tabela) or ():
+            adicionar(item[0], item[1], {
+                "descricao": item[2],
+                "parcela": _numero(item, 3),
+                "juros": _numero(item, 4),
+                "valor": _numero(item, 5),
+                "percentual": 0
+            })
+
+    # Processar Investimento Geral
+    for item in data_results.get('TbItensInvestimentoGeral') or ():
+        adicionar(item[0], item[1], {
+            "descricao": item[2],
+            "valor": _numero(item, 3),
+            "percentual": 0
+        })
+
+    # Processar Gastos Operacionais (COM NOME DIFERENCIADO)
+    for item in data_results.get('TbItensGastosOperacionais') or ():
+        adicionar(item[0], SUBGRUPO_GASTOS_VEICULOS, {
+            "descricao": item[2],
+            "custo_km": _numero(item, 3),
+            "valor": _numero(item, 4),
+            "percentual": 0
+        })
+
+    return dados_organizados
+
+
+def serializar_dados_viabilidade(dados_organizados):
+    """JSON gravado no snapshot (o mesmo texto é enviado pelas APIs)."""
+    return json.dumps(dados_organizados, ensure_ascii=False, separators=(',', ':'))
+
+
+def resposta_dados_viabilidade(empresa_id, ano):
+    """
+    Resposta das APIs de dados de viabilidade a partir do snapshot.
+
+    O corpo é montado sem desserializar o JSON gravado. Com If-None-Match
+    igual à versão atual a resposta é 304 sem corpo. Sem snapshot, os dados
+    são organizados em memória, sem gravar nada (a leitura não cria linhas).
+    """
+    from models.company_manager import CompanyManager
+
+    company_manager = CompanyManager()
+    try:
+        snapshot = company_manager.buscar_snapshot_viabilidade(empresa_id, ano)
+        data_results = None if snapshot else company_manager.buscar_dados_empresa(empresa_id, ano)
+    finally:
+        company_manager.close()
+
+    if snapshot is None:
+        if data_results is None:
+            return current_app.response_class(
+                '{"error":"Erro ao carregar dados"}', status=500, mimetype='application/json'
+            )
+        dados_json = serializar_dados_viabilidade(organizar_dados_viabilidade(data_results))
+        response = current_app.response_class(
+            f'{{"ano":{int(ano)},"dados":{dados_json}}}', mimetype='application/json'
+        )
+        response.headers['Cache-Control'] = 'private, no-cache'
+        logger.debug("Viabilidade sem snapshot montada em memória: empresa_id=%s, ano=%s", empresa_id, ano)
+        return response
+
+    versao, dados_json = snapshot
+    response = current_app.response_class(
+        f'{{"ano":{int(ano)},"dados":{dados_json}}}', mimetype='application/json'
+    )
+    response.set_etag(f"viab-{empresa_id}-{ano}-{versao}")
+    # Sempre revalidar: a versão muda a cada upload/exclusão
+    response.headers['Cache-Control'] = 'private, no-cache'
+    logger.debug("Snapshot de viabilidade empresa_id=%s, ano=%s, versão %s", empresa_id, ano, versao)
+    return response.make_conditional(request)
@@ -0,0 +1,476 @@
+"""
+Relatórios Excel (BPO e Viabilidade)
+====================================
+
+Monta as planilhas com gráficos exportadas pelos dashboards (admin e usuário).
+
+O layout de cada relatório é descrito uma única vez (células, estilos e
+gráficos) e pode ser gravado de duas formas:
+- Streaming (padrão): workbook write-only, linhas gravadas em ordem e o zip
+  enviado em blocos para a resposta HTTP enquanto ainda está sendo produzido
+- Em memória: Workbook tradicional salvo em BytesIO (EXCEL_STREAMING=0)
+
+Os estilos são NamedStyles registrados uma vez por workbook, em vez de
+objetos Font/PatternFill criados célula a célula.
+
+Autor: WaysSolutionHub
+"""
+
+import os
+import queue
+import threading
+from io import BytesIO
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.chart import BarChart, LineChart, PieChart, Reference
+from openpyxl.styles import NamedStyle, Font, PatternFill, Alignment
+from openpyxl.utils import get_column_letter
+from utils.logger import get_logger
+from utils.metrics import medir_fase, medir_iteravel
+
+# Inicializar logger
+logger = get_logger('excel_reports')
+
+MIME_XLSX = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+EXCEL_STREAMING = os.getenv('EXCEL_STREAMING', '1') != '0'
+TAMANHO_BLOCO = 64 * 1024
+
+NOMES_GRUPOS_VIABILIDADE = ['Viabilidade Real', 'Viabilidade PE', 'Viabilidade Ideal']
+
+
+# ============================================================================
+# ESTILOS COMPARTILHADOS
+# ============================================================================
+
+def _criar_estilos():
+    """Cria os NamedStyles usados pelos relatórios (um conjunto por workbook)."""
+    return [
+        NamedStyle(
+            name='relatorio_titulo',
+            font=Font(bold=True, color="FFFFFF", size=16),
+            fill=PatternFill(start_color="2C3E50", end_color="2C3E50", fill_type="solid"),
+            alignment=Alignment(horizontal='center', vertical='center')
+        ),
+        NamedStyle(name='relatorio_empresa', font=Font(bold=True, size=11)),
+        NamedStyle(name='relatorio_periodo', font=Font(size=10)),
+        NamedStyle(name='relatorio_rodape', font=Font(size=9, italic=True)),
+    ]
+
+
+# ============================================================================
+# LAYOUT DA PLANILHA
+# ============================================================================
+
+class _LayoutPlanilha:
+    """
+    Descrição de uma aba: valores por (linha, coluna), estilos, gráficos
+    e colunas ocultas. Independente do modo de gravação.
+    """
+
+    def __init__(self, titulo):
+        self.titulo = titulo
+        self.celulas = {}
+        self.estilos = {}
+        self.graficos = []  # (fabrica(ws) -> chart, ancora)
+        self.alturas = {}
+        self.mesclas = []
+        self.colunas_ocultas = []
+
+    def cell(self, linha, coluna, valor, estilo=None):
+        self.celulas[(linha, coluna)] = valor
+        if estilo:
+            self.estilos[(linha, coluna)] = estilo
+
+    def add_chart(self, fabrica, ancora):
+        self.graficos.append((fabrica, ancora))
+
+    def escrever(self, ws, write_only):
+        """Grava o layout na worksheet (write-only exige linhas em ordem)."""
+        for linha, altura in self.alturas.items():
+            ws.row_dimensions[linha].height = altura
+        for letra in self.colunas_ocultas:
+            ws.column_dimensions[letra].hidden = True
+
+        if write_only:
+            for intervalo in self.mesclas:
+                ws.merged_cells.add(intervalo)
+
+            linhas = {}
+            for (linha, coluna), valor in self.celulas.items():
+                linhas.setdefault(linha, {})[coluna] = valor
+
+            for linha in range(1, max(linhas, default=0) + 1):
+                colunas = linhas.get(linha)
+                if not colunas:
+                    ws.append([])
+                    continue
+                valores = [None] * max(colunas)
+                for coluna, valor in colunas.items():
+                    estilo = self.estilos.get((linha, coluna))
+                    if estilo:
+                        celula = WriteOnlyCell(ws, valor)
+                        celula.style = estilo
+                        valor = celula
+                    valores[coluna - 1] = valor
+                ws.append(valores)
+        else:
+            for (linha, coluna), valor in self.celulas.items():
+                celula = ws.cell(linha, coluna, valor)
+                estilo = self.estilos.get((linha, coluna))
+                if estilo:
+                    celula.style = estilo
+            for intervalo in self.mesclas:
+                ws.merge_cells(intervalo)
+
+        for fabrica, ancora in self.graficos:
+            ws.add_chart(fabrica(ws), ancora)
+
+
+def _cabecalho(layout, titulo, empresa_nome, linha_periodo, gerado_em, ultima_coluna='H'):
+    layout.cell(1, 1, titulo, 'relatorio_titulo')
+    layout.mesclas.append(f'A1:{ultima_coluna}1')
+    layout.alturas[1] = 30
+    layout.cell(2, 1, f"Empresa: {empresa_nome}", 'relatorio_empresa')
+    layout.cell(3, 1, linha_periodo, 'relatorio_periodo')
+    layout.cell(4, 1, f"Gerado em: {gerado_em}", 'relatorio_rodape')
+
+
+def _grafico(classe, titulo, estilo, altura, largura, dados, categorias,
+             titles_from_data, eixo_y=None, eixo_x=None, tipo=None):
+    """
+    Retorna uma fábrica de gráfico; as referências só são resolvidas quando a
+    worksheet de destino existe.
+
+    dados/categorias: tuplas (min_col, min_row, max_row, max_col)
+    """
+    def fabrica(ws):
+        chart = classe()
+        if tipo:
+            chart.type = tipo
+        chart.title = titulo
+        if eixo_y:
+            chart.y_axis.title = eixo_y
+        if eixo_x:
+            chart.x_axis.title = eixo_x
+        chart.style = estilo
+        min_col, min_row, max_row, max_col = dados
+        chart.add_data(Reference(ws, min_col=min_col, min_row=min_row, max_row=max_row, max_col=max_col),
+                       titles_from_data=titles_from_data)
+        min_col, min_row, max_row, max_col = categorias
+        chart.set_categories(Reference(ws, min_col=min_col, min_row=min_row, max_row=max_row, max_col=max_col))
+        chart.height = altura
+        chart.width = largura
+        return chart
+    return fabrica
+
+
+def _layout_relatorio_bpo(resumo):
+    """
+    Layout do relatório BPO.
+
+    Args:
+        resumo (dict): empresa_nome, periodo, gerado_em, tipo_dre, totais,
+            labels_meses, receitas_mensais, despesas_mensais, gerais_mensais,
+            categorias_receita, categorias_despesa
+    """
+    layout = _LayoutPlanilha("Gráficos BPO")
+    _cabecalho(layout, 'Relatório BPO - Análise Gráfica', resumo['empresa_nome'],
+               f"Período: {resumo['periodo']}", resumo['gerado_em'])
+
+    totais = resumo['totais']
+    labels_meses = resumo['labels_meses']
+    receitas_mensais = resumo['receitas_mensais']
+    despesas_mensais = resumo['despesas_mensais']
+    gerais_mensais = resumo['gerais_mensais']
+    categorias_receita = resumo['categorias_receita']
+    categorias_despesa = resumo['categorias_despesa']
+    tipo_dre = resumo['tipo_dre']
+
+    # ==== GRÁFICO 1: COMPARATIVO DOS 3 DREs ====
+    row = 6
+    layout.cell(row, 1, "DRE")
+    layout.cell(row, 2, "Resultado")
+    row += 1
+    for dre_nome, dre_key in [('Fluxo Caixa', 'fluxo_caixa'), ('Real', 'real'), ('Real+MP', 'real_mp')]:
+        layout.cell(row, 1, dre_nome)
+        layout.cell(row, 2, totais[dre_key]['geral'])
+        row += 1
+
+    layout.add_chart(_grafico(BarChart, "Comparativo de Resultado - 3 DREs", 11, 10, 18,
+                              (2, 7, 9, None), (1, 7, 9, None), False,
+                              eixo_y='Resultado (R$)'), 'J7')
+
+    # ==== GRÁFICO 2: EVOLUÇÃO MENSAL (Receita x Despesa x Resultado) ====
+    row = 6
+    col_offset = 5  # Coluna E
+    layout.cell(row, col_offset, "Mês")
+    layout.cell(row, col_offset + 1, "Receita")
+    layout.cell(row, col_offset + 2, "Despesa")
+    layout.cell(row, col_offset + 3, "Resultado")
+    row += 1
+
+    for i, label in enumerate(labels_meses):
+        layout.cell(row, col_offset, label)
+        layout.cell(row, col_offset + 1, receitas_mensais[i])
+        layout.cell(row, col_offset + 2, despesas_mensais[i])
+        layout.cell(row, col_offset + 3, gerais_mensais[i])
+        row += 1
+
+    max_row_chart2 = 6 + len(labels_meses)
+    layout.add_chart(_grafico(LineChart, f"Evolução Mensal - {tipo_dre.replace('_', ' ').title()}", 12, 12, 22,
+                              (col_offset + 1, 6, max_row_chart2, col_offset + 3),
+                              (col_offset, 7, max_row_chart2, None), True,
+                              eixo_y='Valor (R$)', eixo_x='Mês'), 'A12')
+
+    # ==== GRÁFICO 3: PIZZA CATEGORIAS DE RECEITA ====
+    row_start_receita = 6 + len(labels_meses) + 3
+    row = row_start_receita
+    layout.cell(row, 1, "Categoria Receita")
+    layout.cell(row, 2, "Valor")
+    row += 1
+
+    for codigo in sorted(categorias_receita.keys()):
+        cat = categorias_receita[codigo]
+        layout.cell(row, 1, cat['nome'])
+        layout.cell(row, 2, cat['realizado'])
+        row += 1
+
+    if len(categorias_receita) > 0:
+        layout.add_chart(_grafico(PieChart, "Distribuição de Receitas por Categoria", 10, 12, 16,
+                                  (2, row_start_receita + 1, row - 1, None),
+                                  (1, row_start_receita + 1, row - 1, None), False), 'J22')
+
+    # ==== GRÁFICO 4: PIZZA CATEGORIAS DE DESPESA ====
+    row_start_despesa = row + 2
+    row = row_start_despesa
+    layout.cell(row, 1, "Categoria Despesa")
+    layout.cell(row, 2, "Valor")
+    row += 1
+
+    for codigo in sorted(categorias_despesa.keys()):
+        cat = categorias_despesa[codigo]
+        layout.cell(row, 1, cat['nome'])
+        layout.cell(row, 2, cat['realizado'])
+        row += 1
+
+    if len(categorias_despesa) > 0:
+        layout.add_chart(_grafico(PieChart, "Distribuição de Despesas por Categoria", 10, 12, 16,
+                                  (2, row_start_despesa + 1, row - 1, None),
+                                  (1, row_start_despesa + 1, row - 1, None), False), 'J37')
+
+    # ==== GRÁFICO 5: BARRAS HORIZONTAIS - RECEITA vs DESPESA POR MÊS ====
+    row_start_bar = row + 2
+    row = row_start_bar
+    layout.cell(row, 5, "Mês")
+    layout.cell(row, 6, "Receita")
+    layout.cell(row, 7, "Despesa")
+    row += 1
+
+    for i, label in enumerate(labels_meses):
+        layout.cell(row, 5, label)
+        layout.cell(row, 6, receitas_mensais[i])
+        layout.cell(row, 7, despesas_mensais[i])
+        row += 1
+
+    layout.add_chart(_grafico(BarChart, "Receita vs Despesa Mensal", 13, 14, 20,
+                              (6, row_start_bar, row - 1, 7), (5, row_start_bar + 1, row - 1, None), True,
+                              eixo_y='Mês', eixo_x='Valor (R$)', tipo="bar"), 'J52')
+
+    # Ocultar dados (deixar apenas gráficos visíveis)
+    layout.colunas_ocultas = [get_column_letter(c) for c in range(1, 9)]
+    return layout
+
+
+def _layout_relatorio_viabilidade(resumo):
+    """
+    Layout do relatório de viabilidade.
+
+    Args:
+        resumo (dict): empresa_nome, ano, gerado_em, grupos_info
+            (grupo -> {'receita', 'despesa', 'resultado'})
+    """
+    layout = _LayoutPlanilha("Gráficos Viabilidade")
+    _cabecalho(layout, 'Relatório de Viabilidade - Análise Gráfica', resumo['empresa_nome'],
+               f"Ano: {resumo['ano']}", resumo['gerado_em'])
+
+    grupos_info = resumo['grupos_info']
+
+    def blocos(linha_inicial, coluna, titulos, campos):
+        for i, titulo in enumerate(titulos):
+            layout.cell(linha_inicial, coluna + i, titulo)
+        linha = linha_inicial + 1
+        for grupo_nome in NOMES_GRUPOS_VIABILIDADE:
+            grupo = grupos_info[grupo_nome]
+            layout.cell(linha, coluna, grupo_nome.replace('Viabilidade ', ''))
+            for i, campo in enumerate(campos):
+                layout.cell(linha, coluna + 1 + i, grupo[campo])
+            linha += 1
+        return linha
+
+    # ==== GRÁFICO 1: COMPARATIVO DE RESULTADOS DOS 3 GRUPOS ====
+    blocos(6, 1, ["Grupo", "Resultado"], ['resultado'])
+    layout.add_chart(_grafico(BarChart, "Comparativo de Resultados", 11, 12, 18,
+                              (2, 6, 9, None), (1, 7, 9, None), True,
+                              eixo_y='Resultado (R$)'), 'A7')
+
+    # ==== GRÁFICO 2: RECEITA vs DESPESA POR GRUPO ====
+    col_offset = 4  # Coluna D
+    blocos(6, col_offset, ["Grupo", "Receita", "Despesa"], ['receita', 'despesa'])
+    layout.add_chart(_grafico(BarChart, "Receita vs Despesa por Grupo", 12, 12, 20,
+                              (col_offset + 1, 6, 9, col_offset + 2), (col_offset, 7, 9, None), True,
+                              eixo_y='Valor (R$)'), 'J7')
+
+    # ==== GRÁFICO 3: PIZZA - DISTRIBUIÇÃO DE RECEITAS ====
+    row_start_pizza = 12
+    row = blocos(row_start_pizza, 1, ["Grupo", "Receita"], ['receita'])
+    layout.add_chart(_grafico(PieChart, "Distribuição de Receitas", 10, 12, 16,
+                              (2, row_start_pizza, row - 1, None), (1, row_start_pizza + 1, row - 1, None), True), 'A24')
+
+    # ==== GRÁFICO 4: PIZZA - DISTRIBUIÇÃO DE DESPESAS ====
+    row_start_desp = row + 2
+    row = blocos(row_start_desp, 1, ["Grupo", "Despesa"], ['despesa'])
+    layout.add_chart(_grafico(PieChart, "Distribuição de Despesas", 10, 12, 16,
+                              (2, row_start_desp, row - 1, None), (1, row_start_desp + 1, row - 1, None), True), 'J24')
+
+    # Ocultar dados (deixar apenas gráficos visíveis)
+    layout.colunas_ocultas = [get_column_letter(c) for c in range(1, 8)]
+    return layout
+
+
+# ============================================================================
+# GRAVAÇÃO (EM MEMÓRIA / STREAMING)
+# ============================================================================
+
+def _montar_workbook(layout, write_only):
+    wb = Workbook(write_only=write_only)
+    for estilo in _criar_estilos():
+        wb.add_named_style(estilo)
+
+    if write_only:
+        ws = wb.create_sheet(layout.titulo)
+    else:
+        ws = wb.active
+        ws.title = layout.titulo
+
+    layout.escrever(ws, write_only)
+    return wb
+
+
+class _FimDoFluxo:
+    def __init__(self, erro=None):
+        self.erro = erro
+
+
+class _FluxoZip:
+    """
+    Arquivo somente-escrita (não posicionável) passado para wb.save().
+    O zipfile grava os blocos aqui e o gerador da resposta os consome pela
+    fila, com limite para não acumular o arquivo inteiro em memória.
+    """
+
+    def __init__(self, tamanho_bloco=TAMANHO_BLOCO, max_blocos=16):
+        self.tamanho_bloco = tamanho_bloco
+        self.fila = queue.Queue(maxsize=max_blocos)
+        self._buffer = bytearray()
+        self._cancelado = threading.Event()
+
+    def write(self, dados):
+        if self._cancelado.is_set():
+            raise IOError("Download do relatório cancelado")
+        self._buffer += dados
+        if len(self._buffer) >= self.tamanho_bloco:
+            self._enviar(bytes(self._buffer))
+            self._buffer.clear()
+        return len(dados)
+
+    def flush(self):
+        pass
+
+    def _enviar(self, item):
+        while True:
+            try:
+                self.fila.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                if self._cancelado.is_set():
+                    raise IOError("Download do relatório cancelado")
+
+    def finalizar(self, erro=None):
+        if self._buffer and erro is None:
+            self._enviar(bytes(self._buffer))
+            self._buffer.clear()
+        self._enviar(_FimDoFluxo(erro))
+
+    def cancelar(self):
+        self._cancelado.set()
+
+
+def _stream_layout(layout):
+    """Gera os bytes do xlsx em blocos, enquanto o zip é produzido em outra thread."""
+    fluxo = _FluxoZip()
+
+    def produzir():
+        try:
+            wb = _montar_workbook(layout, write_only=True)
+            wb.save(fluxo)
+        except Exception as e:
+            logger.error("Erro ao gerar relatório Excel em streaming: %s", e)
+            try:
+                fluxo.finalizar(e)
+            except IOError:
+                pass
+            return
+        try:
+            fluxo.finalizar()
+        except IOError:
+            pass
+
+    threading.Thread(target=produzir, name='excel-stream', daemon=True).start()
+
+    try:
+        while True:
+            item = fluxo.fila.get()
+            if isinstance(item, _FimDoFluxo):
+                if item.erro is not None:
+                    raise item.erro
+                return
+            yield item
+    finally:
+        # Cliente desconectou (ou terminou): libera a thread produtora
+        fluxo.cancelar()
+
+
+def _buffer_layout(layout):
+    wb = _montar_workbook(layout, write_only=False)
+    excel_buffer = BytesIO()
+    wb.save(excel_buffer)
+    return excel_buffer.getvalue()
+
+
+def _gerar(layout, streaming):
+    if streaming is None:
+        streaming = EXCEL_STREAMING
+    if streaming:
+        return medir_iteravel('report', _stream_layout(layout))
+    with medir_fase('report'):
+        return iter([_buffer_layout(layout)])
+
+
+def gerar_relatorio_bpo_xlsx(resumo, streaming=None):
+    """
+    Gera o relatório BPO.
+
+    Returns:
+        iterator[bytes]: Blocos do arquivo xlsx
+    """
+    return _gerar(_layout_relatorio_bpo(resumo), streaming)
+
+
+def gerar_relatorio_viabilidade_xlsx(resumo, streaming=None):
+    """
+    Gera o relatório de viabilidade.
+
+    Returns:
+        iterator[bytes]: Blocos do arquivo xlsx
+    """
+    return _gerar(_layout_relatorio_viabilidade(resumo), streaming)
@@ -0,0 +1,287 @@
+"""
+Exportação em Massa (CSV / Parquet)
+===================================
+
+Exporta, para uma, várias ou todas as empresas:
+
+- bpo          uma linha por item do plano de contas por mês (TbBpoDados)
+- viabilidade  uma linha por item das cinco tabelas de viabilidade
+
+As linhas vêm de um cursor sem buffer em uma conexão própria (lidas do
+servidor em lotes) e passam por um gerador que emite o arquivo em blocos,
+então a memória usada não depende da quantidade de linhas exportadas. No
+BPO, só o JSON do mês atual fica decodificado.
+
+Parquet exige pyarrow (opcional); os dados são gravados em row groups de
+LINHAS_GRUPO_PARQUET linhas, cada um enviado assim que fica pronto.
+
+Uso:
+    GET /admin/exportar/<conjunto>?empresas=1,2&formato=csv|parquet
+    GET /user/exportar/<conjunto>/<empresa_id>?formato=csv|parquet
+    flask --app app exportar bpo --empresa 1 --empresa 2 --formato parquet --saida bpo.parquet
+
+Autor: WaysSolutionHub
+"""
+
+import io
+import csv
+import json
+import click
+from utils.logger import get_logger
+from utils.metrics import medir_iteravel
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow é opcional (apenas para Parquet)
+    pa = None
+    pq = None
+
+# Inicializar logger
+logger = get_logger('exportacao')
+
+TAMANHO_BLOCO = 64 * 1024
+LINHAS_GRUPO_PARQUET = 50000
+
+FORMATOS = {
+    'csv': 'text/csv; charset=utf-8',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+# Colunas (nome, tipo) de cada conjunto, na ordem das linhas geradas
+CONJUNTOS = {
+    'bpo': (
+        ('empresa_id', 'int'), ('empresa', 'str'), ('ano', 'int'), ('mes', 'int'),
+        ('codigo', 'str'), ('nome', 'str'), ('nivel_hierarquia', 'int'),
+        ('valor_orcado', 'float'), ('valor_realizado', 'float'),
+        ('perc_atingido', 'float'), ('valor_diferenca', 'float'),
+        ('percentual_mp_manual', 'float'),
+    ),
+    'viabilidade': (
+        ('empresa_id', 'int'), ('empresa', 'str'), ('ano', 'int'), ('tabela', 'str'),
+        ('grupo', 'str'), ('subgrupo', 'str'), ('descricao', 'str'),
+        ('porcentagem', 'float'), ('valor', 'float'), ('valor_parc', 'float'),
+        ('valor_juros', 'float'), ('valor_total_parc', 'float'),
+        ('valor_custo_km', 'float'), ('valor_mensal', 'float'),
+    ),
+}
+
+
+class FormatoIndisponivel(Exception):
+    """Lançada quando o formato pedido depende de uma biblioteca não instalada."""
+
+
+# ============================================================================
+# LINHAS
+# ============================================================================
+
+def _linhas_bpo(company_manager, empresa_ids):
+    for empresa_id, empresa, ano, mes, dados_json in company_manager.iterar_exportacao_bpo(empresa_ids):
+        dados = json.loads(dados_json)
+        percentual = dados.get('percentual_mp_manual')
+        itens = dados.get('itens_hierarquicos') or []
+        if isinstance(itens, dict):
+            itens = [dict(item, codigo=codigo) for codigo, item in itens.items()]
+
+        for item in itens:
+            dados_mensais = item.get('dados_mensais') or [{}]
+            mensal = dados_mensais[0]
+            yield (
+                empresa_id, empresa, ano, mes,
+                item.get('codigo'), item.get('nome'), item.get('nivel_hierarquia'),
+                mensal.get('valor_orcado'), mensal.get('valor_realizado'),
+                mensal.get('perc_atingido'), mensal.get('valor_diferenca'),
+                percentual
+            )
+
+
+def _linhas_viabilidade(company_manager, empresa_ids):
+    return company_manager.iterar_exportacao_viabilidade(empresa_ids)
+
+
+LEITORES = {
+    'bpo': _linhas_bpo,
+    'viabilidade': _linhas_viabilidade,
+}
+
+
+# ============================================================================
+# ESCRITORES
+# ============================================================================
+
+def _gerar_csv(linhas, colunas):
+    """CSV (UTF-8, separador vírgula, ponto decimal) em blocos de ~TAMANHO_BLOCO bytes."""
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer, lineterminator='\n')
+    escritor.writerow([nome for nome, _ in colunas])
+
+    for linha in linhas:
+        escritor.writerow(linha)
+        if buffer.tell() >= TAMANHO_BLOCO:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate(0)
+
+    yield buffer.getvalue().encode('utf-8')
+
+
+class _SaidaEmBlocos:
+    """Arquivo só de escrita que guarda os bytes até o gerador retirá-los."""
+
+    def __init__(self):
+        self._partes = []
+        self._posicao = 0
+        self.closed = False
+
+    def write(self, dados):
+        self._partes.append(bytes(dados))
+        self._posicao += len(dados)
+        return len(dados)
+
+    def tell(self):
+        return self._posicao
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def retirar(self):
+        dados = b''.join(self._partes)
+        self._partes = []
+        return dados
+
+
+def _esquema_parquet(colunas):
+    tipos = {'int': pa.int64(), 'float': pa.float64(), 'str': pa.string()}
+    return pa.schema([(nome, tipos[tipo]) for nome, tipo in colunas])
+
+
+def _gerar_parquet(linhas, colunas):
+    """Parquet com um row group a cada LINHAS_GRUPO_PARQUET linhas."""
+    esquema = _esquema_parquet(colunas)
+    # DECIMAL do banco vira float
+    conversores = [float if tipo == 'float' else None for _, tipo in colunas]
+    saida = _SaidaEmBlocos()
+    escritor = pq.ParquetWriter(saida, esquema)
+
+    def gravar(valores):
+        escritor.write_table(pa.Table.from_arrays(
+            [pa.array(coluna, type=campo.type) for coluna, campo in zip(valores, esquema)],
+            schema=esquema
+        ))
+
+    valores = [[] for _ in colunas]
+    quantidade = 0
+    for linha in linhas:
+        for lista, conversor, valor in zip(valores, conversores, linha):
+            lista.append(conversor(valor) if conversor and valor is not None else valor)
+        quantidade += 1
+        if quantidade == LINHAS_GRUPO_PARQUET:
+            gravar(valores)
+            valores = [[] for _ in colunas]
+            quantidade = 0
+            yield saida.retirar()
+
+    if quantidade:
+        gravar(valores)
+    escritor.close()
+    yield saida.retirar()
+
+
+ESCRITORES = {
+    'csv': _gerar_csv,
+    'parquet': _gerar_parquet,
+}
+
+
+# ============================================================================
+# EXPORTAÇÃO
+# ============================================================================
+
+def ler_empresas(texto):
+    """IDs de empresa de '1,2,3' (vazio = todas). Lança ValueError se inválido."""
+    if not texto:
+        return []
+    try:
+        return [int(parte) for parte in texto.split(',') if parte.strip()]
+    except ValueError:
+        raise ValueError(f"Lista de empresas inválida: '{texto}' (use IDs separados por vírgula)")
+
+
+def exportar(conjunto, empresa_ids=None, formato='csv'):
+    """
+    Gerador com os bytes do arquivo exportado.
+
+    A conexão (própria, com cursor sem buffer) só é aberta quando o gerador
+    começa a ser consumido e é fechada ao terminar ou ao ser interrompido.
+
+    Args:
+        conjunto (str): 'bpo' ou 'viabilidade'
+        empresa_ids (list): IDs das empresas (vazio/None = todas)
+        formato (str): 'csv' ou 'parquet'
+
+    Raises:
+        ValueError: conjunto ou formato desconhecido
+        FormatoIndisponivel: Parquet sem pyarrow instalado
+    """
+    if conjunto not in CONJUNTOS:
+        raise ValueError(f"Conjunto inválido: '{conjunto}' (opções: {', '.join(CONJUNTOS)})")
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato inválido: '{formato}' (opções: {', '.join(FORMATOS)})")
+    if formato == 'parquet' and pa is None:
+        raise FormatoIndisponivel("Exportação Parquet requer o pacote pyarrow")
+
+    colunas = CONJUNTOS[conjunto]
+
+    def gerar():
+        from models.company_manager import CompanyManager
+
+        logger.info("Exportação %s (%s) iniciada: empresas %s", conjunto, formato, empresa_ids or 'todas')
+        company_manager = CompanyManager(compartilhada=False)
+        total = 0
+        try:
+            for bloco in ESCRITORES[formato](LEITORES[conjunto](company_manager, empresa_ids), colunas):
+                total += len(bloco)
+                yield bloco
+        finally:
+            company_manager.close()
+            logger.info("Exportação %s (%s) encerrada: %d bytes", conjunto, formato, total)
+
+    return medir_iteravel('export', gerar())
+
+
+def nome_arquivo(conjunto, formato, empresa_ids=None):
+    sufixo = '_'.join(str(empresa_id) for empresa_id in empresa_ids[:5]) if empresa_ids else 'todas'
+    return f"exportacao_{conjunto}_{sufixo}.{formato}"
+
+
+# ============================================================================
+# CLI
+# ============================================================================
+
+@click.command('exportar')
+@click.argument('conjunto', type=click.Choice(list(CONJUNTOS)))
+@click.option('--empresa', 'empresas', type=int, multiple=True,
+              help='ID da empresa (repita para várias; padrão: todas)')
+@click.option('--formato', type=click.Choice(list(FORMATOS)), default='csv', show_default=True)
+@click.option('--saida', default='-', show_default=True, help="Arquivo de saída ('-' = stdout)")
+def comando_exportar(conjunto, empresas, formato, saida):
+    """Exporta o histórico BPO ou os itens de viabilidade (CSV/Parquet, em streaming)."""
+    try:
+        corpo = exportar(conjunto, list(empresas), formato)
+    except FormatoIndisponivel as e:
+        raise click.ClickException(str(e))
+
+    total = 0
+    with click.open_file(saida, 'wb') as arquivo:
+        for bloco in corpo:
+            arquivo.write(bloco)
+            total += len(bloco)
+    click.echo(f"{total} bytes exportados ({conjunto}, {formato})", err=True)
+
+
+def init_app(app):
+    """Registra o comando `flask exportar` no app Flask."""
+    app.cli.add_command(comando_exportar)
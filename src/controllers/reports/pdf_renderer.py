@@ -0,0 +1,384 @@
+"""
+Renderização de Relatórios em PDF
+=================================
+
+Centraliza a geração dos PDFs de viabilidade (admin e usuário):
+- A renderização (xhtml2pdf) roda em um pool de processos limitado, fora
+  das threads do servidor web, com uma fila de tamanho máximo
+- PDFs prontos ficam em um cache em disco indexado pelo hash do conteúdo
+  (HTML final), com descarte LRU respeitando um orçamento em bytes
+- Tempo de renderização e profundidade da fila são registrados
+
+Configuração (.env):
+    PDF_POOL_WORKERS       - processos de renderização (padrão: 2)
+    PDF_POOL_MAX_FILA      - renderizações aguardando na fila (padrão: 8)
+    PDF_RENDER_TIMEOUT     - segundos máximos por renderização (padrão: 60)
+    PDF_CACHE_DIR          - diretório do cache (padrão: <raiz>/cache/pdf)
+    PDF_CACHE_MAX_BYTES    - orçamento do cache em bytes (padrão: 200MB)
+
+Autor: WaysSolutionHub
+"""
+
+import os
+import io
+import time
+import hashlib
+import threading
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FuturesTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from dotenv import load_dotenv
+from utils.logger import get_logger
+from utils.metrics import medir_fase
+
+# Buscar o arquivo .env na raiz do projeto
+BASE_DIR = Path(__file__).resolve().parent.parent.parent.parent
+load_dotenv(dotenv_path=BASE_DIR / '.env')
+
+PDF_POOL_WORKERS = int(os.getenv('PDF_POOL_WORKERS', '2'))
+PDF_POOL_MAX_FILA = int(os.getenv('PDF_POOL_MAX_FILA', '8'))
+PDF_RENDER_TIMEOUT = float(os.getenv('PDF_RENDER_TIMEOUT', '60'))
+PDF_CACHE_DIR = os.getenv('PDF_CACHE_DIR', str(BASE_DIR / 'cache' / 'pdf'))
+PDF_CACHE_MAX_BYTES = int(os.getenv('PDF_CACHE_MAX_BYTES', str(200 * 1024 * 1024)))
+
+# Inicializar logger
+logger = get_logger('pdf_renderer')
+
+
+class FilaRenderizacaoCheia(Exception):
+    """Lançada quando a fila de renderização atingiu o limite configurado."""
+
+
+class TempoRenderizacaoExcedido(Exception):
+    """Lançada quando a renderização não termina dentro de PDF_RENDER_TIMEOUT."""
+
+
+# ============================================================================
+# TEMPLATE HTML
+# ============================================================================
+
+CSS_RELATORIO = """
+        <style>
+            @page { size: A4; margin: 2cm; }
+            body { font-family: Arial, sans-serif; font-size: 11pt; line-height: 1.6; color: #333; }
+            h1 { color: #2c3e50; font-size: 18pt; margin-top: 1em; }
+            h2 { color: #34495e; font-size: 14pt; margin-top: 1em; }
+            h3 { color: #34495e; font-size: 12pt; margin-top: 0.8em; }
+            table { width: 100%; border-collapse: collapse; margin: 1em 0; }
+            th, td { border: 1px solid #ddd; padding: 8px; text-align: left; }
+            th { background-color: #f2f2f2; font-weight: bold; }
+            .header { text-align: center; margin-bottom: 2em; border-bottom: 2px solid #2c3e50; padding-bottom: 1em; }
+            .section { margin: 1.5em 0; }
+            p { margin: 0.5em 0; }
+        </style>
+        """
+
+
+def montar_html_relatorio_viabilidade(empresa_nome, ano, grupo_viabilidade, conteudo_texto):
+    """
+    Monta o HTML completo do relatório de viabilidade.
+
+    Args:
+        empresa_nome (str): Nome da empresa
+        ano (int): Ano do relatório
+        grupo_viabilidade (str): Cenário selecionado
+        conteudo_texto (str): Texto do template (já com os valores)
+
+    Returns:
+        str: Documento HTML pronto para renderização
+    """
+    # Converter quebras de linha do texto em tags HTML <br>
+    conteudo_html = conteudo_texto.replace('\n', '<br>\n')
+
+    return f"""
+        <!DOCTYPE html>
+        <html>
+        <head>
+            <meta charset="UTF-8">
+            {CSS_RELATORIO}
+        </head>
+        <body>
+            <div class="header">
+                <h1>RELATÓRIO DE VIABILIDADE FINANCEIRA</h1>
+                <p><strong>{empresa_nome}</strong> - Ano: {ano}</p>
+                <p>Cenário: {grupo_viabilidade}</p>
+            </div>
+            <div class="content">
+                {conteudo_html}
+            </div>
+        </body>
+        </html>
+        """
+
+
+# ============================================================================
+# CACHE DE ARTEFATOS EM DISCO
+# ============================================================================
+
+class PdfArtifactCache:
+    """
+    Cache de PDFs em disco, endereçado pelo hash SHA-256 do HTML.
+
+    A ordem de uso é mantida em memória (OrderedDict) e reconstruída a partir
+    do mtime dos arquivos ao iniciar; cada acerto atualiza o mtime para que
+    outros processos enxerguem a mesma ordem LRU.
+    """
+
+    def __init__(self, diretorio=PDF_CACHE_DIR, max_bytes=PDF_CACHE_MAX_BYTES):
+        self.diretorio = diretorio
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entradas = OrderedDict()  # chave -> tamanho em bytes
+        self._total_bytes = 0
+        self._carregado = False
+
+    @staticmethod
+    def chave(html):
+        """Calcula a chave de cache (hash do conteúdo) para um HTML."""
+        return hashlib.sha256(html.encode('utf-8')).hexdigest()
+
+    def _caminho(self, chave):
+        return os.path.join(self.diretorio, f'{chave}.pdf')
+
+    def _carregar_indice(self):
+        """Lê os arquivos existentes no diretório, do mais antigo ao mais recente."""
+        if self._carregado:
+            return
+        os.makedirs(self.diretorio, exist_ok=True)
+        arquivos = []
+        for entrada in os.scandir(self.diretorio):
+            if entrada.is_file() and entrada.name.endswith('.pdf'):
+                info = entrada.stat()
+                arquivos.append((info.st_mtime, entrada.name[:-4], info.st_size))
+        for _, chave, tamanho in sorted(arquivos):
+            self._entradas[chave] = tamanho
+            self._total_bytes += tamanho
+        self._carregado = True
+
+    def get(self, chave):
+        """Retorna os bytes do PDF em cache ou None."""
+        with self._lock:
+            self._carregar_indice()
+            if chave not in self._entradas:
+                return None
+            caminho = self._caminho(chave)
+            try:
+                with open(caminho, 'rb') as f:
+                    conteudo = f.read()
+                os.utime(caminho, None)
+            except OSError:
+                # Arquivo removido por outro processo
+                self._total_bytes -= self._entradas.pop(chave)
+                return None
+            self._entradas.move_to_end(chave)
+            return conteudo
+
+    def put(self, chave, conteudo):
+        """Grava um PDF no cache e descarta os menos usados se passar do orçamento."""
+        if len(conteudo) > self.max_bytes:
+            return
+        with self._lock:
+            self._carregar_indice()
+            caminho = self._caminho(chave)
+            temporario = f'{caminho}.{os.getpid()}.tmp'
+            try:
+                with open(temporario, 'wb') as f:
+                    f.write(conteudo)
+                os.replace(temporario, caminho)
+            except OSError as e:
+                logger.warning("Não foi possível gravar PDF no cache: %s", e)
+                return
+
+            if chave in self._entradas:
+                self._total_bytes -= self._entradas.pop(chave)
+            self._entradas[chave] = len(conteudo)
+            self._total_bytes += len(conteudo)
+            self._descartar_excedente()
+
+    def _descartar_excedente(self):
+        while self._total_bytes > self.max_bytes and self._entradas:
+            chave, tamanho = self._entradas.popitem(last=False)
+            self._total_bytes -= tamanho
+            try:
+                os.remove(self._caminho(chave))
+            except OSError:
+                pass
+            logger.debug("PDF removido do cache (LRU): %s", chave)
+
+    @property
+    def total_bytes(self):
+        return self._total_bytes
+
+
+# ============================================================================
+# POOL DE RENDERIZAÇÃO
+# ============================================================================
+
+def _renderizar_pdf(html):
+    """
+    Executada no processo do pool: converte HTML em bytes de PDF.
+    """
+    from xhtml2pdf import pisa
+
+    pdf_file = io.BytesIO()
+    pisa_status = pisa.CreatePDF(
+        html.encode('utf-8'),
+        dest=pdf_file,
+        encoding='utf-8'
+    )
+
+    if pisa_status.err:
+        raise Exception(f"Erro ao gerar PDF: {pisa_status.err}")
+
+    return pdf_file.getvalue()
+
+
+class PdfRenderer:
+    """
+    Fachada de renderização: cache em disco + pool de processos limitado.
+    """
+
+    def __init__(self, workers=PDF_POOL_WORKERS, max_fila=PDF_POOL_MAX_FILA,
+                 timeout=PDF_RENDER_TIMEOUT, cache=None):
+        self.workers = workers
+        self.timeout = timeout
+        self.cache = cache or PdfArtifactCache()
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        # Vagas = processos ocupados + pedidos aguardando
+        self._vagas = threading.BoundedSemaphore(workers + max_fila)
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            'renderizacoes': 0,
+            'acertos_cache': 0,
+            'rejeitados': 0,
+            'erros': 0,
+            'tempo_total_ms': 0.0,
+            'tempo_max_ms': 0.0,
+            'em_andamento': 0,
+            'fila_max': 0,
+        }
+
+    def _get_executor(self):
+        # Criado sob demanda para não criar processos no import do módulo.
+        # Sem fork: o servidor tem threads (inclusive a de escrita dos logs)
+        with self._executor_lock:
+            if self._executor is None:
+                metodo = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context(metodo)
+                )
+            return self._executor
+
+    def _descartar_executor(self, executor):
+        """Descarta o pool quebrado (processo morto); o próximo pedido cria outro."""
+        with self._executor_lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False)
+        logger.error("Pool de renderização de PDF quebrado; será recriado no próximo pedido")
+
+    def _liberar_vaga(self, _futuro=None):
+        self._registrar(em_andamento=-1)
+        self._vagas.release()
+
+    def _registrar(self, **valores):
+        with self._stats_lock:
+            for campo, valor in valores.items():
+                self._stats[campo] += valor
+            if self._stats['em_andamento'] > self._stats['fila_max']:
+                self._stats['fila_max'] = self._stats['em_andamento']
+
+    def gerar_pdf(self, html):
+        """
+        Retorna os bytes do PDF correspondente ao HTML.
+
+        Raises:
+            FilaRenderizacaoCheia: Se a fila de renderização estiver lotada
+            TempoRenderizacaoExcedido: Se a renderização passar de PDF_RENDER_TIMEOUT
+        """
+        chave = self.cache.chave(html)
+        conteudo = self.cache.get(chave)
+        if conteudo is not None:
+            self._registrar(acertos_cache=1)
+            logger.info("PDF servido do cache: %s", chave[:12])
+            return conteudo
+
+        if not self._vagas.acquire(blocking=False):
+            self._registrar(rejeitados=1)
+            logger.warning("Fila de renderização de PDF cheia")
+            raise FilaRenderizacaoCheia("Muitos relatórios sendo gerados no momento. Tente novamente em instantes.")
+
+        self._registrar(em_andamento=1)
+        inicio = time.perf_counter()
+        executor = self._get_executor()
+        try:
+            futuro = executor.submit(_renderizar_pdf, html)
+        except BaseException as e:
+            self._liberar_vaga()
+            self._registrar(erros=1)
+            if isinstance(e, BrokenProcessPool):
+                self._descartar_executor(executor)
+            raise
+
+        # A vaga só volta quando o processo termina: uma renderização que
+        # estourou o tempo continua ocupando o processo (cancel() não a para)
+        futuro.add_done_callback(self._liberar_vaga)
+        try:
+            conteudo = futuro.result(timeout=self.timeout)
+        except FuturesTimeoutError:
+            self._registrar(erros=1)
+            futuro.cancel()
+            raise TempoRenderizacaoExcedido(f"Tempo limite de {self.timeout:.0f}s excedido ao gerar PDF")
+        except BrokenProcessPool:
+            self._registrar(erros=1)
+            self._descartar_executor(executor)
+            raise
+        except Exception:
+            self._registrar(erros=1)
+            raise
+
+        duracao_ms = (time.perf_counter() - inicio) * 1000
+        with self._stats_lock:
+            self._stats['renderizacoes'] += 1
+            self._stats['tempo_total_ms'] += duracao_ms
+            self._stats['tempo_max_ms'] = max(self._stats['tempo_max_ms'], duracao_ms)
+            fila = self._stats['em_andamento']
+
+        logger.info("PDF renderizado em %.0fms (fila: %d, %d bytes)", duracao_ms, fila, len(conteudo))
+        self.cache.put(chave, conteudo)
+        return conteudo
+
+    def estatisticas(self):
+        """Retorna um snapshot das métricas de renderização."""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats['tempo_medio_ms'] = (
+            stats['tempo_total_ms'] / stats['renderizacoes'] if stats['renderizacoes'] else 0.0
+        )
+        stats['cache_bytes'] = self.cache.total_bytes
+        return stats
+
+
+_renderer = None
+_renderer_lock = threading.Lock()
+
+
+def get_pdf_renderer():
+    """Retorna a instância compartilhada do renderizador."""
+    global _renderer
+    with _renderer_lock:
+        if _renderer is None:
+            _renderer = PdfRenderer()
+        return _renderer
+
+
+@medir_fase('report')
+def gerar_pdf_relatorio_viabilidade(empresa_nome, ano, grupo_viabilidade, conteudo_texto):
+    """
+    Monta o HTML do relatório e retorna um BytesIO com o PDF pronto para send_file.
+    """
+    html_completo = montar_html_relatorio_viabilidade(empresa_nome, ano, grupo_viabilidade, conteudo_texto)
+    return io.BytesIO(get_pdf_renderer().gerar_pdf(html_completo))
@@ -1,6 +1,9 @@
-import mysql.connector
+import logging
 from mysql.connector import errorcode
 from utils.logger import get_logger
+from models.backends import DB_ERRORS, obter_backend
+from models.db_session import get_db_session
+from models.cursor_instrumentado import novo_cursor
 import os
 from pathlib import Path
 from dotenv import load_dotenv
@@ -19,9 +22,9 @@ logger = get_logger('database')
 
 # Log para debug: verificar se encontrou o .env
 if env_path.exists():
-    logger.info(f"✓ Arquivo .env encontrado em: {env_path}")
+    logger.info("✓ Arquivo .env encontrado em: %s", env_path)
 else:
-    logger.warning(f"⚠ Arquivo .env NÃO encontrado em: {env_path}")
+    logger.warning("⚠ Arquivo .env NÃO encontrado em: %s", env_path)
     logger.warning("Usando valores padrão de desenvolvimento")
 
 # Credenciais do banco de dados - Carregadas do arquivo .env
@@ -31,73 +34,107 @@ DB_CONFIG = {
     'host': os.getenv('DB_HOST', 'localhost'),
     'user': os.getenv('DB_USER', 'root'),
     'password': os.getenv('DB_PASSWORD', ''),
-    'database': os.getenv('DB_NAME', 'WaysDb')
+    'database': os.getenv('DB_NAME', 'WaysDb'),
+    # Backend do banco: mysql (padrão) ou sqlite (embutido, ver models/backends)
+    'backend': os.getenv('DB_BACKEND', 'mysql'),
+    'sqlite_path': os.getenv('DB_SQLITE_PATH', ':memory:')
 }
 
-logger.info(f"Conectando ao banco de dados: {DB_CONFIG['host']} / {DB_CONFIG['database']}")
+if DB_CONFIG['backend'] == 'sqlite':
+    logger.info("Usando banco SQLite embutido: %s", DB_CONFIG['sqlite_path'])
+else:
+    logger.info("Conectando ao banco de dados: %s / %s", DB_CONFIG['host'], DB_CONFIG['database'])
+
+# Database e tabelas são verificados/criados uma única vez por processo
+_schema_inicializado = False
+
+# Tabelas de Viabilidade (consultadas e excluídas sempre por empresa_id + ano)
+TABELAS_VIABILIDADE = (
+    'TbItens',
+    'TbItensInvestimentos',
+    'TbItensDividas',
+    'TbItensInvestimentoGeral',
+    'TbItensGastosOperacionais',
+)
+
+# Índices compostos seguindo os caminhos de acesso: (tabela, nome, colunas)
+INDICES_VIABILIDADE = (
+    # DISTINCT ano / COUNT / DELETE por empresa+ano resolvidos só pelo índice;
+    # subgrupo_id incluso para o JOIN com TbSubGrupo
+    ('TbItens', 'idx_itens_empresa_ano', '(empresa_id, ano, subgrupo_id)'),
+    ('TbItensInvestimentos', 'idx_itens_invest_empresa_ano', '(empresa_id, ano)'),
+    ('TbItensDividas', 'idx_itens_dividas_empresa_ano', '(empresa_id, ano)'),
+    ('TbItensInvestimentoGeral', 'idx_itens_invest_geral_empresa_ano', '(empresa_id, ano)'),
+    ('TbItensGastosOperacionais', 'idx_itens_gastos_op_empresa_ano', '(empresa_id, ano)'),
+    # Busca do subgrupo por nome dentro do grupo (salvar_itens_empresa)
+    ('TbSubGrupo', 'idx_subgrupo_grupo_nome', '(grupo_id, nome)'),
+)
+
+# Particionamento por ano (opcional): DB_PARTICIONAR_ANO=1
+DB_PARTICIONAR_ANO = os.getenv('DB_PARTICIONAR_ANO', '0') == '1'
+DB_PARTICAO_ANO_INICIAL = int(os.getenv('DB_PARTICAO_ANO_INICIAL', '2020'))
 
 class DatabaseConnection:
-    def __init__(self):
+    def __init__(self, compartilhada=True):
         self.host = DB_CONFIG['host']
         self.user = DB_CONFIG['user']
         self.password = DB_CONFIG['password']
         self.database_name = DB_CONFIG['database']
         self.connection = None
-
-        # Log detalhado da configuração (sem senha)
-        logger.info("="*60)
-        logger.info("INICIANDO CONEXÃO COM BANCO DE DADOS")
-        logger.info(f"Host: {self.host}")
-        logger.info(f"User: {self.user}")
-        logger.info(f"Database: {self.database_name}")
-        logger.info("="*60)
+        self.cursor = None
+        self.backend = obter_backend(DB_CONFIG['backend'])
+
+        # Dentro de uma requisição, reaproveita a conexão já aberta por outro manager
+        # (compartilhada=False: conexão própria, ex.: cursor sem buffer de uma exportação)
+        self._sessao = get_db_session() if compartilhada else None
+        if self._sessao is not None:
+            conexao = self._sessao.conexao_ativa()
+            if conexao is not None:
+                self.connection = conexao
+                self.cursor = novo_cursor(self.connection, buffered=True)
+                return
+
+        # Log detalhado da configuração (sem senha) - nível DEBUG, ver LOG_LEVEL_DATABASE
+        logger.debug("="*60)
+        logger.debug("INICIANDO CONEXÃO COM BANCO DE DADOS (%s)", self.backend.nome)
+        logger.debug("Host: %s", self.host)
+        logger.debug("User: %s", self.user)
+        logger.debug("Database: %s", self.database_name)
+        logger.debug("="*60)
 
         try:
-            logger.info("Tentando estabelecer conexão MySQL...")
-            self.connection = mysql.connector.connect(
-                host=self.host,
-                user=self.user,
-                password=self.password
-            )
-            logger.info(f"✓ Conexão MySQL estabelecida com sucesso!")
-            logger.info(f"  - Connection ID: {self.connection.connection_id}")
-            logger.info(f"  - Server Info: {self.connection.get_server_info()}")
-            logger.info(f"  - Connection está ativa: {self.connection.is_connected()}")
-
-            self.cursor = self.connection.cursor(buffered=True)
-            logger.info("✓ Cursor criado com sucesso")
-
-            logger.info("Verificando/criando database...")
-            self.create_database_if_not_exists()
-
-            logger.info(f"Selecionando database '{self.database_name}'...")
-            self.connection.database = self.database_name
-            logger.info(f"✓ Database '{self.database_name}' selecionado")
-
-            logger.info("Criando/verificando tabelas...")
-            self.create_user_table_if_not_exists()
-            self.create_empresa_table_if_not_exists()
-            self.create_user_empresa_table_if_not_exists()
-            self.create_empresa_tables_if_not_exists()
-            self.create_bpo_tables_if_not_exists()
-            self.insert_default_grupos_subgrupos()
-
-            logger.info("="*60)
-            logger.info("✓ INICIALIZAÇÃO DO BANCO CONCLUÍDA COM SUCESSO")
-            logger.info("="*60)
-
-        except mysql.connector.Error as err:
+            logger.debug("Tentando estabelecer conexão %s...", self.backend.nome)
+            self.connection = self.backend.conectar(DB_CONFIG)
+            logger.debug("✓ Conexão %s estabelecida com sucesso!", self.backend.nome)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("  - Connection ID: %s", self.connection.connection_id)
+                logger.debug("  - Server Info: %s", self.connection.get_server_info())
+                logger.debug("  - Connection está ativa: %s", self.connection.is_connected())
+
+            self.cursor = novo_cursor(self.connection, buffered=True)
+            logger.debug("✓ Cursor criado com sucesso")
+
+            if _schema_inicializado:
+                self.backend.selecionar_database(self.connection, self.database_name)
+            else:
+                self._inicializar_schema()
+
+            if self._sessao is not None:
+                self._sessao.registrar_conexao(self.connection)
+
+        except DB_ERRORS as err:
+            errno = getattr(err, 'errno', None)
             logger.error("="*60)
             logger.error("✗ ERRO NA CONEXÃO COM BANCO DE DADOS")
-            logger.error(f"Erro número: {err.errno}")
+            logger.error(f"Erro número: {errno if errno is not None else 'N/A'}")
             logger.error(f"Código SQL State: {err.sqlstate if hasattr(err, 'sqlstate') else 'N/A'}")
             logger.error(f"Mensagem de erro: {err.msg if hasattr(err, 'msg') else str(err)}")
 
-            if err.errno == errorcode.ER_ACCESS_DENIED_ERROR:
+            if errno == errorcode.ER_ACCESS_DENIED_ERROR:
                 logger.error("Tipo: ERRO DE AUTENTICAÇÃO")
                 logger.error(f"  - Verifique usuário '{self.user}' e senha")
                 logger.error(f"  - Verifique permissões no host '{self.host}'")
-            elif err.errno == errorcode.ER_BAD_DB_ERROR:
+            elif errno == errorcode.ER_BAD_DB_ERROR:
                 logger.error("Tipo: DATABASE NÃO EXISTE")
             else:
                 logger.error(f"Tipo: {type(err).__name__}")
@@ -105,12 +142,45 @@ class DatabaseConnection:
             logger.error("="*60)
             self.connection = None
 
+    def _inicializar_schema(self):
+        """Cria database, tabelas e dados padrão (executado uma vez por processo)."""
+        global _schema_inicializado
+
+        logger.info("Verificando/criando database...")
+        self.create_database_if_not_exists()
+
+        logger.info("Selecionando database '%s'...", self.database_name)
+        self.backend.selecionar_database(self.connection, self.database_name)
+        logger.info("✓ Database '%s' selecionado", self.database_name)
+
+        logger.info("Criando/verificando tabelas...")
+        self.create_user_table_if_not_exists()
+        self.create_empresa_table_if_not_exists()
+        self.create_user_empresa_table_if_not_exists()
+        self.create_empresa_tables_if_not_exists()
+        self.create_bpo_tables_if_not_exists()
+        self.create_snapshot_table_if_not_exists()
+        self.create_indices_if_not_exists()
+        if DB_PARTICIONAR_ANO and self.backend.suporta_particionamento:
+            self.particionar_tabelas_por_ano()
+        self.insert_default_grupos_subgrupos()
+
+        logger.info("="*60)
+        logger.info("✓ INICIALIZAÇÃO DO BANCO CONCLUÍDA COM SUCESSO")
+        logger.info("="*60)
+        _schema_inicializado = True
+
+    def _executar_ddl(self, sql):
+        """Executa um CREATE TABLE (escrito para MySQL) no dialeto do backend."""
+        for statement in self.backend.ddl(sql):
+            self.cursor.execute(statement)
+
     def create_database_if_not_exists(self):
         try:
-            self.cursor.execute(f"CREATE DATABASE IF NOT EXISTS {self.database_name}")
+            self.backend.criar_database(self.cursor, self.database_name)
             self.connection.commit()
-            logger.info(f"Banco de dados '{self.database_name}' verificado/criado com sucesso.")
-        except mysql.connector.Error as err:
+            logger.info("Banco de dados '%s' verificado/criado com sucesso.", self.database_name)
+        except DB_ERRORS as err:
             logger.error(f"Erro ao criar o banco de dados: {err}")
 
     def create_user_table_if_not_exists(self):
@@ -123,14 +193,21 @@ class DatabaseConnection:
             "  telefone VARCHAR(20) NOT NULL,"
             "  password VARCHAR(255) NOT NULL,"
             "  role ENUM('admin', 'user') NOT NULL,"
+            "  versao INT NOT NULL DEFAULT 0,"
             "  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP"
             ")"
         )
         try:
-            self.cursor.execute(table_schema)
+            self._executar_ddl(table_schema)
+
+            # Versão dos dados do usuário (cache do usuário logado, ver controllers/auth/principal)
+            if 'versao' not in self.backend.colunas_existentes(self.cursor, 'users'):
+                self.cursor.execute("ALTER TABLE users ADD COLUMN versao INT NOT NULL DEFAULT 0")
+                logger.info("✓ Coluna 'versao' adicionada em users")
+
             self.connection.commit()
             logger.info("Tabela 'users' verificada/criada com sucesso.")
-        except mysql.connector.Error as err:
+        except DB_ERRORS as err:
             logger.error(f"Erro ao criar a tabela de usuários: {err}")
 
     def create_empresa_table_if_not_exists(self):
@@ -139,7 +216,7 @@ class DatabaseConnection:
             "CREATE TABLE IF NOT EXISTS empresas ("
             "  id INT AUTO_INCREMENT PRIMARY KEY,"
             "  nome VARCHAR(255) NOT NULL,"
-            "  cnpj VARCHAR(18) NOT NULL UNIQUE,"
+            "  cnpj VARCHAR(18) NOT NULL,"
             "  website VARCHAR(255),"
             "  telefone VARCHAR(20) NOT NULL,"
             "  email VARCHAR(255) NOT NULL,"
@@ -150,10 +227,10 @@ class DatabaseConnection:
             ")"
         )
         try:
-            self.cursor.execute(table_schema)
+            self._executar_ddl(table_schema)
             self.connection.commit()
             logger.info("Tabela 'empresas' verificada/criada com sucesso.")
-        except mysql.connector.Error as err:
+        except DB_ERRORS as err:
             logger.error(f"Erro ao criar a tabela de empresas: {err}")
 
     def create_user_empresa_table_if_not_exists(self):
@@ -170,10 +247,10 @@ class DatabaseConnection:
             ")"
         )
         try:
-            self.cursor.execute(table_schema)
+            self._executar_ddl(table_schema)
             self.connection.commit()
             logger.info("Tabela 'user_empresa' verificada/criada com sucesso.")
-        except mysql.connector.Error as err:
+        except DB_ERRORS as err:
             logger.error(f"Erro ao criar a tabela de relacionamento user_empresa: {err}")
 
     def create_empresa_tables_if_not_exists(self):
@@ -187,7 +264,7 @@ class DatabaseConnection:
                 "  nome VARCHAR(255) NOT NULL"
                 ")"
             )
-            self.cursor.execute(grupo_schema)
+            self._executar_ddl(grupo_schema)
 
             # =========================
             # Tabela de SubGrupos
@@ -200,7 +277,7 @@ class DatabaseConnection:
                 "  FOREIGN KEY (grupo_id) REFERENCES TbGrupo(id) ON DELETE CASCADE"
                 ")"
             )
-            self.cursor.execute(subgrupo_schema)
+            self._executar_ddl(subgrupo_schema)
 
             # =========================
             # Tabela de Itens (cenários normais) - SEM MÊS - FK EMPRESA
@@ -218,7 +295,7 @@ class DatabaseConnection:
                 "  FOREIGN KEY (empresa_id) REFERENCES empresas(id) ON DELETE CASCADE"
                 ")"
             )
-            self.cursor.execute(itens_schema)
+            self._executar_ddl(itens_schema)
 
             # =========================
             # Tabela de Itens Investimentos - SEM MÊS - FK EMPRESA
@@ -237,7 +314,7 @@ class DatabaseConnection:
                 "  FOREIGN KEY (empresa_id) REFERENCES empresas(id) ON DELETE CASCADE"
                 ")"
             )
-            self.cursor.execute(investimentos_schema)
+            self._executar_ddl(investimentos_schema)
 
             # =========================
             # Tabela de Itens Dívidas - SEM MÊS - FK EMPRESA
@@ -256,7 +333,7 @@ class DatabaseConnection:
                 "  FOREIGN KEY (empresa_id) REFERENCES empresas(id) ON DELETE CASCADE"
                 ")"
             )
-            self.cursor.execute(dividas_schema)
+            self._executar_ddl(dividas_schema)
 
             # =========================
             # Tabela de Investimento Geral - SEM MÊS - FK EMPRESA
@@ -273,7 +350,7 @@ class DatabaseConnection:
                 "  FOREIGN KEY (empresa_id) REFERENCES empresas(id) ON DELETE CASCADE"
                 ")"
             )
-            self.cursor.execute(investimento_geral_schema)
+            self._executar_ddl(investimento_geral_schema)
 
             # =========================
             # Tabela de Gastos Operacionais - SEM MÊS - FK EMPRESA
@@ -291,13 +368,13 @@ class DatabaseConnection:
                 "  FOREIGN KEY (empresa_id) REFERENCES empresas(id) ON DELETE CASCADE"
                 ")"
             )
-            self.cursor.execute(gastos_operacionais_schema)
+            self._executar_ddl(gastos_operacionais_schema)
 
             # Commit final
             self.connection.commit()
             logger.info("Todas as tabelas de dados verificadas/criadas com sucesso (FK EMPRESA, SEM coluna MÊS).")
 
-        except mysql.connector.Error as err:
+        except DB_ERRORS as err:
             logger.error(f"Erro ao criar as tabelas de empresas: {err}")
 
     def create_bpo_tables_if_not_exists(self):
@@ -311,17 +388,133 @@ class DatabaseConnection:
                 "  ano INT NOT NULL,"
                 "  mes INT NOT NULL,"
                 "  dados_json LONGTEXT NOT NULL,"
+                "  hash_conteudo CHAR(64),"
                 "  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,"
                 "  FOREIGN KEY (empresa_id) REFERENCES empresas(id) ON DELETE CASCADE,"
                 "  UNIQUE KEY unique_empresa_ano_mes (empresa_id, ano, mes)"
                 ")"
             )
-            self.cursor.execute(bpo_schema)
+            self._executar_ddl(bpo_schema)
+
+            # Hash do conteúdo do mês (upload incremental); meses antigos ficam NULL
+            if 'hash_conteudo' not in self.backend.colunas_existentes(self.cursor, 'TbBpoDados'):
+                self.cursor.execute("ALTER TABLE TbBpoDados ADD COLUMN hash_conteudo CHAR(64)")
+                logger.info("✓ Coluna 'hash_conteudo' adicionada em TbBpoDados")
+
+            # Totais mensais por cenário de DRE (extraídos do JSON ao salvar),
+            # usados pela visão consolidada da carteira
+            bpo_totais_schema = (
+                "CREATE TABLE IF NOT EXISTS TbBpoTotais ("
+                "  empresa_id INT NOT NULL,"
+                "  ano INT NOT NULL,"
+                "  mes INT NOT NULL,"
+                "  cenario VARCHAR(20) NOT NULL,"
+                "  receita_realizado DECIMAL(18,2) NOT NULL DEFAULT 0,"
+                "  despesa_realizado DECIMAL(18,2) NOT NULL DEFAULT 0,"
+                "  geral_realizado DECIMAL(18,2) NOT NULL DEFAULT 0,"
+                "  receita_orcado DECIMAL(18,2) NOT NULL DEFAULT 0,"
+                "  despesa_orcado DECIMAL(18,2) NOT NULL DEFAULT 0,"
+                "  geral_orcado DECIMAL(18,2) NOT NULL DEFAULT 0,"
+                "  PRIMARY KEY (empresa_id, ano, mes, cenario),"
+                "  KEY idx_bpo_totais_periodo (ano, mes, cenario),"
+                "  FOREIGN KEY (empresa_id) REFERENCES empresas(id) ON DELETE CASCADE"
+                ")"
+            )
+            self._executar_ddl(bpo_totais_schema)
             self.connection.commit()
-            logger.info("Tabela 'TbBpoDados' verificada/criada com sucesso.")
-        except mysql.connector.Error as err:
+            logger.info("Tabelas 'TbBpoDados' e 'TbBpoTotais' verificadas/criadas com sucesso.")
+        except DB_ERRORS as err:
             logger.error(f"Erro ao criar tabelas BPO: {err}")
 
+    def create_snapshot_table_if_not_exists(self):
+        """Cria a tabela com os dados de viabilidade já organizados por empresa/ano"""
+        try:
+            snapshot_schema = (
+                "CREATE TABLE IF NOT EXISTS TbViabilidadeSnapshot ("
+                "  empresa_id INT NOT NULL,"
+                "  ano INT NOT NULL,"
+                "  versao INT NOT NULL DEFAULT 1,"
+                "  dados_json LONGTEXT NOT NULL,"
+                "  atualizado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,"
+                "  PRIMARY KEY (empresa_id, ano),"
+                "  FOREIGN KEY (empresa_id) REFERENCES empresas(id) ON DELETE CASCADE"
+                ")"
+            )
+            self._executar_ddl(snapshot_schema)
+            self.connection.commit()
+            logger.info("Tabela 'TbViabilidadeSnapshot' verificada/criada com sucesso.")
+        except DB_ERRORS as err:
+            logger.error(f"Erro ao criar tabela de snapshot de viabilidade: {err}")
+
+    def create_indices_if_not_exists(self):
+        """Cria os índices compostos (empresa_id, ano) das tabelas de Viabilidade."""
+        try:
+            existentes = self.backend.indices_existentes(self.cursor)
+
+            for tabela, nome, colunas in INDICES_VIABILIDADE:
+                if (tabela, nome) in existentes:
+                    continue
+                self.cursor.execute(f"CREATE INDEX {nome} ON {tabela} {colunas}")
+                logger.info("✓ Índice %s criado em %s", nome, tabela)
+
+            self.connection.commit()
+        except DB_ERRORS as err:
+            logger.error(f"Erro ao criar índices das tabelas de viabilidade: {err}")
+
+    def remover_indices_viabilidade(self):
+        """Remove os índices de INDICES_VIABILIDADE (usado pelo benchmark para comparar)."""
+        for tabela, nome, _ in INDICES_VIABILIDADE:
+            try:
+                self.cursor.execute(self.backend.drop_index(tabela, nome))
+            except DB_ERRORS:
+                pass
+        self.connection.commit()
+
+    def particionar_tabelas_por_ano(self, ano_inicial=None, ano_final=None):
+        """
+        Particiona as tabelas de Viabilidade por RANGE (ano), uma partição por ano.
+
+        O MySQL não aceita chaves estrangeiras em tabelas particionadas e exige
+        a coluna de partição em toda chave única; por isso as FKs dessas
+        tabelas são removidas e a chave primária passa a ser (id, ano). A
+        exclusão em cascata da empresa é feita explicitamente em
+        CompanyManager.deletar_empresa. Tabelas já particionadas são ignoradas.
+        """
+        from datetime import date
+
+        ano_inicial = ano_inicial or DB_PARTICAO_ANO_INICIAL
+        ano_final = ano_final or date.today().year + 2
+        particoes = ", ".join(
+            f"PARTITION p{ano} VALUES LESS THAN ({ano + 1})" for ano in range(ano_inicial, ano_final + 1)
+        )
+        particoes = f"PARTITION p_antigos VALUES LESS THAN ({ano_inicial}), {particoes}, " \
+                    f"PARTITION p_futuro VALUES LESS THAN MAXVALUE"
+
+        for tabela in TABELAS_VIABILIDADE:
+            try:
+                self.cursor.execute("""
+                    SELECT COUNT(*) FROM information_schema.PARTITIONS
+                    WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND PARTITION_NAME IS NOT NULL
+                """, (tabela,))
+                if self.cursor.fetchone()[0] > 0:
+                    continue
+
+                self.cursor.execute("""
+                    SELECT CONSTRAINT_NAME FROM information_schema.REFERENTIAL_CONSTRAINTS
+                    WHERE CONSTRAINT_SCHEMA = DATABASE() AND TABLE_NAME = %s
+                """, (tabela,))
+                for (constraint,) in self.cursor.fetchall():
+                    self.cursor.execute(f"ALTER TABLE {tabela} DROP FOREIGN KEY {constraint}")
+
+                self.cursor.execute(f"ALTER TABLE {tabela} DROP PRIMARY KEY, ADD PRIMARY KEY (id, ano)")
+                self.cursor.execute(f"ALTER TABLE {tabela} PARTITION BY RANGE (ano) ({particoes})")
+                self.connection.commit()
+                logger.info("✓ Tabela %s particionada por ano (%s-%s)", tabela, ano_inicial, ano_final)
+
+            except DB_ERRORS as err:
+                logger.error(f"Erro ao particionar {tabela}: {err}")
+                self.connection.rollback()
+
     def insert_default_grupos_subgrupos(self):
         try:
             # Grupos padrão
@@ -373,13 +566,18 @@ class DatabaseConnection:
             self.connection.commit()
             logger.info("Grupos e subgrupos padrão inseridos/verificados com sucesso.")
 
-        except mysql.connector.Error as err:
+        except DB_ERRORS as err:
             logger.error(f"Erro ao inserir grupos/subgrupos padrão: {err}")
 
     def get_connection(self):
         return self.connection
 
     def close_connection(self):
+        if self._sessao is not None and self._sessao.connection is self.connection:
+            # Conexão pertence à requisição: fecha apenas o cursor deste manager
+            if self.cursor:
+                self.cursor.close()
+            return
         if self.connection and self.connection.is_connected():
             self.cursor.close()
             self.connection.close()
@@ -0,0 +1,46 @@
+"""
+Backends de Banco de Dados
+==========================
+
+Escolhido por DB_BACKEND no .env:
+
+    DB_BACKEND=mysql    (padrão) servidor MySQL de DB_HOST/DB_USER/DB_PASSWORD
+    DB_BACKEND=sqlite   banco embutido em DB_SQLITE_PATH (arquivo ou :memory:)
+
+Os managers capturam DB_ERRORS (erros de qualquer backend) em vez de
+mysql.connector.Error.
+
+Autor: WaysSolutionHub
+"""
+
+import sqlite3
+import threading
+import mysql.connector
+from models.backends.base import Backend
+from models.backends.mysql_backend import MySQLBackend
+from models.backends.sqlite_backend import SQLiteBackend
+
+# Exceções de banco de todos os backends
+DB_ERRORS = (mysql.connector.Error, sqlite3.Error)
+
+BACKENDS = {
+    'mysql': MySQLBackend,
+    'sqlite': SQLiteBackend,
+}
+
+_lock = threading.Lock()
+_instancias = {}
+
+
+def obter_backend(nome='mysql'):
+    """Instância (única por processo) do backend pelo nome."""
+    nome = (nome or 'mysql').lower()
+    if nome not in BACKENDS:
+        raise ValueError(f"DB_BACKEND inválido: '{nome}' (opções: {', '.join(BACKENDS)})")
+    with _lock:
+        if nome not in _instancias:
+            _instancias[nome] = BACKENDS[nome]()
+        return _instancias[nome]
+
+
+__all__ = ['Backend', 'MySQLBackend', 'SQLiteBackend', 'DB_ERRORS', 'obter_backend']
@@ -0,0 +1,81 @@
+"""
+Interface dos Backends de Banco de Dados
+========================================
+
+Tudo que muda entre motores de banco fica aqui: fábrica de conexão,
+seleção do database, dialeto de DDL, sintaxe de upsert e consultas ao
+catálogo (índices e colunas existentes). Os managers continuam escrevendo
+SQL com placeholders %s; backends com outro paramstyle traduzem no cursor.
+
+Autor: WaysSolutionHub
+"""
+
+
+class Backend:
+    """Operações dependentes do motor de banco (implementadas por backend)."""
+
+    nome = None
+    paramstyle = 'format'
+
+    # Recursos opcionais do motor
+    suporta_fulltext = False
+    suporta_particionamento = False
+
+    def conectar(self, config):
+        """Abre uma conexão (sem database selecionado) a partir de DB_CONFIG."""
+        raise NotImplementedError
+
+    def criar_database(self, cursor, nome):
+        """Cria o database se o motor tiver esse conceito."""
+
+    def selecionar_database(self, connection, nome):
+        """Seleciona o database da conexão se o motor tiver esse conceito."""
+
+    def ddl(self, sql):
+        """
+        Traduz um CREATE TABLE escrito no dialeto MySQL.
+
+        Returns:
+            list: statements a executar, na ordem
+        """
+        return [sql]
+
+    def upsert(self, tabela, colunas, chaves, atualizar=(), expressoes=None):
+        """
+        INSERT que atualiza a linha quando a chave (única/primária) já existe.
+
+        Args:
+            tabela (str): nome da tabela
+            colunas (tuple): colunas do INSERT (um placeholder %s por coluna)
+            chaves (tuple): colunas da chave em conflito
+            atualizar (tuple): colunas que recebem o valor novo no conflito
+            expressoes (dict): {coluna: expressão SQL} aplicadas no conflito,
+                ex.: {'versao': 'versao + 1'}
+        """
+        raise NotImplementedError
+
+    def indices_existentes(self, cursor, tabela=None):
+        """Índices do database: set de (tabela, nome_indice)."""
+        raise NotImplementedError
+
+    def indices_unicos(self, cursor, tabela, coluna):
+        """Nomes dos índices únicos (fora a chave primária) que cobrem a coluna."""
+        raise NotImplementedError
+
+    def colunas_existentes(self, cursor, tabela):
+        """Nomes das colunas da tabela."""
+        raise NotImplementedError
+
+    def drop_index(self, tabela, nome):
+        """SQL para remover um índice."""
+        return f"DROP INDEX {nome} ON {tabela}"
+
+    def condicao_palavras(self, colunas, palavras):
+        """
+        Condição de busca por palavras (todas obrigatórias, por prefixo) em
+        qualquer posição das colunas.
+
+        Returns:
+            tuple: (sql, params)
+        """
+        raise NotImplementedError
@@ -0,0 +1,80 @@
+"""
+Backend MySQL (mysql-connector)
+===============================
+
+Backend de produção. O SQL dos managers já é escrito no dialeto MySQL,
+então DDL e placeholders passam sem tradução.
+
+Autor: WaysSolutionHub
+"""
+
+import mysql.connector
+from models.backends.base import Backend
+
+
+class MySQLBackend(Backend):
+    nome = 'mysql'
+    paramstyle = 'format'
+    suporta_fulltext = True
+    suporta_particionamento = True
+
+    def conectar(self, config):
+        return mysql.connector.connect(
+            host=config['host'],
+            user=config['user'],
+            password=config['password']
+        )
+
+    def criar_database(self, cursor, nome):
+        cursor.execute(f"CREATE DATABASE IF NOT EXISTS {nome}")
+
+    def selecionar_database(self, connection, nome):
+        connection.database = nome
+
+    def upsert(self, tabela, colunas, chaves, atualizar=(), expressoes=None):
+        sets = [f"{coluna} = {expressao}" for coluna, expressao in (expressoes or {}).items()]
+        sets += [f"{coluna} = VALUES({coluna})" for coluna in atualizar]
+        return (
+            f"INSERT INTO {tabela} ({', '.join(colunas)}) "
+            f"VALUES ({', '.join(['%s'] * len(colunas))}) "
+            f"ON DUPLICATE KEY UPDATE {', '.join(sets)}"
+        )
+
+    def indices_existentes(self, cursor, tabela=None):
+        sql = """
+            SELECT DISTINCT TABLE_NAME, INDEX_NAME
+            FROM information_schema.STATISTICS
+            WHERE TABLE_SCHEMA = DATABASE()
+        """
+        if tabela is None:
+            cursor.execute(sql)
+        else:
+            cursor.execute(sql + " AND TABLE_NAME = %s", (tabela,))
+        return {(linha[0], linha[1]) for linha in cursor.fetchall()}
+
+    def indices_unicos(self, cursor, tabela, coluna):
+        cursor.execute("""
+            SELECT DISTINCT INDEX_NAME
+            FROM information_schema.STATISTICS
+            WHERE TABLE_SCHEMA = DATABASE()
+            AND TABLE_NAME = %s
+            AND COLUMN_NAME = %s
+            AND NON_UNIQUE = 0
+            AND INDEX_NAME != 'PRIMARY'
+        """, (tabela, coluna))
+        return [linha[0] for linha in cursor.fetchall()]
+
+    def colunas_existentes(self, cursor, tabela):
+        cursor.execute("""
+            SELECT COLUMN_NAME
+            FROM information_schema.COLUMNS
+            WHERE TABLE_SCHEMA = DATABASE()
+            AND TABLE_NAME = %s
+        """, (tabela,))
+        return {linha[0] for linha in cursor.fetchall()}
+
+    def condicao_palavras(self, colunas, palavras):
+        return (
+            f"MATCH({', '.join(colunas)}) AGAINST (%s IN BOOLEAN MODE)",
+            [' '.join(f"+{palavra}*" for palavra in palavras)]
+        )
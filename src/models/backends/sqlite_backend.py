@@ -0,0 +1,255 @@
+"""
+Backend SQLite (embutido)
+=========================
+
+Permite rodar managers, app Flask, benchmarks e testes de carga sem um
+servidor MySQL, com o banco em arquivo (DB_SQLITE_PATH=/tmp/ways.db) ou em
+memória (DB_SQLITE_PATH=:memory:, padrão).
+
+O SQL dos managers continua no dialeto MySQL; aqui ele é adaptado:
+
+- placeholders %s viram ? (e LIKE %s ganha ESCAPE '\\', como no MySQL)
+- CREATE TABLE: AUTO_INCREMENT, ENUM, UNIQUE KEY/KEY e ON UPDATE
+  CURRENT_TIMESTAMP são reescritos; VARCHAR usa COLLATE NOCASE para
+  comparar e ordenar sem diferenciar maiúsculas, como o collation do MySQL
+- upsert com ON CONFLICT ... DO UPDATE
+- cursor(dictionary=True) devolve dicts; DECIMAL e TIMESTAMP voltam como
+  Decimal e datetime
+
+Em memória, o banco é compartilhado entre as conexões do processo (cache
+compartilhado) e mantido vivo por uma conexão âncora. Para testes de carga
+com várias threads prefira um arquivo: ele usa WAL, com leitores
+concorrentes e espera (DB_SQLITE_TIMEOUT) em vez de erro de bloqueio.
+
+Autor: WaysSolutionHub
+"""
+
+import os
+import re
+import sqlite3
+import threading
+from datetime import datetime
+from decimal import Decimal
+from functools import lru_cache
+from models.backends.base import Backend
+
+SQLITE_TIMEOUT = float(os.getenv('DB_SQLITE_TIMEOUT', '30'))
+
+# Tipos que o mysql-connector devolve e o sqlite3 não conhece
+sqlite3.register_adapter(Decimal, str)
+sqlite3.register_adapter(datetime, lambda valor: valor.isoformat(' '))
+sqlite3.register_converter('DECIMAL', lambda valor: Decimal(valor.decode()))
+sqlite3.register_converter('TIMESTAMP', lambda valor: datetime.fromisoformat(valor.decode()))
+
+
+# ============================================================================
+# TRADUÇÃO DE SQL
+# ============================================================================
+
+_RE_LIKE = re.compile(r"\bLIKE\s+%s", re.IGNORECASE)
+_RE_EXPLAIN = re.compile(r"^\s*EXPLAIN\s+(?!QUERY\s+PLAN)", re.IGNORECASE)
+
+_RE_TABELA = re.compile(r"CREATE TABLE IF NOT EXISTS (\w+)", re.IGNORECASE)
+_RE_AUTO_INCREMENT = re.compile(r"\bINT\s+AUTO_INCREMENT\s+PRIMARY\s+KEY", re.IGNORECASE)
+_RE_ENUM = re.compile(r"(\w+)\s+ENUM\(([^)]*)\)", re.IGNORECASE)
+_RE_ON_UPDATE = re.compile(r"\s+ON\s+UPDATE\s+CURRENT_TIMESTAMP", re.IGNORECASE)
+_RE_UNIQUE_KEY = re.compile(r"\bUNIQUE\s+KEY\s+(\w+)\s*\(([^)]*)\)", re.IGNORECASE)
+_RE_KEY = re.compile(r",\s*KEY\s+(\w+)\s*\(([^)]*)\)", re.IGNORECASE)
+_RE_VARCHAR = re.compile(r"\bVARCHAR\((\d+)\)", re.IGNORECASE)
+
+
+@lru_cache(maxsize=1024)
+def traduzir_sql(sql):
+    """SQL com placeholders %s (paramstyle format) para o paramstyle qmark do SQLite."""
+    sql = _RE_LIKE.sub(r"LIKE %s ESCAPE '\\'", sql)
+    sql = _RE_EXPLAIN.sub("EXPLAIN QUERY PLAN ", sql)
+    return sql.replace('%s', '?')
+
+
+def traduzir_ddl(sql):
+    """CREATE TABLE no dialeto MySQL para SQLite (+ CREATE INDEX das KEYs)."""
+    tabela = _RE_TABELA.search(sql)
+    indices = [
+        f"CREATE INDEX IF NOT EXISTS {nome} ON {tabela.group(1)} ({colunas})"
+        for nome, colunas in _RE_KEY.findall(sql)
+    ] if tabela else []
+
+    sql = _RE_KEY.sub('', sql)
+    sql = _RE_AUTO_INCREMENT.sub('INTEGER PRIMARY KEY AUTOINCREMENT', sql)
+    sql = _RE_ENUM.sub(r"\1 TEXT CHECK (\1 IN (\2))", sql)
+    sql = _RE_ON_UPDATE.sub('', sql)
+    sql = _RE_UNIQUE_KEY.sub(r"CONSTRAINT \1 UNIQUE (\2)", sql)
+    sql = _RE_VARCHAR.sub(r"VARCHAR(\1) COLLATE NOCASE", sql)
+    return [sql] + indices
+
+
+# ============================================================================
+# CONEXÃO E CURSOR (MESMA INTERFACE USADA DO MYSQL-CONNECTOR)
+# ============================================================================
+
+class CursorSQLite:
+    """Cursor sqlite3 com a interface do cursor do mysql-connector usada pelos managers."""
+
+    def __init__(self, cursor, dictionary=False):
+        self._cursor = cursor
+        self._dictionary = dictionary
+
+    def execute(self, operation, params=None):
+        self._cursor.execute(traduzir_sql(operation), tuple(params) if params else ())
+
+    def executemany(self, operation, seq_params):
+        self._cursor.executemany(traduzir_sql(operation), seq_params)
+
+    def _linha(self, linha):
+        if linha is None or not self._dictionary:
+            return linha
+        return dict(zip((coluna[0] for coluna in self._cursor.description), linha))
+
+    def fetchone(self):
+        return self._linha(self._cursor.fetchone())
+
+    def fetchall(self):
+        linhas = self._cursor.fetchall()
+        if not self._dictionary:
+            return linhas
+        colunas = [coluna[0] for coluna in self._cursor.description or ()]
+        return [dict(zip(colunas, linha)) for linha in linhas]
+
+    def fetchmany(self, size=1):
+        return [self._linha(linha) for linha in self._cursor.fetchmany(size)]
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    def close(self):
+        self._cursor.close()
+
+
+class ConexaoSQLite:
+    """Conexão sqlite3 com a interface da conexão do mysql-connector usada pelos managers."""
+
+    connection_id = None
+
+    def __init__(self, conexao):
+        self._conexao = conexao
+        self._aberta = True
+        self.database = None
+
+    def cursor(self, dictionary=False, buffered=False):
+        return CursorSQLite(self._conexao.cursor(), dictionary)
+
+    def commit(self):
+        self._conexao.commit()
+
+    def rollback(self):
+        self._conexao.rollback()
+
+    def is_connected(self):
+        return self._aberta
+
+    def get_server_info(self):
+        return f"SQLite {sqlite3.sqlite_version}"
+
+    def close(self):
+        if self._aberta:
+            self._aberta = False
+            self._conexao.close()
+
+
+# ============================================================================
+# BACKEND
+# ============================================================================
+
+class SQLiteBackend(Backend):
+    nome = 'sqlite'
+    paramstyle = 'qmark'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ancoras = {}
+        self._wal_configurado = set()
+
+    def _abrir(self, destino, uri):
+        conexao = sqlite3.connect(
+            destino, uri=uri, timeout=SQLITE_TIMEOUT,
+            detect_types=sqlite3.PARSE_DECLTYPES, check_same_thread=False
+        )
+        conexao.execute("PRAGMA foreign_keys = ON")
+        return conexao
+
+    def conectar(self, config):
+        caminho = config.get('sqlite_path') or ':memory:'
+
+        if caminho == ':memory:':
+            destino = f"file:{config['database']}?mode=memory&cache=shared"
+            with self._lock:
+                # O banco em memória existe enquanto houver uma conexão aberta
+                if destino not in self._ancoras:
+                    self._ancoras[destino] = self._abrir(destino, True)
+            return ConexaoSQLite(self._abrir(destino, True))
+
+        conexao = self._abrir(caminho, False)
+        conexao.execute("PRAGMA synchronous = NORMAL")
+        with self._lock:
+            if caminho not in self._wal_configurado:
+                conexao.execute("PRAGMA journal_mode = WAL")
+                self._wal_configurado.add(caminho)
+        return ConexaoSQLite(conexao)
+
+    def ddl(self, sql):
+        return traduzir_ddl(sql)
+
+    def upsert(self, tabela, colunas, chaves, atualizar=(), expressoes=None):
+        sets = [f"{coluna} = {expressao}" for coluna, expressao in (expressoes or {}).items()]
+        sets += [f"{coluna} = excluded.{coluna}" for coluna in atualizar]
+        return (
+            f"INSERT INTO {tabela} ({', '.join(colunas)}) "
+            f"VALUES ({', '.join(['%s'] * len(colunas))}) "
+            f"ON CONFLICT ({', '.join(chaves)}) DO UPDATE SET {', '.join(sets)}"
+        )
+
+    def indices_existentes(self, cursor, tabela=None):
+        sql = "SELECT tbl_name, name FROM sqlite_master WHERE type = 'index'"
+        if tabela is None:
+            cursor.execute(sql)
+        else:
+            cursor.execute(sql + " AND tbl_name = %s", (tabela,))
+        return {(linha[0], linha[1]) for linha in cursor.fetchall()}
+
+    def indices_unicos(self, cursor, tabela, coluna):
+        cursor.execute(f"PRAGMA index_list({tabela})")
+        unicos = [linha[1] for linha in cursor.fetchall() if linha[2] and linha[3] != 'pk']
+        nomes = []
+        for nome in unicos:
+            cursor.execute(f"PRAGMA index_info({nome})")
+            if any(linha[2] == coluna for linha in cursor.fetchall()):
+                nomes.append(nome)
+        return nomes
+
+    def colunas_existentes(self, cursor, tabela):
+        cursor.execute(f"PRAGMA table_info({tabela})")
+        return {linha[1] for linha in cursor.fetchall()}
+
+    def drop_index(self, tabela, nome):
+        return f"DROP INDEX {nome}"
+
+    def condicao_palavras(self, colunas, palavras):
+        # Sem FULLTEXT: cada palavra precisa aparecer em alguma das colunas
+        condicoes = []
+        params = []
+        for palavra in palavras:
+            condicoes.append("(" + " OR ".join(f"{coluna} LIKE %s" for coluna in colunas) + ")")
+            params.extend([f"%{palavra}%"] * len(colunas))
+        return " AND ".join(condicoes), params
@@ -1,12 +1,44 @@
-from models.auth import DatabaseConnection
-import mysql.connector
+import threading
+from models.auth import DatabaseConnection, TABELAS_VIABILIDADE
+from models.backends import DB_ERRORS
 from utils.logger import get_logger
 
 # Inicializar logger
 logger = get_logger('company_manager')
 
+# Migrações da tabela empresas são verificadas uma única vez por processo
+_migracoes_executadas = False
+
+# Linhas lidas por vez do cursor sem buffer das exportações
+LOTE_EXPORTACAO = 1000
+
+# Meses BPO por executemany em salvar_dados_bpo_lote
+LOTE_MESES_BPO = 12
+
+# Colunas de valor de cada tabela de viabilidade (as ausentes saem NULL na exportação)
+COLUNAS_VALOR_VIABILIDADE = (
+    'porcentagem', 'valor', 'valor_parc', 'valor_juros', 'valor_total_parc',
+    'valor_custo_km', 'valor_mensal'
+)
+COLUNAS_VIABILIDADE = {
+    'TbItens': ('porcentagem', 'valor'),
+    'TbItensInvestimentos': ('valor_parc', 'valor_juros', 'valor_total_parc'),
+    'TbItensDividas': ('valor_parc', 'valor_juros', 'valor_total_parc'),
+    'TbItensInvestimentoGeral': ('valor',),
+    'TbItensGastosOperacionais': ('valor_custo_km', 'valor_mensal'),
+}
+
+# Grupos/subgrupos (dados de referência fixos), carregados uma vez por processo
+_referencia_lock = threading.Lock()
+_referencia_subgrupos = None
+
 class CompanyManager(DatabaseConnection):
 
+    def __init__(self, compartilhada=True):
+        super().__init__(compartilhada)
+        # Empresas com histórico colunar do BPO a regravar no close()
+        self._historicos_bpo_pendentes = set()
+
     def salvar_itens_empresa(self, empresa_id, ano_selecionado, lista_cenarios, dados_especiais):
         """
         Salva dados da empresa para um ANO específico (SEM mês).
@@ -35,7 +67,7 @@ class CompanyManager(DatabaseConnection):
                     f"DELETE FROM {tabela} WHERE empresa_id = %s AND ano = %s",
                     (empresa_id, ano_selecionado)
                 )
-            logger.debug(f"Dados antigos removidos para empresa_id={empresa_id}, ano={ano_selecionado}")
+            logger.debug("Dados antigos removidos para empresa_id=%s, ano=%s", empresa_id, ano_selecionado)
 
             # ============================
             # 3. Mapeamento de nomes do Excel -> nomes no banco
@@ -82,14 +114,9 @@ class CompanyManager(DatabaseConnection):
                     nome_subgrupo_excel = subgrupo_nome.strip().upper()
                     nome_subgrupo_banco = subgrupo_map.get(nome_subgrupo_excel, nome_subgrupo_excel)
 
-                    self.cursor.execute(
-                        "SELECT id FROM TbSubGrupo WHERE nome = %s AND grupo_id = %s",
-                        (nome_subgrupo_banco, grupo_id)
-                    )
-                    subgrupo_row = self.cursor.fetchone()
-                    if not subgrupo_row:
+                    subgrupo_id = self.id_subgrupo(nome_subgrupo_banco, grupo_id)
+                    if not subgrupo_id:
                         continue
-                    subgrupo_id = subgrupo_row[0]
 
                     for item in itens:
                         valor = item.get("valor") if item.get("valor") is not None else 0.00
@@ -113,11 +140,7 @@ class CompanyManager(DatabaseConnection):
             for grupo_id in [1, 2, 3]:
                 # DIVIDAS
                 for it in dados_especiais.get("DIVIDAS", []):
-                    self.cursor.execute(
-                        "SELECT id FROM TbSubGrupo WHERE nome = %s AND grupo_id = %s",
-                        ("Dividas", grupo_id)
-                    )
-                    subgrupo_id = self.cursor.fetchone()[0]
+                    subgrupo_id = self.id_subgrupo("Dividas", grupo_id)
                     sql = """
                         INSERT INTO TbItensDividas (descricao, valor_parc, valor_juros, valor_total_parc, ano, subgrupo_id, empresa_id)
                         VALUES (%s, %s, %s, %s, %s, %s, %s)
@@ -130,11 +153,7 @@ class CompanyManager(DatabaseConnection):
 
                 # INVESTIMENTOS
                 for it in dados_especiais.get("INVESTIMENTOS", []):
-                    self.cursor.execute(
-                        "SELECT id FROM TbSubGrupo WHERE nome = %s AND grupo_id = %s",
-                        ("Investimentos", grupo_id)
-                    )
-                    subgrupo_id = self.cursor.fetchone()[0]
+                    subgrupo_id = self.id_subgrupo("Investimentos", grupo_id)
                     sql = """
                         INSERT INTO TbItensInvestimentos (descricao, valor_parc, valor_juros, valor_total_parc, ano, subgrupo_id, empresa_id)
                         VALUES (%s, %s, %s, %s, %s, %s, %s)
@@ -147,11 +166,7 @@ class CompanyManager(DatabaseConnection):
 
                 # INVESTIMENTOS GERAL
                 for it in dados_especiais.get("INVESTIMENTOS GERAL NO NEGOCIO", []):
-                    self.cursor.execute(
-                        "SELECT id FROM TbSubGrupo WHERE nome = %s AND grupo_id = %s",
-                        ("InvestimentosGeral", grupo_id)
-                    )
-                    subgrupo_id = self.cursor.fetchone()[0]
+                    subgrupo_id = self.id_subgrupo("InvestimentosGeral", grupo_id)
                     sql = """
                         INSERT INTO TbItensInvestimentoGeral (descricao, valor, ano, subgrupo_id, empresa_id)
                         VALUES (%s, %s, %s, %s, %s)
@@ -164,11 +179,7 @@ class CompanyManager(DatabaseConnection):
 
                 # GASTOS OPERACIONAIS
                 for it in dados_especiais.get("GASTOS OPERACIONAIS", []):
-                    self.cursor.execute(
-                        "SELECT id FROM TbSubGrupo WHERE nome = %s AND grupo_id = %s",
-                        ("GastosOperacionais", grupo_id)
-                    )
-                    subgrupo_id = self.cursor.fetchone()[0]
+                    subgrupo_id = self.id_subgrupo("GastosOperacionais", grupo_id)
                     sql = """
                         INSERT INTO TbItensGastosOperacionais (descricao, valor_custo_km, valor_mensal, ano, subgrupo_id, empresa_id)
                         VALUES (%s, %s, %s, %s, %s, %s)
@@ -180,104 +191,176 @@ class CompanyManager(DatabaseConnection):
                     self.cursor.execute(sql, values)
 
             # ============================
-            # 6. Commit final
+            # 6. Snapshot organizado para as APIs (mesma transação)
+            # ============================
+            self._gravar_snapshot_viabilidade(empresa_id, ano_selecionado)
+
+            # ============================
+            # 7. Commit final
             # ============================
             self.connection.commit()
             logger.info("Itens salvos com sucesso no banco de dados (dados antigos sobrescritos).")
 
-        except mysql.connector.Error as err:
+        except DB_ERRORS as err:
             logger.error(f"Erro ao salvar itens: {err}")
             self.connection.rollback()
 
 
-    def buscar_dados_empresa(self, empresa_id, ano_selecionado):
+    def salvar_itens_lote(self, empresa_id, ano, itens):
         """
-        Busca todos os dados de uma empresa para um ANO específico (SEM mês).
-        Agora recebe diretamente o empresa_id.
+        Substitui os itens de viabilidade da empresa/ano pelos informados, em
+        uma transação, com um executemany por tabela. Usado pela ingestão
+        direta (sem planilha).
+
+        Args:
+            empresa_id (int): ID da empresa
+            ano (int): ano dos dados
+            itens (list): dicts com tabela, grupo, subgrupo, descricao e as
+                colunas de valor da tabela (COLUNAS_VIABILIDADE)
+
+        Returns:
+            bool: True se gravado
+
+        Raises:
+            ValueError: tabela ou grupo/subgrupo inexistente
         """
+        ids_subgrupos = {nomes: subgrupo_id for subgrupo_id, nomes in self.referencia_subgrupos()['por_id'].items()}
+
+        linhas = {tabela: [] for tabela in TABELAS_VIABILIDADE}
+        for item in itens:
+            tabela = item['tabela']
+            if tabela not in linhas:
+                raise ValueError(f"Tabela de viabilidade inválida: '{tabela}'")
+            subgrupo_id = ids_subgrupos.get((item['grupo'], item['subgrupo']))
+            if subgrupo_id is None:
+                raise ValueError(f"Subgrupo '{item['subgrupo']}' não encontrado no grupo '{item['grupo']}'")
+            linhas[tabela].append(
+                (item['descricao'],) + tuple(item.get(coluna) for coluna in COLUNAS_VIABILIDADE[tabela])
+                + (ano, subgrupo_id, empresa_id)
+            )
+
         try:
-            # 1. Verificar se a empresa existe
             self.cursor.execute("SELECT id FROM empresas WHERE id = %s", (empresa_id,))
-            row = self.cursor.fetchone()
-            if not row:
-                raise Exception(f"Empresa com ID '{empresa_id}' não encontrada na tabela empresas.")
+            if not self.cursor.fetchone():
+                raise ValueError(f"Empresa com ID '{empresa_id}' não encontrada na tabela empresas.")
 
-            resultado = {
-                "TbItens": [],
-                "TbItensInvestimentos": [],
-                "TbItensDividas": [],
-                "TbItensInvestimentoGeral": [],
-                "TbItensGastosOperacionais": []
-            }
+            for tabela, valores in linhas.items():
+                self.cursor.execute(
+                    f"DELETE FROM {tabela} WHERE empresa_id = %s AND ano = %s", (empresa_id, ano)
+                )
+                if valores:
+                    colunas = ('descricao',) + COLUNAS_VIABILIDADE[tabela] + ('ano', 'subgrupo_id', 'empresa_id')
+                    self.cursor.executemany(
+                        f"INSERT INTO {tabela} ({', '.join(colunas)}) VALUES ({', '.join(['%s'] * len(colunas))})",
+                        valores
+                    )
 
-            # ============================
-            # 2. Buscar Itens Normais - SEM MÊS
-            # ============================
-            sql_itens = """
-                SELECT g.nome AS grupo, s.nome AS subgrupo, i.descricao, i.porcentagem, i.valor
-                FROM TbItens i
-                JOIN TbSubGrupo s ON i.subgrupo_id = s.id
-                JOIN TbGrupo g ON s.grupo_id = g.id
-                WHERE i.empresa_id = %s AND i.ano = %s
-            """
-            self.cursor.execute(sql_itens, (empresa_id, ano_selecionado))
-            resultado["TbItens"] = self.cursor.fetchall()
+            self._gravar_snapshot_viabilidade(empresa_id, ano)
+            self.connection.commit()
+            logger.debug("Itens de viabilidade salvos em lote: empresa_id=%s, ano=%s, itens=%s", empresa_id, ano, len(itens))
+            return True
 
-            # ============================
-            # 3. Buscar Itens Investimentos - SEM MÊS
-            # ============================
-            sql_invest = """
-                SELECT g.nome AS grupo, s.nome AS subgrupo, i.descricao, i.valor_parc, i.valor_juros, i.valor_total_parc
-                FROM TbItensInvestimentos i
-                JOIN TbSubGrupo s ON i.subgrupo_id = s.id
-                JOIN TbGrupo g ON s.grupo_id = g.id
-                WHERE i.empresa_id = %s AND i.ano = %s
-            """
-            self.cursor.execute(sql_invest, (empresa_id, ano_selecionado))
-            resultado["TbItensInvestimentos"] = self.cursor.fetchall()
+        except DB_ERRORS as err:
+            logger.error(f"Erro ao salvar lote de itens: {err}")
+            self.connection.rollback()
+            return False
 
-            # ============================
-            # 4. Buscar Itens Dívidas - SEM MÊS
-            # ============================
-            sql_dividas = """
-                SELECT g.nome AS grupo, s.nome AS subgrupo, i.descricao, i.valor_parc, i.valor_juros, i.valor_total_parc
-                FROM TbItensDividas i
-                JOIN TbSubGrupo s ON i.subgrupo_id = s.id
-                JOIN TbGrupo g ON s.grupo_id = g.id
-                WHERE i.empresa_id = %s AND i.ano = %s
-            """
-            self.cursor.execute(sql_dividas, (empresa_id, ano_selecionado))
-            resultado["TbItensDividas"] = self.cursor.fetchall()
 
-            # ============================
-            # 5. Buscar Investimento Geral - SEM MÊS
-            # ============================
-            sql_invest_geral = """
-                SELECT g.nome AS grupo, s.nome AS subgrupo, i.descricao, i.valor
-                FROM TbItensInvestimentoGeral i
-                JOIN TbSubGrupo s ON i.subgrupo_id = s.id
-                JOIN TbGrupo g ON s.grupo_id = g.id
-                WHERE i.empresa_id = %s AND i.ano = %s
-            """
-            self.cursor.execute(sql_invest_geral, (empresa_id, ano_selecionado))
-            resultado["TbItensInvestimentoGeral"] = self.cursor.fetchall()
+    # ============================
+    # DADOS DE REFERÊNCIA (GRUPOS/SUBGRUPOS)
+    # ============================
 
-            # ============================
-            # 6. Buscar Gastos Operacionais - SEM MÊS
-            # ============================
-            sql_gastos = """
-                SELECT g.nome AS grupo, s.nome AS subgrupo, i.descricao, i.valor_custo_km, i.valor_mensal
-                FROM TbItensGastosOperacionais i
-                JOIN TbSubGrupo s ON i.subgrupo_id = s.id
-                JOIN TbGrupo g ON s.grupo_id = g.id
-                WHERE i.empresa_id = %s AND i.ano = %s
+    def referencia_subgrupos(self, recarregar=False):
+        """
+        Retorna os grupos/subgrupos em cache (carregados uma vez por processo).
+
+        Returns:
+            dict: {'por_id': {subgrupo_id: (grupo_nome, subgrupo_nome)},
+                   'por_nome': {(subgrupo_nome, grupo_id): subgrupo_id}}
+        """
+        global _referencia_subgrupos
+
+        with _referencia_lock:
+            if _referencia_subgrupos is not None and not recarregar:
+                return _referencia_subgrupos
+
+        self.cursor.execute("""
+            SELECT s.id, s.nome, s.grupo_id, g.nome
+            FROM TbSubGrupo s
+            JOIN TbGrupo g ON s.grupo_id = g.id
+        """)
+        referencia = {'por_id': {}, 'por_nome': {}}
+        for subgrupo_id, subgrupo_nome, grupo_id, grupo_nome in self.cursor.fetchall():
+            referencia['por_id'][subgrupo_id] = (grupo_nome, subgrupo_nome)
+            referencia['por_nome'][(subgrupo_nome, grupo_id)] = subgrupo_id
+
+        with _referencia_lock:
+            _referencia_subgrupos = referencia
+        return referencia
+
+    def id_subgrupo(self, nome, grupo_id):
+        """Id do subgrupo pelo nome dentro do grupo (None se não existir)."""
+        return self.referencia_subgrupos()['por_nome'].get((nome, grupo_id))
+
+    def buscar_dados_empresa(self, empresa_id, ano_selecionado):
+        """
+        Busca todos os dados de uma empresa para um ANO específico (SEM mês).
+        Agora recebe diretamente o empresa_id.
+
+        As cinco tabelas de itens (e a verificação da empresa) são lidas em uma
+        única consulta UNION ALL; grupo e subgrupo vêm do cache de referência.
+        Cada lista mantém o formato de antes: (grupo, subgrupo, descricao, ...).
+        """
+        try:
+            sql = """
+                SELECT 0 AS fonte, 0 AS id, NULL AS subgrupo_id, NULL AS descricao, NULL AS v1, NULL AS v2, NULL AS v3
+                FROM empresas WHERE id = %s
+                UNION ALL
+                SELECT 1, id, subgrupo_id, descricao, porcentagem, valor, NULL
+                FROM TbItens WHERE empresa_id = %s AND ano = %s
+                UNION ALL
+                SELECT 2, id, subgrupo_id, descricao, valor_parc, valor_juros, valor_total_parc
+                FROM TbItensInvestimentos WHERE empresa_id = %s AND ano = %s
+                UNION ALL
+                SELECT 3, id, subgrupo_id, descricao, valor_parc, valor_juros, valor_total_parc
+                FROM TbItensDividas WHERE empresa_id = %s AND ano = %s
+                UNION ALL
+                SELECT 4, id, subgrupo_id, descricao, valor, NULL, NULL
+                FROM TbItensInvestimentoGeral WHERE empresa_id = %s AND ano = %s
+                UNION ALL
+                SELECT 5, id, subgrupo_id, descricao, valor_custo_km, valor_mensal, NULL
+                FROM TbItensGastosOperacionais WHERE empresa_id = %s AND ano = %s
+                ORDER BY fonte, id
             """
-            self.cursor.execute(sql_gastos, (empresa_id, ano_selecionado))
-            resultado["TbItensGastosOperacionais"] = self.cursor.fetchall()
+            params = (empresa_id,) + (empresa_id, ano_selecionado) * 5
+            self.cursor.execute(sql, params)
+            rows = self.cursor.fetchall()
+
+            # 1. Verificar se a empresa existe
+            if not rows or rows[0][0] != 0:
+                raise Exception(f"Empresa com ID '{empresa_id}' não encontrada na tabela empresas.")
+
+            # Tabela de origem e quantidade de colunas de valor de cada fonte
+            fontes = {
+                1: ("TbItens", 2),
+                2: ("TbItensInvestimentos", 3),
+                3: ("TbItensDividas", 3),
+                4: ("TbItensInvestimentoGeral", 1),
+                5: ("TbItensGastosOperacionais", 2),
+            }
+            resultado = {tabela: [] for tabela, _ in fontes.values()}
+
+            por_id = self.referencia_subgrupos()['por_id']
+            for fonte, _, subgrupo_id, descricao, v1, v2, v3 in rows[1:]:
+                nomes = por_id.get(subgrupo_id)
+                if nomes is None:
+                    nomes = self.referencia_subgrupos(recarregar=True)['por_id'].get(subgrupo_id, (None, None))
+                tabela, colunas = fontes[fonte]
+                resultado[tabela].append(nomes + (descricao,) + (v1, v2, v3)[:colunas])
 
             return resultado
 
-        except mysql.connector.Error as err:
+        except DB_ERRORS as err:
             logger.error(f"Erro ao buscar dados: {err}")
             return None
 
@@ -310,17 +393,113 @@ class CompanyManager(DatabaseConnection):
                     (empresa_id, ano_selecionado)
                 )
 
-            # 4. Commit final
+            # 4. Snapshot passa a refletir o ano vazio (nova versão invalida o ETag)
+            self._gravar_snapshot_viabilidade(empresa_id, ano_selecionado)
+
+            # 5. Commit final
             self.connection.commit()
-            logger.debug(f"Dados excluídos para empresa_id={empresa_id}, ano={ano_selecionado}")
+            logger.debug("Dados excluídos para empresa_id=%s, ano=%s", empresa_id, ano_selecionado)
             return True
 
-        except mysql.connector.Error as err:
+        except DB_ERRORS as err:
             logger.error(f"Erro ao excluir dados: {err}")
             self.connection.rollback()
             return False
 
 
+    # ============================
+    # SNAPSHOT DE VIABILIDADE (DADOS ORGANIZADOS PARA AS APIs)
+    # ============================
+
+    def _gravar_snapshot_viabilidade(self, empresa_id, ano):
+        """
+        Monta {grupo: {subgrupo: [itens]}} a partir das tabelas de itens e grava
+        em TbViabilidadeSnapshot, incrementando a versão. Não faz commit: roda
+        dentro da transação de quem alterou os itens.
+
+        Returns:
+            tuple: (versao, dados_json) ou None se a leitura dos itens falhar
+        """
+        from controllers.data_processing.viabilidade import (
+            organizar_dados_viabilidade, serializar_dados_viabilidade
+        )
+
+        data_results = self.buscar_dados_empresa(empresa_id, ano)
+        if data_results is None:
+            # Snapshot desatualizado fica vazio (e com nova versão) até ser remontado
+            self.cursor.execute(
+                "UPDATE TbViabilidadeSnapshot SET versao = versao + 1, dados_json = '' "
+                "WHERE empresa_id = %s AND ano = %s",
+                (empresa_id, ano)
+            )
+            return None
+
+        dados_json = serializar_dados_viabilidade(organizar_dados_viabilidade(data_results))
+        self.cursor.execute(
+            self.backend.upsert(
+                'TbViabilidadeSnapshot', ('empresa_id', 'ano', 'versao', 'dados_json'), ('empresa_id', 'ano'),
+                atualizar=('dados_json',), expressoes={'versao': 'versao + 1'}
+            ),
+            (empresa_id, ano, 1, dados_json)
+        )
+        self.cursor.execute(
+            "SELECT versao FROM TbViabilidadeSnapshot WHERE empresa_id = %s AND ano = %s",
+            (empresa_id, ano)
+        )
+        versao = self.cursor.fetchone()[0]
+        logger.debug("Snapshot de viabilidade gravado: empresa_id=%s, ano=%s, versão %s", empresa_id, ano, versao)
+        return versao, dados_json
+
+    def buscar_snapshot_viabilidade(self, empresa_id, ano):
+        """
+        Retorna (versao, dados_json) do snapshot da empresa/ano, ou None se
+        ainda não existir (ou se precisar ser remontado).
+        """
+        try:
+            self.cursor.execute(
+                "SELECT versao, dados_json FROM TbViabilidadeSnapshot WHERE empresa_id = %s AND ano = %s",
+                (empresa_id, ano)
+            )
+            row = self.cursor.fetchone()
+            return (row[0], row[1]) if row and row[1] else None
+        except DB_ERRORS as err:
+            logger.error(f"Erro ao buscar snapshot de viabilidade: {err}")
+            return None
+
+    def preencher_snapshots_viabilidade(self):
+        """
+        Grava o snapshot das empresas/anos que têm itens mas ainda não têm
+        snapshot válido (dados enviados antes de TbViabilidadeSnapshot existir).
+
+        Returns:
+            int: quantidade de snapshots gravados
+        """
+        try:
+            anos = " UNION ".join(f"SELECT empresa_id, ano FROM {tabela}" for tabela in TABELAS_VIABILIDADE)
+            self.cursor.execute(f"""
+                SELECT i.empresa_id, i.ano
+                FROM ({anos}) i
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM TbViabilidadeSnapshot s
+                    WHERE s.empresa_id = i.empresa_id AND s.ano = i.ano AND s.dados_json <> ''
+                )
+            """)
+            pendentes = self.cursor.fetchall()
+
+            for empresa_id, ano in pendentes:
+                self._gravar_snapshot_viabilidade(empresa_id, ano)
+                self.connection.commit()
+
+            if pendentes:
+                logger.info("✓ Snapshots de viabilidade preenchidos para %d empresas/anos", len(pendentes))
+            return len(pendentes)
+
+        except DB_ERRORS as err:
+            logger.error(f"Erro ao preencher snapshots de viabilidade: {err}")
+            self.connection.rollback()
+            return 0
+
+
     def get_anos_com_dados(self, empresa_id):
         """
         Retorna uma lista com os anos em que existem dados para a empresa.
@@ -340,7 +519,7 @@ class CompanyManager(DatabaseConnection):
             anos = [r[0] for r in rows]
             return anos
 
-        except mysql.connector.Error as err:
+        except DB_ERRORS as err:
             logger.error(f"get_anos_com_dados: {err}")
             return []
 
@@ -370,11 +549,64 @@ class CompanyManager(DatabaseConnection):
 
             return dados_por_ano
 
-        except mysql.connector.Error as err:
+        except DB_ERRORS as err:
             logger.error(f"get_meses_com_dados_bpo: {err}")
             return {}
 
 
+    def get_inventario_uploads(self, empresa_ids=None):
+        """
+        Retorna, em duas consultas agrupadas, os anos com dados de Viabilidade
+        e os meses com dados BPO de várias empresas (ou de todas, se
+        empresa_ids for None). Substitui chamar get_anos_com_dados e
+        get_meses_com_dados_bpo empresa por empresa.
+
+        Returns:
+            tuple: (uploads, uploads_bpo)
+                uploads:     {empresa_id: [2025, 2024, ...]}
+                uploads_bpo: {empresa_id: {2025: [12, 11, ...], ...}}
+        """
+        uploads = {}
+        uploads_bpo = {}
+
+        if empresa_ids is not None:
+            empresa_ids = list(empresa_ids)
+            if not empresa_ids:
+                return uploads, uploads_bpo
+            filtro = f"WHERE empresa_id IN ({', '.join(['%s'] * len(empresa_ids))})"
+            params = tuple(empresa_ids)
+        else:
+            filtro = ""
+            params = ()
+
+        try:
+            self.cursor.execute(f"""
+                SELECT empresa_id, ano
+                FROM TbItens
+                {filtro}
+                GROUP BY empresa_id, ano
+                ORDER BY empresa_id, ano DESC
+            """, params)
+            for empresa_id, ano in self.cursor.fetchall():
+                uploads.setdefault(empresa_id, []).append(ano)
+
+            self.cursor.execute(f"""
+                SELECT empresa_id, ano, mes
+                FROM TbBpoDados
+                {filtro}
+                GROUP BY empresa_id, ano, mes
+                ORDER BY empresa_id, ano DESC, mes DESC
+            """, params)
+            for empresa_id, ano, mes in self.cursor.fetchall():
+                uploads_bpo.setdefault(empresa_id, {}).setdefault(ano, []).append(mes)
+
+            return uploads, uploads_bpo
+
+        except DB_ERRORS as err:
+            logger.error(f"get_inventario_uploads: {err}")
+            return {}, {}
+
+
     def verificar_dados_existentes(self, empresa_id, ano):
         """
         Verifica se existem dados para uma empresa em um ano específico.
@@ -392,7 +624,7 @@ class CompanyManager(DatabaseConnection):
 
             return row[0] > 0 if row else False
 
-        except mysql.connector.Error as err:
+        except DB_ERRORS as err:
             logger.error(f"verificar_dados_existentes: {err}")
             return False
 
@@ -401,61 +633,81 @@ class CompanyManager(DatabaseConnection):
     # MIGRAÇÕES DO BANCO DE DADOS
     # ============================
 
+    def executar_migracoes(self):
+        """
+        Executa as migrações da tabela empresas (CNPJ sem UNIQUE, coluna ativo)
+        apenas na primeira chamada do processo.
+        """
+        global _migracoes_executadas
+
+        if _migracoes_executadas:
+            return
+        self.remover_unique_cnpj()  # Permitir CNPJ duplicado (matriz/filiais)
+        self.adicionar_coluna_ativo_se_nao_existir()  # Adicionar coluna ativo
+        self.criar_indices_empresas()  # Índices da listagem paginada e da busca
+        self.preencher_totais_bpo()  # Totais da carteira para meses enviados antes de TbBpoTotais
+        self.preencher_snapshots_viabilidade()  # Snapshots para anos enviados antes de TbViabilidadeSnapshot
+        _migracoes_executadas = True
+
     def remover_unique_cnpj(self):
         """
         Remove a constraint UNIQUE do campo CNPJ para permitir empresas duplicadas (matriz/filiais).
         """
         try:
             # Verificar se o CNPJ tem unique constraint
-            self.cursor.execute("""
-                SELECT COUNT(*)
-                FROM information_schema.STATISTICS
-                WHERE TABLE_SCHEMA = DATABASE()
-                AND TABLE_NAME = 'empresas'
-                AND COLUMN_NAME = 'cnpj'
-                AND NON_UNIQUE = 0
-            """)
-            tem_unique = self.cursor.fetchone()[0] > 0
+            indexes = self.backend.indices_unicos(self.cursor, 'empresas', 'cnpj')
 
-            if tem_unique:
+            if indexes:
                 logger.info("CNPJ tem constraint UNIQUE. Removendo...")
-
-                # Tentar remover pela constraint padrão
-                try:
-                    self.cursor.execute("ALTER TABLE empresas DROP INDEX cnpj")
-                    self.connection.commit()
-                    logger.info("✓ Constraint UNIQUE do CNPJ removida! Agora permite duplicatas (matriz/filiais).")
-                    return True
-                except mysql.connector.Error as err:
-                    logger.error(f"Erro ao remover index 'cnpj': {err}")
-                    # Tentar listar e remover outros indexes
-                    self.cursor.execute("""
-                        SELECT DISTINCT INDEX_NAME
-                        FROM information_schema.STATISTICS
-                        WHERE TABLE_SCHEMA = DATABASE()
-                        AND TABLE_NAME = 'empresas'
-                        AND COLUMN_NAME = 'cnpj'
-                        AND NON_UNIQUE = 0
-                        AND INDEX_NAME != 'PRIMARY'
-                    """)
-                    indexes = self.cursor.fetchall()
-                    for idx in indexes:
-                        try:
-                            self.cursor.execute(f"ALTER TABLE empresas DROP INDEX {idx[0]}")
-                            self.connection.commit()
-                            logger.info(f"✓ Index '{idx[0]}' removido do CNPJ.")
-                        except:
-                            pass
-                    return True
+                for idx in indexes:
+                    try:
+                        self.cursor.execute(self.backend.drop_index('empresas', idx))
+                        self.connection.commit()
+                        logger.info("✓ Index '%s' removido do CNPJ.", idx)
+                    except DB_ERRORS as err:
+                        logger.error(f"Erro ao remover index '{idx}': {err}")
+                logger.info("✓ Constraint UNIQUE do CNPJ removida! Agora permite duplicatas (matriz/filiais).")
+                return True
             else:
                 logger.info("CNPJ já permite duplicatas.")
                 return False
 
-        except mysql.connector.Error as err:
+        except DB_ERRORS as err:
             logger.error(f"Erro ao remover UNIQUE do CNPJ: {err}")
             self.connection.rollback()
             return False
 
+    def criar_indices_empresas(self):
+        """
+        Cria os índices usados pela listagem paginada (ativo, nome, id) e pela
+        busca (prefixo de nome/seguimento/CNPJ e FULLTEXT em nome + seguimento).
+        """
+        indices = {
+            'idx_empresas_ordem': "CREATE INDEX idx_empresas_ordem ON empresas (ativo, nome, id)",
+            'idx_empresas_nome': "CREATE INDEX idx_empresas_nome ON empresas (nome)",
+            'idx_empresas_seguimento': "CREATE INDEX idx_empresas_seguimento ON empresas (seguimento)",
+            'idx_empresas_cnpj': "CREATE INDEX idx_empresas_cnpj ON empresas (cnpj)",
+            'ft_empresas_busca': "CREATE FULLTEXT INDEX ft_empresas_busca ON empresas (nome, seguimento)",
+        }
+        if not self.backend.suporta_fulltext:
+            # Sem FULLTEXT a busca por palavras usa LIKE (ver buscar_empresas)
+            del indices['ft_empresas_busca']
+        try:
+            existentes = {nome for _, nome in self.backend.indices_existentes(self.cursor, 'empresas')}
+
+            for nome, ddl in indices.items():
+                if nome in existentes:
+                    continue
+                try:
+                    self.cursor.execute(ddl)
+                    self.connection.commit()
+                    logger.info("✓ Índice %s criado na tabela empresas", nome)
+                except DB_ERRORS as err:
+                    logger.error(f"Erro ao criar índice {nome}: {err}")
+
+        except DB_ERRORS as err:
+            logger.error(f"Erro ao verificar índices da tabela empresas: {err}")
+
     def adicionar_coluna_ativo_se_nao_existir(self):
         """
         Adiciona a coluna 'ativo' na tabela empresas se ela não existir.
@@ -463,14 +715,7 @@ class CompanyManager(DatabaseConnection):
         """
         try:
             # Verificar se a coluna já existe
-            self.cursor.execute("""
-                SELECT COUNT(*)
-                FROM information_schema.COLUMNS
-                WHERE TABLE_SCHEMA = DATABASE()
-                AND TABLE_NAME = 'empresas'
-                AND COLUMN_NAME = 'ativo'
-            """)
-            existe = self.cursor.fetchone()[0] > 0
+            existe = 'ativo' in self.backend.colunas_existentes(self.cursor, 'empresas')
 
             if not existe:
                 logger.info("Coluna 'ativo' não existe. Criando...")
@@ -485,7 +730,7 @@ class CompanyManager(DatabaseConnection):
                 logger.info("Coluna 'ativo' já existe na tabela empresas.")
                 return False
 
-        except mysql.connector.Error as err:
+        except DB_ERRORS as err:
             logger.error(f"Erro ao adicionar coluna 'ativo': {err}")
             self.connection.rollback()
             return False
@@ -510,10 +755,10 @@ class CompanyManager(DatabaseConnection):
             self.connection.commit()
 
             empresa_id = self.cursor.lastrowid
-            logger.debug(f"Empresa '{nome}' criada com sucesso. ID: {empresa_id}")
+            logger.debug("Empresa '%s' criada com sucesso. ID: %s", nome, empresa_id)
             return empresa_id
 
-        except mysql.connector.Error as err:
+        except DB_ERRORS as err:
             logger.error(f"Erro ao criar empresa: {err}")
             self.connection.rollback()
             return None
@@ -540,7 +785,7 @@ class CompanyManager(DatabaseConnection):
                 }
             return None
 
-        except mysql.connector.Error as err:
+        except DB_ERRORS as err:
             logger.error(f"Erro ao buscar empresa: {err}")
             return None
 
@@ -566,7 +811,7 @@ class CompanyManager(DatabaseConnection):
                 }
             return None
 
-        except mysql.connector.Error as err:
+        except DB_ERRORS as err:
             logger.error(f"Erro ao buscar empresa por CNPJ: {err}")
             return None
 
@@ -600,10 +845,184 @@ class CompanyManager(DatabaseConnection):
 
             return empresas
 
-        except mysql.connector.Error as err:
+        except DB_ERRORS as err:
             logger.error(f"Erro ao listar empresas: {err}")
             return []
 
+    # ============================
+    # LISTAGEM PAGINADA E BUSCA
+    # ============================
+
+    COLUNAS_EMPRESA = "id, nome, cnpj, website, telefone, email, cep, complemento, seguimento, created_at, ativo"
+
+    @staticmethod
+    def _empresa_de_linha(row):
+        return {
+            'id': row[0],
+            'nome': row[1],
+            'cnpj': row[2],
+            'website': row[3],
+            'telefone': row[4],
+            'email': row[5],
+            'cep': row[6],
+            'complemento': row[7],
+            'seguimento': row[8],
+            'created_at': row[9],
+            'ativo': row[10]
+        }
+
+    @staticmethod
+    def _prefixo_like(termo):
+        """Padrão LIKE 'termo%' com os curingas do próprio termo escapados."""
+        return termo.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+
+    @staticmethod
+    def _mascarar_cnpj_parcial(digitos):
+        """Aplica a máscara 00.000.000/0000-00 ao início de CNPJ digitado só com números."""
+        mascara = ''
+        for i, digito in enumerate(digitos[:14]):
+            if i in (2, 5):
+                mascara += '.'
+            elif i == 8:
+                mascara += '/'
+            elif i == 12:
+                mascara += '-'
+            mascara += digito
+        return mascara
+
+    def _filtro_busca_empresas(self, termo):
+        """Condição de busca por prefixo em nome, seguimento ou CNPJ (com ou sem máscara)."""
+        prefixo = self._prefixo_like(termo)
+        condicoes = ["nome LIKE %s", "seguimento LIKE %s", "cnpj LIKE %s"]
+        params = [prefixo, prefixo, prefixo]
+
+        digitos = ''.join(c for c in termo if c.isdigit())
+        if digitos and digitos != termo:
+            condicoes.append("cnpj LIKE %s")
+            params.append(self._prefixo_like(digitos))
+        if digitos == termo and len(digitos) > 2:
+            condicoes.append("cnpj LIKE %s")
+            params.append(self._prefixo_like(self._mascarar_cnpj_parcial(digitos)))
+
+        return "(" + " OR ".join(condicoes) + ")", params
+
+    def listar_empresas_pagina(self, limite=50, apos=None, busca=None):
+        """
+        Lista empresas em páginas (paginação por chave, sem OFFSET), na mesma
+        ordem de listar_todas_empresas: ativas primeiro, depois por nome.
+
+        Args:
+            limite (int): Quantidade de empresas por página
+            apos (tuple): (ativo, nome, id) da última empresa da página anterior
+            busca (str): Filtro opcional por prefixo de nome, seguimento ou CNPJ
+
+        Returns:
+            tuple: (empresas, proximo) - proximo é o (ativo, nome, id) para a
+                   página seguinte ou None se esta for a última
+        """
+        condicoes = []
+        params = []
+
+        if busca:
+            condicao, params_busca = self._filtro_busca_empresas(busca)
+            condicoes.append(condicao)
+            params.extend(params_busca)
+
+        if apos:
+            ativo, nome, empresa_id = apos
+            condicoes.append("(ativo < %s OR (ativo = %s AND (nome > %s OR (nome = %s AND id > %s))))")
+            params.extend([ativo, ativo, nome, nome, empresa_id])
+
+        where = ("WHERE " + " AND ".join(condicoes)) if condicoes else ""
+
+        try:
+            sql = f"""
+                SELECT {self.COLUNAS_EMPRESA}
+                FROM empresas
+                {where}
+                ORDER BY ativo DESC, nome ASC, id ASC
+                LIMIT %s
+            """
+            self.cursor.execute(sql, tuple(params) + (limite + 1,))
+            rows = self.cursor.fetchall()
+
+            empresas = [self._empresa_de_linha(row) for row in rows[:limite]]
+            proximo = None
+            if len(rows) > limite:
+                ultima = empresas[-1]
+                proximo = (int(ultima['ativo']), ultima['nome'], ultima['id'])
+
+            return empresas, proximo
+
+        except DB_ERRORS as err:
+            logger.error(f"Erro ao listar página de empresas: {err}")
+            return [], None
+
+    def contar_empresas(self, busca=None):
+        """Retorna a quantidade de empresas (opcionalmente filtradas pela busca)."""
+        try:
+            if busca:
+                condicao, params = self._filtro_busca_empresas(busca)
+                self.cursor.execute(f"SELECT COUNT(*) FROM empresas WHERE {condicao}", tuple(params))
+            else:
+                self.cursor.execute("SELECT COUNT(*) FROM empresas")
+            return self.cursor.fetchone()[0]
+
+        except DB_ERRORS as err:
+            logger.error(f"Erro ao contar empresas: {err}")
+            return 0
+
+    def buscar_empresas(self, termo, limite=10):
+        """
+        Busca para autocompletar: prefixo de nome, seguimento e CNPJ (cada um
+        pelo seu índice) e, a partir de 3 caracteres, palavras em qualquer
+        posição do nome/seguimento pelo índice FULLTEXT.
+
+        Returns:
+            list: [{'id', 'nome', 'cnpj', 'seguimento', 'ativo'}, ...]
+        """
+        termo = (termo or '').strip()
+        if not termo:
+            return []
+
+        colunas = "id, nome, cnpj, seguimento, ativo"
+        prefixo = self._prefixo_like(termo)
+        # Cada parte como tabela derivada: ORDER BY/LIMIT por parte em qualquer backend
+        parte = "SELECT * FROM (SELECT {colunas} FROM empresas WHERE {condicao} {ordem} LIMIT %s) AS b{n}"
+        partes = [
+            parte.format(colunas=colunas, condicao="nome LIKE %s", ordem="ORDER BY nome", n=1),
+            parte.format(colunas=colunas, condicao="seguimento LIKE %s", ordem="ORDER BY nome", n=2),
+        ]
+        params = [prefixo, limite, prefixo, limite]
+
+        digitos = ''.join(c for c in termo if c.isdigit())
+        if digitos:
+            cnpj = termo if digitos != termo else self._mascarar_cnpj_parcial(digitos)
+            partes.append(parte.format(colunas=colunas, condicao="cnpj LIKE %s", ordem="ORDER BY cnpj", n=3))
+            params.extend([self._prefixo_like(cnpj), limite])
+
+        palavras = [
+            ''.join(c for c in palavra if c.isalnum())
+            for palavra in termo.split()
+        ]
+        palavras = [palavra for palavra in palavras if len(palavra) >= 3]
+        if palavras:
+            condicao, params_palavras = self.backend.condicao_palavras(('nome', 'seguimento'), palavras)
+            partes.append(parte.format(colunas=colunas, condicao=condicao, ordem="", n=4))
+            params.extend(params_palavras + [limite])
+
+        try:
+            sql = " UNION ".join(partes) + " ORDER BY ativo DESC, nome ASC LIMIT %s"
+            self.cursor.execute(sql, tuple(params) + (limite,))
+            return [
+                {'id': row[0], 'nome': row[1], 'cnpj': row[2], 'seguimento': row[3], 'ativo': bool(row[4])}
+                for row in self.cursor.fetchall()
+            ]
+
+        except DB_ERRORS as err:
+            logger.error(f"Erro na busca de empresas: {err}")
+            return []
+
     def atualizar_empresa(self, empresa_id, nome, cnpj, telefone, email, cep, complemento, seguimento, website=None):
         """Atualiza os dados de uma empresa."""
         try:
@@ -617,10 +1036,14 @@ class CompanyManager(DatabaseConnection):
             self.cursor.execute(sql, values)
             self.connection.commit()
 
-            logger.debug(f"Empresa ID {empresa_id} atualizada com sucesso.")
+            logger.debug("Empresa ID %s atualizada com sucesso.", empresa_id)
+
+            # Lista de empresas em cache dos usuários vinculados fica desatualizada
+            from controllers.auth.acesso import invalidar_acesso
+            invalidar_acesso()
             return True
 
-        except mysql.connector.Error as err:
+        except DB_ERRORS as err:
             logger.error(f"Erro ao atualizar empresa: {err}")
             self.connection.rollback()
             return False
@@ -631,14 +1054,25 @@ class CompanyManager(DatabaseConnection):
         ATENÇÃO: Isso também deletará todos os dados relacionados (CASCADE).
         """
         try:
+            # Tabelas de Viabilidade particionadas por ano não têm FK/CASCADE
+            for tabela in TABELAS_VIABILIDADE:
+                self.cursor.execute(f"DELETE FROM {tabela} WHERE empresa_id = %s", (empresa_id,))
+
             sql = "DELETE FROM empresas WHERE id = %s"
             self.cursor.execute(sql, (empresa_id,))
             self.connection.commit()
 
-            logger.debug(f"Empresa ID {empresa_id} deletada com sucesso.")
+            logger.debug("Empresa ID %s deletada com sucesso.", empresa_id)
+
+            # Lista de empresas em cache dos usuários vinculados fica desatualizada
+            from controllers.auth.acesso import invalidar_acesso
+            invalidar_acesso()
+
+            from controllers.data_processing.bpo_colunar import invalidar_historico
+            invalidar_historico(empresa_id)
             return True
 
-        except mysql.connector.Error as err:
+        except DB_ERRORS as err:
             logger.error(f"Erro ao deletar empresa: {err}")
             self.connection.rollback()
             return False
@@ -653,10 +1087,14 @@ class CompanyManager(DatabaseConnection):
             self.cursor.execute(sql, (empresa_id,))
             self.connection.commit()
 
-            logger.debug(f"Empresa ID {empresa_id} inativada com sucesso.")
+            logger.debug("Empresa ID %s inativada com sucesso.", empresa_id)
+
+            # Lista de empresas em cache dos usuários vinculados fica desatualizada
+            from controllers.auth.acesso import invalidar_acesso
+            invalidar_acesso()
             return True
 
-        except mysql.connector.Error as err:
+        except DB_ERRORS as err:
             logger.error(f"Erro ao inativar empresa: {err}")
             self.connection.rollback()
             return False
@@ -670,10 +1108,14 @@ class CompanyManager(DatabaseConnection):
             self.cursor.execute(sql, (empresa_id,))
             self.connection.commit()
 
-            logger.debug(f"Empresa ID {empresa_id} ativada com sucesso.")
+            logger.debug("Empresa ID %s ativada com sucesso.", empresa_id)
+
+            # Lista de empresas em cache dos usuários vinculados fica desatualizada
+            from controllers.auth.acesso import invalidar_acesso
+            invalidar_acesso()
             return True
 
-        except mysql.connector.Error as err:
+        except DB_ERRORS as err:
             logger.error(f"Erro ao ativar empresa: {err}")
             self.connection.rollback()
             return False
@@ -687,57 +1129,148 @@ class CompanyManager(DatabaseConnection):
         Salva dados BPO processados para empresa/ano/mês específico.
         IMPORTANTE: Preserva o percentual_mp_manual se já existir!
         """
-        try:
-            import json
+        return self.salvar_dados_bpo_lote(empresa_id, [(ano, mes, dados_processados)])
 
-            # Verificar se empresa existe
+    def salvar_dados_bpo_lote(self, empresa_id, meses):
+        """
+        Salva vários meses BPO da empresa em uma única transação: ou todos os
+        meses ficam visíveis, ou nenhum. Os meses são gravados com upsert
+        (chave unique_empresa_ano_mes) em executemany de até LOTE_MESES_BPO
+        meses, então um iterador é consumido aos poucos, sem manter todos os
+        meses na memória. Ele é consumido com a transação aberta: o trabalho
+        caro (ler o arquivo) deve acontecer antes, como em
+        process_bpo_file_por_mes, que lê a planilha na chamada e só monta os
+        meses sob demanda.
+        IMPORTANTE: Preserva o percentual_mp_manual existente quando o mês
+        novo não traz um.
+
+        Args:
+            empresa_id (int): ID da empresa
+            meses (iterable): (ano, mes, dados_processados)
+
+        Returns:
+            bool: True se todos os meses foram gravados
+
+        Raises:
+            Exception: erros de quem gera os meses (ex.: leitura da planilha)
+                são repassados depois do rollback
+        """
+        import json
+        from controllers.data_processing.bpo_file_processing import hash_mes_bpo
+
+        try:
             self.cursor.execute("SELECT id FROM empresas WHERE id = %s", (empresa_id,))
             if not self.cursor.fetchone():
-                raise Exception(f"Empresa ID {empresa_id} não encontrada")
-
-            # IMPORTANTE: Buscar percentual_mp_manual existente antes de deletar
-            percentual_mp_existente = None
-            sql_buscar = "SELECT dados_json FROM TbBpoDados WHERE empresa_id = %s AND ano = %s AND mes = %s"
-            self.cursor.execute(sql_buscar, (empresa_id, ano, mes))
-            row_existente = self.cursor.fetchone()
+                logger.error(f"Erro ao salvar dados BPO: Empresa ID {empresa_id} não encontrada")
+                return False
 
-            if row_existente:
+            # Percentuais MP já gravados (uma consulta; só decodifica os meses que têm percentual)
+            self.cursor.execute(
+                "SELECT ano, mes, dados_json FROM TbBpoDados WHERE empresa_id = %s AND dados_json LIKE %s",
+                (empresa_id, '%"percentual_mp_manual"%')
+            )
+            percentuais = {}
+            for ano, mes, dados_json in self.cursor.fetchall():
                 try:
-                    dados_antigos = json.loads(row_existente[0])
-                    percentual_mp_existente = dados_antigos.get('percentual_mp_manual')
-                    if percentual_mp_existente is not None:
-                        logger.debug(f"Preservando percentual_mp_manual existente: {percentual_mp_existente}% para {mes}/{ano}")
-                except:
-                    pass
-
-            # Preservar percentual_mp_manual nos novos dados
-            if percentual_mp_existente is not None:
-                dados_processados['percentual_mp_manual'] = percentual_mp_existente
-
-            # Converter dados para JSON
-            dados_json = json.dumps(dados_processados, ensure_ascii=False)
+                    percentual = json.loads(dados_json).get('percentual_mp_manual')
+                except ValueError:
+                    continue
+                if percentual is not None:
+                    percentuais[(ano, mes)] = percentual
 
-            # Deletar dados antigos do mesmo período
-            self.cursor.execute(
-                "DELETE FROM TbBpoDados WHERE empresa_id = %s AND ano = %s AND mes = %s",
-                (empresa_id, ano, mes)
+            sql_dados = self.backend.upsert(
+                'TbBpoDados', ('empresa_id', 'ano', 'mes', 'dados_json', 'hash_conteudo'), ('empresa_id', 'ano', 'mes'),
+                atualizar=('dados_json', 'hash_conteudo'), expressoes={'created_at': 'CURRENT_TIMESTAMP'}
             )
+            gravados = 0
+            linhas_dados = []
+            linhas_totais = []
+            periodos = []
+
+            for ano, mes, dados in meses:
+                if dados.get('percentual_mp_manual') is None and (ano, mes) in percentuais:
+                    dados['percentual_mp_manual'] = percentuais[(ano, mes)]
+                linhas_dados.append((empresa_id, ano, mes, json.dumps(dados, ensure_ascii=False), hash_mes_bpo(dados)))
+                linhas_totais.extend(self._linhas_totais_bpo(empresa_id, ano, mes, dados))
+                periodos.append((empresa_id, ano, mes))
+
+                if len(linhas_dados) == LOTE_MESES_BPO:
+                    self._gravar_lote_bpo(sql_dados, linhas_dados, linhas_totais, periodos)
+                    gravados += len(linhas_dados)
+                    linhas_dados, linhas_totais, periodos = [], [], []
+
+            if linhas_dados:
+                self._gravar_lote_bpo(sql_dados, linhas_dados, linhas_totais, periodos)
+                gravados += len(linhas_dados)
 
-            # Inserir novos dados (com percentual preservado)
-            sql = """
-                INSERT INTO TbBpoDados (empresa_id, ano, mes, dados_json)
-                VALUES (%s, %s, %s, %s)
-            """
-            self.cursor.execute(sql, (empresa_id, ano, mes, dados_json))
             self.connection.commit()
+            if gravados:
+                self._historico_bpo_alterado(empresa_id)
 
-            logger.debug(f"Dados BPO salvos: empresa_id={empresa_id}, ano={ano}, mes={mes}")
+            logger.debug("Dados BPO salvos: empresa_id=%s, meses=%s", empresa_id, gravados)
             return True
 
-        except Exception as err:
+        except DB_ERRORS as err:
             logger.error(f"Erro ao salvar dados BPO: {err}")
             self.connection.rollback()
             return False
+        except Exception:
+            self.connection.rollback()
+            raise
+
+    def _gravar_lote_bpo(self, sql_dados, linhas_dados, linhas_totais, periodos):
+        """Upsert dos meses em TbBpoDados e regravação dos seus totais (sem commit)."""
+        self.cursor.executemany(sql_dados, linhas_dados)
+        self.cursor.executemany(
+            "DELETE FROM TbBpoTotais WHERE empresa_id = %s AND ano = %s AND mes = %s", periodos
+        )
+        self._inserir_totais_bpo(linhas_totais)
+
+    def salvar_dados_bpo_incremental(self, empresa_id, meses):
+        """
+        Upload incremental: compara o hash de conteúdo de cada mês com o
+        gravado e salva (em lote) apenas os meses novos ou alterados.
+        Meses gravados antes do hash existir contam como alterados.
+
+        Args:
+            empresa_id (int): ID da empresa
+            meses (iterable): (ano, mes, dados_processados)
+
+        Returns:
+            dict: {'inalterados': [(ano, mes)], 'atualizados': [...], 'adicionados': [...]}
+                  ou None se a gravação falhar
+        """
+        from controllers.data_processing.bpo_file_processing import hash_mes_bpo
+
+        try:
+            self.cursor.execute(
+                "SELECT ano, mes, hash_conteudo FROM TbBpoDados WHERE empresa_id = %s", (empresa_id,)
+            )
+            hashes = {(ano, mes): hash_conteudo for ano, mes, hash_conteudo in self.cursor.fetchall()}
+        except DB_ERRORS as err:
+            logger.error(f"Erro ao buscar hashes BPO: {err}")
+            return None
+
+        resumo = {'inalterados': [], 'atualizados': [], 'adicionados': []}
+        alterados = []
+        for ano, mes, dados in meses:
+            if (ano, mes) not in hashes:
+                resumo['adicionados'].append((ano, mes))
+            elif hashes[(ano, mes)] == hash_mes_bpo(dados):
+                resumo['inalterados'].append((ano, mes))
+                continue
+            else:
+                resumo['atualizados'].append((ano, mes))
+            alterados.append((ano, mes, dados))
+
+        if not self.salvar_dados_bpo_lote(empresa_id, alterados):
+            return None
+
+        logger.info(
+            "Upload BPO incremental: empresa_id=%s, %d inalterados, %d atualizados, %d adicionados",
+            empresa_id, len(resumo['inalterados']), len(resumo['atualizados']), len(resumo['adicionados'])
+        )
+        return resumo
 
     def buscar_dados_bpo_empresa(self, empresa_id, ano, mes):
         """Busca dados BPO de empresa/ano/mês específico"""
@@ -764,6 +1297,34 @@ class CompanyManager(DatabaseConnection):
             logger.error(f"Erro ao buscar dados BPO: {err}")
             return None
 
+    def buscar_dados_bpo_periodo(self, empresa_id, ano_inicio, mes_inicio, ano_fim, mes_fim):
+        """
+        Busca em uma única consulta os meses BPO de empresa no período.
+
+        Returns:
+            list: [(ano, mes, dados)] em ordem cronológica
+        """
+        try:
+            import json
+
+            sql = """
+                SELECT ano, mes, dados_json
+                FROM TbBpoDados
+                WHERE empresa_id = %s
+                  AND ano BETWEEN %s AND %s
+                  AND ano * 100 + mes BETWEEN %s AND %s
+                ORDER BY ano, mes
+            """
+            self.cursor.execute(sql, (
+                empresa_id, ano_inicio, ano_fim,
+                ano_inicio * 100 + mes_inicio, ano_fim * 100 + mes_fim
+            ))
+            return [(ano, mes, json.loads(dados_json)) for ano, mes, dados_json in self.cursor.fetchall()]
+
+        except Exception as err:
+            logger.error(f"Erro ao buscar período BPO: {err}")
+            return []
+
     def atualizar_percentual_mp_manual(self, empresa_id, ano, mes, percentual):
         """
         Atualiza o percentual MP manual para um mês específico.
@@ -795,9 +1356,12 @@ class CompanyManager(DatabaseConnection):
                 WHERE empresa_id = %s AND ano = %s AND mes = %s
             """
             self.cursor.execute(sql_update, (dados_json_str, empresa_id, ano, mes))
+            # Resultado Real com MP depende do percentual manual
+            self._gravar_totais_bpo(empresa_id, ano, mes, dados_json)
             self.connection.commit()
+            self._historico_bpo_alterado(empresa_id)
 
-            logger.debug(f"Percentual MP manual atualizado: Empresa {empresa_id}, {mes}/{ano} = {percentual}%")
+            logger.debug("Percentual MP manual atualizado: Empresa %s, %s/%s = %s%%", empresa_id, mes, ano, percentual)
             return True
 
         except Exception as err:
@@ -810,9 +1374,14 @@ class CompanyManager(DatabaseConnection):
         try:
             sql = "DELETE FROM TbBpoDados WHERE empresa_id = %s AND ano = %s AND mes = %s"
             self.cursor.execute(sql, (empresa_id, ano, mes))
+            self.cursor.execute(
+                "DELETE FROM TbBpoTotais WHERE empresa_id = %s AND ano = %s AND mes = %s",
+                (empresa_id, ano, mes)
+            )
             self.connection.commit()
+            self._historico_bpo_alterado(empresa_id)
 
-            logger.debug(f"Dados BPO excluídos: empresa_id={empresa_id}, ano={ano}, mes={mes}")
+            logger.debug("Dados BPO excluídos: empresa_id=%s, ano=%s, mes=%s", empresa_id, ano, mes)
             return True
 
         except Exception as err:
@@ -820,6 +1389,114 @@ class CompanyManager(DatabaseConnection):
             self.connection.rollback()
             return False
 
+    def _historico_bpo_alterado(self, empresa_id):
+        """Invalida o histórico colunar da empresa; o novo arquivo é gravado no close()."""
+        from controllers.data_processing.bpo_colunar import invalidar_historico
+        if invalidar_historico(empresa_id):
+            self._historicos_bpo_pendentes.add(empresa_id)
+
+    # ============================
+    # TOTAIS BPO (VISÃO CONSOLIDADA DA CARTEIRA)
+    # ============================
+
+    def _gravar_totais_bpo(self, empresa_id, ano, mes, dados):
+        """
+        Regrava em TbBpoTotais os totais do mês por cenário de DRE.
+        Não faz commit: roda na transação de quem alterou TbBpoDados.
+        """
+        self.cursor.execute(
+            "DELETE FROM TbBpoTotais WHERE empresa_id = %s AND ano = %s AND mes = %s",
+            (empresa_id, ano, mes)
+        )
+        self._inserir_totais_bpo(self._linhas_totais_bpo(empresa_id, ano, mes, dados))
+
+    @staticmethod
+    def _linhas_totais_bpo(empresa_id, ano, mes, dados):
+        """Linhas de TbBpoTotais (uma por cenário de DRE) do mês."""
+        from controllers.data_processing.bpo_totais import totais_mes_bpo
+
+        return [
+            (empresa_id, ano, mes, cenario) + (valores['realizado'] or (0, 0, 0)) + (valores['orcamento'] or (0, 0, 0))
+            for cenario, valores in totais_mes_bpo(dados, mes).items()
+        ]
+
+    def _inserir_totais_bpo(self, linhas):
+        if linhas:
+            self.cursor.executemany("""
+                INSERT INTO TbBpoTotais (empresa_id, ano, mes, cenario,
+                    receita_realizado, despesa_realizado, geral_realizado,
+                    receita_orcado, despesa_orcado, geral_orcado)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            """, linhas)
+
+    def preencher_totais_bpo(self):
+        """
+        Preenche TbBpoTotais para os meses de TbBpoDados que ainda não têm
+        totais (dados enviados antes da tabela existir).
+
+        Returns:
+            int: quantidade de meses preenchidos
+        """
+        import json
+
+        try:
+            self.cursor.execute("""
+                SELECT d.empresa_id, d.ano, d.mes
+                FROM TbBpoDados d
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM TbBpoTotais t
+                    WHERE t.empresa_id = d.empresa_id AND t.ano = d.ano AND t.mes = d.mes
+                )
+            """)
+            pendentes = self.cursor.fetchall()
+
+            for empresa_id, ano, mes in pendentes:
+                self.cursor.execute(
+                    "SELECT dados_json FROM TbBpoDados WHERE empresa_id = %s AND ano = %s AND mes = %s",
+                    (empresa_id, ano, mes)
+                )
+                row = self.cursor.fetchone()
+                if row:
+                    self._gravar_totais_bpo(empresa_id, ano, mes, json.loads(row[0]))
+                self.connection.commit()
+
+            if pendentes:
+                logger.info("✓ Totais BPO preenchidos para %d meses", len(pendentes))
+            return len(pendentes)
+
+        except DB_ERRORS + (ValueError,) as err:
+            logger.error(f"Erro ao preencher totais BPO: {err}")
+            self.connection.rollback()
+            return 0
+
+    def consolidar_totais_bpo(self, ano_inicio, mes_inicio, ano_fim, mes_fim):
+        """
+        Soma os totais BPO de todas as empresas ativas no período, em uma única
+        consulta agrupada por empresa e cenário.
+
+        Returns:
+            list: tuplas (empresa_id, nome, cnpj, cenario, meses,
+                  receita_realizado, despesa_realizado, geral_realizado,
+                  receita_orcado, despesa_orcado, geral_orcado)
+        """
+        try:
+            self.cursor.execute("""
+                SELECT e.id, e.nome, e.cnpj, t.cenario, COUNT(*),
+                       SUM(t.receita_realizado), SUM(t.despesa_realizado), SUM(t.geral_realizado),
+                       SUM(t.receita_orcado), SUM(t.despesa_orcado), SUM(t.geral_orcado)
+                FROM TbBpoTotais t
+                JOIN empresas e ON e.id = t.empresa_id
+                WHERE e.ativo = TRUE
+                  AND t.ano BETWEEN %s AND %s
+                  AND t.ano * 100 + t.mes BETWEEN %s AND %s
+                GROUP BY e.id, e.nome, e.cnpj, t.cenario
+            """, (ano_inicio, ano_fim, ano_inicio * 100 + mes_inicio, ano_fim * 100 + mes_fim))
+            return self.cursor.fetchall()
+
+        except DB_ERRORS as err:
+            logger.error(f"Erro ao consolidar totais BPO: {err}")
+            return []
+
     def listar_meses_bpo_empresa(self, empresa_id):
         """Lista todos os meses de BPO disponíveis para uma empresa"""
         try:
@@ -839,13 +1516,98 @@ class CompanyManager(DatabaseConnection):
                     'mes': row[1]
                 })
 
-            logger.debug(f"Meses BPO listados: empresa_id={empresa_id}, total={len(meses)}")
+            logger.debug("Meses BPO listados: empresa_id=%s, total=%s", empresa_id, len(meses))
             return meses
 
         except Exception as err:
             logger.error(f"Erro ao listar meses BPO: {err}")
             return []
 
+    # ============================
+    # EXPORTAÇÃO EM MASSA (CURSOR SEM BUFFER)
+    # ============================
+
+    def _iterar_consulta(self, sql, params):
+        """
+        Gera as linhas da consulta em lotes de um cursor sem buffer: no MySQL
+        o resultado é lido do servidor aos poucos, sem carregar tudo na memória.
+        Use com um manager de conexão própria (compartilhada=False).
+        """
+        from models.cursor_instrumentado import novo_cursor
+
+        cursor = novo_cursor(self.connection, buffered=False)
+        try:
+            cursor.execute(sql, params)
+            while True:
+                linhas = cursor.fetchmany(LOTE_EXPORTACAO)
+                if not linhas:
+                    break
+                yield from linhas
+        finally:
+            try:
+                cursor.close()
+            except DB_ERRORS:
+                # Exportação interrompida com linhas não lidas: a conexão é descartada em seguida
+                pass
+
+    @staticmethod
+    def _filtro_empresas(coluna, empresa_ids):
+        if not empresa_ids:
+            return "", []
+        return f"WHERE {coluna} IN ({', '.join(['%s'] * len(empresa_ids))})", list(empresa_ids)
+
+    def iterar_exportacao_bpo(self, empresa_ids=None):
+        """
+        Meses BPO das empresas (todas se empresa_ids for vazio).
+
+        Yields:
+            tuple: (empresa_id, nome da empresa, ano, mes, dados_json)
+        """
+        filtro, params = self._filtro_empresas('d.empresa_id', empresa_ids)
+        sql = f"""
+            SELECT d.empresa_id, e.nome, d.ano, d.mes, d.dados_json
+            FROM TbBpoDados d
+            JOIN empresas e ON e.id = d.empresa_id
+            {filtro}
+            ORDER BY d.empresa_id, d.ano, d.mes
+        """
+        return self._iterar_consulta(sql, params)
+
+    def iterar_exportacao_viabilidade(self, empresa_ids=None):
+        """
+        Itens de viabilidade das empresas (todas se empresa_ids for vazio),
+        das cinco tabelas em uma consulta.
+
+        Yields:
+            tuple: (empresa_id, nome da empresa, ano, tabela, grupo, subgrupo,
+                    descricao) + as colunas de valor de COLUNAS_VALOR_VIABILIDADE
+        """
+        filtro, params = self._filtro_empresas('t.empresa_id', empresa_ids)
+        partes = []
+        for tabela in TABELAS_VIABILIDADE:
+            valores = ', '.join(
+                f"t.{coluna}" if coluna in COLUNAS_VIABILIDADE[tabela] else "NULL"
+                for coluna in COLUNAS_VALOR_VIABILIDADE
+            )
+            partes.append(f"""
+                SELECT t.empresa_id AS empresa_id, e.nome AS empresa, t.ano AS ano,
+                       '{tabela}' AS tabela, g.nome AS grupo, s.nome AS subgrupo,
+                       t.descricao AS descricao, {valores}
+                FROM {tabela} t
+                JOIN empresas e ON e.id = t.empresa_id
+                JOIN TbSubGrupo s ON s.id = t.subgrupo_id
+                JOIN TbGrupo g ON g.id = s.grupo_id
+                {filtro}
+            """)
+        sql = " UNION ALL ".join(partes) + " ORDER BY empresa_id, ano, tabela"
+        return self._iterar_consulta(sql, params * len(TABELAS_VIABILIDADE))
+
     def close(self):
         """Fecha a conexão com o banco de dados."""
+        # Um upload salva vários meses: o histórico colunar é regravado uma vez
+        if self._historicos_bpo_pendentes:
+            from controllers.data_processing.bpo_colunar import construir_historico
+            for empresa_id in sorted(self._historicos_bpo_pendentes):
+                construir_historico(empresa_id, self)
+            self._historicos_bpo_pendentes.clear()
         self.close_connection()
\ No newline at end of file
@@ -0,0 +1,219 @@
+"""
+Cursor Instrumentado / Profiler de SQL
+======================================
+
+Envolve o cursor do mysql-connector para medir cada execute/executemany.
+Para cada statement são registrados a impressão digital (SQL normalizado,
+sem literais), a duração e as linhas afetadas/retornadas:
+
+- tempo de banco e quantidade de queries alimentam utils/metrics.py
+- a mesma impressão digital repetida SQL_N1_LIMIAR vezes na mesma
+  requisição é sinalizada como N+1 (consulta dentro de loop)
+- queries acima de SQL_LENTA_MS são registradas no log junto com o EXPLAIN
+- em modo debug (ou com SQL_PERFIL=1) cada requisição gera um resumo no
+  log e os headers X-SQL-Queries, X-SQL-Tempo-Ms e X-SQL-N1
+
+Configuração (.env):
+    SQL_N1_LIMIAR   - repetições para considerar N+1 (padrão: 5)
+    SQL_LENTA_MS    - limite de query lenta em ms (padrão: 200)
+    SQL_PERFIL      - 1 para o resumo por requisição fora do modo debug
+
+Autor: WaysSolutionHub
+"""
+
+import os
+import re
+import time
+from functools import lru_cache
+from flask import g, request, current_app, has_request_context
+from utils.logger import get_logger
+from utils.metrics import registrar_query
+
+# Inicializar logger
+logger = get_logger('sql_profiler')
+
+SQL_N1_LIMIAR = int(os.getenv('SQL_N1_LIMIAR', '5'))
+SQL_LENTA_MS = float(os.getenv('SQL_LENTA_MS', '200'))
+SQL_PERFIL = os.getenv('SQL_PERFIL', '0') == '1'
+
+_RE_STRING = re.compile(r"'(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.)*\"")
+_RE_NUMERO = re.compile(r"\b\d+(?:\.\d+)?\b")
+_RE_PLACEHOLDER = re.compile(r"%s|%\(\w+\)s")
+_RE_LISTA = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_RE_VALUES = re.compile(r"(\(\?\+\)|\(\?\))(?:\s*,\s*(?:\(\?\+\)|\(\?\)))+")
+_RE_ESPACOS = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=1024)
+def impressao_digital(sql):
+    """
+    Normaliza o SQL para agrupar execuções do mesmo statement:
+    literais e placeholders viram '?', listas IN (...) e VALUES múltiplos
+    são colapsados e os espaços unificados.
+    """
+    if isinstance(sql, (bytes, bytearray)):
+        sql = sql.decode('utf-8', 'replace')
+    texto = _RE_STRING.sub('?', sql)
+    texto = _RE_PLACEHOLDER.sub('?', texto)
+    texto = _RE_NUMERO.sub('?', texto)
+    texto = _RE_ESPACOS.sub(' ', texto).strip()
+    texto = _RE_LISTA.sub('(?+)', texto)
+    texto = _RE_VALUES.sub(r'\1, ...', texto)
+    return texto
+
+
+# ============================================================================
+# PERFIL DA REQUISIÇÃO
+# ============================================================================
+
+class PerfilSql:
+    """Estatísticas de SQL acumuladas durante uma requisição."""
+
+    def __init__(self):
+        self.por_impressao = {}  # impressão digital -> [execuções, tempo_s, linhas]
+        self.n1 = set()
+        self.total_queries = 0
+        self.tempo_total = 0.0
+
+    def registrar(self, digital, duracao, linhas):
+        estat = self.por_impressao.get(digital)
+        if estat is None:
+            estat = self.por_impressao[digital] = [0, 0.0, 0]
+        estat[0] += 1
+        estat[1] += duracao
+        estat[2] += max(linhas, 0)
+        self.total_queries += 1
+        self.tempo_total += duracao
+        return estat[0]
+
+    def mais_custosas(self, limite=5):
+        return sorted(self.por_impressao.items(), key=lambda item: item[1][1], reverse=True)[:limite]
+
+
+def _perfil_atual():
+    if not has_request_context():
+        return None
+    perfil = g.get('perfil_sql')
+    if perfil is None:
+        perfil = g.perfil_sql = PerfilSql()
+    return perfil
+
+
+def _registrar_explain(connection, operation, params):
+    """Roda EXPLAIN da query lenta em um cursor separado (não contabilizado)."""
+    if connection is None or not impressao_digital(operation).upper().startswith('SELECT'):
+        return None
+    cursor = None
+    try:
+        cursor = connection.cursor(buffered=True)
+        cursor.execute(f"EXPLAIN {operation}", params)
+        colunas = [coluna[0] for coluna in cursor.description or ()]
+        return [dict(zip(colunas, linha)) for linha in cursor.fetchall()]
+    except Exception as e:
+        logger.debug("EXPLAIN indisponível: %s", e)
+        return None
+    finally:
+        if cursor is not None:
+            try:
+                cursor.close()
+            except Exception:
+                pass
+
+
+def _registrar_execucao(connection, operation, params, duracao, linhas):
+    registrar_query(duracao)
+    digital = impressao_digital(operation)
+
+    perfil = _perfil_atual()
+    if perfil is not None:
+        execucoes = perfil.registrar(digital, duracao, linhas)
+        if execucoes == SQL_N1_LIMIAR and digital not in perfil.n1:
+            perfil.n1.add(digital)
+            logger.warning(
+                "Possível N+1 em %s: statement executado %d vezes na requisição: %s",
+                request.endpoint, execucoes, digital
+            )
+
+    duracao_ms = duracao * 1000
+    if duracao_ms >= SQL_LENTA_MS:
+        plano = _registrar_explain(connection, operation, params)
+        logger.warning(
+            "Query lenta (%.1f ms, %s linhas) em %s: %s | EXPLAIN: %s",
+            duracao_ms, linhas, request.endpoint if has_request_context() else '-', digital, plano
+        )
+
+
+# ============================================================================
+# CURSOR
+# ============================================================================
+
+class CursorInstrumentado:
+    """Proxy de cursor que registra duração, linhas e impressão digital de cada query."""
+
+    def __init__(self, cursor, connection=None):
+        self._cursor = cursor
+        self._connection = connection
+
+    def execute(self, operation, params=None, *args, **kwargs):
+        inicio = time.perf_counter()
+        try:
+            if params is None:
+                return self._cursor.execute(operation, *args, **kwargs)
+            return self._cursor.execute(operation, params, *args, **kwargs)
+        finally:
+            _registrar_execucao(
+                self._connection, operation, params,
+                time.perf_counter() - inicio, self._cursor.rowcount
+            )
+
+    def executemany(self, operation, seq_params, *args, **kwargs):
+        inicio = time.perf_counter()
+        try:
+            return self._cursor.executemany(operation, seq_params, *args, **kwargs)
+        finally:
+            _registrar_execucao(
+                None, operation, None, time.perf_counter() - inicio, self._cursor.rowcount
+            )
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __getattr__(self, nome):
+        return getattr(self._cursor, nome)
+
+
+def novo_cursor(connection, **opcoes):
+    """Cria um cursor na conexão já envolvido pelo profiler."""
+    return CursorInstrumentado(connection.cursor(**opcoes), connection)
+
+
+# ============================================================================
+# RESUMO POR REQUISIÇÃO (MODO DEBUG)
+# ============================================================================
+
+def _resumo_requisicao(response):
+    if not (SQL_PERFIL or current_app.debug):
+        return response
+    perfil = g.get('perfil_sql')
+    if perfil is None:
+        return response
+
+    response.headers['X-SQL-Queries'] = str(perfil.total_queries)
+    response.headers['X-SQL-Tempo-Ms'] = f"{perfil.tempo_total * 1000:.1f}"
+    response.headers['X-SQL-N1'] = str(len(perfil.n1))
+
+    linhas = [
+        f"  {estat[0]}x {estat[1] * 1000:.1f} ms {estat[2]} linhas - {digital}"
+        for digital, estat in perfil.mais_custosas()
+    ]
+    logger.info(
+        "Perfil SQL %s %s: %d queries, %.1f ms, %d N+1\n%s",
+        request.method, request.path, perfil.total_queries,
+        perfil.tempo_total * 1000, len(perfil.n1), '\n'.join(linhas)
+    )
+    return response
+
+
+def init_app(app):
+    """Registra o resumo de SQL por requisição no app Flask."""
+    app.after_request(_resumo_requisicao)
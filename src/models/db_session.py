@@ -0,0 +1,90 @@
+"""
+Sessão de Banco de Dados por Requisição
+=======================================
+
+Mantém uma única conexão MySQL por requisição Flask, guardada em flask.g.
+A conexão é aberta sob demanda pelo primeiro manager instanciado
+(CompanyManager, UserManager, ...) e reaproveitada pelos demais; ao final
+da requisição ela é devolvida/fechada em teardown_appcontext.
+
+Fora de um contexto de aplicação (scripts, CLI, threads sem contexto) os
+managers continuam abrindo a própria conexão, como antes.
+
+Autor: WaysSolutionHub
+"""
+
+from flask import g, has_app_context
+from utils.logger import get_logger
+
+# Inicializar logger
+logger = get_logger('db_session')
+
+
+class DbSession:
+    """Conexão compartilhada e contadores da requisição atual."""
+
+    def __init__(self):
+        self.connection = None
+        self.conexoes_abertas = 0
+        self.reutilizacoes = 0
+
+    def conexao_ativa(self):
+        """Retorna a conexão compartilhada se ainda estiver utilizável."""
+        if self.connection is None:
+            return None
+        try:
+            if self.connection.is_connected():
+                self.reutilizacoes += 1
+                return self.connection
+        except Exception:
+            pass
+        logger.warning("Conexão compartilhada da requisição caiu; uma nova será aberta")
+        self.connection = None
+        return None
+
+    def registrar_conexao(self, connection):
+        self.connection = connection
+        self.conexoes_abertas += 1
+
+    def fechar(self):
+        if self.connection is not None:
+            try:
+                if self.connection.is_connected():
+                    self.connection.close()
+            except Exception as e:
+                logger.warning("Erro ao fechar conexão da requisição: %s", e)
+            self.connection = None
+
+
+def get_db_session():
+    """
+    Retorna a sessão de banco da requisição atual (criada sob demanda),
+    ou None quando não há contexto de aplicação.
+    """
+    if not has_app_context():
+        return None
+    if 'db_session' not in g:
+        g.db_session = DbSession()
+    return g.db_session
+
+
+def close_db_session(exception=None):
+    """Fecha a conexão da requisição (registrado em teardown_appcontext)."""
+    sessao = g.pop('db_session', None)
+    if sessao is None:
+        return
+
+    if sessao.conexoes_abertas > 1:
+        logger.warning(
+            "Requisição abriu %d conexões com o banco (esperado: 1)", sessao.conexoes_abertas
+        )
+    logger.debug(
+        "Sessão de banco encerrada: %d conexão(ões), %d reutilização(ões)",
+        sessao.conexoes_abertas, sessao.reutilizacoes
+    )
+    sessao.fechar()
+
+
+def init_app(app):
+    """Registra o encerramento da sessão de banco no app Flask."""
+    app.teardown_appcontext(close_db_session)
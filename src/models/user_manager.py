@@ -1,5 +1,6 @@
 from models.auth import DatabaseConnection
-import mysql.connector
+from models.cursor_instrumentado import novo_cursor
+from models.backends import DB_ERRORS
 from utils.logger import get_logger
 
 # Inicializar logger
@@ -7,62 +8,61 @@ logger = get_logger('user_manager')
 
 class UserManager:
     def __init__(self):
-        logger.info("-" * 50)
-        logger.info("Inicializando UserManager...")
+        logger.debug("-" * 50)
+        logger.debug("Inicializando UserManager...")
         self.db_connector = DatabaseConnection()
         self.db_connection = self.db_connector.get_connection()
         self.cursor = None
 
         if self.db_connection:
-            logger.info("✓ Conexão obtida do DatabaseConnection")
-            logger.info(f"  - Conexão ativa: {self.db_connection.is_connected()}")
-            self.cursor = self.db_connection.cursor(dictionary=True)
-            logger.info("✓ Cursor dictionary criado para UserManager")
+            logger.debug("✓ Conexão obtida do DatabaseConnection")
+            self.cursor = novo_cursor(self.db_connection, dictionary=True, buffered=True)
+            logger.debug("✓ Cursor dictionary criado para UserManager")
         else:
             logger.error("✗ FALHA ao obter conexão do DatabaseConnection")
-        logger.info("-" * 50)
+        logger.debug("-" * 50)
 
     def find_user_by_email(self, email):
-        logger.info("=" * 50)
-        logger.info("BUSCAR USUÁRIO POR EMAIL")
-        logger.info(f"Email solicitado: {email}")
+        logger.debug("=" * 50)
+        logger.debug("BUSCAR USUÁRIO POR EMAIL")
+        logger.debug("Email solicitado: %s", email)
 
         if not self.db_connection or not self.db_connection.is_connected():
             logger.error("✗ Conexão com o banco de dados não está ativa.")
             logger.error(f"  - db_connection existe: {self.db_connection is not None}")
             if self.db_connection:
                 logger.error(f"  - is_connected: {self.db_connection.is_connected()}")
-            logger.info("=" * 50)
+            logger.debug("=" * 50)
             return None
 
         try:
             query = "SELECT * FROM users WHERE email = %s"
-            logger.info(f"Query SQL: {query}")
-            logger.info(f"Parâmetros: {(email,)}")
+            logger.debug("Query SQL: %s", query)
+            logger.debug("Parâmetros: %s", (email,))
 
-            logger.info("Executando query...")
+            logger.debug("Executando query...")
             self.cursor.execute(query, (email,))
 
-            logger.info("Buscando resultado (fetchone)...")
+            logger.debug("Buscando resultado (fetchone)...")
             user = self.cursor.fetchone()
 
             if user:
-                logger.info("✓ Usuário encontrado!")
-                logger.info(f"  - ID: {user.get('id')}")
-                logger.info(f"  - Nome: {user.get('nome')}")
-                logger.info(f"  - Email: {user.get('email')}")
-                logger.info(f"  - Role: {user.get('role')}")
-                logger.info(f"  - Telefone: {user.get('telefone')}")
-                logger.info(f"  - Created at: {user.get('created_at')}")
-                logger.info(f"  - Password hash presente: {bool(user.get('password'))}")
-                logger.info(f"  - Tamanho password hash: {len(user.get('password', ''))} caracteres")
+                logger.debug("✓ Usuário encontrado!")
+                logger.debug("  - ID: %s", user.get('id'))
+                logger.debug("  - Nome: %s", user.get('nome'))
+                logger.debug("  - Email: %s", user.get('email'))
+                logger.debug("  - Role: %s", user.get('role'))
+                logger.debug("  - Telefone: %s", user.get('telefone'))
+                logger.debug("  - Created at: %s", user.get('created_at'))
+                logger.debug("  - Password hash presente: %s", bool(user.get('password')))
+                logger.debug("  - Tamanho password hash: %s caracteres", len(user.get('password', '')))
             else:
                 logger.warning("✗ Nenhum usuário encontrado com este email")
 
-            logger.info("=" * 50)
+            logger.debug("=" * 50)
             return user
 
-        except mysql.connector.Error as err:
+        except DB_ERRORS as err:
             logger.error("=" * 50)
             logger.error("✗ ERRO AO BUSCAR USUÁRIO")
             logger.error(f"Tipo do erro: {type(err).__name__}")
@@ -73,7 +73,7 @@ class UserManager:
         finally:
             # Feche a conexão do cursor após a operação, mas não a conexão principal
             if self.cursor:
-                logger.info("Fechando cursor após busca de usuário...")
+                logger.debug("Fechando cursor após busca de usuário...")
                 self.cursor.close()
                 self.cursor = None
 
@@ -100,7 +100,7 @@ class UserManager:
         try:
             # Reopen cursor if it was closed
             if not self.cursor:
-                self.cursor = self.db_connection.cursor(dictionary=True)
+                self.cursor = novo_cursor(self.db_connection, dictionary=True, buffered=True)
 
             # Hash the password before storing it in the database
             from controllers.auth.hash import hash_senha_sha256
@@ -115,10 +115,10 @@ class UserManager:
 
             # Retorna o ID do usuário criado
             user_id = self.cursor.lastrowid
-            logger.info(f"Usuário '{name}' criado com sucesso. ID: {user_id}")
+            logger.info("Usuário '%s' criado com sucesso. ID: %s", name, user_id)
             return user_id
 
-        except mysql.connector.Error as err:
+        except DB_ERRORS as err:
             logger.error(f"Erro ao cadastrar usuário: {err}")
             self.db_connection.rollback()
             return False
@@ -131,14 +131,14 @@ class UserManager:
         """Retorna todos os usuários (sem campos de empresa)."""
         try:
             if not self.cursor:
-                self.cursor = self.db_connection.cursor(dictionary=True)
+                self.cursor = novo_cursor(self.db_connection, dictionary=True, buffered=True)
 
             query = "SELECT id, nome, email, telefone, role, created_at FROM users"
             self.cursor.execute(query)
             users = self.cursor.fetchall()
             return users
 
-        except mysql.connector.Error as err:
+        except DB_ERRORS as err:
             logger.error(f"Erro ao buscar todos os usuários: {err}")
             return []
 
@@ -159,17 +159,23 @@ class UserManager:
 
         try:
             if not self.cursor:
-                self.cursor = self.db_connection.cursor(dictionary=True)
+                self.cursor = novo_cursor(self.db_connection, dictionary=True, buffered=True)
 
             query = "DELETE FROM users WHERE id = %s"
             self.cursor.execute(query, (user_id,))
 
             # Confirma a operação de exclusão no banco de dados
             self.db_connection.commit()
-            logger.info(f"Usuário com ID {user_id} excluído com sucesso.")
+            logger.info("Usuário com ID %s excluído com sucesso.", user_id)
+
+            # Sessões/cache do usuário logado passam a recarregar os dados
+            from controllers.auth.principal import invalidar_usuario
+            from controllers.auth.acesso import invalidar_acesso
+            invalidar_usuario(user_id)
+            invalidar_acesso(user_id)
             return True
 
-        except mysql.connector.Error as err:
+        except DB_ERRORS as err:
             logger.error(f"Erro ao tentar excluir usuário: {err}")
             # Desfaz a operação em caso de erro
             self.db_connection.rollback()
@@ -204,19 +210,23 @@ class UserManager:
 
         try:
             if not self.cursor:
-                self.cursor = self.db_connection.cursor(dictionary=True)
+                self.cursor = novo_cursor(self.db_connection, dictionary=True, buffered=True)
 
             query = """
                 UPDATE users
-                SET nome = %s, email = %s, telefone = %s, role = %s
+                SET nome = %s, email = %s, telefone = %s, role = %s, versao = versao + 1
                 WHERE id = %s
             """
             self.cursor.execute(query, (nome, email, telefone, perfil, user_id))
             self.db_connection.commit()
-            logger.info(f"Usuário com ID {user_id} atualizado com sucesso.")
+            logger.info("Usuário com ID %s atualizado com sucesso.", user_id)
+
+            # Sessões/cache do usuário logado passam a recarregar os dados
+            from controllers.auth.principal import invalidar_usuario
+            invalidar_usuario(user_id)
             return True
 
-        except mysql.connector.Error as err:
+        except DB_ERRORS as err:
             logger.error(f"Erro ao atualizar usuário: {err}")
             self.db_connection.rollback()
             return False
@@ -242,7 +252,7 @@ class UserManager:
 
         try:
             if not self.cursor:
-                self.cursor = self.db_connection.cursor(dictionary=True)
+                self.cursor = novo_cursor(self.db_connection, dictionary=True, buffered=True)
 
             # Hash da nova senha
             from controllers.auth.hash import hash_senha_sha256
@@ -250,15 +260,19 @@ class UserManager:
 
             query = """
                 UPDATE users
-                SET password = %s
+                SET password = %s, versao = versao + 1
                 WHERE id = %s
             """
             self.cursor.execute(query, (hashed_password, user_id))
             self.db_connection.commit()
-            logger.info(f"Senha do usuário com ID {user_id} atualizada com sucesso.")
+            logger.info("Senha do usuário com ID %s atualizada com sucesso.", user_id)
+
+            # Sessões/cache do usuário logado passam a recarregar os dados
+            from controllers.auth.principal import invalidar_usuario
+            invalidar_usuario(user_id)
             return True
 
-        except mysql.connector.Error as err:
+        except DB_ERRORS as err:
             logger.error(f"Erro ao atualizar senha do usuário: {err}")
             self.db_connection.rollback()
             return False
@@ -289,23 +303,26 @@ class UserManager:
 
         try:
             if not self.cursor:
-                self.cursor = self.db_connection.cursor(dictionary=True)
+                self.cursor = novo_cursor(self.db_connection, dictionary=True, buffered=True)
 
             # Verifica se o vínculo já existe
             check_query = "SELECT * FROM user_empresa WHERE user_id = %s AND empresa_id = %s"
             self.cursor.execute(check_query, (user_id, empresa_id))
             if self.cursor.fetchone():
-                logger.info(f"Vínculo entre user_id={user_id} e empresa_id={empresa_id} já existe.")
+                logger.info("Vínculo entre user_id=%s e empresa_id=%s já existe.", user_id, empresa_id)
                 return True
 
             # Cria o vínculo
             insert_query = "INSERT INTO user_empresa (user_id, empresa_id) VALUES (%s, %s)"
             self.cursor.execute(insert_query, (user_id, empresa_id))
             self.db_connection.commit()
-            logger.info(f"Vínculo criado: user_id={user_id} <-> empresa_id={empresa_id}")
+            logger.info("Vínculo criado: user_id=%s <-> empresa_id=%s", user_id, empresa_id)
+
+            from controllers.auth.acesso import invalidar_acesso
+            invalidar_acesso(user_id)
             return True
 
-        except mysql.connector.Error as err:
+        except DB_ERRORS as err:
             logger.error(f"Erro ao vincular usuário e empresa: {err}")
             self.db_connection.rollback()
             return False
@@ -327,15 +344,18 @@ class UserManager:
 
         try:
             if not self.cursor:
-                self.cursor = self.db_connection.cursor(dictionary=True)
+                self.cursor = novo_cursor(self.db_connection, dictionary=True, buffered=True)
 
             query = "DELETE FROM user_empresa WHERE user_id = %s AND empresa_id = %s"
             self.cursor.execute(query, (user_id, empresa_id))
             self.db_connection.commit()
-            logger.info(f"Vínculo removido: user_id={user_id} <-> empresa_id={empresa_id}")
+            logger.info("Vínculo removido: user_id=%s <-> empresa_id=%s", user_id, empresa_id)
+
+            from controllers.auth.acesso import invalidar_acesso
+            invalidar_acesso(user_id)
             return True
 
-        except mysql.connector.Error as err:
+        except DB_ERRORS as err:
             logger.error(f"Erro ao desvincular usuário e empresa: {err}")
             self.db_connection.rollback()
             return False
@@ -352,7 +372,7 @@ class UserManager:
         """
         try:
             if not self.cursor:
-                self.cursor = self.db_connection.cursor(dictionary=True)
+                self.cursor = novo_cursor(self.db_connection, dictionary=True, buffered=True)
 
             query = """
                 SELECT e.*
@@ -365,7 +385,7 @@ class UserManager:
             empresas = self.cursor.fetchall()
             return empresas
 
-        except mysql.connector.Error as err:
+        except DB_ERRORS as err:
             logger.error(f"Erro ao buscar empresas do usuário: {err}")
             return []
 
@@ -381,7 +401,7 @@ class UserManager:
         """
         try:
             if not self.cursor:
-                self.cursor = self.db_connection.cursor(dictionary=True)
+                self.cursor = novo_cursor(self.db_connection, dictionary=True, buffered=True)
 
             query = """
                 SELECT u.id, u.nome, u.email, u.telefone, u.role, u.created_at
@@ -394,7 +414,7 @@ class UserManager:
             users = self.cursor.fetchall()
             return users
 
-        except mysql.connector.Error as err:
+        except DB_ERRORS as err:
             logger.error(f"Erro ao buscar usuários da empresa: {err}")
             return []
 
@@ -410,16 +430,19 @@ class UserManager:
         """
         try:
             if not self.cursor:
-                self.cursor = self.db_connection.cursor(dictionary=True)
+                self.cursor = novo_cursor(self.db_connection, dictionary=True, buffered=True)
 
             query = "SELECT * FROM users WHERE id = %s"
             self.cursor.execute(query, (user_id,))
             user = self.cursor.fetchone()
             return user
 
-        except mysql.connector.Error as err:
+        except DB_ERRORS as err:
             logger.error(f"Erro ao buscar usuário por ID: {err}")
             return None
 
     def close(self):
+        if self.cursor:
+            self.cursor.close()
+            self.cursor = None
         self.db_connector.close_connection()
\ No newline at end of file
@@ -1,6 +1,8 @@
-from flask import Blueprint, render_template, session, redirect, url_for, request, flash, jsonify, make_response
+import logging
+from flask import Blueprint, render_template, session, redirect, url_for, request, flash, jsonify, Response
 from datetime import datetime
 from utils.logger import get_logger
+from controllers.auth.principal import obter_usuario_logado
 
 # Inicializar logger
 logger = get_logger('admin_pages')
@@ -8,6 +10,9 @@ logger = get_logger('admin_pages')
 
 admin_bp = Blueprint('admin', __name__)
 
+# Quantidade de empresas por página em /admin/empresas
+EMPRESAS_POR_PAGINA = 50
+
 # ============================
 # DASHBOARD E AUTENTICAÇÃO
 # ============================
@@ -32,8 +37,8 @@ def logout():
         flash("Acesso negado. Você precisa ser um administrador.", "danger")
         return redirect(url_for('index.login'))
 
-    session.pop('user_email', None)
-    session.pop('user_role', None)
+    from controllers.auth.principal import encerrar_sessao
+    encerrar_sessao()
     return redirect(url_for('index.login'))
 
 
@@ -179,27 +184,76 @@ def gerenciar_empresas():
     from models.company_manager import CompanyManager
     company_manager = CompanyManager()
 
-    # Executar migrações do banco de dados
-    company_manager.remover_unique_cnpj()  # Permitir CNPJ duplicado (matriz/filiais)
-    company_manager.adicionar_coluna_ativo_se_nao_existir()  # Adicionar coluna ativo
+    # Executar migrações do banco de dados (uma vez por processo)
+    company_manager.executar_migracoes()
+
+    # Apenas a página visível (paginação por chave) e, opcionalmente, filtrada pela busca
+    busca = request.args.get('q', '').strip() or None
+    apos = decodificar_cursor_pagina(request.args.get('apos'))
+    empresas, proximo = company_manager.listar_empresas_pagina(EMPRESAS_POR_PAGINA, apos, busca)
+    total_empresas = company_manager.contar_empresas(busca)
 
-    empresas = company_manager.listar_todas_empresas()
+    # Anos com dados de Viabilidade e meses com dados BPO das empresas da página
+    # (duas consultas agrupadas, independente da quantidade de empresas)
+    uploads, uploads_bpo = company_manager.get_inventario_uploads([empresa['id'] for empresa in empresas])
+
+    company_manager.close()
 
-    # Para cada empresa, buscar anos com dados de Viabilidade
-    uploads = {}
-    for empresa in empresas:
-        anos_com_dados = company_manager.get_anos_com_dados(empresa['id'])
-        uploads[empresa['id']] = anos_com_dados
+    return render_template(
+        'admin/empresas.html',
+        empresas=empresas,
+        uploads=uploads,
+        uploads_bpo=uploads_bpo,
+        total_empresas=total_empresas,
+        busca=busca or '',
+        primeira_pagina=apos is None,
+        proxima_pagina=codificar_cursor_pagina(proximo)
+    )
 
-    # Para cada empresa, buscar meses com dados de BPO
-    uploads_bpo = {}
-    for empresa in empresas:
-        meses_com_dados_bpo = company_manager.get_meses_com_dados_bpo(empresa['id'])
-        uploads_bpo[empresa['id']] = meses_com_dados_bpo
 
+@admin_bp.route('/admin/api/empresas/buscar')
+def api_buscar_empresas():
+    """Autocompletar de empresas por nome, CNPJ ou seguimento (JSON)"""
+    if not ('user_email' in session and session.get('user_role') == 'admin'):
+        return jsonify({"error": "Não autorizado"}), 403
+
+    termo = request.args.get('q', '').strip()
+    if len(termo) < 2:
+        return jsonify({"empresas": []})
+
+    try:
+        limite = min(int(request.args.get('limite', 10)), 50)
+    except ValueError:
+        limite = 10
+
+    from models.company_manager import CompanyManager
+    company_manager = CompanyManager()
+    empresas = company_manager.buscar_empresas(termo, limite)
     company_manager.close()
 
-    return render_template('admin/empresas.html', empresas=empresas, uploads=uploads, uploads_bpo=uploads_bpo)
+    return jsonify({"empresas": empresas})
+
+
+def codificar_cursor_pagina(proximo):
+    """Converte o (ativo, nome, id) da última empresa em um token para a URL."""
+    if not proximo:
+        return None
+    import json
+    import base64
+    return base64.urlsafe_b64encode(json.dumps(proximo).encode('utf-8')).decode('ascii')
+
+
+def decodificar_cursor_pagina(token):
+    """Inverso de codificar_cursor_pagina; retorna None para token ausente ou inválido."""
+    if not token:
+        return None
+    import json
+    import base64
+    try:
+        ativo, nome, empresa_id = json.loads(base64.urlsafe_b64decode(token.encode('ascii')))
+        return int(ativo), str(nome), int(empresa_id)
+    except (ValueError, TypeError, UnicodeError):
+        return None
 
 
 @admin_bp.route('/admin/cadastrar_empresa', methods=['POST'])
@@ -398,6 +452,38 @@ def salvar_percentual_mp():
         return jsonify({"error": str(e)}), 500
 
 
+@admin_bp.route('/admin/api/simular-mp/<int:empresa_id>', methods=['POST'])
+def simular_percentual_mp(empresa_id):
+    """
+    Simula percentuais MP (faixa ou ajustes por mês) sobre o Resultado Real
+    com MP do período, sem gravar nada
+    """
+    if not ('user_email' in session and session.get('user_role') == 'admin'):
+        return jsonify({"error": "Não autorizado"}), 403
+
+    from controllers.data_processing.simulacao_mp import ler_percentuais, ler_ajustes, simular_percentuais_mp
+
+    data = request.get_json(silent=True) or {}
+    try:
+        ano_inicio = int(data.get('ano_inicio', 2025))
+        mes_inicio = int(data.get('mes_inicio', 1))
+        ano_fim = int(data.get('ano_fim', 2025))
+        mes_fim = int(data.get('mes_fim', 12))
+        percentuais = ler_percentuais(data.get('percentuais'))
+        ajustes = ler_ajustes(data.get('meses_percentuais'))
+    except (TypeError, ValueError, AttributeError) as e:
+        return jsonify({"error": f"Parâmetros inválidos: {e}"}), 400
+
+    if not percentuais and not ajustes:
+        return jsonify({"error": "Informe percentuais ou meses_percentuais"}), 400
+
+    from models.company_manager import CompanyManager
+    company_manager = CompanyManager()
+    meses = company_manager.buscar_dados_bpo_periodo(empresa_id, ano_inicio, mes_inicio, ano_fim, mes_fim)
+    company_manager.close()
+
+    return jsonify(simular_percentuais_mp(meses, percentuais, ajustes))
+
 @admin_bp.route('/admin/dashboard-empresa/<int:empresa_id>')
 def dashboard_empresa(empresa_id):
     """Dashboard de uma empresa específica (acesso admin)"""
@@ -420,10 +506,7 @@ def dashboard_empresa(empresa_id):
     company_manager.close()
 
     # Busca informações do admin logado (para exibir no header)
-    from models.user_manager import UserManager
-    user_manager = UserManager()
-    user_data = user_manager.find_user_by_email(session.get('user_email'))
-    user_manager.close()
+    user_data = obter_usuario_logado()
 
     return render_template(
         'admin/dashboard_empresa.html',
@@ -454,6 +537,15 @@ def api_dados_bpo_tabela(empresa_id):
         mes_fim = int(request.args.get('mes_fim', 12))
         ano_fim = int(request.args.get('ano_fim', 2025))
 
+        # Com o histórico colunar ativo, a tabela sai do arquivo mapeado em memória
+        from controllers.data_processing.bpo_colunar import abrir_historico, tabela_bpo
+        historico = abrir_historico(empresa_id)
+        if historico is not None:
+            tabela = tabela_bpo(historico, ano_inicio, mes_inicio, ano_fim, mes_fim)
+            if tabela is None:
+                return jsonify({'error': 'Nenhum dado encontrado para o período'}), 404
+            return jsonify(tabela)
+
         company_manager = CompanyManager()
 
         # Buscar todos os meses do período
@@ -544,11 +636,11 @@ def api_dados_bpo_tabela(empresa_id):
             # Extrair totais calculados
             totais = dados.get('totais_calculados', {})
 
-            logger.debug(f"Mês {mes}/{ano}: totais keys: {list(totais.keys()) if totais else 'VAZIO'}")
-            if totais:
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Mês %s/%s: totais keys: %s", mes, ano, list(totais.keys()) if totais else 'VAZIO')
                 for cenario in ['fluxo_caixa', 'real', 'real_mp']:
                     if cenario in totais:
-                        logger.debug(f"   {cenario}: {list(totais[cenario].keys()) if isinstance(totais[cenario], dict) else type(totais[cenario])}")
+                        logger.debug("   %s: %s", cenario, list(totais[cenario].keys()) if isinstance(totais[cenario], dict) else type(totais[cenario]))
 
             # Os totais_calculados vêm com TODOS os meses do Excel
             # Então apenas precisamos mesclar os dados de cada cenário
@@ -572,9 +664,10 @@ def api_dados_bpo_tabela(empresa_id):
                         if chave_normalizada not in totais_calculados[cenario]:
                             totais_calculados[cenario][chave_normalizada] = mes_value
 
-        logger.debug(f"TOTAIS CALCULADOS FINAL:")
-        for cenario in ['fluxo_caixa', 'real', 'real_mp']:
-            logger.debug(f"   {cenario}: {len(totais_calculados[cenario])} meses - {list(totais_calculados[cenario].keys())}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("TOTAIS CALCULADOS FINAL:")
+            for cenario in ['fluxo_caixa', 'real', 'real_mp']:
+                logger.debug("   %s: %s meses - %s", cenario, len(totais_calculados[cenario]), list(totais_calculados[cenario].keys()))
 
         return jsonify({
             'itens': itens_lista,
@@ -583,7 +676,7 @@ def api_dados_bpo_tabela(empresa_id):
         })
 
     except Exception as e:
-        logger.error(f"Erro na API dados-bpo-tabela: {e}")
+        logger.error("Erro na API dados-bpo-tabela: %s", e)
         import traceback
         traceback.print_exc()
         return jsonify({'error': str(e)}), 500
@@ -598,8 +691,7 @@ def gerar_relatorio_pdf(empresa_id, ano, grupo_viabilidade):
 
     try:
         from models.company_manager import CompanyManager
-        from xhtml2pdf import pisa
-        import io
+        from controllers.reports.pdf_renderer import gerar_pdf_relatorio_viabilidade
 
         # Buscar empresa
         company_manager = CompanyManager()
@@ -618,62 +710,11 @@ def gerar_relatorio_pdf(empresa_id, ano, grupo_viabilidade):
             flash(f"Template de relatório não encontrado para o ano {ano}. Por favor, faça o upload de um arquivo Excel com a aba 'Relatório'.", "warning")
             return redirect(url_for('admin.dashboard_empresa', empresa_id=empresa_id))
 
-        # Pegar o texto do template (já vem pronto com os valores)
-        conteudo_texto = template_data['template']
-
-        # Adicionar CSS para formatação do PDF
-        css_style = """
-        <style>
-            @page { size: A4; margin: 2cm; }
-            body { font-family: Arial, sans-serif; font-size: 11pt; line-height: 1.6; color: #333; }
-            h1 { color: #2c3e50; font-size: 18pt; margin-top: 1em; }
-            h2 { color: #34495e; font-size: 14pt; margin-top: 1em; }
-            h3 { color: #34495e; font-size: 12pt; margin-top: 0.8em; }
-            table { width: 100%; border-collapse: collapse; margin: 1em 0; }
-            th, td { border: 1px solid #ddd; padding: 8px; text-align: left; }
-            th { background-color: #f2f2f2; font-weight: bold; }
-            .header { text-align: center; margin-bottom: 2em; border-bottom: 2px solid #2c3e50; padding-bottom: 1em; }
-            .section { margin: 1.5em 0; }
-            p { margin: 0.5em 0; }
-        </style>
-        """
-
-        # Converter quebras de linha do texto em tags HTML <br>
-        conteudo_html = conteudo_texto.replace('\n', '<br>\n')
-
-        html_completo = f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <meta charset="UTF-8">
-            {css_style}
-        </head>
-        <body>
-            <div class="header">
-                <h1>RELATÓRIO DE VIABILIDADE FINANCEIRA</h1>
-                <p><strong>{empresa['nome']}</strong> - Ano: {ano}</p>
-                <p>Cenário: {grupo_viabilidade}</p>
-            </div>
-            <div class="content">
-                {conteudo_html}
-            </div>
-        </body>
-        </html>
-        """
-
-        # Gerar PDF usando xhtml2pdf (funciona melhor no Windows)
-        pdf_file = io.BytesIO()
-        pisa_status = pisa.CreatePDF(
-            html_completo.encode('utf-8'),
-            dest=pdf_file,
-            encoding='utf-8'
+        # Renderizar PDF (pool de processos + cache em disco)
+        pdf_file = gerar_pdf_relatorio_viabilidade(
+            empresa['nome'], ano, grupo_viabilidade, template_data['template']
         )
 
-        if pisa_status.err:
-            raise Exception(f"Erro ao gerar PDF: {pisa_status.err}")
-
-        pdf_file.seek(0)
-
         # Retornar PDF como download
         from flask import send_file
         return send_file(
@@ -781,136 +822,10 @@ def api_dados_empresa(empresa_id, ano):
     if not ('user_email' in session and session.get('user_role') == 'admin'):
         return jsonify({"error": "Não autorizado"}), 403
 
-    from models.company_manager import CompanyManager
-
-    company_manager = CompanyManager()
-    data_results = company_manager.buscar_dados_empresa(empresa_id, ano)
-    company_manager.close()
-
-    # Organizar dados por SUBGRUPO dentro de cada grupo de viabilidade
-    dados_organizados = {}
-
-    # Processar TbItens
-    if data_results and data_results.get('TbItens'):
-        for item in data_results['TbItens']:
-            grupo = item[0]
-            subgrupo = item[1]
-            descricao = item[2]
-            percentual = float(item[3]) if item[3] else 0
-            valor = float(item[4]) if item[4] else 0
-
-            if grupo not in dados_organizados:
-                dados_organizados[grupo] = {}
-
-            if subgrupo not in dados_organizados[grupo]:
-                dados_organizados[grupo][subgrupo] = []
-
-            dados_organizados[grupo][subgrupo].append({
-                "descricao": descricao,
-                "percentual": percentual,
-                "valor": valor
-            })
-
-    # Processar Investimentos (TODOS OS CAMPOS)
-    if data_results and data_results.get('TbItensInvestimentos'):
-        for item in data_results['TbItensInvestimentos']:
-            grupo = item[0]
-            subgrupo = item[1]
-            descricao = item[2]
-            parcela = float(item[3]) if len(item) > 3 and item[3] else 0
-            juros = float(item[4]) if len(item) > 4 and item[4] else 0
-            total = float(item[5]) if len(item) > 5 and item[5] else 0
-
-            if grupo not in dados_organizados:
-                dados_organizados[grupo] = {}
-
-            if subgrupo not in dados_organizados[grupo]:
-                dados_organizados[grupo][subgrupo] = []
-
-            dados_organizados[grupo][subgrupo].append({
-                "descricao": descricao,
-                "parcela": parcela,
-                "juros": juros,
-                "valor": total,
-                "percentual": 0
-            })
-
-    # Processar Dívidas (TODOS OS CAMPOS)
-    if data_results and data_results.get('TbItensDividas'):
-        for item in data_results['TbItensDividas']:
-            grupo = item[0]
-            subgrupo = item[1]
-            descricao = item[2]
-            parcela = float(item[3]) if len(item) > 3 and item[3] else 0
-            juros = float(item[4]) if len(item) > 4 and item[4] else 0
-            total = float(item[5]) if len(item) > 5 and item[5] else 0
-
-            if grupo not in dados_organizados:
-                dados_organizados[grupo] = {}
-
-            if subgrupo not in dados_organizados[grupo]:
-                dados_organizados[grupo][subgrupo] = []
-
-            dados_organizados[grupo][subgrupo].append({
-                "descricao": descricao,
-                "parcela": parcela,
-                "juros": juros,
-                "valor": total,
-                "percentual": 0
-            })
-
-    # Processar Investimento Geral
-    if data_results and data_results.get('TbItensInvestimentoGeral'):
-        for item in data_results['TbItensInvestimentoGeral']:
-            grupo = item[0]
-            subgrupo = item[1]
-            descricao = item[2]
-            valor = float(item[3]) if len(item) > 3 and item[3] else 0
-
-            if grupo not in dados_organizados:
-                dados_organizados[grupo] = {}
-
-            if subgrupo not in dados_organizados[grupo]:
-                dados_organizados[grupo][subgrupo] = []
-
-            dados_organizados[grupo][subgrupo].append({
-                "descricao": descricao,
-                "valor": valor,
-                "percentual": 0
-            })
-
-    # Processar Gastos Operacionais (COM NOME DIFERENCIADO)
-    if data_results and data_results.get('TbItensGastosOperacionais'):
-        for item in data_results['TbItensGastosOperacionais']:
-            grupo = item[0]
-            subgrupo_original = item[1]  # Pode ser "GastosOperacionais"
-            descricao = item[2]
-            custo_km = float(item[3]) if len(item) > 3 and item[3] else 0
-            custo_mensal = float(item[4]) if len(item) > 4 and item[4] else 0
-
-            # Renomear subgrupo para "Gastos Operacionais Veículos" para diferenciar
-            subgrupo = 'Gastos Operacionais Veículos'
-
-            if grupo not in dados_organizados:
-                dados_organizados[grupo] = {}
-
-            if subgrupo not in dados_organizados[grupo]:
-                dados_organizados[grupo][subgrupo] = []
-
-            dados_organizados[grupo][subgrupo].append({
-                "descricao": descricao,
-                "custo_km": custo_km,
-                "valor": custo_mensal,
-                "percentual": 0
-            })
-
-    logger.debug(f"Dados organizados para API: {len(dados_organizados)} grupos")
-
-    return jsonify({
-        "ano": ano,
-        "dados": dados_organizados
-    })
+    from controllers.data_processing.viabilidade import resposta_dados_viabilidade
 
+    # Dados já organizados por SUBGRUPO dentro de cada grupo (snapshot com ETag)
+    return resposta_dados_viabilidade(empresa_id, ano)
 
 # ============================
 # RELACIONAMENTO USER-EMPRESA
@@ -924,13 +839,10 @@ def gerenciar_vinculos():
         return redirect(url_for('index.login'))
 
     from models.user_manager import UserManager
-    from models.company_manager import CompanyManager
 
     user_manager = UserManager()
-    company_manager = CompanyManager()
 
     users = user_manager.get_all_users()
-    empresas = company_manager.listar_todas_empresas()
 
     # Para cada usuário, buscar empresas vinculadas
     user_empresas = {}
@@ -938,11 +850,9 @@ def gerenciar_vinculos():
         user_empresas[user['id']] = user_manager.get_empresas_do_usuario(user['id'])
 
     user_manager.close()
-    company_manager.close()
 
     return render_template('admin/vinculos.html',
                          users=users,
-                         empresas=empresas,
                          user_empresas=user_empresas)
 
 
@@ -1088,67 +998,60 @@ def upload_dados_bpo():
         return redirect(url_for('admin.gerenciar_empresas'))
 
     try:
-        from controllers.data_processing.bpo_file_processing import process_bpo_file
+        from controllers.data_processing.bpo_file_processing import process_bpo_file_por_mes
         from models.company_manager import CompanyManager
 
-        # Processar arquivo Excel (detecta meses e anos automaticamente do cabeçalho)
-        dados_bpo = process_bpo_file(arquivo)
-        meses_info = dados_bpo['metadados']['meses_info']
+        # Ler o arquivo Excel (detecta meses e anos automaticamente do cabeçalho)
+        # antes de abrir a transação; os meses são montados um a um, conforme
+        # são gravados
+        meses_planilha = process_bpo_file_por_mes(arquivo)
+        meses_bpo = (
+            (ano, mes_numero, dados_mes)
+            for ano, mes_numero, dados_mes in meses_planilha
+            if dados_mes['itens_hierarquicos']
+        )
         meses_processados = []
 
         company_manager = CompanyManager()
 
-        # Salvar cada mês separadamente (agora com mes_numero e ano do cabeçalho)
-        for mes_info in meses_info:
-            mes_numero = mes_info['mes_numero']
-            ano = mes_info['ano']
-            chave_mes = f"{ano}_{mes_numero}"  # Ex: "2025_3" para Março 2025
-
-            # Filtrar totais_calculados deste mês
-            totais_mes = {}
-            totais_calculados = dados_bpo.get('totais_calculados', {})
-
-            for cenario_key in ['fluxo_caixa', 'real', 'real_mp']:
-                if cenario_key in totais_calculados:
-                    cenario_data = totais_calculados[cenario_key]
-                    # Pegar apenas dados deste mês usando chave ano_mes
-                    if chave_mes in cenario_data:
-                        totais_mes[cenario_key] = {mes_numero: cenario_data[chave_mes]}
-                    else:
-                        totais_mes[cenario_key] = {}
-                else:
-                    totais_mes[cenario_key] = {}
-
-            # Filtrar dados deste mês
-            dados_mes = {
-                'itens_hierarquicos': [],
-                'totais_calculados': totais_mes,
-                'metadados': dados_bpo['metadados']
-            }
-
-            # Para cada item hierárquico, pegar só dados do mês atual
-            for item in dados_bpo['itens_hierarquicos']:
-                item_mes = item.copy()
-                item_mes['dados_mensais'] = [
-                    m for m in item['dados_mensais']
-                    if m['mes_numero'] == mes_numero and m['ano'] == ano
-                ]
-                dados_mes['itens_hierarquicos'].append(item_mes)
-
-            # Salvar se tiver dados
-            if dados_mes['itens_hierarquicos']:
-                sucesso = company_manager.salvar_dados_bpo_empresa(
-                    empresa_id=int(empresa_id),
-                    ano=ano,
-                    mes=mes_numero,
-                    dados_processados=dados_mes
+        # Modo incremental: grava só os meses novos ou com conteúdo alterado
+        if request.form.get('incremental'):
+            try:
+                resumo = company_manager.salvar_dados_bpo_incremental(int(empresa_id), meses_bpo)
+            finally:
+                company_manager.close()
+
+            if resumo is None:
+                flash("Erro ao salvar os dados BPO. Nenhum mês foi alterado.", "danger")
+            elif not any(resumo.values()):
+                flash("Nenhum dado BPO foi encontrado na planilha.", "warning")
+            else:
+                def listar(periodos):
+                    return ', '.join(f"{mes:02d}/{ano}" for ano, mes in periodos) or 'nenhum'
+
+                flash(
+                    f"Upload incremental concluído! Inalterados: {len(resumo['inalterados'])}. "
+                    f"Atualizados: {listar(resumo['atualizados'])}. "
+                    f"Adicionados: {listar(resumo['adicionados'])}.",
+                    "success"
                 )
-                if sucesso:
-                    meses_processados.append(f"{mes_info['mes_nome']} {ano}")
-
-        company_manager.close()
+            return redirect(url_for('admin.gerenciar_empresas'))
+
+        def registrar(meses):
+            for ano, mes_numero, dados_mes in meses:
+                mes_nome = dados_mes['itens_hierarquicos'][0]['dados_mensais'][0]['mes_nome']
+                meses_processados.append(f"{mes_nome} {ano}")
+                yield ano, mes_numero, dados_mes
+
+        # Salvar todos os meses em uma transação (ou todos ou nenhum), gravando conforme são montados
+        try:
+            sucesso = company_manager.salvar_dados_bpo_lote(int(empresa_id), registrar(meses_bpo))
+        finally:
+            company_manager.close()
 
-        if meses_processados:
+        if not sucesso:
+            flash("Erro ao salvar os dados BPO. Nenhum mês foi alterado.", "danger")
+        elif meses_processados:
             meses_str = ', '.join(meses_processados)
             flash(f"Dados BPO salvos com sucesso! Meses processados: {meses_str}", "success")
         else:
@@ -1171,10 +1074,10 @@ def consultar_dados():
     from models.company_manager import CompanyManager
 
     company_manager = CompanyManager()
-    empresas = company_manager.listar_todas_empresas()
 
     data_results = None
     empresa_selecionada = None
+    empresa = None
     ano_selecionado = None
 
     if request.method == 'POST':
@@ -1187,12 +1090,13 @@ def consultar_dados():
                 int(ano_selecionado)
             )
             empresa_selecionada = int(empresa_id)
+            empresa = company_manager.buscar_empresa_por_id(empresa_selecionada)
 
     company_manager.close()
 
     return render_template(
         'admin/consultar_dados.html',
-        empresas=empresas,
+        empresa=empresa,
         data_results=data_results,
         empresa_selecionada=empresa_selecionada,
         ano_selecionado=ano_selecionado
@@ -1209,10 +1113,10 @@ def consultar_dados_bpo():
     from models.company_manager import CompanyManager
 
     company_manager = CompanyManager()
-    empresas = company_manager.listar_todas_empresas()
 
     data_results = None
     empresa_selecionada = None
+    empresa = None
     ano_selecionado = None
     mes_selecionado = None
 
@@ -1220,6 +1124,7 @@ def consultar_dados_bpo():
     empresa_id = request.args.get('empresa_id') or request.form.get('empresa_id')
     if empresa_id:
         empresa_selecionada = int(empresa_id)
+        empresa = company_manager.buscar_empresa_por_id(empresa_selecionada)
 
     if request.method == 'POST':
         ano_selecionado = request.form.get('ano')
@@ -1237,7 +1142,7 @@ def consultar_dados_bpo():
 
     return render_template(
         'admin/consultar_bpo.html',
-        empresas=empresas,
+        empresa=empresa,
         data_results=data_results,
         empresa_selecionada=empresa_selecionada,
         ano_selecionado=ano_selecionado,
@@ -1340,7 +1245,14 @@ def api_dados_bpo(empresa_id):
     mes_fim = int(request.args.get('mes_fim', 12))
     tipo_dre = request.args.get('tipo_dre', 'fluxo_caixa')
 
+    # Com o histórico colunar ativo, os totais saem do arquivo mapeado em memória
+    from controllers.data_processing.bpo_colunar import abrir_historico, dashboard_bpo
+    historico = abrir_historico(empresa_id)
+    if historico is not None:
+        return jsonify(dashboard_bpo(historico, ano_inicio, mes_inicio, ano_fim, mes_fim, tipo_dre))
+
     from models.company_manager import CompanyManager
+    from controllers.data_processing.bpo_totais import totais_mes_bpo
     company_manager = CompanyManager()
 
     # Buscar todos os meses
@@ -1363,10 +1275,10 @@ def api_dados_bpo(empresa_id):
 
     company_manager.close()
 
-    logger.debug(f"API DASHBOARD BPO - Empresa {empresa_id}")
-    logger.debug(f"Período: {mes_inicio}/{ano_inicio} até {mes_fim}/{ano_fim}")
-    logger.debug(f"DRE selecionado: {tipo_dre}")
-    logger.debug(f"Total de meses encontrados no DB: {len(meses_data)}")
+    logger.debug("API DASHBOARD BPO - Empresa %s", empresa_id)
+    logger.debug("Período: %s/%s até %s/%s", mes_inicio, ano_inicio, mes_fim, ano_fim)
+    logger.debug("DRE selecionado: %s", tipo_dre)
+    logger.debug("Total de meses encontrados no DB: %s", len(meses_data))
 
     # Inicializar totais acumulados
     totais = {
@@ -1405,14 +1317,14 @@ def api_dados_bpo(empresa_id):
         ano_curto = str(ano)[-2:]  # Pega só os 2 últimos dígitos
         labels_meses.append(f"{nome_mes}/{ano_curto}")
 
-        logger.debug(f"Processando mês {mes_num}/{ano}")
+        logger.debug("Processando mês %s/%s", mes_num, ano)
 
         # Extrair totais_calculados (nova estrutura)
         totais_calculados = dados.get('totais_calculados', {})
 
         # Verificar se totais_calculados está vazio ou None
         if not totais_calculados or totais_calculados == {}:
-            logger.warning(f"totais_calculados vazio para mês {mes_num}/{ano}")
+            logger.warning("totais_calculados vazio para mês %s/%s", mes_num, ano)
             logger.info("DICA: Faça upload da planilha novamente para recalcular os dados")
             receitas_mensais.append(0)
             despesas_mensais.append(0)
@@ -1424,101 +1336,45 @@ def api_dados_bpo(empresa_id):
         despesa_grafico = 0
         geral_grafico = 0
 
-        # Processar cada cenário (fluxo_caixa, real, real_mp)
-        for cenario_key in ['fluxo_caixa', 'real', 'real_mp']:
-            cenario_data = totais_calculados.get(cenario_key, {})
-
-            # Verificar se o cenário existe e não está vazio
-            if not cenario_data or not isinstance(cenario_data, dict):
-                logger.warning(f"{cenario_key.upper()}: cenário vazio ou inválido para mês {mes_num}/{ano}")
-                continue
-
-            # Pegar dados do mês (a chave pode ser string ou int)
-            # Tentar primeiro como int, depois como string
-            mes_dados = cenario_data.get(mes_num, cenario_data.get(str(mes_num), {}))
-
-            if mes_dados and isinstance(mes_dados, dict):
-                # Extrair valores realizados
-                realizado = mes_dados.get('realizado', {})
-                if isinstance(realizado, dict):
-                    receita = realizado.get('receita', 0) or 0
-                    despesa = realizado.get('despesa', 0) or 0
-                    geral = realizado.get('geral', 0) or 0
-
-                    # RECALCULAR DESPESA DO REAL_MP SE EXISTIR PERCENTUAL MANUAL
-                    if cenario_key == 'real_mp':
-                        percentual_mp_manual = dados.get('percentual_mp_manual')
-                        if percentual_mp_manual is not None:
-                            # Pegar a despesa do "Resultado Real"
-                            despesa_real = totais_calculados.get('real', {}).get(mes_num, totais_calculados.get('real', {}).get(str(mes_num), {})).get('realizado', {}).get('despesa', 0) or 0
-
-                            # Buscar o valor do item 2.08 (Matéria Prima)
-                            valor_materia_prima = 0
-                            itens = dados.get('itens_hierarquicos', [])
-
-                            # Itens pode ser lista ou dict
-                            items_to_process = itens if isinstance(itens, list) else itens.items()
-
-                            for item in items_to_process:
-                                if isinstance(itens, list):
-                                    codigo = item.get('codigo', '')
-                                    item_data = item
-                                else:
-                                    codigo, item_data = item
-
-                                # Verificar se é o item 2.08
-                                if codigo == '2.08':
-                                    dados_mensais = item_data.get('dados_mensais', [])
-                                    if dados_mensais and len(dados_mensais) > 0:
-                                        mes_atual_dados = dados_mensais[0]
-                                        valor_materia_prima = mes_atual_dados.get('valor_realizado', 0) or 0
-                                    break
-
-                            # Nova fórmula: Despesa_Real - Matéria_Prima + (Receita × Percentual)
-                            despesa_recalculada = despesa_real - valor_materia_prima + ((percentual_mp_manual / 100) * receita)
-
-                            logger.debug(f"REAL_MP {mes_num}/{ano}: Despesa Real: R$ {despesa_real:,.2f}, Matéria Prima (2.08): R$ {valor_materia_prima:,.2f}, Percentual {percentual_mp_manual}% × Receita R$ {receita:,.2f} = R$ {(percentual_mp_manual / 100) * receita:,.2f} → Despesa final: R$ {despesa_recalculada:,.2f}")
-
-                            despesa = despesa_recalculada
-                            geral = receita - despesa  # Recalcular geral também
-
-                    # Acumular totais
-                    totais[cenario_key]['receita'] += receita
-                    totais[cenario_key]['despesa'] += despesa
-                    totais[cenario_key]['geral'] += geral
-
-                    logger.debug(f"{cenario_key.upper()}: Receita: R$ {receita:,.2f}, Despesa: R$ {despesa:,.2f}, Geral: R$ {geral:,.2f}")
-
-                    # Se é o DRE selecionado, guardar para gráfico
-                    if cenario_key == tipo_dre:
-                        receita_grafico = receita
-                        despesa_grafico = despesa
-                        geral_grafico = geral
-                else:
-                    logger.warning(f"{cenario_key.upper()}: estrutura 'realizado' inválida para mês {mes_num}/{ano}")
-
-                # Extrair valores de orçamento
-                orcamento = mes_dados.get('orcamento', {})
-                if isinstance(orcamento, dict):
-                    receita_orc = orcamento.get('receita', 0) or 0
-                    despesa_orc = orcamento.get('despesa', 0) or 0
-                    geral_orc = orcamento.get('geral', 0) or 0
-
-                    # Acumular orçamento
-                    totais_orcamento[cenario_key]['receita'] += receita_orc
-                    totais_orcamento[cenario_key]['despesa'] += despesa_orc
-                    totais_orcamento[cenario_key]['geral'] += geral_orc
+        # Processar cada cenário (fluxo_caixa, real, real_mp); real_mp já vem
+        # recalculado quando o mês tem percentual MP manual
+        for cenario_key, valores in totais_mes_bpo(dados, mes_num).items():
+            if valores['realizado'] is not None:
+                receita, despesa, geral = valores['realizado']
+
+                # Acumular totais
+                totais[cenario_key]['receita'] += receita
+                totais[cenario_key]['despesa'] += despesa
+                totais[cenario_key]['geral'] += geral
+
+                logger.debug("%s: Receita: R$ %.2f, Despesa: R$ %.2f, Geral: R$ %.2f",
+                             cenario_key.upper(), receita, despesa, geral)
+
+                # Se é o DRE selecionado, guardar para gráfico
+                if cenario_key == tipo_dre:
+                    receita_grafico = receita
+                    despesa_grafico = despesa
+                    geral_grafico = geral
             else:
-                logger.warning(f"{cenario_key.upper()}: sem dados para mês {mes_num}")
+                logger.warning("%s: estrutura 'realizado' inválida para mês %s/%s", cenario_key.upper(), mes_num, ano)
+
+            # Acumular orçamento
+            if valores['orcamento'] is not None:
+                receita_orc, despesa_orc, geral_orc = valores['orcamento']
+                totais_orcamento[cenario_key]['receita'] += receita_orc
+                totais_orcamento[cenario_key]['despesa'] += despesa_orc
+                totais_orcamento[cenario_key]['geral'] += geral_orc
 
         # Adicionar aos arrays do gráfico
         receitas_mensais.append(receita_grafico)
         despesas_mensais.append(despesa_grafico)
         gerais_mensais.append(geral_grafico)
 
-    logger.debug("TOTAIS ACUMULADOS FINAIS:")
-    for dre_key, valores in totais.items():
-        logger.debug(f"{dre_key.upper()}: Receita: R$ {valores['receita']:,.2f}, Despesa: R$ {valores['despesa']:,.2f}, Geral: R$ {valores['geral']:,.2f}")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("TOTAIS ACUMULADOS FINAIS:")
+        for dre_key, valores in totais.items():
+            logger.debug("%s: Receita: R$ %.2f, Despesa: R$ %.2f, Geral: R$ %.2f",
+                         dre_key.upper(), valores['receita'], valores['despesa'], valores['geral'])
 
     # Processar categorias de despesa (itens 2.0X)
     categorias_despesa = {}
@@ -1531,7 +1387,7 @@ def api_dados_bpo(empresa_id):
             dados = mes_data['dados']
             itens = dados.get('itens_hierarquicos', [])
 
-            logger.debug(f"Mês {mes_data['mes']}/{mes_data['ano']}: {len(itens)} itens encontrados")
+            logger.debug("Mês %s/%s: %s itens encontrados", mes_data['mes'], mes_data['ano'], len(itens))
 
             # Processar cada item (funciona para lista ou dicionário)
             items_to_process = itens if isinstance(itens, list) else itens.items()
@@ -1593,9 +1449,10 @@ def api_dados_bpo(empresa_id):
             # Diferença entre média realizada e média prevista (realizado - orçado)
             cat['diferenca'] = cat['realizado'] - cat['orcado']
 
-        logger.debug(f"Total de categorias de despesa: {len(categorias_despesa)}, Total receita orçado: R$ {total_receita_orcado:,.2f}, Meses processados: {num_meses}")
+        logger.debug("Total de categorias de despesa: %s, Total receita orçado: R$ %.2f, Meses processados: %s",
+                     len(categorias_despesa), total_receita_orcado, num_meses)
     except Exception as e:
-        logger.error(f"Erro ao processar categorias de despesa: {e}")
+        logger.error("Erro ao processar categorias de despesa: %s", e)
         import traceback
         traceback.print_exc()
         categorias_despesa = {}
@@ -1655,9 +1512,9 @@ def api_dados_bpo(empresa_id):
             # Diferença entre média realizada e média prevista (realizado - orçado)
             cat['diferenca'] = cat['realizado'] - cat['orcado']
 
-        logger.debug(f"Total de categorias de receita: {len(categorias_receita)}")
+        logger.debug("Total de categorias de receita: %s", len(categorias_receita))
     except Exception as e:
-        logger.error(f"Erro ao processar categorias de receita: {e}")
+        logger.error("Erro ao processar categorias de receita: %s", e)
         import traceback
         traceback.print_exc()
         categorias_receita = {}
@@ -1685,10 +1542,6 @@ def gerar_relatorio_bpo(empresa_id):
 
     from models.company_manager import CompanyManager
     from datetime import datetime
-    from io import BytesIO
-    from openpyxl import Workbook
-    from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-    from openpyxl.chart import BarChart, Reference
 
     # Buscar dados da empresa
     company_manager = CompanyManager()
@@ -1917,177 +1770,25 @@ def gerar_relatorio_bpo(empresa_id):
 
     company_manager.close()
 
-    # ========== CRIAR EXCEL COM GRÁFICOS ==========
-    from openpyxl.chart import LineChart, PieChart
-
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Gráficos BPO"
-
-    # Estilos
-    header_fill = PatternFill(start_color="2C3E50", end_color="2C3E50", fill_type="solid")
-    header_font = Font(bold=True, color="FFFFFF", size=16)
-
-    # Cabeçalho
-    ws['A1'] = 'Relatório BPO - Análise Gráfica'
-    ws['A1'].font = header_font
-    ws['A1'].fill = header_fill
-    ws['A1'].alignment = Alignment(horizontal='center', vertical='center')
-    ws.merge_cells('A1:H1')
-    ws.row_dimensions[1].height = 30
-
-    ws['A2'] = f"Empresa: {empresa['nome']}"
-    ws['A2'].font = Font(bold=True, size=11)
-    ws['A3'] = f"Período: {nomes_meses[mes_inicio]}/{ano_inicio} - {nomes_meses[mes_fim]}/{ano_fim}"
-    ws['A3'].font = Font(size=10)
-    ws['A4'] = f"Gerado em: {datetime.now().strftime('%d/%m/%Y %H:%M')}"
-    ws['A4'].font = Font(size=9, italic=True)
-
-    # Dados ocultos para os gráficos (coluna A-D, começando linha 6)
-    row = 6
-
-    # ==== GRÁFICO 1: COMPARATIVO DOS 3 DREs ====
-    ws.cell(row, 1, "DRE")
-    ws.cell(row, 2, "Resultado")
-    row += 1
-    for dre_nome, dre_key in [('Fluxo Caixa', 'fluxo_caixa'), ('Real', 'real'), ('Real+MP', 'real_mp')]:
-        ws.cell(row, 1, dre_nome)
-        ws.cell(row, 2, totais[dre_key]['geral'])
-        row += 1
-
-    chart1 = BarChart()
-    chart1.title = "Comparativo de Resultado - 3 DREs"
-    chart1.y_axis.title = 'Resultado (R$)'
-    chart1.style = 11
-    data = Reference(ws, min_col=2, min_row=7, max_row=9)
-    cats = Reference(ws, min_col=1, min_row=7, max_row=9)
-    chart1.add_data(data, titles_from_data=False)
-    chart1.set_categories(cats)
-    chart1.height = 10
-    chart1.width = 18
-    ws.add_chart(chart1, 'J7')
-
-    # ==== GRÁFICO 2: EVOLUÇÃO MENSAL (Receita x Despesa x Resultado) ====
-    row = 6
-    col_offset = 5  # Coluna E
-    ws.cell(row, col_offset, "Mês")
-    ws.cell(row, col_offset+1, "Receita")
-    ws.cell(row, col_offset+2, "Despesa")
-    ws.cell(row, col_offset+3, "Resultado")
-    row += 1
-
-    for i, label in enumerate(labels_meses):
-        ws.cell(row, col_offset, label)
-        ws.cell(row, col_offset+1, receitas_mensais[i])
-        ws.cell(row, col_offset+2, despesas_mensais[i])
-        ws.cell(row, col_offset+3, gerais_mensais[i])
-        row += 1
-
-    chart2 = LineChart()
-    chart2.title = f"Evolução Mensal - {tipo_dre.replace('_', ' ').title()}"
-    chart2.y_axis.title = 'Valor (R$)'
-    chart2.x_axis.title = 'Mês'
-    chart2.style = 12
-    max_row_chart2 = 6 + len(labels_meses)
-    data = Reference(ws, min_col=col_offset+1, min_row=6, max_row=max_row_chart2, max_col=col_offset+3)
-    cats = Reference(ws, min_col=col_offset, min_row=7, max_row=max_row_chart2)
-    chart2.add_data(data, titles_from_data=True)
-    chart2.set_categories(cats)
-    chart2.height = 12
-    chart2.width = 22
-    ws.add_chart(chart2, 'A12')
-
-    # ==== GRÁFICO 3: PIZZA CATEGORIAS DE RECEITA ====
-    row_start_receita = 6 + len(labels_meses) + 3
-    row = row_start_receita
-    ws.cell(row, 1, "Categoria Receita")
-    ws.cell(row, 2, "Valor")
-    row += 1
-
-    for codigo in sorted(categorias_receita.keys()):
-        cat = categorias_receita[codigo]
-        ws.cell(row, 1, cat['nome'])
-        ws.cell(row, 2, cat['realizado'])
-        row += 1
-
-    if len(categorias_receita) > 0:
-        chart3 = PieChart()
-        chart3.title = "Distribuição de Receitas por Categoria"
-        chart3.style = 10
-        data = Reference(ws, min_col=2, min_row=row_start_receita+1, max_row=row-1)
-        cats = Reference(ws, min_col=1, min_row=row_start_receita+1, max_row=row-1)
-        chart3.add_data(data, titles_from_data=False)
-        chart3.set_categories(cats)
-        chart3.height = 12
-        chart3.width = 16
-        ws.add_chart(chart3, 'J22')
-
-    # ==== GRÁFICO 4: PIZZA CATEGORIAS DE DESPESA ====
-    row_start_despesa = row + 2
-    row = row_start_despesa
-    ws.cell(row, 1, "Categoria Despesa")
-    ws.cell(row, 2, "Valor")
-    row += 1
-
-    for codigo in sorted(categorias_despesa.keys()):
-        cat = categorias_despesa[codigo]
-        ws.cell(row, 1, cat['nome'])
-        ws.cell(row, 2, cat['realizado'])
-        row += 1
-
-    if len(categorias_despesa) > 0:
-        chart4 = PieChart()
-        chart4.title = "Distribuição de Despesas por Categoria"
-        chart4.style = 10
-        data = Reference(ws, min_col=2, min_row=row_start_despesa+1, max_row=row-1)
-        cats = Reference(ws, min_col=1, min_row=row_start_despesa+1, max_row=row-1)
-        chart4.add_data(data, titles_from_data=False)
-        chart4.set_categories(cats)
-        chart4.height = 12
-        chart4.width = 16
-        ws.add_chart(chart4, 'J37')
-
-    # ==== GRÁFICO 5: BARRAS HORIZONTAIS - RECEITA vs DESPESA POR MÊS ====
-    row_start_bar = row + 2
-    row = row_start_bar
-    ws.cell(row, 5, "Mês")
-    ws.cell(row, 6, "Receita")
-    ws.cell(row, 7, "Despesa")
-    row += 1
-
-    for i, label in enumerate(labels_meses):
-        ws.cell(row, 5, label)
-        ws.cell(row, 6, receitas_mensais[i])
-        ws.cell(row, 7, despesas_mensais[i])
-        row += 1
-
-    from openpyxl.chart import BarChart as HorizontalBarChart
-    chart5 = HorizontalBarChart()
-    chart5.type = "bar"
-    chart5.title = "Receita vs Despesa Mensal"
-    chart5.y_axis.title = 'Mês'
-    chart5.x_axis.title = 'Valor (R$)'
-    chart5.style = 13
-    data = Reference(ws, min_col=6, min_row=row_start_bar, max_row=row-1, max_col=7)
-    cats = Reference(ws, min_col=5, min_row=row_start_bar+1, max_row=row-1)
-    chart5.add_data(data, titles_from_data=True)
-    chart5.set_categories(cats)
-    chart5.height = 14
-    chart5.width = 20
-    ws.add_chart(chart5, 'J52')
-
-    # Ocultar dados (deixar apenas gráficos visíveis)
-    for col_letter in ['A', 'B', 'C', 'D', 'E', 'F', 'G', 'H']:
-        ws.column_dimensions[col_letter].hidden = True
-
-    # Salvar em memória
-    excel_buffer = BytesIO()
-    wb.save(excel_buffer)
-    excel_buffer.seek(0)
-
-    # Retornar Excel
-    response = make_response(excel_buffer.read())
-    response.headers['Content-Type'] = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    # ========== GERAR EXCEL COM GRÁFICOS ==========
+    from controllers.reports.excel_reports import gerar_relatorio_bpo_xlsx, MIME_XLSX
+
+    resumo = {
+        'empresa_nome': empresa['nome'],
+        'periodo': f"{nomes_meses[mes_inicio]}/{ano_inicio} - {nomes_meses[mes_fim]}/{ano_fim}",
+        'gerado_em': datetime.now().strftime('%d/%m/%Y %H:%M'),
+        'tipo_dre': tipo_dre,
+        'totais': totais,
+        'labels_meses': labels_meses,
+        'receitas_mensais': receitas_mensais,
+        'despesas_mensais': despesas_mensais,
+        'gerais_mensais': gerais_mensais,
+        'categorias_receita': categorias_receita,
+        'categorias_despesa': categorias_despesa
+    }
+
+    # Retornar Excel (enviado em blocos enquanto o arquivo é gerado)
+    response = Response(gerar_relatorio_bpo_xlsx(resumo), mimetype=MIME_XLSX)
     response.headers['Content-Disposition'] = f'attachment; filename=Relatorio_BPO_{empresa["nome"]}_{datetime.now().strftime("%Y%m%d")}.xlsx'
 
     return response
@@ -2100,10 +1801,6 @@ def gerar_relatorio_viabilidade(empresa_id):
 
     from models.company_manager import CompanyManager
     from datetime import datetime
-    from io import BytesIO
-    from openpyxl import Workbook
-    from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-    from openpyxl.chart import BarChart, Reference
 
     # Buscar dados da empresa
     company_manager = CompanyManager()
@@ -2155,149 +1852,78 @@ def gerar_relatorio_viabilidade(empresa_id):
 
     company_manager.close()
 
-    # ========== CRIAR EXCEL COM GRÁFICOS ==========
-    from openpyxl.chart import PieChart
-
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Gráficos Viabilidade"
-
-    # Estilos
-    header_fill = PatternFill(start_color="2C3E50", end_color="2C3E50", fill_type="solid")
-    header_font = Font(bold=True, color="FFFFFF", size=16)
-
-    # Cabeçalho
-    ws['A1'] = 'Relatório de Viabilidade - Análise Gráfica'
-    ws['A1'].font = header_font
-    ws['A1'].fill = header_fill
-    ws['A1'].alignment = Alignment(horizontal='center', vertical='center')
-    ws.merge_cells('A1:H1')
-    ws.row_dimensions[1].height = 30
-
-    ws['A2'] = f"Empresa: {empresa['nome']}"
-    ws['A2'].font = Font(bold=True, size=11)
-    ws['A3'] = f"Ano: {ano_selecionado}"
-    ws['A3'].font = Font(size=10)
-    ws['A4'] = f"Gerado em: {datetime.now().strftime('%d/%m/%Y %H:%M')}"
-    ws['A4'].font = Font(size=9, italic=True)
-
-    # Dados ocultos para os gráficos
-    row = 6
-
-    # ==== GRÁFICO 1: COMPARATIVO DE RESULTADOS DOS 3 GRUPOS ====
-    ws.cell(row, 1, "Grupo")
-    ws.cell(row, 2, "Resultado")
-    row += 1
-    for grupo_nome in ['Viabilidade Real', 'Viabilidade PE', 'Viabilidade Ideal']:
-        grupo = grupos_info[grupo_nome]
-        ws.cell(row, 1, grupo_nome.replace('Viabilidade ', ''))
-        ws.cell(row, 2, grupo['resultado'])
-        row += 1
-
-    chart1 = BarChart()
-    chart1.title = "Comparativo de Resultados"
-    chart1.y_axis.title = 'Resultado (R$)'
-    chart1.style = 11
-    data = Reference(ws, min_col=2, min_row=6, max_row=9)
-    cats = Reference(ws, min_col=1, min_row=7, max_row=9)
-    chart1.add_data(data, titles_from_data=True)
-    chart1.set_categories(cats)
-    chart1.height = 12
-    chart1.width = 18
-    ws.add_chart(chart1, 'A7')
-
-    # ==== GRÁFICO 2: RECEITA vs DESPESA POR GRUPO ====
-    row = 6
-    col_offset = 4  # Coluna D
-    ws.cell(row, col_offset, "Grupo")
-    ws.cell(row, col_offset+1, "Receita")
-    ws.cell(row, col_offset+2, "Despesa")
-    row += 1
-
-    for grupo_nome in ['Viabilidade Real', 'Viabilidade PE', 'Viabilidade Ideal']:
-        grupo = grupos_info[grupo_nome]
-        ws.cell(row, col_offset, grupo_nome.replace('Viabilidade ', ''))
-        ws.cell(row, col_offset+1, grupo['receita'])
-        ws.cell(row, col_offset+2, grupo['despesa'])
-        row += 1
-
-    chart2 = BarChart()
-    chart2.title = "Receita vs Despesa por Grupo"
-    chart2.y_axis.title = 'Valor (R$)'
-    chart2.style = 12
-    data = Reference(ws, min_col=col_offset+1, min_row=6, max_row=9, max_col=col_offset+2)
-    cats = Reference(ws, min_col=col_offset, min_row=7, max_row=9)
-    chart2.add_data(data, titles_from_data=True)
-    chart2.set_categories(cats)
-    chart2.height = 12
-    chart2.width = 20
-    ws.add_chart(chart2, 'J7')
-
-    # ==== GRÁFICO 3: PIZZA - DISTRIBUIÇÃO DE RECEITAS ====
-    row_start_pizza = 12
-    row = row_start_pizza
-    ws.cell(row, 1, "Grupo")
-    ws.cell(row, 2, "Receita")
-    row += 1
-
-    for grupo_nome in ['Viabilidade Real', 'Viabilidade PE', 'Viabilidade Ideal']:
-        grupo = grupos_info[grupo_nome]
-        ws.cell(row, 1, grupo_nome.replace('Viabilidade ', ''))
-        ws.cell(row, 2, grupo['receita'])
-        row += 1
-
-    chart3 = PieChart()
-    chart3.title = "Distribuição de Receitas"
-    chart3.style = 10
-    data = Reference(ws, min_col=2, min_row=row_start_pizza, max_row=row-1)
-    cats = Reference(ws, min_col=1, min_row=row_start_pizza+1, max_row=row-1)
-    chart3.add_data(data, titles_from_data=True)
-    chart3.set_categories(cats)
-    chart3.height = 12
-    chart3.width = 16
-    ws.add_chart(chart3, 'A24')
-
-    # ==== GRÁFICO 4: PIZZA - DISTRIBUIÇÃO DE DESPESAS ====
-    row_start_desp = row + 2
-    row = row_start_desp
-    ws.cell(row, 1, "Grupo")
-    ws.cell(row, 2, "Despesa")
-    row += 1
-
-    for grupo_nome in ['Viabilidade Real', 'Viabilidade PE', 'Viabilidade Ideal']:
-        grupo = grupos_info[grupo_nome]
-        ws.cell(row, 1, grupo_nome.replace('Viabilidade ', ''))
-        ws.cell(row, 2, grupo['despesa'])
-        row += 1
-
-    chart4 = PieChart()
-    chart4.title = "Distribuição de Despesas"
-    chart4.style = 10
-    data = Reference(ws, min_col=2, min_row=row_start_desp, max_row=row-1)
-    cats = Reference(ws, min_col=1, min_row=row_start_desp+1, max_row=row-1)
-    chart4.add_data(data, titles_from_data=True)
-    chart4.set_categories(cats)
-    chart4.height = 12
-    chart4.width = 16
-    ws.add_chart(chart4, 'J24')
-
-    # Ocultar dados (deixar apenas gráficos visíveis)
-    for col_letter in ['A', 'B', 'C', 'D', 'E', 'F', 'G']:
-        ws.column_dimensions[col_letter].hidden = True
-
-    # Salvar Excel em buffer
-    excel_buffer = BytesIO()
-    wb.save(excel_buffer)
-    excel_buffer.seek(0)
-
-    # Retornar Excel
-    response = make_response(excel_buffer.read())
-    response.headers['Content-Type'] = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    # ========== GERAR EXCEL COM GRÁFICOS ==========
+    from controllers.reports.excel_reports import gerar_relatorio_viabilidade_xlsx, MIME_XLSX
+
+    resumo = {
+        'empresa_nome': empresa['nome'],
+        'ano': ano_selecionado,
+        'gerado_em': datetime.now().strftime('%d/%m/%Y %H:%M'),
+        'grupos_info': grupos_info
+    }
+
+    # Retornar Excel (enviado em blocos enquanto o arquivo é gerado)
+    response = Response(gerar_relatorio_viabilidade_xlsx(resumo), mimetype=MIME_XLSX)
     response.headers['Content-Disposition'] = f'attachment; filename=Relatorio_Viabilidade_{empresa["nome"]}_{ano_selecionado}.xlsx'
 
     return response
 
 
+@admin_bp.route('/admin/exportar/<conjunto>')
+def exportar_dados(conjunto):
+    """Exporta em streaming (CSV/Parquet) o BPO ou a viabilidade de uma, várias ou todas as empresas"""
+    if not ('user_email' in session and session.get('user_role') == 'admin'):
+        return jsonify({'error': 'Não autorizado'}), 403
+
+    from controllers.reports.exportacao import exportar, ler_empresas, nome_arquivo, FORMATOS, FormatoIndisponivel
+
+    formato = request.args.get('formato', 'csv')
+    try:
+        empresa_ids = ler_empresas(request.args.get('empresas'))
+        corpo = exportar(conjunto, empresa_ids, formato)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except FormatoIndisponivel as e:
+        return jsonify({'error': str(e)}), 501
+
+    response = Response(corpo, mimetype=FORMATOS[formato])
+    response.headers['Content-Disposition'] = f'attachment; filename={nome_arquivo(conjunto, formato, empresa_ids)}'
+    return response
+
+
+@admin_bp.route('/admin/api/ingestao/<conjunto>', methods=['POST'])
+def ingerir_dados(conjunto):
+    """Carrega BPO ou viabilidade de um CSV/JSONL (sem planilha Excel) e retorna linhas/s"""
+    if not ('user_email' in session and session.get('user_role') == 'admin'):
+        return jsonify({'error': 'Não autorizado'}), 403
+
+    import io
+    from controllers.data_processing.ingestao import ingerir, formato_do_arquivo
+
+    arquivo = request.files.get('arquivo')
+    if arquivo:
+        stream = arquivo.stream
+        nome = arquivo.filename
+    else:
+        # Corpo bruto (ex.: curl --data-binary @dados.jsonl)
+        stream = io.BytesIO(request.get_data())
+        nome = None
+
+    formato = request.values.get('formato') or formato_do_arquivo(nome)
+    if not formato:
+        return jsonify({'error': 'Informe o formato (csv ou jsonl)'}), 400
+
+    empresa_id = request.values.get('empresa_id')
+    try:
+        resultado = ingerir(conjunto, stream, formato, int(empresa_id) if empresa_id else None)
+    except ValueError as e:
+        return jsonify({'error': str(e), 'erros': getattr(e, 'erros', [str(e)])}), 400
+    except RuntimeError as e:
+        return jsonify({'error': str(e)}), 500
+
+    return jsonify(resultado)
+
+
 # ========== API: GERENCIAMENTO DE MESES BPO ==========
 
 @admin_bp.route('/admin/api/listar-meses-bpo/<int:empresa_id>')
@@ -2366,3 +1992,103 @@ def excluir_meses_bpo():
             'mensagem': f'Erro ao excluir meses: {str(e)}'
         }), 500
 
+
+
+@admin_bp.route('/admin/api/comparativo-bpo/<int:empresa_id>')
+def api_comparativo_bpo(empresa_id):
+    """API de comparativo ano contra ano e janelas móveis (3/6/12 meses) do BPO"""
+    if not ('user_email' in session and session.get('user_role') == 'admin'):
+        return jsonify({"error": "Não autorizado"}), 403
+
+    from controllers.data_processing.bpo_series import ler_parametros_comparativo, carregar_comparativo_bpo
+
+    parametros, erro = ler_parametros_comparativo(request.args)
+    if erro:
+        return jsonify({"error": erro}), 400
+
+    return jsonify(carregar_comparativo_bpo(empresa_id, **parametros))
+
+
+# ============================
+# CARTEIRA BPO (VISÃO CONSOLIDADA)
+# ============================
+
+def _consultar_carteira_bpo():
+    """Lê os filtros da carteira (período, DRE, ordenação) e consolida os totais."""
+    from models.company_manager import CompanyManager
+    from controllers.data_processing.bpo_totais import CENARIOS_DRE, ORDENACOES_CARTEIRA, montar_carteira
+
+    ano_padrao = datetime.now().year
+    filtros = {
+        'ano_inicio': request.args.get('ano_inicio', ano_padrao, type=int),
+        'mes_inicio': request.args.get('mes_inicio', 1, type=int),
+        'ano_fim': request.args.get('ano_fim', ano_padrao, type=int),
+        'mes_fim': request.args.get('mes_fim', 12, type=int),
+        'tipo_dre': request.args.get('tipo_dre', 'fluxo_caixa'),
+        'ordenar': request.args.get('ordenar', 'margem'),
+        'ordem': request.args.get('ordem', 'desc'),
+    }
+    if filtros['tipo_dre'] not in CENARIOS_DRE:
+        filtros['tipo_dre'] = 'fluxo_caixa'
+    if filtros['ordenar'] not in ORDENACOES_CARTEIRA:
+        filtros['ordenar'] = 'margem'
+
+    company_manager = CompanyManager()
+    company_manager.executar_migracoes()  # Preenche TbBpoTotais de uploads antigos
+    linhas = company_manager.consolidar_totais_bpo(
+        filtros['ano_inicio'], filtros['mes_inicio'], filtros['ano_fim'], filtros['mes_fim']
+    )
+    company_manager.close()
+
+    carteira = montar_carteira(
+        linhas, filtros['tipo_dre'], filtros['ordenar'], decrescente=filtros['ordem'] != 'asc'
+    )
+    return filtros, carteira
+
+
+@admin_bp.route('/admin/carteira-bpo')
+def carteira_bpo():
+    """Visão consolidada do BPO de todas as empresas ativas"""
+    if not ('user_email' in session and session.get('user_role') == 'admin'):
+        flash("Acesso negado. Você precisa ser um administrador.", "danger")
+        return redirect(url_for('index.login'))
+
+    filtros, carteira = _consultar_carteira_bpo()
+    return render_template('admin/carteira_bpo.html', filtros=filtros, carteira=carteira)
+
+
+@admin_bp.route('/admin/api/carteira-bpo')
+def api_carteira_bpo():
+    """API com os totais BPO consolidados por empresa (realizado x orçado, 3 DREs)"""
+    if not ('user_email' in session and session.get('user_role') == 'admin'):
+        return jsonify({"error": "Não autorizado"}), 403
+
+    filtros, carteira = _consultar_carteira_bpo()
+    return jsonify({'filtros': filtros, **carteira})
+
+
+# ============================
+# MÉTRICAS (PROMETHEUS)
+# ============================
+
+@admin_bp.route('/metrics')
+def metrics():
+    """
+    Métricas da aplicação no formato texto do Prometheus.
+
+    Acesso: sessão de administrador ou header "Authorization: Bearer <METRICS_TOKEN>"
+    (para o scraper do Prometheus, quando METRICS_TOKEN estiver definido no .env).
+    """
+    import os
+    import hmac
+
+    autorizado = 'user_email' in session and session.get('user_role') == 'admin'
+    if not autorizado:
+        token = os.getenv('METRICS_TOKEN')
+        cabecalho = request.headers.get('Authorization', '')
+        autorizado = bool(token) and hmac.compare_digest(cabecalho, f"Bearer {token}")
+    if not autorizado:
+        return Response("Acesso negado\n", status=403, mimetype='text/plain')
+
+    from utils.metrics import exportar_prometheus
+    return Response(exportar_prometheus(), mimetype='text/plain; version=0.0.4; charset=utf-8')
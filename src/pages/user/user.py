@@ -1,6 +1,8 @@
-from flask import Blueprint, render_template, session, redirect, url_for, request, flash, jsonify
+from flask import Blueprint, render_template, session, redirect, url_for, request, flash, jsonify, Response
 from datetime import datetime
 from utils.logger import get_logger
+from controllers.auth.principal import obter_usuario_logado
+from controllers.auth.acesso import acesso_empresa_requerido, obter_acesso
 
 # Inicializar logger
 logger = get_logger('user_pages')
@@ -11,18 +13,14 @@ user_bp = Blueprint('user', __name__)
 def selecionar_empresa():
     """Página para o usuário selecionar qual empresa deseja acessar"""
     if 'user_email' in session and session.get('user_role') == 'user':
-        from models.user_manager import UserManager
-
-        user_manager = UserManager()
-        user_data = user_manager.find_user_by_email(session.get('user_email'))
+        user_data = obter_usuario_logado()
 
         if not user_data:
             flash("Erro ao carregar dados do usuário.", "danger")
             return redirect(url_for('index.login'))
 
-        # Busca empresas vinculadas ao usuário
-        empresas = user_manager.get_empresas_do_usuario(user_data['id'])
-        user_manager.close()
+        # Busca empresas vinculadas ao usuário (cache de acesso)
+        empresas = list(obter_acesso(user_data['id']).empresas)
 
         # Se não tiver empresa vinculada
         if not empresas:
@@ -50,25 +48,18 @@ def selecionar_empresa():
 def definir_empresa(empresa_id):
     """Define a empresa que o usuário quer acessar"""
     if 'user_email' in session and session.get('user_role') == 'user':
-        from models.user_manager import UserManager
-        from models.company_manager import CompanyManager
-
-        user_manager = UserManager()
-        user_data = user_manager.find_user_by_email(session.get('user_email'))
+        user_data = obter_usuario_logado()
 
         if not user_data:
             flash("Erro ao carregar dados do usuário.", "danger")
             return redirect(url_for('index.login'))
 
-        # Verifica se o usuário tem acesso a essa empresa
-        empresas = user_manager.get_empresas_do_usuario(user_data['id'])
-        user_manager.close()
+        # Verifica se o usuário tem acesso a essa empresa (cache de acesso)
+        acesso = obter_acesso(user_data['id'])
 
         empresa_encontrada = None
-        for empresa in empresas:
-            if empresa['id'] == empresa_id:
-                empresa_encontrada = empresa
-                break
+        if empresa_id in acesso.empresa_ids:
+            empresa_encontrada = next(e for e in acesso.empresas if e['id'] == empresa_id)
 
         if not empresa_encontrada:
             flash("Você não tem acesso a esta empresa.", "danger")
@@ -86,10 +77,10 @@ def definir_empresa(empresa_id):
 
 
 @user_bp.route('/user/dashboard')
+@acesso_empresa_requerido()
 def user_dashboard():
     """Dashboard principal do usuário - mostra dados anuais da empresa selecionada"""
     if 'user_email' in session and session.get('user_role') == 'user':
-        from models.user_manager import UserManager
         from models.company_manager import CompanyManager
 
         # Verifica se tem empresa selecionada
@@ -97,9 +88,7 @@ def user_dashboard():
             return redirect(url_for('user.selecionar_empresa'))
 
         # Pega informações do usuário logado
-        user_manager = UserManager()
-        user_data = user_manager.find_user_by_email(session.get('user_email'))
-        user_manager.close()
+        user_data = obter_usuario_logado()
 
         if not user_data:
             flash("Erro ao carregar dados do usuário.", "danger")
@@ -128,19 +117,12 @@ def user_dashboard():
 
 
 @user_bp.route('/user/api/dados-bpo-tabela/<int:empresa_id>')
+@acesso_empresa_requerido(api=True)
 def api_dados_bpo_tabela(empresa_id):
     """
     API para retornar dados BPO em formato tabular (tipo planilha)
     Filtra por período e retorna itens hierárquicos com dados mensais
     """
-    if 'user_email' not in session or session.get('user_role') != 'user':
-        return jsonify({'error': 'Não autorizado'}), 403
-
-    # Verificar se usuário tem acesso a esta empresa
-    empresa_id_session = session.get('empresa_id')
-    if empresa_id != empresa_id_session:
-        return jsonify({'error': 'Acesso negado a esta empresa'}), 403
-
     try:
         from models.company_manager import CompanyManager
         import json
@@ -151,6 +133,15 @@ def api_dados_bpo_tabela(empresa_id):
         mes_fim = int(request.args.get('mes_fim', 12))
         ano_fim = int(request.args.get('ano_fim', 2025))
 
+        # Com o histórico colunar ativo, a tabela sai do arquivo mapeado em memória
+        from controllers.data_processing.bpo_colunar import abrir_historico, tabela_bpo
+        historico = abrir_historico(empresa_id)
+        if historico is not None:
+            tabela = tabela_bpo(historico, ano_inicio, mes_inicio, ano_fim, mes_fim)
+            if tabela is None:
+                return jsonify({'error': 'Nenhum dado encontrado para o período'}), 404
+            return jsonify(tabela)
+
         company_manager = CompanyManager()
 
         # Buscar todos os meses do período
@@ -277,22 +268,12 @@ def api_dados_bpo_tabela(empresa_id):
 
 
 @user_bp.route('/user/relatorio-pdf/<int:empresa_id>/<int:ano>/<grupo_viabilidade>')
+@acesso_empresa_requerido()
 def gerar_relatorio_pdf(empresa_id, ano, grupo_viabilidade):
     """Gera PDF do relatório de viabilidade (rota para usuários)"""
-    if 'user_email' not in session or session.get('user_role') != 'user':
-        flash("Acesso negado. Faça login como usuário.", "danger")
-        return redirect(url_for('index.login'))
-
-    # Verificar se usuário tem acesso a esta empresa
-    empresa_id_session = session.get('empresa_id')
-    if empresa_id != empresa_id_session:
-        flash("Acesso negado a esta empresa.", "danger")
-        return redirect(url_for('user.user_dashboard'))
-
     try:
         from models.company_manager import CompanyManager
-        from xhtml2pdf import pisa
-        import io
+        from controllers.reports.pdf_renderer import gerar_pdf_relatorio_viabilidade
 
         # Buscar empresa
         company_manager = CompanyManager()
@@ -311,62 +292,11 @@ def gerar_relatorio_pdf(empresa_id, ano, grupo_viabilidade):
             flash(f"Template de relatório não encontrado para o ano {ano}.", "warning")
             return redirect(url_for('user.user_dashboard'))
 
-        # Pegar o texto do template (já vem pronto com os valores)
-        conteudo_texto = template_data['template']
-
-        # Adicionar CSS para formatação do PDF
-        css_style = """
-        <style>
-            @page { size: A4; margin: 2cm; }
-            body { font-family: Arial, sans-serif; font-size: 11pt; line-height: 1.6; color: #333; }
-            h1 { color: #2c3e50; font-size: 18pt; margin-top: 1em; }
-            h2 { color: #34495e; font-size: 14pt; margin-top: 1em; }
-            h3 { color: #34495e; font-size: 12pt; margin-top: 0.8em; }
-            table { width: 100%; border-collapse: collapse; margin: 1em 0; }
-            th, td { border: 1px solid #ddd; padding: 8px; text-align: left; }
-            th { background-color: #f2f2f2; font-weight: bold; }
-            .header { text-align: center; margin-bottom: 2em; border-bottom: 2px solid #2c3e50; padding-bottom: 1em; }
-            .section { margin: 1.5em 0; }
-            p { margin: 0.5em 0; }
-        </style>
-        """
-
-        # Converter quebras de linha do texto em tags HTML <br>
-        conteudo_html = conteudo_texto.replace('\n', '<br>\n')
-
-        html_completo = f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <meta charset="UTF-8">
-            {css_style}
-        </head>
-        <body>
-            <div class="header">
-                <h1>RELATÓRIO DE VIABILIDADE FINANCEIRA</h1>
-                <p><strong>{empresa['nome']}</strong> - Ano: {ano}</p>
-                <p>Cenário: {grupo_viabilidade}</p>
-            </div>
-            <div class="content">
-                {conteudo_html}
-            </div>
-        </body>
-        </html>
-        """
-
-        # Gerar PDF usando xhtml2pdf (funciona melhor no Windows)
-        pdf_file = io.BytesIO()
-        pisa_status = pisa.CreatePDF(
-            html_completo.encode('utf-8'),
-            dest=pdf_file,
-            encoding='utf-8'
+        # Renderizar PDF (pool de processos + cache em disco)
+        pdf_file = gerar_pdf_relatorio_viabilidade(
+            empresa['nome'], ano, grupo_viabilidade, template_data['template']
         )
 
-        if pisa_status.err:
-            raise Exception(f"Erro ao gerar PDF: {pisa_status.err}")
-
-        pdf_file.seek(0)
-
         # Retornar PDF como download
         from flask import send_file
         return send_file(
@@ -385,11 +315,9 @@ def gerar_relatorio_pdf(empresa_id, ano, grupo_viabilidade):
 
 
 @user_bp.route('/user/api/relatorio-ia-viabilidade/<int:empresa_id>', methods=['POST'])
+@acesso_empresa_requerido(api=True)
 def api_relatorio_ia_viabilidade_user(empresa_id):
     """Gera relatório de viabilidade usando IA (Gemini) - rota para usuários"""
-    if not ('user_email' in session and session.get('user_role') == 'user'):
-        return jsonify({"error": "Não autorizado"}), 403
-
     try:
         from controllers.AI.gemini_utils import gerar_relatorio_viabilidade
         from models.company_manager import CompanyManager
@@ -427,11 +355,9 @@ def api_relatorio_ia_viabilidade_user(empresa_id):
 
 
 @user_bp.route('/user/api/relatorio-ia-bpo/<int:empresa_id>', methods=['POST'])
+@acesso_empresa_requerido(api=True)
 def api_relatorio_ia_bpo_user(empresa_id):
     """Gera relatório executivo de DRE e Performance usando IA (Gemini) - rota para usuários"""
-    if not ('user_email' in session and session.get('user_role') == 'user'):
-        return jsonify({"error": "Não autorizado"}), 403
-
     try:
         from controllers.AI.gemini_utils import gerar_relatorio_bpo
         from models.company_manager import CompanyManager
@@ -469,10 +395,10 @@ def api_relatorio_ia_bpo_user(empresa_id):
 
 
 @user_bp.route('/user/dados')
+@acesso_empresa_requerido()
 def visualizar_dados():
     """Página de visualização detalhada dos dados anuais da empresa selecionada"""
     if 'user_email' in session and session.get('user_role') == 'user':
-        from models.user_manager import UserManager
         from models.company_manager import CompanyManager
 
         # Verifica se tem empresa selecionada
@@ -480,9 +406,7 @@ def visualizar_dados():
             return redirect(url_for('user.selecionar_empresa'))
 
         # Pega informações do usuário logado
-        user_manager = UserManager()
-        user_data = user_manager.find_user_by_email(session.get('user_email'))
-        user_manager.close()
+        user_data = obter_usuario_logado()
 
         if not user_data:
             flash("Erro ao carregar dados do usuário.", "danger")
@@ -518,169 +442,26 @@ def visualizar_dados():
 
 
 @user_bp.route('/user/api/dados-empresa/<int:empresa_id>/<int:ano>')
+@acesso_empresa_requerido(api=True)
 def api_dados_empresa_user(empresa_id, ano):
     """API compatível com template do admin - retorna dados organizados por subgrupo"""
-    if not ('user_email' in session and session.get('user_role') == 'user'):
-        return jsonify({"error": "Não autorizado"}), 403
-
-    from models.user_manager import UserManager
-    from models.company_manager import CompanyManager
-
-    # SEGURANÇA: Verificar se o usuário tem acesso a esta empresa
-    empresa_id_session = session.get('empresa_id')
-    if empresa_id != empresa_id_session:
-        return jsonify({"error": "Acesso negado a esta empresa"}), 403
+    from controllers.data_processing.viabilidade import resposta_dados_viabilidade
 
-    user_manager = UserManager()
-    user_data = user_manager.find_user_by_email(session.get('user_email'))
-    user_manager.close()
+    user_data = obter_usuario_logado()
 
     if not user_data:
         return jsonify({"error": "Usuário não encontrado"}), 404
 
-    company_manager = CompanyManager()
-    data_results = company_manager.buscar_dados_empresa(empresa_id, ano)
-    company_manager.close()
-
-    # Organizar dados por SUBGRUPO dentro de cada grupo de viabilidade (MESMA LÓGICA DO ADMIN)
-    dados_organizados = {}
-
-    # Processar TbItens
-    if data_results and data_results.get('TbItens'):
-        for item in data_results['TbItens']:
-            grupo = item[0]
-            subgrupo = item[1]
-            descricao = item[2]
-            percentual = float(item[3]) if item[3] else 0
-            valor = float(item[4]) if item[4] else 0
-
-            if grupo not in dados_organizados:
-                dados_organizados[grupo] = {}
-
-            if subgrupo not in dados_organizados[grupo]:
-                dados_organizados[grupo][subgrupo] = []
-
-            dados_organizados[grupo][subgrupo].append({
-                "descricao": descricao,
-                "percentual": percentual,
-                "valor": valor
-            })
-
-    # Processar Investimentos (TODOS OS CAMPOS)
-    if data_results and data_results.get('TbItensInvestimentos'):
-        for item in data_results['TbItensInvestimentos']:
-            grupo = item[0]
-            subgrupo = item[1]
-            descricao = item[2]
-            parcela = float(item[3]) if len(item) > 3 and item[3] else 0
-            juros = float(item[4]) if len(item) > 4 and item[4] else 0
-            total = float(item[5]) if len(item) > 5 and item[5] else 0
-
-            if grupo not in dados_organizados:
-                dados_organizados[grupo] = {}
-
-            if subgrupo not in dados_organizados[grupo]:
-                dados_organizados[grupo][subgrupo] = []
-
-            dados_organizados[grupo][subgrupo].append({
-                "descricao": descricao,
-                "parcela": parcela,
-                "juros": juros,
-                "valor": total,
-                "percentual": 0
-            })
-
-    # Processar Dívidas (TODOS OS CAMPOS)
-    if data_results and data_results.get('TbItensDividas'):
-        for item in data_results['TbItensDividas']:
-            grupo = item[0]
-            subgrupo = item[1]
-            descricao = item[2]
-            parcela = float(item[3]) if len(item) > 3 and item[3] else 0
-            juros = float(item[4]) if len(item) > 4 and item[4] else 0
-            total = float(item[5]) if len(item) > 5 and item[5] else 0
-
-            if grupo not in dados_organizados:
-                dados_organizados[grupo] = {}
-
-            if subgrupo not in dados_organizados[grupo]:
-                dados_organizados[grupo][subgrupo] = []
-
-            dados_organizados[grupo][subgrupo].append({
-                "descricao": descricao,
-                "parcela": parcela,
-                "juros": juros,
-                "valor": total,
-                "percentual": 0
-            })
-
-    # Processar Investimento Geral
-    if data_results and data_results.get('TbItensInvestimentoGeral'):
-        for item in data_results['TbItensInvestimentoGeral']:
-            grupo = item[0]
-            subgrupo = item[1]
-            descricao = item[2]
-            valor = float(item[3]) if len(item) > 3 and item[3] else 0
-
-            if grupo not in dados_organizados:
-                dados_organizados[grupo] = {}
-
-            if subgrupo not in dados_organizados[grupo]:
-                dados_organizados[grupo][subgrupo] = []
-
-            dados_organizados[grupo][subgrupo].append({
-                "descricao": descricao,
-                "valor": valor,
-                "percentual": 0
-            })
-
-    # Processar Gastos Operacionais (COM NOME DIFERENCIADO)
-    if data_results and data_results.get('TbItensGastosOperacionais'):
-        for item in data_results['TbItensGastosOperacionais']:
-            grupo = item[0]
-            subgrupo_original = item[1]  # Pode ser "GastosOperacionais"
-            descricao = item[2]
-            custo_km = float(item[3]) if len(item) > 3 and item[3] else 0
-            custo_mensal = float(item[4]) if len(item) > 4 and item[4] else 0
-
-            # Renomear subgrupo para "Gastos Operacionais Veículos" para diferenciar
-            subgrupo = 'Gastos Operacionais Veículos'
-
-            if grupo not in dados_organizados:
-                dados_organizados[grupo] = {}
-
-            if subgrupo not in dados_organizados[grupo]:
-                dados_organizados[grupo][subgrupo] = []
-
-            dados_organizados[grupo][subgrupo].append({
-                "descricao": descricao,
-                "custo_km": custo_km,
-                "valor": custo_mensal,
-                "percentual": 0
-            })
-
-    return jsonify({
-        "ano": ano,
-        "dados": dados_organizados
-    })
-
+    # MESMOS DADOS DO ADMIN: snapshot organizado por subgrupo, com ETag
+    return resposta_dados_viabilidade(empresa_id, ano)
 
 @user_bp.route('/user/api/dados/<int:ano>')
+@acesso_empresa_requerido(api=True)
 def api_dados_ano(ano):
     """API para retornar dados de um ano específico organizados por grupo de viabilidade"""
-    if not ('user_email' in session and session.get('user_role') == 'user'):
-        return jsonify({"error": "Não autorizado"}), 403
-
-    from models.user_manager import UserManager
     from models.company_manager import CompanyManager
 
-    # Verifica se tem empresa selecionada
-    if 'empresa_id' not in session:
-        return jsonify({"error": "Empresa não selecionada"}), 400
-
-    user_manager = UserManager()
-    user_data = user_manager.find_user_by_email(session.get('user_email'))
-    user_manager.close()
+    user_data = obter_usuario_logado()
 
     if not user_data:
         return jsonify({"error": "Usuário não encontrado"}), 404
@@ -756,19 +537,17 @@ def api_dados_ano(ano):
 
 
 @user_bp.route('/user/bpo')
+@acesso_empresa_requerido()
 def visualizar_bpo():
     """Página de visualização do BPO da empresa selecionada"""
     if 'user_email' in session and session.get('user_role') == 'user':
-        from models.user_manager import UserManager
 
         # Verifica se tem empresa selecionada
         if 'empresa_id' not in session:
             return redirect(url_for('user.selecionar_empresa'))
 
         # Pega informações do usuário logado
-        user_manager = UserManager()
-        user_data = user_manager.find_user_by_email(session.get('user_email'))
-        user_manager.close()
+        user_data = obter_usuario_logado()
 
         if not user_data:
             flash("Erro ao carregar dados do usuário.", "danger")
@@ -815,23 +594,23 @@ def trocar_empresa():
 
 
 @user_bp.route('/user/api/dados-bpo/<int:empresa_id>')
+@acesso_empresa_requerido(api=True)
 def api_dados_bpo_user(empresa_id):
     """API compatível com template do admin - retorna dados BPO processados"""
-    if not ('user_email' in session and session.get('user_role') == 'user'):
-        return jsonify({"error": "Não autorizado"}), 403
-
-    # SEGURANÇA: Verificar se o usuário tem acesso a esta empresa
-    empresa_id_session = session.get('empresa_id')
-    if empresa_id != empresa_id_session:
-        return jsonify({"error": "Acesso negado a esta empresa"}), 403
-
     ano_inicio = int(request.args.get('ano_inicio', 2025))
     mes_inicio = int(request.args.get('mes_inicio', 1))
     ano_fim = int(request.args.get('ano_fim', 2025))
     mes_fim = int(request.args.get('mes_fim', 12))
     tipo_dre = request.args.get('tipo_dre', 'fluxo_caixa')
 
+    # Com o histórico colunar ativo, os totais saem do arquivo mapeado em memória
+    from controllers.data_processing.bpo_colunar import abrir_historico, dashboard_bpo
+    historico = abrir_historico(empresa_id)
+    if historico is not None:
+        return jsonify(dashboard_bpo(historico, ano_inicio, mes_inicio, ano_fim, mes_fim, tipo_dre, usuario=True))
+
     from models.company_manager import CompanyManager
+    from controllers.data_processing.bpo_totais import totais_mes_bpo
     company_manager = CompanyManager()
 
     # Buscar todos os meses
@@ -905,73 +684,29 @@ def api_dados_bpo_user(empresa_id):
         despesa_grafico = 0
         geral_grafico = 0
 
-        # Processar cada cenário (fluxo_caixa, real, real_mp)
-        for cenario_key in ['fluxo_caixa', 'real', 'real_mp']:
-            cenario_data = totais_calculados.get(cenario_key, {})
-
-            if not cenario_data or not isinstance(cenario_data, dict):
-                continue
-
-            mes_dados = cenario_data.get(mes_num, cenario_data.get(str(mes_num), {}))
-
-            if mes_dados and isinstance(mes_dados, dict):
-                # Extrair valores realizados
-                realizado = mes_dados.get('realizado', {})
-                if isinstance(realizado, dict):
-                    receita = realizado.get('receita', 0) or 0
-                    despesa = realizado.get('despesa', 0) or 0
-                    geral = realizado.get('geral', 0) or 0
-
-                    # RECALCULAR DESPESA DO REAL_MP SE EXISTIR PERCENTUAL MANUAL
-                    if cenario_key == 'real_mp':
-                        percentual_mp_manual = dados.get('percentual_mp_manual')
-                        if percentual_mp_manual is not None:
-                            # Pegar a despesa do "Resultado Real"
-                            despesa_real = totais_calculados.get('real', {}).get(mes_num, totais_calculados.get('real', {}).get(str(mes_num), {})).get('realizado', {}).get('despesa', 0) or 0
-
-                            # Buscar o valor do item 2.08 (Matéria Prima)
-                            valor_materia_prima = 0
-                            itens = dados.get('itens_hierarquicos', [])
-                            items_to_process = itens if isinstance(itens, list) else itens.items()
-
-                            for item in items_to_process:
-                                if isinstance(itens, list):
-                                    codigo = item.get('codigo', '')
-                                    item_data = item
-                                else:
-                                    codigo, item_data = item
-
-                                if codigo == '2.08':
-                                    dados_mensais = item_data.get('dados_mensais', [])
-                                    if dados_mensais and len(dados_mensais) > 0:
-                                        mes_atual_dados = dados_mensais[0]
-                                        valor_materia_prima = mes_atual_dados.get('valor_realizado', 0) or 0
-                                    break
-
-                            # Nova fórmula: Despesa_Real - Matéria_Prima + (Receita × Percentual)
-                            despesa_recalculada = despesa_real - valor_materia_prima + ((percentual_mp_manual / 100) * receita)
-                            despesa = despesa_recalculada
-                            geral = receita - despesa
-
-                    totais[cenario_key]['receita'] += receita
-                    totais[cenario_key]['despesa'] += despesa
-                    totais[cenario_key]['geral'] += geral
-
-                    if cenario_key == tipo_dre:
-                        receita_grafico = receita
-                        despesa_grafico = despesa
-                        geral_grafico = geral
-
-                # Extrair valores de orçamento
-                orcamento = mes_dados.get('orcamento', {})
-                if isinstance(orcamento, dict):
-                    receita_orc = orcamento.get('receita', 0) or 0
-                    despesa_orc = orcamento.get('despesa', 0) or 0
-                    geral_orc = orcamento.get('geral', 0) or 0
-
-                    totais_orcamento[cenario_key]['receita'] += receita_orc
-                    totais_orcamento[cenario_key]['despesa'] += despesa_orc
-                    totais_orcamento[cenario_key]['geral'] += geral_orc
+        # Processar cada cenário (fluxo_caixa, real, real_mp); real_mp já vem
+        # recalculado quando o mês tem percentual MP manual
+        for cenario_key, valores in totais_mes_bpo(dados, mes_num).items():
+            if valores['realizado'] is not None:
+                receita, despesa, geral = valores['realizado']
+
+                # Acumular totais
+                totais[cenario_key]['receita'] += receita
+                totais[cenario_key]['despesa'] += despesa
+                totais[cenario_key]['geral'] += geral
+
+                # Se é o DRE selecionado, guardar para gráfico
+                if cenario_key == tipo_dre:
+                    receita_grafico = receita
+                    despesa_grafico = despesa
+                    geral_grafico = geral
+
+            # Acumular orçamento
+            if valores['orcamento'] is not None:
+                receita_orc, despesa_orc, geral_orc = valores['orcamento']
+                totais_orcamento[cenario_key]['receita'] += receita_orc
+                totais_orcamento[cenario_key]['despesa'] += despesa_orc
+                totais_orcamento[cenario_key]['geral'] += geral_orc
 
         # Adicionar aos arrays do gráfico
         receitas_mensais.append(receita_grafico)
@@ -1101,24 +836,27 @@ def api_dados_bpo_user(empresa_id):
     })
 
 
+@user_bp.route('/user/api/comparativo-bpo/<int:empresa_id>')
+@acesso_empresa_requerido(api=True)
+def api_comparativo_bpo_user(empresa_id):
+    """API compatível com o admin - comparativo ano contra ano e janelas móveis do BPO"""
+    from controllers.data_processing.bpo_series import ler_parametros_comparativo, carregar_comparativo_bpo
+
+    parametros, erro = ler_parametros_comparativo(request.args)
+    if erro:
+        return jsonify({"error": erro}), 400
+
+    return jsonify(carregar_comparativo_bpo(empresa_id, **parametros))
+
+
 @user_bp.route('/user/consultar-bpo', methods=['GET', 'POST'])
+@acesso_empresa_requerido()
 def consultar_dados_bpo():
     """Consulta dados de BPO em formato de tabela para a empresa do usuário"""
-    if not ('user_email' in session and session.get('user_role') == 'user'):
-        flash("Acesso negado. Faça login como usuário.", "danger")
-        return redirect(url_for('index.login'))
-
-    # Verifica se tem empresa selecionada
-    if 'empresa_id' not in session:
-        return redirect(url_for('user.selecionar_empresa'))
-
-    from models.user_manager import UserManager
     from models.company_manager import CompanyManager
 
     # Pega informações do usuário logado
-    user_manager = UserManager()
-    user_data = user_manager.find_user_by_email(session.get('user_email'))
-    user_manager.close()
+    user_data = obter_usuario_logado()
 
     if not user_data:
         flash("Erro ao carregar dados do usuário.", "danger")
@@ -1156,23 +894,14 @@ def consultar_dados_bpo():
 
 
 @user_bp.route('/user/gerar_relatorio_bpo')
+@acesso_empresa_requerido()
 def gerar_relatorio_bpo():
     """Gera relatório Excel do dashboard BPO para usuário"""
-    if not ('user_email' in session and session.get('user_role') == 'user'):
-        return "Acesso negado", 403
-
-    # Pega empresa_id da sessão do usuário
     empresa_id = session.get('empresa_id')
-    if not empresa_id:
-        return "Empresa não selecionada", 400
 
     from models.company_manager import CompanyManager
     from datetime import datetime
-    from flask import make_response
-    from io import BytesIO
-    from openpyxl import Workbook
-    from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-    from openpyxl.chart import BarChart, Reference
+    from controllers.data_processing.bpo_totais import totais_mes_bpo
 
     # Buscar dados da empresa
     company_manager = CompanyManager()
@@ -1260,80 +989,29 @@ def gerar_relatorio_bpo():
         despesa_grafico = 0
         geral_grafico = 0
 
-        # Processar cada cenário (fluxo_caixa, real, real_mp)
-        for cenario_key in ['fluxo_caixa', 'real', 'real_mp']:
-            cenario_data = totais_calculados.get(cenario_key, {})
-
-            if not cenario_data or not isinstance(cenario_data, dict):
-                continue
-
-            # Pegar dados do mês
-            mes_dados = cenario_data.get(mes_num, cenario_data.get(str(mes_num), {}))
-
-            if mes_dados and isinstance(mes_dados, dict):
-                # Extrair valores realizados
-                realizado = mes_dados.get('realizado', {})
-                if isinstance(realizado, dict):
-                    receita = realizado.get('receita', 0) or 0
-                    despesa = realizado.get('despesa', 0) or 0
-                    geral = realizado.get('geral', 0) or 0
-
-                    # RECALCULAR DESPESA DO REAL_MP SE EXISTIR PERCENTUAL MANUAL
-                    if cenario_key == 'real_mp':
-                        percentual_mp_manual = dados.get('percentual_mp_manual')
-                        if percentual_mp_manual is not None:
-                            # Pegar a despesa do "Resultado Real"
-                            despesa_real = totais_calculados.get('real', {}).get(mes_num, totais_calculados.get('real', {}).get(str(mes_num), {})).get('realizado', {}).get('despesa', 0) or 0
-
-                            # Buscar o valor do item 2.08 (Matéria Prima)
-                            valor_materia_prima = 0
-                            itens = dados.get('itens_hierarquicos', [])
-
-                            # Itens pode ser lista ou dict
-                            items_to_process = itens if isinstance(itens, list) else itens.items()
-
-                            for item in items_to_process:
-                                if isinstance(itens, list):
-                                    codigo = item.get('codigo', '')
-                                    item_data = item
-                                else:
-                                    codigo, item_data = item
-
-                                # Verificar se é o item 2.08
-                                if codigo == '2.08':
-                                    dados_mensais = item_data.get('dados_mensais', [])
-                                    if dados_mensais and len(dados_mensais) > 0:
-                                        mes_atual_dados = dados_mensais[0]
-                                        valor_materia_prima = mes_atual_dados.get('valor_realizado', 0) or 0
-                                    break
-
-                            # Nova fórmula: Despesa_Real - Matéria_Prima + (Receita × Percentual)
-                            despesa_recalculada = despesa_real - valor_materia_prima + ((percentual_mp_manual / 100) * receita)
-                            despesa = despesa_recalculada
-                            geral = receita - despesa
-
-                    # Acumular totais
-                    totais[cenario_key]['receita'] += receita
-                    totais[cenario_key]['despesa'] += despesa
-                    totais[cenario_key]['geral'] += geral
-
-                    # Se é o DRE selecionado, guardar para gráfico
-                    if cenario_key == tipo_dre:
-                        receita_grafico = receita
-                        despesa_grafico = despesa
-                        geral_grafico = geral
-
-                # Extrair valores de orçamento
-                orcamento = mes_dados.get('orcamento', {})
-                if isinstance(orcamento, dict):
-                    receita_orc = orcamento.get('receita', 0) or 0
-                    despesa_orc = orcamento.get('despesa', 0) or 0
-                    geral_orc = orcamento.get('geral', 0) or 0
-
-                    # Acumular orçamento
-                    totais_orcamento[cenario_key]['receita'] += receita_orc
-                    totais_orcamento[cenario_key]['despesa'] += despesa_orc
-                    totais_orcamento[cenario_key]['geral'] += geral_orc
+        # Processar cada cenário (fluxo_caixa, real, real_mp); real_mp já vem
+        # recalculado quando o mês tem percentual MP manual
+        for cenario_key, valores in totais_mes_bpo(dados, mes_num).items():
+            if valores['realizado'] is not None:
+                receita, despesa, geral = valores['realizado']
+
+                # Acumular totais
+                totais[cenario_key]['receita'] += receita
+                totais[cenario_key]['despesa'] += despesa
+                totais[cenario_key]['geral'] += geral
+
+                # Se é o DRE selecionado, guardar para gráfico
+                if cenario_key == tipo_dre:
+                    receita_grafico = receita
+                    despesa_grafico = despesa
+                    geral_grafico = geral
+
+            # Acumular orçamento
+            if valores['orcamento'] is not None:
+                receita_orc, despesa_orc, geral_orc = valores['orcamento']
+                totais_orcamento[cenario_key]['receita'] += receita_orc
+                totais_orcamento[cenario_key]['despesa'] += despesa_orc
+                totais_orcamento[cenario_key]['geral'] += geral_orc
 
         # Adicionar aos arrays do gráfico
         receitas_mensais.append(receita_grafico)
@@ -1427,197 +1105,37 @@ def gerar_relatorio_bpo():
 
     company_manager.close()
 
-    # ========== CRIAR EXCEL COM GRÁFICOS ==========
-    from openpyxl.chart import LineChart, PieChart
-
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Gráficos BPO"
-
-    # Estilos
-    header_fill = PatternFill(start_color="2C3E50", end_color="2C3E50", fill_type="solid")
-    header_font = Font(bold=True, color="FFFFFF", size=16)
-
-    # Cabeçalho
-    ws['A1'] = 'Relatório BPO - Análise Gráfica'
-    ws['A1'].font = header_font
-    ws['A1'].fill = header_fill
-    ws['A1'].alignment = Alignment(horizontal='center', vertical='center')
-    ws.merge_cells('A1:H1')
-    ws.row_dimensions[1].height = 30
-
-    ws['A2'] = f"Empresa: {empresa['nome']}"
-    ws['A2'].font = Font(bold=True, size=11)
-    ws['A3'] = f"Período: {nomes_meses[mes_inicio]}/{ano_inicio} - {nomes_meses[mes_fim]}/{ano_fim}"
-    ws['A3'].font = Font(size=10)
-    ws['A4'] = f"Gerado em: {datetime.now().strftime('%d/%m/%Y %H:%M')}"
-    ws['A4'].font = Font(size=9, italic=True)
-
-    # Dados ocultos para os gráficos (coluna A-D, começando linha 6)
-    row = 6
-
-    # ==== GRÁFICO 1: COMPARATIVO DOS 3 DREs ====
-    ws.cell(row, 1, "DRE")
-    ws.cell(row, 2, "Resultado")
-    row += 1
-    for dre_nome, dre_key in [('Fluxo Caixa', 'fluxo_caixa'), ('Real', 'real'), ('Real+MP', 'real_mp')]:
-        ws.cell(row, 1, dre_nome)
-        ws.cell(row, 2, totais[dre_key]['geral'])
-        row += 1
-
-    chart1 = BarChart()
-    chart1.title = "Comparativo de Resultado - 3 DREs"
-    chart1.y_axis.title = 'Resultado (R$)'
-    chart1.style = 11
-    data = Reference(ws, min_col=2, min_row=7, max_row=9)
-    cats = Reference(ws, min_col=1, min_row=7, max_row=9)
-    chart1.add_data(data, titles_from_data=False)
-    chart1.set_categories(cats)
-    chart1.height = 10
-    chart1.width = 18
-    ws.add_chart(chart1, 'J7')
-
-    # ==== GRÁFICO 2: EVOLUÇÃO MENSAL (Receita x Despesa x Resultado) ====
-    row = 6
-    col_offset = 5  # Coluna E
-    ws.cell(row, col_offset, "Mês")
-    ws.cell(row, col_offset+1, "Receita")
-    ws.cell(row, col_offset+2, "Despesa")
-    ws.cell(row, col_offset+3, "Resultado")
-    row += 1
-
-    for i, label in enumerate(labels_meses):
-        ws.cell(row, col_offset, label)
-        ws.cell(row, col_offset+1, receitas_mensais[i])
-        ws.cell(row, col_offset+2, despesas_mensais[i])
-        ws.cell(row, col_offset+3, gerais_mensais[i])
-        row += 1
-
-    chart2 = LineChart()
-    chart2.title = f"Evolução Mensal - {tipo_dre.replace('_', ' ').title()}"
-    chart2.y_axis.title = 'Valor (R$)'
-    chart2.x_axis.title = 'Mês'
-    chart2.style = 12
-    max_row_chart2 = 6 + len(labels_meses)
-    data = Reference(ws, min_col=col_offset+1, min_row=6, max_row=max_row_chart2, max_col=col_offset+3)
-    cats = Reference(ws, min_col=col_offset, min_row=7, max_row=max_row_chart2)
-    chart2.add_data(data, titles_from_data=True)
-    chart2.set_categories(cats)
-    chart2.height = 12
-    chart2.width = 22
-    ws.add_chart(chart2, 'A12')
-
-    # ==== GRÁFICO 3: PIZZA CATEGORIAS DE RECEITA ====
-    row_start_receita = 6 + len(labels_meses) + 3
-    row = row_start_receita
-    ws.cell(row, 1, "Categoria Receita")
-    ws.cell(row, 2, "Valor")
-    row += 1
-
-    for codigo in sorted(categorias_receita.keys()):
-        cat = categorias_receita[codigo]
-        ws.cell(row, 1, cat['nome'])
-        ws.cell(row, 2, cat['realizado'])
-        row += 1
-
-    if len(categorias_receita) > 0:
-        chart3 = PieChart()
-        chart3.title = "Distribuição de Receitas por Categoria"
-        chart3.style = 10
-        data = Reference(ws, min_col=2, min_row=row_start_receita+1, max_row=row-1)
-        cats = Reference(ws, min_col=1, min_row=row_start_receita+1, max_row=row-1)
-        chart3.add_data(data, titles_from_data=False)
-        chart3.set_categories(cats)
-        chart3.height = 12
-        chart3.width = 16
-        ws.add_chart(chart3, 'J22')
-
-    # ==== GRÁFICO 4: PIZZA CATEGORIAS DE DESPESA ====
-    row_start_despesa = row + 2
-    row = row_start_despesa
-    ws.cell(row, 1, "Categoria Despesa")
-    ws.cell(row, 2, "Valor")
-    row += 1
-
-    for codigo in sorted(categorias_despesa.keys()):
-        cat = categorias_despesa[codigo]
-        ws.cell(row, 1, cat['nome'])
-        ws.cell(row, 2, cat['realizado'])
-        row += 1
-
-    if len(categorias_despesa) > 0:
-        chart4 = PieChart()
-        chart4.title = "Distribuição de Despesas por Categoria"
-        chart4.style = 10
-        data = Reference(ws, min_col=2, min_row=row_start_despesa+1, max_row=row-1)
-        cats = Reference(ws, min_col=1, min_row=row_start_despesa+1, max_row=row-1)
-        chart4.add_data(data, titles_from_data=False)
-        chart4.set_categories(cats)
-        chart4.height = 12
-        chart4.width = 16
-        ws.add_chart(chart4, 'J37')
-
-    # ==== GRÁFICO 5: BARRAS HORIZONTAIS - RECEITA vs DESPESA POR MÊS ====
-    row_start_bar = row + 2
-    row = row_start_bar
-    ws.cell(row, 5, "Mês")
-    ws.cell(row, 6, "Receita")
-    ws.cell(row, 7, "Despesa")
-    row += 1
-
-    for i, label in enumerate(labels_meses):
-        ws.cell(row, 5, label)
-        ws.cell(row, 6, receitas_mensais[i])
-        ws.cell(row, 7, despesas_mensais[i])
-        row += 1
-
-    from openpyxl.chart import BarChart as HorizontalBarChart
-    chart5 = HorizontalBarChart()
-    chart5.type = "bar"
-    chart5.title = "Receita vs Despesa Mensal"
-    chart5.y_axis.title = 'Mês'
-    chart5.x_axis.title = 'Valor (R$)'
-    chart5.style = 13
-    data = Reference(ws, min_col=6, min_row=row_start_bar, max_row=row-1, max_col=7)
-    cats = Reference(ws, min_col=5, min_row=row_start_bar+1, max_row=row-1)
-    chart5.add_data(data, titles_from_data=True)
-    chart5.set_categories(cats)
-    chart5.height = 14
-    chart5.width = 20
-    ws.add_chart(chart5, 'J52')
-
-    # Ocultar dados (deixar apenas gráficos visíveis)
-    for col_letter in ['A', 'B', 'C', 'D', 'E', 'F', 'G', 'H']:
-        ws.column_dimensions[col_letter].hidden = True
-
-    # Salvar Excel em buffer
-    excel_buffer = BytesIO()
-    wb.save(excel_buffer)
-    excel_buffer.seek(0)
-
-    # Retornar Excel
-    response = make_response(excel_buffer.read())
-    response.headers['Content-Type'] = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    # ========== GERAR EXCEL COM GRÁFICOS ==========
+    from controllers.reports.excel_reports import gerar_relatorio_bpo_xlsx, MIME_XLSX
+
+    resumo = {
+        'empresa_nome': empresa['nome'],
+        'periodo': f"{nomes_meses[mes_inicio]}/{ano_inicio} - {nomes_meses[mes_fim]}/{ano_fim}",
+        'gerado_em': datetime.now().strftime('%d/%m/%Y %H:%M'),
+        'tipo_dre': tipo_dre,
+        'totais': totais,
+        'labels_meses': labels_meses,
+        'receitas_mensais': receitas_mensais,
+        'despesas_mensais': despesas_mensais,
+        'gerais_mensais': gerais_mensais,
+        'categorias_receita': categorias_receita,
+        'categorias_despesa': categorias_despesa
+    }
+
+    # Retornar Excel (enviado em blocos enquanto o arquivo é gerado)
+    response = Response(gerar_relatorio_bpo_xlsx(resumo), mimetype=MIME_XLSX)
     response.headers['Content-Disposition'] = f'attachment; filename=Relatorio_BPO_{empresa["nome"]}_{datetime.now().strftime("%Y%m%d")}.xlsx'
 
     return response
 
 @user_bp.route('/user/gerar_relatorio_viabilidade')
+@acesso_empresa_requerido()
 def gerar_relatorio_viabilidade():
     """Gera relatório Excel comparando os 3 grupos de viabilidade para usuário"""
-    if not ('user_email' in session and session.get('user_role') == 'user'):
-        return "Acesso negado", 403
-
     empresa_id = session.get('empresa_id')
-    if not empresa_id:
-        return "Empresa não selecionada", 400
 
     from models.company_manager import CompanyManager
     from datetime import datetime
-    from io import BytesIO
-    from openpyxl import Workbook
-    from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-    from openpyxl.chart import BarChart, Reference
 
     # Buscar dados da empresa
     company_manager = CompanyManager()
@@ -1669,155 +1187,46 @@ def gerar_relatorio_viabilidade():
 
     company_manager.close()
 
-    # ========== CRIAR EXCEL COM GRÁFICOS ==========
-    from openpyxl.chart import PieChart
-
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Gráficos Viabilidade"
-
-    # Estilos
-    header_fill = PatternFill(start_color="2C3E50", end_color="2C3E50", fill_type="solid")
-    header_font = Font(bold=True, color="FFFFFF", size=16)
-
-    # Cabeçalho
-    ws['A1'] = 'Relatório de Viabilidade - Análise Gráfica'
-    ws['A1'].font = header_font
-    ws['A1'].fill = header_fill
-    ws['A1'].alignment = Alignment(horizontal='center', vertical='center')
-    ws.merge_cells('A1:H1')
-    ws.row_dimensions[1].height = 30
-
-    ws['A2'] = f"Empresa: {empresa['nome']}"
-    ws['A2'].font = Font(bold=True, size=11)
-    ws['A3'] = f"Ano: {ano_selecionado}"
-    ws['A3'].font = Font(size=10)
-    ws['A4'] = f"Gerado em: {datetime.now().strftime('%d/%m/%Y %H:%M')}"
-    ws['A4'].font = Font(size=9, italic=True)
-
-    # Dados ocultos para os gráficos
-    row = 6
-
-    # ==== GRÁFICO 1: COMPARATIVO DE RESULTADOS DOS 3 GRUPOS ====
-    ws.cell(row, 1, "Grupo")
-    ws.cell(row, 2, "Resultado")
-    row += 1
-    for grupo_nome in ['Viabilidade Real', 'Viabilidade PE', 'Viabilidade Ideal']:
-        grupo = grupos_info[grupo_nome]
-        ws.cell(row, 1, grupo_nome.replace('Viabilidade ', ''))
-        ws.cell(row, 2, grupo['resultado'])
-        row += 1
-
-    chart1 = BarChart()
-    chart1.title = "Comparativo de Resultados"
-    chart1.y_axis.title = 'Resultado (R$)'
-    chart1.style = 11
-    data = Reference(ws, min_col=2, min_row=6, max_row=9)
-    cats = Reference(ws, min_col=1, min_row=7, max_row=9)
-    chart1.add_data(data, titles_from_data=True)
-    chart1.set_categories(cats)
-    chart1.height = 12
-    chart1.width = 18
-    ws.add_chart(chart1, 'A7')
-
-    # ==== GRÁFICO 2: RECEITA vs DESPESA POR GRUPO ====
-    row = 6
-    col_offset = 4  # Coluna D
-    ws.cell(row, col_offset, "Grupo")
-    ws.cell(row, col_offset+1, "Receita")
-    ws.cell(row, col_offset+2, "Despesa")
-    row += 1
-
-    for grupo_nome in ['Viabilidade Real', 'Viabilidade PE', 'Viabilidade Ideal']:
-        grupo = grupos_info[grupo_nome]
-        ws.cell(row, col_offset, grupo_nome.replace('Viabilidade ', ''))
-        ws.cell(row, col_offset+1, grupo['receita'])
-        ws.cell(row, col_offset+2, grupo['despesa'])
-        row += 1
-
-    chart2 = BarChart()
-    chart2.title = "Receita vs Despesa por Grupo"
-    chart2.y_axis.title = 'Valor (R$)'
-    chart2.style = 12
-    data = Reference(ws, min_col=col_offset+1, min_row=6, max_row=9, max_col=col_offset+2)
-    cats = Reference(ws, min_col=col_offset, min_row=7, max_row=9)
-    chart2.add_data(data, titles_from_data=True)
-    chart2.set_categories(cats)
-    chart2.height = 12
-    chart2.width = 20
-    ws.add_chart(chart2, 'J7')
-
-    # ==== GRÁFICO 3: PIZZA - DISTRIBUIÇÃO DE RECEITAS ====
-    row_start_pizza = 12
-    row = row_start_pizza
-    ws.cell(row, 1, "Grupo")
-    ws.cell(row, 2, "Receita")
-    row += 1
-
-    for grupo_nome in ['Viabilidade Real', 'Viabilidade PE', 'Viabilidade Ideal']:
-        grupo = grupos_info[grupo_nome]
-        ws.cell(row, 1, grupo_nome.replace('Viabilidade ', ''))
-        ws.cell(row, 2, grupo['receita'])
-        row += 1
-
-    chart3 = PieChart()
-    chart3.title = "Distribuição de Receitas"
-    chart3.style = 10
-    data = Reference(ws, min_col=2, min_row=row_start_pizza, max_row=row-1)
-    cats = Reference(ws, min_col=1, min_row=row_start_pizza+1, max_row=row-1)
-    chart3.add_data(data, titles_from_data=True)
-    chart3.set_categories(cats)
-    chart3.height = 12
-    chart3.width = 16
-    ws.add_chart(chart3, 'A24')
-
-    # ==== GRÁFICO 4: PIZZA - DISTRIBUIÇÃO DE DESPESAS ====
-    row_start_desp = row + 2
-    row = row_start_desp
-    ws.cell(row, 1, "Grupo")
-    ws.cell(row, 2, "Despesa")
-    row += 1
-
-    for grupo_nome in ['Viabilidade Real', 'Viabilidade PE', 'Viabilidade Ideal']:
-        grupo = grupos_info[grupo_nome]
-        ws.cell(row, 1, grupo_nome.replace('Viabilidade ', ''))
-        ws.cell(row, 2, grupo['despesa'])
-        row += 1
-
-    chart4 = PieChart()
-    chart4.title = "Distribuição de Despesas"
-    chart4.style = 10
-    data = Reference(ws, min_col=2, min_row=row_start_desp, max_row=row-1)
-    cats = Reference(ws, min_col=1, min_row=row_start_desp+1, max_row=row-1)
-    chart4.add_data(data, titles_from_data=True)
-    chart4.set_categories(cats)
-    chart4.height = 12
-    chart4.width = 16
-    ws.add_chart(chart4, 'J24')
-
-    # Ocultar dados (deixar apenas gráficos visíveis)
-    for col_letter in ['A', 'B', 'C', 'D', 'E', 'F', 'G']:
-        ws.column_dimensions[col_letter].hidden = True
-
-    # Salvar Excel em buffer
-    excel_buffer = BytesIO()
-    wb.save(excel_buffer)
-    excel_buffer.seek(0)
-
-    # Retornar Excel
-    response = make_response(excel_buffer.read())
-    response.headers['Content-Type'] = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    # ========== GERAR EXCEL COM GRÁFICOS ==========
+    from controllers.reports.excel_reports import gerar_relatorio_viabilidade_xlsx, MIME_XLSX
+
+    resumo = {
+        'empresa_nome': empresa['nome'],
+        'ano': ano_selecionado,
+        'gerado_em': datetime.now().strftime('%d/%m/%Y %H:%M'),
+        'grupos_info': grupos_info
+    }
+
+    # Retornar Excel (enviado em blocos enquanto o arquivo é gerado)
+    response = Response(gerar_relatorio_viabilidade_xlsx(resumo), mimetype=MIME_XLSX)
     response.headers['Content-Disposition'] = f'attachment; filename=Relatorio_Viabilidade_{empresa["nome"]}_{ano_selecionado}.xlsx'
 
     return response
 
 
+@user_bp.route('/user/exportar/<conjunto>/<int:empresa_id>')
+@acesso_empresa_requerido(api=True)
+def exportar_dados_user(conjunto, empresa_id):
+    """Exporta em streaming (CSV/Parquet) o BPO ou a viabilidade da empresa"""
+    from controllers.reports.exportacao import exportar, nome_arquivo, FORMATOS, FormatoIndisponivel
+
+    formato = request.args.get('formato', 'csv')
+    try:
+        corpo = exportar(conjunto, [empresa_id], formato)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except FormatoIndisponivel as e:
+        return jsonify({'error': str(e)}), 501
+
+    response = Response(corpo, mimetype=FORMATOS[formato])
+    response.headers['Content-Disposition'] = f'attachment; filename={nome_arquivo(conjunto, formato, [empresa_id])}'
+    return response
+
+
 @user_bp.route('/user/logout')
 def logout():
     """Logout do usuário"""
-    session.pop('user_email', None)
-    session.pop('user_role', None)
-    session.pop('empresa_id', None)
-    session.pop('empresa_nome', None)
+    from controllers.auth.principal import encerrar_sessao
+    encerrar_sessao()
     flash("Logout realizado com sucesso.", "success")
     return redirect(url_for('index.login'))
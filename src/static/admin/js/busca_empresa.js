@@ -0,0 +1,142 @@
+/**
+ * Autocompletar de empresas (admin)
+ * Usado pelo componente templates/admin/components/busca_empresa.html
+ */
+(function () {
+    const ATRASO_MS = 250;
+    const MINIMO_CARACTERES = 2;
+
+    function iniciarBuscaEmpresa(container) {
+        if (container.dataset.iniciado) return;
+        container.dataset.iniciado = '1';
+
+        const url = container.dataset.url;
+        const texto = container.querySelector('.busca-empresa-texto');
+        const campo = container.querySelector('input[type="hidden"]');
+        const lista = container.querySelector('.busca-empresa-resultados');
+        let temporizador = null;
+        let requisicao = null;
+        let ativo = -1;
+
+        function esconder() {
+            lista.classList.add('d-none');
+            lista.innerHTML = '';
+            ativo = -1;
+        }
+
+        function selecionar(empresa) {
+            campo.value = empresa.id;
+            texto.value = `${empresa.nome} (${empresa.cnpj})`;
+            texto.classList.remove('is-invalid');
+            esconder();
+            campo.dispatchEvent(new Event('change', { bubbles: true }));
+            container.dispatchEvent(new CustomEvent('empresa-selecionada', { detail: empresa, bubbles: true }));
+        }
+
+        function destacar(indice) {
+            const itens = lista.querySelectorAll('.list-group-item');
+            itens.forEach((item, i) => item.classList.toggle('active', i === indice));
+            ativo = indice;
+        }
+
+        function mostrar(empresas) {
+            lista.innerHTML = '';
+            if (!empresas.length) {
+                const vazio = document.createElement('div');
+                vazio.className = 'list-group-item text-muted small';
+                vazio.textContent = 'Nenhuma empresa encontrada';
+                lista.appendChild(vazio);
+            }
+            empresas.forEach((empresa) => {
+                const item = document.createElement('button');
+                item.type = 'button';
+                item.className = 'list-group-item list-group-item-action';
+                const nome = document.createElement('div');
+                nome.className = 'fw-medium';
+                nome.textContent = empresa.nome;
+                if (!empresa.ativo) {
+                    const badge = document.createElement('span');
+                    badge.className = 'badge bg-danger ms-2';
+                    badge.textContent = 'INATIVO';
+                    nome.appendChild(badge);
+                }
+                const detalhe = document.createElement('small');
+                detalhe.className = 'text-muted';
+                detalhe.textContent = `${empresa.cnpj} · ${empresa.seguimento}`;
+                item.append(nome, detalhe);
+                item.addEventListener('mousedown', (e) => {
+                    e.preventDefault();
+                    selecionar(empresa);
+                });
+                lista.appendChild(item);
+            });
+            lista.classList.remove('d-none');
+            ativo = -1;
+            lista._empresas = empresas;
+        }
+
+        async function buscar(termo) {
+            if (requisicao) requisicao.abort();
+            requisicao = new AbortController();
+            try {
+                const resposta = await fetch(`${url}?q=${encodeURIComponent(termo)}`, { signal: requisicao.signal });
+                if (!resposta.ok) return;
+                const dados = await resposta.json();
+                if (texto.value.trim() === termo) mostrar(dados.empresas || []);
+            } catch (erro) {
+                if (erro.name !== 'AbortError') console.error('Erro na busca de empresas:', erro);
+            }
+        }
+
+        texto.addEventListener('input', () => {
+            campo.value = '';
+            clearTimeout(temporizador);
+            const termo = texto.value.trim();
+            if (termo.length < MINIMO_CARACTERES) {
+                esconder();
+                return;
+            }
+            temporizador = setTimeout(() => buscar(termo), ATRASO_MS);
+        });
+
+        texto.addEventListener('keydown', (e) => {
+            const empresas = lista._empresas || [];
+            if (lista.classList.contains('d-none') || !empresas.length) return;
+            if (e.key === 'ArrowDown') {
+                e.preventDefault();
+                destacar(Math.min(ativo + 1, empresas.length - 1));
+            } else if (e.key === 'ArrowUp') {
+                e.preventDefault();
+                destacar(Math.max(ativo - 1, 0));
+            } else if (e.key === 'Enter' && ativo >= 0) {
+                e.preventDefault();
+                selecionar(empresas[ativo]);
+            } else if (e.key === 'Escape') {
+                esconder();
+            }
+        });
+
+        texto.addEventListener('blur', () => setTimeout(esconder, 150));
+
+        const form = container.closest('form');
+        if (form) {
+            form.addEventListener('submit', (e) => {
+                if (texto.required && !campo.value) {
+                    e.preventDefault();
+                    texto.classList.add('is-invalid');
+                    texto.focus();
+                }
+            });
+        }
+    }
+
+    function iniciarTodos() {
+        document.querySelectorAll('.busca-empresa').forEach(iniciarBuscaEmpresa);
+    }
+
+    if (document.readyState === 'loading') {
+        document.addEventListener('DOMContentLoaded', iniciarTodos);
+    } else {
+        iniciarTodos();
+    }
+})();
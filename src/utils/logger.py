@@ -8,12 +8,76 @@ Este módulo fornece um sistema de logging profissional com:
 - Múltiplos níveis de log (DEBUG, INFO, WARNING, ERROR, CRITICAL)
 - Formatação padronizada com timestamp
 - Logs organizados por data
+- Escrita assíncrona: a requisição só enfileira o registro; uma thread
+  em segundo plano formata e grava nos arquivos
+- Nível por logger configurável via variáveis de ambiente
+
+Variáveis de ambiente:
+    LOG_LEVEL          - nível padrão de todos os loggers (padrão: INFO)
+    LOG_LEVEL_<NOME>   - nível de um logger específico, ex.:
+                         LOG_LEVEL_DATABASE=WARNING, LOG_LEVEL_BPO_PROCESSING=DEBUG
+    LOG_ASYNC          - 0 para gravar direto no arquivo, sem fila (padrão: 1)
+    LOG_DIR            - diretório dos arquivos de log (padrão: <raiz>/logs)
 """
 
+import atexit
 import logging
 import os
-from logging.handlers import RotatingFileHandler
-from datetime import datetime
+import queue
+import threading
+from logging.handlers import RotatingFileHandler, QueueHandler, QueueListener
+from datetime import date, datetime, time
+from decimal import Decimal
+
+
+# Tipos de argumento que não mudam depois da chamada de log
+_TIPOS_IMUTAVEIS = (str, int, float, bytes, Decimal, date, datetime, time, type(None))
+
+
+def _imutavel(valor):
+    if isinstance(valor, tuple):
+        return all(_imutavel(item) for item in valor)
+    return isinstance(valor, _TIPOS_IMUTAVEIS)
+
+
+class _QueueHandlerLazy(QueueHandler):
+    """
+    QueueHandler que não formata a mensagem na thread da requisição.
+
+    Quando msg e args são imutáveis, a interpolação (msg % args) e a
+    formatação ficam para a thread de escrita. Com args mutáveis (dict,
+    list, objetos), a mensagem é montada aqui, para registrar o estado do
+    momento da chamada. O traceback (que depende do frame atual) é sempre
+    capturado aqui, e o registro é marcado com o arquivo de destino.
+    """
+
+    def __init__(self, fila, destino):
+        super().__init__(fila)
+        self.destino = destino
+
+    def prepare(self, record):
+        if record.args and not (isinstance(record.msg, str) and _imutavel(record.args)):
+            record.msg = record.getMessage()
+            record.args = None
+        if record.exc_info:
+            # Traceback precisa ser renderizado enquanto a exceção existe
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        record.destino = self.destino
+        return record
+
+
+class _RoteadorArquivos(logging.Handler):
+    """Handler da thread de escrita: entrega cada registro ao arquivo do seu logger."""
+
+    def __init__(self):
+        super().__init__()
+        self.arquivos = {}
+
+    def emit(self, record):
+        handler = self.arquivos.get(getattr(record, 'destino', None))
+        if handler is not None and record.levelno >= handler.level:
+            handler.handle(record)
 
 
 class Logger:
@@ -22,15 +86,52 @@ class Logger:
     """
 
     _loggers = {}
+    _lock = threading.Lock()
+    _fila = None
+    _listener = None
+    _roteador = None
+
+    @staticmethod
+    def nivel_configurado(name, padrao=logging.INFO):
+        """
+        Resolve o nível de um logger a partir do ambiente
+        (LOG_LEVEL_<NOME>, depois LOG_LEVEL, depois o padrão).
+        """
+        chave = 'LOG_LEVEL_' + ''.join(c if c.isalnum() else '_' for c in name).upper()
+        valor = os.getenv(chave) or os.getenv('LOG_LEVEL')
+        if not valor:
+            return padrao
+        nivel = logging.getLevelName(valor.strip().upper())
+        return nivel if isinstance(nivel, int) else padrao
+
+    @staticmethod
+    def _iniciar_escrita_assincrona():
+        """Cria a fila e a thread de escrita (uma para todos os loggers)."""
+        if Logger._listener is not None:
+            return
+        Logger._fila = queue.SimpleQueue()
+        Logger._roteador = _RoteadorArquivos()
+        Logger._listener = QueueListener(Logger._fila, Logger._roteador)
+        Logger._listener.start()
+        # Garante que os registros pendentes sejam gravados ao encerrar
+        atexit.register(Logger.parar)
+
+    @staticmethod
+    def parar():
+        """Esvazia a fila e encerra a thread de escrita."""
+        if Logger._listener is not None:
+            Logger._listener.stop()
+            Logger._listener = None
 
     @staticmethod
-    def get_logger(name='app', log_level=logging.INFO):
+    def get_logger(name='app', log_level=None):
         """
         Obtém ou cria um logger configurado.
 
         Args:
             name (str): Nome do logger (geralmente o nome do módulo)
-            log_level (int): Nível de log (DEBUG, INFO, WARNING, ERROR, CRITICAL)
+            log_level (int): Nível de log (DEBUG, INFO, WARNING, ERROR, CRITICAL).
+                Se omitido, usa LOG_LEVEL_<NOME>/LOG_LEVEL do ambiente ou INFO.
 
         Returns:
             logging.Logger: Instância configurada do logger
@@ -40,44 +141,60 @@ class Logger:
         if name in Logger._loggers:
             return Logger._loggers[name]
 
-        # Cria novo logger
-        logger = logging.getLogger(name)
-        logger.setLevel(log_level)
-
-        # Remove handlers existentes para evitar duplicação
-        logger.handlers = []
-
-        # Define diretório de logs
-        log_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'logs')
-        os.makedirs(log_dir, exist_ok=True)
-
-        # Define formato do log
-        log_format = logging.Formatter(
-            '%(asctime)s - [%(levelname)s] - %(name)s - %(message)s',
-            datefmt='%Y-%m-%d %H:%M:%S'
-        )
-
-        # Handler para arquivo com rotação (10MB por arquivo, mantém 5 backups)
-        log_file = os.path.join(log_dir, f'{name}.log')
-        file_handler = RotatingFileHandler(
-            log_file,
-            maxBytes=10 * 1024 * 1024,  # 10MB
-            backupCount=5,
-            encoding='utf-8'
-        )
-        file_handler.setLevel(log_level)
-        file_handler.setFormatter(log_format)
-        logger.addHandler(file_handler)
-
-        # Handler para console (opcional - apenas em desenvolvimento)
-        # Descomente as linhas abaixo se quiser ver logs no console também
-        # console_handler = logging.StreamHandler()
-        # console_handler.setLevel(logging.WARNING)  # Apenas warnings e erros no console
-        # console_handler.setFormatter(log_format)
-        # logger.addHandler(console_handler)
-
-        # Salva logger no cache
-        Logger._loggers[name] = logger
+        with Logger._lock:
+            if name in Logger._loggers:
+                return Logger._loggers[name]
+
+            if log_level is None:
+                log_level = Logger.nivel_configurado(name)
+
+            # Cria novo logger
+            logger = logging.getLogger(name)
+            logger.setLevel(log_level)
+
+            # Remove handlers existentes para evitar duplicação
+            logger.handlers = []
+
+            # Define diretório de logs
+            log_dir = os.getenv('LOG_DIR') or os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'logs')
+            os.makedirs(log_dir, exist_ok=True)
+
+            # Define formato do log
+            log_format = logging.Formatter(
+                '%(asctime)s - [%(levelname)s] - %(name)s - %(message)s',
+                datefmt='%Y-%m-%d %H:%M:%S'
+            )
+
+            # Handler para arquivo com rotação (10MB por arquivo, mantém 5 backups)
+            log_file = os.path.join(log_dir, f'{name}.log')
+            file_handler = RotatingFileHandler(
+                log_file,
+                maxBytes=10 * 1024 * 1024,  # 10MB
+                backupCount=5,
+                encoding='utf-8'
+            )
+            file_handler.setLevel(log_level)
+            file_handler.setFormatter(log_format)
+
+            if os.getenv('LOG_ASYNC', '1') != '0':
+                # Requisição apenas enfileira; a thread de escrita grava o arquivo
+                Logger._iniciar_escrita_assincrona()
+                Logger._roteador.arquivos[name] = file_handler
+                queue_handler = _QueueHandlerLazy(Logger._fila, name)
+                queue_handler.setLevel(log_level)
+                logger.addHandler(queue_handler)
+            else:
+                logger.addHandler(file_handler)
+
+            # Handler para console (opcional - apenas em desenvolvimento)
+            # Descomente as linhas abaixo se quiser ver logs no console também
+            # console_handler = logging.StreamHandler()
+            # console_handler.setLevel(logging.WARNING)  # Apenas warnings e erros no console
+            # console_handler.setFormatter(log_format)
+            # logger.addHandler(console_handler)
+
+            # Salva logger no cache
+            Logger._loggers[name] = logger
 
         return logger
 
@@ -89,7 +206,7 @@ class Logger:
         Args:
             app: Instância do Flask (opcional)
         """
-        logger = Logger.get_logger('app', log_level=logging.INFO)
+        logger = Logger.get_logger('app')
 
         if app and len(logger.handlers) > 0:
             # Desabilita o logger padrão do Flask para evitar duplicação
@@ -98,11 +215,11 @@ class Logger:
             # Redireciona logs do Flask para nosso logger
             for handler in logger.handlers:
                 app.logger.addHandler(handler)
-            app.logger.setLevel(logging.INFO)
+            app.logger.setLevel(logger.level)
 
         logger.info("="*80)
         logger.info("Sistema de Logging Inicializado")
-        logger.info(f"Data/Hora: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+        logger.info("Data/Hora: %s", datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
         logger.info("="*80)
 
         return logger
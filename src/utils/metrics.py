@@ -0,0 +1,275 @@
+"""
+Métricas da Aplicação (formato Prometheus)
+==========================================
+
+Instrumentação por requisição, agregada por endpoint do blueprint
+(ex.: admin.api_dados_bpo, user.api_dados_empresa_user):
+
+- latência da requisição (histograma) e total por status HTTP
+- tempo gasto no banco e quantidade de queries por requisição
+- bytes enviados na resposta (inclusive respostas em streaming)
+- tempo nas fases de processamento: 'parse' (leitura de planilhas),
+  'report' (geração de PDF/Excel) e 'ai' (chamadas ao Gemini)
+
+Os valores ficam em memória, por processo; com vários workers cada um
+expõe os próprios números em /metrics.
+
+Uso:
+    from utils.metrics import medir_fase
+
+    @medir_fase('parse')
+    def process_bpo_file(file): ...
+
+    with medir_fase('report'):
+        ...
+"""
+
+import threading
+import time
+from functools import wraps
+from bisect import bisect_left
+from flask import g, request, has_request_context
+
+# Limites dos histogramas
+BUCKETS_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+BUCKETS_QUERIES = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+BUCKETS_BYTES = (1_000, 10_000, 100_000, 1_000_000, 10_000_000, 50_000_000)
+
+ENDPOINT_DESCONHECIDO = 'desconhecido'
+
+
+# ============================================================================
+# REGISTRO DE MÉTRICAS
+# ============================================================================
+
+class _Histograma:
+    """Histograma cumulativo no formato Prometheus, com séries por rótulos."""
+
+    def __init__(self, nome, descricao, rotulos, buckets):
+        self.nome = nome
+        self.descricao = descricao
+        self.rotulos = rotulos
+        self.buckets = buckets
+        self.series = {}  # valores dos rótulos -> [contagens por bucket..., +Inf], soma
+
+    def observar(self, valores_rotulos, valor):
+        serie = self.series.get(valores_rotulos)
+        if serie is None:
+            serie = self.series[valores_rotulos] = [[0] * (len(self.buckets) + 1), 0.0]
+        serie[0][bisect_left(self.buckets, valor)] += 1
+        serie[1] += valor
+
+    def exportar(self):
+        linhas = [f"# HELP {self.nome} {self.descricao}", f"# TYPE {self.nome} histogram"]
+        for valores_rotulos, (contagens, soma) in sorted(self.series.items()):
+            base = _formatar_rotulos(self.rotulos, valores_rotulos)
+            acumulado = 0
+            for limite, contagem in zip(self.buckets, contagens):
+                acumulado += contagem
+                linhas.append(f'{self.nome}_bucket{{{base},le="{limite}"}} {acumulado}')
+            acumulado += contagens[-1]
+            linhas.append(f'{self.nome}_bucket{{{base},le="+Inf"}} {acumulado}')
+            linhas.append(f"{self.nome}_sum{{{base}}} {soma}")
+            linhas.append(f"{self.nome}_count{{{base}}} {acumulado}")
+        return linhas
+
+
+class _Contador:
+    """Contador monotônico com séries por rótulos."""
+
+    def __init__(self, nome, descricao, rotulos):
+        self.nome = nome
+        self.descricao = descricao
+        self.rotulos = rotulos
+        self.series = {}
+
+    def incrementar(self, valores_rotulos, valor=1):
+        self.series[valores_rotulos] = self.series.get(valores_rotulos, 0) + valor
+
+    def exportar(self):
+        linhas = [f"# HELP {self.nome} {self.descricao}", f"# TYPE {self.nome} counter"]
+        for valores_rotulos, valor in sorted(self.series.items()):
+            linhas.append(f"{self.nome}{{{_formatar_rotulos(self.rotulos, valores_rotulos)}}} {valor}")
+        return linhas
+
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _formatar_rotulos(nomes, valores):
+    return ','.join(f'{nome}="{_escapar(valor)}"' for nome, valor in zip(nomes, valores))
+
+
+_lock = threading.Lock()
+
+REQUISICOES = _Contador(
+    'wsh_http_requisicoes_total', 'Requisições atendidas', ('endpoint', 'metodo', 'status'))
+LATENCIA = _Histograma(
+    'wsh_http_requisicao_segundos', 'Latência da requisição', ('endpoint',), BUCKETS_SEGUNDOS)
+TEMPO_BANCO = _Histograma(
+    'wsh_db_tempo_segundos', 'Tempo gasto no banco por requisição', ('endpoint',), BUCKETS_SEGUNDOS)
+QUERIES = _Histograma(
+    'wsh_db_queries_por_requisicao', 'Queries executadas por requisição', ('endpoint',), BUCKETS_QUERIES)
+BYTES_RESPOSTA = _Histograma(
+    'wsh_http_resposta_bytes', 'Tamanho da resposta enviada', ('endpoint',), BUCKETS_BYTES)
+FASES = _Histograma(
+    'wsh_fase_segundos', 'Tempo nas fases parse/report/ai', ('endpoint', 'fase'), BUCKETS_SEGUNDOS)
+
+_METRICAS = (REQUISICOES, LATENCIA, TEMPO_BANCO, QUERIES, BYTES_RESPOSTA, FASES)
+
+
+def _endpoint_atual():
+    if has_request_context():
+        return request.endpoint or ENDPOINT_DESCONHECIDO
+    return ENDPOINT_DESCONHECIDO
+
+
+# ============================================================================
+# INSTRUMENTAÇÃO
+# ============================================================================
+
+def registrar_query(duracao):
+    """Contabiliza uma query na requisição atual (chamado pelo cursor instrumentado)."""
+    if not has_request_context():
+        return
+    metricas = g.get('metricas')
+    if metricas is not None:
+        metricas['db_tempo'] += duracao
+        metricas['db_queries'] += 1
+
+
+class medir_fase:
+    """
+    Context manager/decorator que mede o tempo de uma fase ('parse', 'report', 'ai').
+
+    O endpoint é capturado na entrada, então a medição continua válida mesmo
+    quando a fase termina depois da resposta (streaming).
+    """
+
+    def __init__(self, fase):
+        self.fase = fase
+        self._inicio = None
+        self._endpoint = None
+
+    def __enter__(self):
+        self._endpoint = _endpoint_atual()
+        self._inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        duracao = time.perf_counter() - self._inicio
+        with _lock:
+            FASES.observar((self._endpoint, self.fase), duracao)
+        return False
+
+    def __call__(self, funcao):
+        @wraps(funcao)
+        def wrapper(*args, **kwargs):
+            with medir_fase(self.fase):
+                return funcao(*args, **kwargs)
+        return wrapper
+
+
+def medir_iteravel(fase, iteravel):
+    """Mede a fase até o iterável (ex.: corpo de resposta em streaming) ser consumido."""
+    medicao = medir_fase(fase).__enter__()
+
+    def gerar():
+        try:
+            yield from iteravel
+        finally:
+            medicao.__exit__(None, None, None)
+    return gerar()
+
+
+def _contar_bytes(endpoint, corpo):
+    """Repassa o corpo em streaming contando os bytes enviados."""
+    total = 0
+    try:
+        for bloco in corpo:
+            total += len(bloco)
+            yield bloco
+    finally:
+        with _lock:
+            BYTES_RESPOSTA.observar((endpoint,), total)
+        fechar = getattr(corpo, 'close', None)
+        if fechar is not None:
+            fechar()
+
+
+def _iniciar_requisicao():
+    g.metricas = {'inicio': time.perf_counter(), 'db_tempo': 0.0, 'db_queries': 0, 'registrada': False}
+
+
+def _registrar_requisicao(status, response=None):
+    metricas = g.get('metricas')
+    if metricas is None or metricas['registrada']:
+        return
+    metricas['registrada'] = True
+
+    endpoint = request.endpoint or ENDPOINT_DESCONHECIDO
+    duracao = time.perf_counter() - metricas['inicio']
+    tamanho = None
+    if response is not None:
+        if response.is_streamed:
+            response.response = _contar_bytes(endpoint, response.response)
+        else:
+            tamanho = response.calculate_content_length()
+
+    with _lock:
+        REQUISICOES.incrementar((endpoint, request.method, str(status)))
+        LATENCIA.observar((endpoint,), duracao)
+        TEMPO_BANCO.observar((endpoint,), metricas['db_tempo'])
+        QUERIES.observar((endpoint,), metricas['db_queries'])
+        if tamanho is not None:
+            BYTES_RESPOSTA.observar((endpoint,), tamanho)
+
+
+def _apos_requisicao(response):
+    _registrar_requisicao(response.status_code, response)
+    return response
+
+
+def _encerrar_requisicao(exception=None):
+    # Exceção não tratada: after_request não roda
+    if exception is not None:
+        _registrar_requisicao(500)
+
+
+def init_app(app):
+    """Registra a coleta de métricas no app Flask."""
+    app.before_request(_iniciar_requisicao)
+    app.after_request(_apos_requisicao)
+    app.teardown_request(_encerrar_requisicao)
+
+
+# ============================================================================
+# EXPORTAÇÃO
+# ============================================================================
+
+def _metricas_pdf():
+    """Estatísticas do renderizador de PDF, se ele já foi iniciado neste processo."""
+    import sys
+
+    modulo = sys.modules.get('controllers.reports.pdf_renderer')
+    renderer = getattr(modulo, '_renderer', None) if modulo else None
+    if renderer is None:
+        return []
+
+    linhas = []
+    for campo, valor in sorted(renderer.estatisticas().items()):
+        nome = f"wsh_pdf_{campo}"
+        linhas.append(f"# TYPE {nome} gauge")
+        linhas.append(f"{nome} {valor}")
+    return linhas
+
+
+def exportar_prometheus():
+    """Retorna todas as métricas no formato texto do Prometheus."""
+    linhas = []
+    with _lock:
+        for metrica in _METRICAS:
+            linhas.extend(metrica.exportar())
+    linhas.extend(_metricas_pdf())
+    return '\n'.join(linhas) + '\n'